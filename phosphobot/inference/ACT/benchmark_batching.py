@@ -0,0 +1,147 @@
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "lerobot",
+#     "edubotics",
+#     "fastapi",
+#     "uvicorn",
+#     "packaging",
+#     "torch",
+#     "loguru",
+# ]
+#
+# [tool.uv.sources]
+# lerobot = { git = "https://github.com/phospho-app/lerobot" }
+# # phosphobot.tensor_encoding and phosphobot.request_batching must match the client,
+# # and are not released on PyPI: install phosphobot from this checkout
+# edubotics = { path = "../../phosphobot" }
+# ///
+"""
+Benchmark of the dynamic batching of the ACT inference server (server.py), on CPU
+with a tiny randomly initialized policy.
+
+Several clients send requests one after the other, like robots running the AI
+control loop. The throughput and latency are printed for several batch sizes.
+
+```
+uv run benchmark_batching.py --nb-clients 8
+```
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import torch
+from lerobot.configs.types import FeatureType, PolicyFeature
+from lerobot.policies.act.configuration_act import ACTConfig
+from lerobot.policies.act.modeling_act import ACTPolicy
+from loguru import logger
+
+import server
+from phosphobot.request_batching import RequestBatcher
+
+
+def make_tiny_policy(
+    state_size: int, nb_cameras: int, height: int, width: int
+) -> ACTPolicy:
+    """A small ACT policy with random weights, to measure the batching on CPU"""
+    input_features = {
+        "observation.state": PolicyFeature(type=FeatureType.STATE, shape=(state_size,))
+    }
+    for i in range(nb_cameras):
+        input_features[f"observation.images.{i}"] = PolicyFeature(
+            type=FeatureType.VISUAL, shape=(3, height, width)
+        )
+    output_features = {
+        "action": PolicyFeature(type=FeatureType.ACTION, shape=(state_size,))
+    }
+    config = ACTConfig(
+        device="cpu",
+        input_features=input_features,
+        output_features=output_features,
+        pretrained_backbone_weights=None,
+        use_vae=False,
+        chunk_size=30,
+        n_action_steps=30,
+        dim_model=128,
+        n_heads=4,
+        dim_feedforward=256,
+        n_encoder_layers=2,
+        n_decoder_layers=1,
+    )
+    dataset_stats = {}
+    for key, feature in {**input_features, **output_features}.items():
+        shape = (3, 1, 1) if feature.type == FeatureType.VISUAL else feature.shape
+        dataset_stats[key] = {
+            "mean": torch.zeros(shape),
+            "std": torch.ones(shape),
+            "min": torch.zeros(shape),
+            "max": torch.ones(shape),
+        }
+    return ACTPolicy(config, dataset_stats=dataset_stats).eval()
+
+
+async def run_clients(
+    batcher: RequestBatcher, nb_clients: int, nb_requests: int, request: dict
+) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+
+    async def client():
+        for _ in range(nb_requests):
+            start = time.perf_counter()
+            await batcher.submit(request)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(nb_clients)])
+    return time.perf_counter() - start, latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the request batching")
+    parser.add_argument("--nb-clients", type=int, default=8)
+    parser.add_argument("--nb-requests", type=int, default=10)
+    parser.add_argument("--nb-cameras", type=int, default=2)
+    parser.add_argument("--batch-window-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    height, width = 240, 320
+    state_size = 6
+    server.policy = make_tiny_policy(state_size, args.nb_cameras, height, width)
+    server.device = torch.device("cpu")
+    server.image_names = [f"observation.images.{i}" for i in range(args.nb_cameras)]
+    server.target_size = (width, height)
+
+    request = {
+        "state": np.zeros(state_size, dtype=np.float32),
+        "images": [
+            np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+            for _ in range(args.nb_cameras)
+        ],
+    }
+    # Warm up
+    server.process_batch([request])
+
+    for max_batch_size in (1, 2, 4, 8):
+        batcher = RequestBatcher(
+            server.process_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=args.batch_window_ms,
+        )
+        elapsed, latencies = await run_clients(
+            batcher, args.nb_clients, args.nb_requests, request
+        )
+        await batcher.close()
+        logger.info(
+            f"max batch size {max_batch_size}: "
+            f"{len(latencies) / elapsed:.1f} requests/s, "
+            f"mean batch size {batcher.mean_batch_size:.1f}, "
+            f"latency p50 {np.percentile(latencies, 50) * 1000:.0f} ms, "
+            f"p99 {np.percentile(latencies, 99) * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
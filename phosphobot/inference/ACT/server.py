@@ -2,8 +2,7 @@
 # requires-python = ">=3.10"
 # dependencies = [
 #     "lerobot",
-#     "phosphobot",
-#     "json_numpy",
+#     "edubotics",
 #     "fastapi",
 #     "uvicorn",
 #     "packaging",
@@ -13,6 +12,9 @@
 #
 # [tool.uv.sources]
 # lerobot = { git = "https://github.com/phospho-app/lerobot" }
+# # phosphobot.tensor_encoding and phosphobot.request_batching must match the client,
+# # and are not released on PyPI: install phosphobot from this checkout
+# edubotics = { path = "../../phosphobot" }
 # ///
 
 from loguru import logger
@@ -24,29 +26,28 @@ from pathlib import Path
 from typing import List
 import json
 import cv2
-import json_numpy
 import numpy as np
 import torch
 import torch.nn as nn
 import uvicorn
 from packaging import version  # Don't remove this line (used by lerobot)
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from huggingface_hub import snapshot_download
 from huggingface_hub.errors import RepositoryNotFoundError
 from huggingface_hub.utils._validators import HFValidationError
 from lerobot.policies.act.modeling_act import ACTPolicy
-from pydantic import BaseModel
+from phosphobot.request_batching import RequestBatcher
+from phosphobot.tensor_encoding import inference_response, read_inference_request
 
 app = FastAPI()
 
 # Global variables
 policy: ACTPolicy = None
 input_features: dict = {}
+image_names: List[str] = []
+target_size: tuple[int, int] = (224, 224)
 device = None
-
-
-class InferenceRequest(BaseModel):
-    encoded: str  # Will contain json_numpy encoded payload with image
+batcher: RequestBatcher | None = None
 
 
 def get_safe_torch_device(device_str: str, log: bool = True) -> torch.device:
@@ -112,7 +113,7 @@ def parse_input_features(file_path: Path) -> dict:
 
 def load_policy(model_id: str, revision: str | None = None):
     """Download and load the ACT policy."""
-    global policy, device, input_features
+    global policy, device, input_features, image_names, target_size
     try:
         logger.info(f"Loading policy from {model_id}")
 
@@ -134,6 +135,12 @@ def load_policy(model_id: str, revision: str | None = None):
 
         input_features = parse_input_features(policy_path / "config.json")
         logger.success(f"Input features required for model: {input_features.keys()}")
+        image_names = [
+            feature for feature in input_features.keys() if "image" in feature
+        ]
+        if image_names:
+            shape = input_features[image_names[0]]["shape"]
+            target_size = (shape[2], shape[1])
 
         # Set to evaluation mode
         policy.eval()
@@ -146,119 +153,130 @@ def load_policy(model_id: str, revision: str | None = None):
         raise
 
 
-def process_image(
-    images: List[np.ndarray],
-    current_qpos: np.ndarray,
-    image_names: List[str],
-    target_size: tuple[int, int],
-) -> np.ndarray:
-    """Process image through the ACT policy."""
+def process_batch(requests: List[dict]) -> List[np.ndarray]:
+    """
+    Process a batch of requests through the ACT policy, with a single forward pass.
+
+    Every request is a dict with the "state" and the "images" of the robot, checked
+    by parse_request. The inputs are stacked and moved to the device once per feature, and the images
+    are converted to float on the device.
+
+    Returns:
+        The actions of every request, of shape (n_action_steps, 1, action_dim).
+    """
     global policy, device
 
+    if device is None:
+        raise ValueError(
+            "Device is not set. Please ensure the policy is loaded correctly."
+        )
+
+    try:
+        with torch.no_grad(), torch.autocast(device_type=device.type):
+            # Prepare state tensor
+            states = np.stack(
+                [np.asarray(request["state"], dtype=np.float32) for request in requests]
+            )
+            batch = {"observation.state": torch.from_numpy(states).to(device)}
+
+            # Convert images to tensors (B, C, H, W), normalize
+            width, height = target_size
+            for i, image_name in enumerate(image_names):
+                images = []
+                for request in requests:
+                    image = request["images"][i]
+                    if image.shape[:2] != (height, width):
+                        image = cv2.resize(image, target_size)
+                    images.append(image)
+                tensor_images = torch.from_numpy(np.stack(images)).to(device)
+                batch[image_name] = tensor_images.permute(0, 3, 1, 2).float() / 255.0
+
+            # Get the actions
+            batch = policy.normalize_inputs(batch)  # type: ignore
+            if policy.config.image_features:  # type: ignore
+                batch = dict(batch)
+                batch["observation.images"] = [
+                    batch[key]
+                    for key in policy.config.image_features  # type: ignore
+                ]
+            actions = policy.model(batch)[0][:, : policy.config.n_action_steps]  # type: ignore
+            actions = policy.unnormalize_outputs({"action": actions})["action"]  # type: ignore
+            actions = actions.transpose(0, 1).float().cpu().numpy()
+
+    except Exception as e:
+        logger.error(f"Error during inference: {str(e)}")
+        raise
+
+    # Scatter the results, keeping a batch dimension of 1
+    return [actions[:, i : i + 1] for i in range(len(requests))]
+
+
+def parse_request(payload: dict) -> dict:
+    """
+    Check the inputs of an inference request and build the item of the batch.
+
+    The requests are checked before they are batched, so that an invalid request
+    doesn't fail the forward pass of the other requests of its batch.
+
+    Raises:
+        ValueError: If the request doesn't match the input features of the policy.
+    """
+    if "observation.state" not in payload:
+        logger.error("observation.state not found in payload")
+        raise ValueError("observation.state required in payload")
+
+    if len(payload.keys()) != len(input_features.keys()):
+        for feature in input_features.keys():
+            if feature not in payload:
+                logger.error(f"{feature} required but not found in payload")
+        raise ValueError("Missing required features in payload")
+
+    state = np.asarray(payload["observation.state"], dtype=np.float32)
+    state_shape = input_features.get("observation.state", {}).get("shape")
+    if state_shape is not None and state.shape != tuple(state_shape):
+        raise ValueError(
+            f"Invalid state shape {state.shape}. Expected {tuple(state_shape)}."
+        )
+
+    images = [
+        np.asarray(payload[f"observation.images.{i}"])
+        for i in range(len(payload.keys()))
+        if f"observation.images.{i}" in payload
+    ]
     if len(images) == 0:
         raise ValueError("No images provided")
+    if len(images) != len(image_names):
+        raise ValueError(f"Expected {len(image_names)} images, got {len(images)}")
+    for image in images:
+        if image.ndim != 3 or image.shape[2] != 3:
+            raise ValueError("Invalid image format. Expected RGB image.")
 
-    if len(images[0].shape) == 3 and images[0].shape[2] == 3:
-        try:
-            if device is None:
-                raise ValueError(
-                    "Device is not set. Please ensure the policy is loaded correctly."
-                )
-            with torch.no_grad(), torch.autocast(device_type=device.type):
-                # Prepare state tensor
-                current_qpos = current_qpos.copy()
-                state_tensor = (
-                    torch.from_numpy(current_qpos)
-                    .view(1, len(current_qpos))
-                    .float()
-                    .to(device)
-                )
-
-                # Create batch dictionary
-                batch = {
-                    "observation.state": state_tensor,
-                }
-
-                # Convert images to tensors (B, C, H, W), normalize
-                processed_images = []
-                for i, image in enumerate(images):
-                    if image.shape[:2] != target_size:
-                        image = cv2.resize(image, target_size)
-                    tensor_image = (
-                        torch.from_numpy(image)
-                        .permute(2, 0, 1)
-                        .unsqueeze(0)
-                        .float()
-                        .to(device)
-                    )
-                    tensor_image = tensor_image / 255.0
-                    processed_images.append(tensor_image)
-                    batch[image_names[i]] = tensor_image
-
-                # Get the actions
-                batch = policy.normalize_inputs(batch)  # type: ignore
-                if policy.config.image_features:  # type: ignore
-                    batch = dict(batch)
-                    batch["observation.images"] = [
-                        batch[key]
-                        for key in policy.config.image_features  # type: ignore
-                    ]
-                actions = policy.model(batch)[0][:, : policy.config.n_action_steps]  # type: ignore
-                actions = policy.unnormalize_outputs({"action": actions})["action"]  # type: ignore
-                actions = actions.transpose(0, 1)
-                return actions.cpu().numpy()
-
-        except Exception as e:
-            logger.error(f"Error during inference: {str(e)}")
-            raise
-    else:
-        raise ValueError("Invalid image format. Expected RGB image.")
+    return {"state": state, "images": images}
 
 
 @app.post("/act")
-async def inference(request: InferenceRequest) -> str | None:
-    """Endpoint for ACT policy inference."""
+async def inference(request: Request) -> Response:
+    """
+    Endpoint for ACT policy inference.
+
+    Accepts the binary tensor encoding (see phosphobot.tensor_encoding) or the
+    double-encoded JSON payload {"encoded": json_numpy.dumps(inputs)}, and answers
+    in the same encoding.
+    """
     if policy is None:
         raise HTTPException(status_code=500, detail="Policy not initialized")
 
     try:
-        # Decode the double-encoded payload
-        payload: dict = json_numpy.loads(request.encoded)
-        target_size: tuple[int, int] = (224, 224)
-
-        # Get feature names
-        image_names = [
-            feature for feature in input_features.keys() if "image" in feature
-        ]
-
-        if "observation.state" not in payload:
-            logger.error("observation.state not found in payload")
-            raise ValueError("observation.state required in payload")
-
-        if len(payload.keys()) != len(input_features.keys()):
-            for feature in input_features.keys():
-                if feature not in payload:
-                    logger.error(f"{feature} required but not found in payload")
-            raise ValueError("Missing required features in payload")
-        else:
-            shape = input_features[image_names[0]]["shape"]
-            target_size = (shape[2], shape[1])
-
-        # Infer actions
-        actions = process_image(
-            current_qpos=payload["observation.state"],
-            images=[
-                payload[f"observation.images.{i}"]
-                for i in range(len(payload.keys()))
-                if f"observation.images.{i}" in payload
-            ],
-            image_names=image_names,
-            target_size=target_size,
-        )
+        payload, binary = await read_inference_request(request)
+        item = parse_request(payload)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Encode response using json_numpy
-        response = json_numpy.dumps(actions)
-        return response
+    try:
+        # Infer actions, batched with the concurrent requests
+        assert batcher is not None
+        actions = await batcher.submit(item)
+        return inference_response(actions, binary=binary)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -272,6 +290,8 @@ async def health_check():
         "policy_loaded": policy is not None,
         "device": str(device) if device is not None else None,
         "input_features": input_features if input_features != {} else "not_loaded",
+        # Encodings of the /act requests, checked by the clients
+        "transports": ["binary", "json"],
     }
 
 
@@ -292,11 +312,30 @@ def main():
     parser.add_argument(
         "--port", type=int, default=8080, help="Port to run the server on"
     )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=8,
+        help="Maximum number of concurrent requests processed in one forward pass. Default: 8",
+    )
+    parser.add_argument(
+        "--batch-window-ms",
+        type=float,
+        default=5.0,
+        help="Time to wait for concurrent requests before running a batch. Default: 5",
+    )
 
     args = parser.parse_args()
     # Load the policy
     load_policy(args.model_id, revision=args.revision)
 
+    global batcher
+    batcher = RequestBatcher(
+        process_batch,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.batch_window_ms,
+    )
+
     # Start the server
     uvicorn.run(app, host="0.0.0.0", port=args.port)
 
@@ -212,15 +212,14 @@ async def serve(
     import time
     from datetime import datetime, timezone
 
-    import json_numpy
     import torch
     import torch.nn as nn
     import uvicorn
-    from fastapi import FastAPI, HTTPException
+    from fastapi import FastAPI, HTTPException, Request
     from huggingface_hub import snapshot_download  # type: ignore
-    from pydantic import BaseModel
 
     from lerobot.policies.act.modeling_act import ACTPolicy
+    from phosphobot.tensor_encoding import inference_response, read_inference_request
     from supabase import Client, create_client
 
     class RetryError(Exception):
@@ -456,20 +455,19 @@ async def serve(
                     actions = actions.transpose(0, 1)
                     return actions.cpu().numpy()
 
-            class InferenceRequest(BaseModel):
-                encoded: str  # Will contain json_numpy encoded payload with image
-
             @app.post("/act")
-            async def inference(request: InferenceRequest):
-                """Endpoint for ACT policy inference."""
+            async def inference(request: Request):
+                """
+                Endpoint for ACT policy inference. Accepts the binary tensor encoding
+                or the double-encoded JSON payload, and answers in the same encoding.
+                """
                 nonlocal policy
 
                 if policy is None:
                     raise HTTPException(status_code=500, detail="Policy not loaded")
 
                 try:
-                    # Decode the double-encoded payload
-                    payload: dict = json_numpy.loads(request.encoded)
+                    payload, binary = await read_inference_request(request)
                     # Default size for Paligemma
                     target_size: tuple[int, int] = (224, 224)
 
@@ -537,9 +535,7 @@ async def serve(
                             content=str(e),
                         )
 
-                    # Encode response using json_numpy
-                    response = json_numpy.dumps(actions)
-                    return response
+                    return inference_response(actions, binary=binary)
 
                 except Exception as e:
                     raise HTTPException(
@@ -1,9 +1,6 @@
 import asyncio
-from collections import deque
-import time
 from typing import Dict, List, Literal, Optional
 
-import cv2
 import httpx
 import json_numpy  # type: ignore
 import numpy as np
@@ -12,11 +9,18 @@ from fastapi import HTTPException
 from huggingface_hub import HfApi
 from pydantic import BaseModel, Field, field_validator, model_validator
 
-from phosphobot.am.base import ActionModel
+from phosphobot.am.base import ActionChunkPipeline, ActionModel
 from phosphobot.camera import AllCameras
+from phosphobot.control_loop import LoopTimer
 from phosphobot.control_signal import AIControlSignal
 from phosphobot.hardware.base import BaseManipulator
 from phosphobot.models import ModelConfigurationResponse
+from phosphobot.snapshot import Snapshot, get_snapshot_service
+from phosphobot.tensor_encoding import (
+    TENSOR_CONTENT_TYPE,
+    decode_tensors,
+    encode_tensors,
+)
 from phosphobot.utils import background_task_log_exceptions, get_hf_token
 
 
@@ -173,13 +177,34 @@ class RetryError(Exception):
 
 
 class ACT(ActionModel):
+    # Status codes of a server which can't parse the binary requests: 415 Unsupported
+    # Media Type, or 422 when the body is validated as JSON. Other errors are checked
+    # with the /health endpoint, which lists the transports of the server.
+    JSON_ONLY_STATUS_CODES = (415, 422)
+    # Number of requests sent in JSON after a fall back, before trying binary again
+    BINARY_RETRY_INTERVAL = 100
+
     def __init__(
         self,
         server_url: str = "http://localhost",
         server_port: int = 8080,
+        transport: Literal["binary", "json"] = "binary",
+        jpeg_quality: int | None = None,
         **kwargs,
     ):
+        """
+        Args:
+            transport: Encoding of the inference requests. "binary" sends the raw
+                buffers of the arrays and falls back to "json" for a while if the
+                server doesn't support it.
+            jpeg_quality: If set, the images are JPEG compressed with this quality
+                (1-100) in the binary transport.
+        """
         super().__init__(server_url, server_port)
+        self.transport = transport
+        self.jpeg_quality = jpeg_quality
+        # Requests left to send in JSON before trying the binary transport again
+        self._json_requests_left = 0
         self.async_client = httpx.AsyncClient(
             base_url=server_url + f":{server_port}",
             timeout=10,
@@ -195,19 +220,105 @@ class ACT(ActionModel):
             http2=True,  # Enables HTTP/2 if supported by the server
         )
 
-    def sample_actions(self, inputs: dict) -> np.ndarray:
+    @property
+    def uses_binary_transport(self) -> bool:
+        """Whether the next request is sent with the binary transport"""
+        return self.transport == "binary" and self._json_requests_left == 0
+
+    def _request_kwargs(self, inputs: dict) -> dict:
+        if self.uses_binary_transport:
+            return {
+                "content": encode_tensors(inputs, jpeg_quality=self.jpeg_quality),
+                "headers": {
+                    "Content-Type": TENSOR_CONTENT_TYPE,
+                    "Accept": TENSOR_CONTENT_TYPE,
+                },
+            }
+        if self._json_requests_left > 0:
+            self._json_requests_left -= 1
         # Double-encoded version (to send numpy arrays as JSON)
-        encoded_payload = {"encoded": json_numpy.dumps(inputs)}
+        return {"json": {"encoded": json_numpy.dumps(inputs)}}
+
+    def _binary_request_failed(self, response: httpx.Response) -> bool:
+        """Whether the request was sent in binary and failed"""
+        return self.uses_binary_transport and response.status_code not in (200, 202)
 
+    @staticmethod
+    def _health_supports_binary(response: httpx.Response) -> bool:
+        """
+        Whether the /health response lists the binary transport. Servers that don't
+        list their transports only support JSON.
+        """
         try:
-            response = self.sync_client.post("/act", json=encoded_payload)
+            return "binary" in response.json().get("transports", [])
+        except Exception:
+            return False
 
-            if response.status_code == 202:
-                raise RetryError(response.content)
+    def _should_fall_back(
+        self, response: httpx.Response, binary_supported: bool
+    ) -> bool:
+        """
+        Whether to send the failed binary request again in JSON.
 
-            if response.status_code != 200:
-                raise RuntimeError(response.text)
-            actions = json_numpy.loads(response.json())
+        binary_supported is the result of the capability probe. If it is True, the
+        error is a real inference error, which is not retried.
+        """
+        if binary_supported:
+            return False
+        logger.warning(
+            f"The inference server rejected the binary transport ({response.status_code}). "
+            f"Falling back to JSON for {self.BINARY_RETRY_INTERVAL} requests."
+        )
+        self._json_requests_left = self.BINARY_RETRY_INTERVAL
+        return True
+
+    def _probe_binary_support(self, response: httpx.Response) -> bool:
+        """
+        Whether the server supports the binary transport, after a failed binary
+        request.
+        """
+        if response.status_code in self.JSON_ONLY_STATUS_CODES:
+            return False
+        try:
+            return self._health_supports_binary(self.sync_client.get("/health"))
+        except httpx.HTTPError:
+            return False
+
+    async def _async_probe_binary_support(self, response: httpx.Response) -> bool:
+        if response.status_code in self.JSON_ONLY_STATUS_CODES:
+            return False
+        try:
+            return self._health_supports_binary(await self.async_client.get("/health"))
+        except httpx.HTTPError:
+            return False
+
+    @staticmethod
+    def _parse_actions(response: httpx.Response) -> np.ndarray:
+        if response.status_code == 202:
+            raise RetryError(response.content)
+
+        if response.status_code != 200:
+            raise RuntimeError(response.text)
+        if response.headers.get("content-type", "").startswith(TENSOR_CONTENT_TYPE):
+            return decode_tensors(response.content)["actions"]
+        return json_numpy.loads(response.json())
+
+    def sample_actions(self, inputs: dict) -> np.ndarray:
+        try:
+            response = self.sync_client.post("/act", **self._request_kwargs(inputs))
+            if self._binary_request_failed(response) and self._should_fall_back(
+                response, self._probe_binary_support(response)
+            ):
+                try:
+                    response = self.sync_client.post(
+                        "/act", **self._request_kwargs(inputs)
+                    )
+                except httpx.TransportError:
+                    # The server may close the connection after the error
+                    response = self.sync_client.post(
+                        "/act", **self._request_kwargs(inputs)
+                    )
+            actions = self._parse_actions(response)
         except RetryError as e:
             raise RetryError(e)
         except Exception as e:
@@ -219,20 +330,27 @@ class ACT(ActionModel):
         return actions
 
     async def async_sample_actions(self, inputs: dict) -> np.ndarray:
-        # Clean up the input to avoid JSON serialization issues
-        encoded_payload = {"encoded": json_numpy.dumps(inputs)}
-
         try:
             response = await self.async_client.post(
-                f"{self.server_url}/act", json=encoded_payload, timeout=30
+                f"{self.server_url}/act", **self._request_kwargs(inputs), timeout=30
             )
-
-            if response.status_code == 202:
-                raise RetryError(response.content)
-
-            if response.status_code != 200:
-                raise RuntimeError(response.text)
-            actions = json_numpy.loads(response.json())
+            if self._binary_request_failed(response) and self._should_fall_back(
+                response, await self._async_probe_binary_support(response)
+            ):
+                try:
+                    response = await self.async_client.post(
+                        f"{self.server_url}/act",
+                        **self._request_kwargs(inputs),
+                        timeout=30,
+                    )
+                except httpx.TransportError:
+                    # The server may close the connection after the error
+                    response = await self.async_client.post(
+                        f"{self.server_url}/act",
+                        **self._request_kwargs(inputs),
+                        timeout=30,
+                    )
+            actions = self._parse_actions(response)
         except RetryError as e:
             raise RetryError(e)
         except Exception as e:
@@ -387,17 +505,21 @@ class ACT(ActionModel):
 
     @classmethod
     def fetch_frame(
-        cls, all_cameras: AllCameras, camera_id: int, resolution: list[int]
+        cls,
+        all_cameras: AllCameras,
+        camera_id: int,
+        resolution: list[int],
+        snapshot: Optional[Snapshot] = None,
     ) -> np.ndarray:
-        rgb_frame = all_cameras.get_rgb_frame(
-            camera_id=camera_id,
-            resize=(resolution[2], resolution[1]),
-        )
-        if rgb_frame is not None:
-            # Convert to BGR
-            image = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
+        resize = (resolution[2], resolution[1])
+        camera_sample = snapshot.cameras.get(camera_id) if snapshot else None
+        if camera_sample is not None:
+            bgr_frame = camera_sample.bgr(resize=resize)
+        else:
+            bgr_frame = all_cameras.get_bgr_frame(camera_id=camera_id, resize=resize)
+        if bgr_frame is not None:
             # Ensure dtype is uint8 (if it isn’t already)
-            converted_array = image.astype(np.uint8)
+            converted_array = bgr_frame.astype(np.uint8, copy=False)
             return converted_array
 
         else:
@@ -426,6 +548,8 @@ class ACT(ActionModel):
         angle_format: Literal["degrees", "radians", "other"] = "radians",
         min_angle: float | None = None,
         max_angle: float | None = None,
+        prefetch_fraction: float = 0.3,
+        loop_timer: LoopTimer | None = None,
         **kwargs,
     ):
         """
@@ -433,39 +557,53 @@ class ACT(ActionModel):
         It uses the model to get the actions based on the current state of the robot and the cameras.
         The loop runs until the control signal is stopped or the model is not available anymore.
         The loop runs at the specified fps and speed.
+        The next action chunk is requested when prefetch_fraction of the current chunk remains.
         """
 
         nb_iter = 0
         config = model_spawn_config.hf_model_config
 
         signal_marked_as_started = False
-        actions_queue: deque = deque([])
-
-        while control_signal.is_in_loop():
-            logger.debug(
-                f"AI control loop iteration {nb_iter}, status: {control_signal.status}, with id {control_signal.id}"
-            )
-            if control_signal.status == "paused":
-                logger.debug("AI control loop paused")
-                await asyncio.sleep(0.1)
-                continue
+        if loop_timer is None:
+            loop_timer = LoopTimer(name="ai_control")
+        loop_timer.period = 1.0 / (fps * speed)
+        pipeline = ActionChunkPipeline(
+            self.async_sample_actions, prefetch_fraction=prefetch_fraction
+        )
 
-            start_time = time.perf_counter()
+        unit: Literal["rad", "motor_units", "degrees", "other"]
+        if angle_format == "radians":
+            unit = "rad"
+        else:
+            unit = angle_format
+
+        camera_ids = [
+            i if cameras_keys_mapping is None else cameras_keys_mapping.get(key, i)
+            for i, key in enumerate(config.input_features.video_keys)
+        ]
+        if selected_camera_id is not None:
+            camera_ids.append(selected_camera_id)
+        # The joints and the frames of the inputs are sampled at the same time
+        snapshots = get_snapshot_service().subscribe(
+            robots=robots,
+            cameras=[all_cameras.get_camera_by_id(i) for i in set(camera_ids)],
+            freq=fps * speed,
+        )
 
+        def get_inputs() -> dict[str, np.ndarray | str]:
+            snapshot = snapshots.latest(max_age=2 / (fps * speed))
             # Get the images from the cameras based on the config
             # For now, just put as many cameras as the model config
             image_inputs: Dict[str, np.ndarray] = {}
-            for i, camera_name in enumerate(config.input_features.video_keys):
-                if cameras_keys_mapping is None:
-                    camera_id = i
-                else:
-                    camera_id = cameras_keys_mapping.get(camera_name, i)
-
+            for camera_name, camera_id in zip(
+                config.input_features.video_keys, camera_ids
+            ):
                 video_resolution = config.input_features.features[camera_name].shape
                 frame_array = ACT.fetch_frame(
                     all_cameras=all_cameras,
                     camera_id=camera_id,
                     resolution=video_resolution,
+                    snapshot=snapshot,
                 )
                 image_inputs[camera_name] = frame_array
 
@@ -488,11 +626,13 @@ class ACT(ActionModel):
                 raise Exception("No robot connected. Exiting AI control loop.")
 
             # Concatenate all robot states
-            state = robots[0].read_joints_position(unit="rad")
-            for robot in robots[1:]:
-                state = np.concatenate(
-                    (state, robot.read_joints_position(unit="rad")), axis=0
-                )
+            state = snapshot.joints_position(robots) if snapshot else None
+            if state is None:
+                state = robots[0].read_joints_position(unit="rad")
+                for robot in robots[1:]:
+                    state = np.concatenate(
+                        (state, robot.read_joints_position(unit="rad")), axis=0
+                    )
 
             inputs: dict[str, np.ndarray | str] = {
                 config.input_features.state_key: state,
@@ -510,54 +650,65 @@ class ACT(ActionModel):
                     all_cameras=all_cameras,
                     camera_id=selected_camera_id,
                     resolution=[3, 224, 224],
+                    snapshot=snapshot,
                 )
                 inputs["image_for_bboxes"] = frame_array
+            return inputs
 
-            try:
-                if len(actions_queue) == 0:
-                    actions = await self.async_sample_actions(inputs)
-                    actions_queue.extend(actions)
-                actions = actions_queue.popleft()
-            except RetryError:
-                logger.warning("Could not detect the target object. Retrying...")
-                continue
-            except Exception as e:
-                logger.warning(
-                    f"Failed to get actions from model: {e}. Exiting AI control loop."
+        try:
+            while control_signal.is_in_loop():
+                logger.debug(
+                    f"AI control loop iteration {nb_iter}, status: {control_signal.status}, with id {control_signal.id}"
                 )
-                control_signal.stop()
-                break
-
-            if not signal_marked_as_started:
-                control_signal.set_running()
-                signal_marked_as_started = True
-
-            for action in actions:
-                # Early stop
-                if not control_signal.is_in_loop():
-                    break
-
-                # Send the new joint position to the robot
-                action_list = action.tolist()
-
-                unit: Literal["rad", "motor_units", "degrees", "other"]
-                if angle_format == "radians":
-                    unit = "rad"
-                else:
-                    unit = angle_format
-
-                for robot_index in range(len(robots)):
-                    robots[robot_index].write_joint_positions(
-                        angles=action_list[robot_index * 6 : robot_index * 6 + 6],
-                        unit=unit,
-                        min_value=min_angle,
-                        max_value=max_angle,
+                if control_signal.status == "paused":
+                    logger.debug("AI control loop paused")
+                    # The remaining actions were predicted before the pause
+                    pipeline.cancel()
+                    await asyncio.sleep(0.1)
+                    loop_timer.reset()
+                    continue
+
+                try:
+                    actions = await pipeline.next_action(get_inputs)
+                except RetryError:
+                    logger.warning("Could not detect the target object. Retrying...")
+                    continue
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to get actions from model: {e}. Exiting AI control loop."
                     )
+                    control_signal.stop()
+                    break
 
-                # Wait fps time
-                elapsed_time = time.perf_counter() - start_time
-                sleep_time = max(0, 1.0 / (fps * speed) - elapsed_time)
-                await asyncio.sleep(sleep_time)
-                start_time = time.perf_counter()
-
-            nb_iter += 1
+                if not signal_marked_as_started:
+                    control_signal.set_running()
+                    signal_marked_as_started = True
+
+                for action in actions:
+                    # Early stop
+                    if not control_signal.is_in_loop():
+                        break
+
+                    # Send the new joint position to the robot
+                    action_list = action.tolist()
+
+                    for robot_index in range(len(robots)):
+                        robots[robot_index].write_joint_positions(
+                            angles=action_list[robot_index * 6 : robot_index * 6 + 6],
+                            unit=unit,
+                            min_value=min_angle,
+                            max_value=max_angle,
+                        )
+
+                    # Wait fps time
+                    await loop_timer.wait()
+
+                nb_iter += 1
+        finally:
+            snapshots.close()
+
+        pipeline.cancel()
+        if pipeline.mean_stall_ms is not None:
+            logger.info(
+                f"AI control loop stopped. Mean wait between action chunks: {pipeline.mean_stall_ms:.1f} ms"
+            )
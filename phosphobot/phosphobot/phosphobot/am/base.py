@@ -1,8 +1,12 @@
+import asyncio
+import math
 import random
 import string
+import time
 from abc import ABC, abstractmethod
+from collections import deque
 from pathlib import Path
-from typing import Literal, Optional
+from typing import Awaitable, Callable, Literal, Optional
 
 import av
 import numpy as np
@@ -11,6 +15,7 @@ from huggingface_hub import HfApi
 from loguru import logger
 from pydantic import BaseModel, Field, field_validator, model_validator
 
+from phosphobot.metrics import get_metrics
 from phosphobot.models import InfoModel, ModelConfigurationResponse
 
 # Disable PyAV logs
@@ -79,6 +84,159 @@ class ActionModel(ABC):
         return self.sample_actions(*args, **kwargs)
 
 
+INFERENCE_SECONDS = get_metrics().histogram(
+    "phosphobot_inference_seconds",
+    "Round trip time of the requests of action chunks to the inference server, in seconds.",
+)
+INFERENCE_STALL_SECONDS = get_metrics().histogram(
+    "phosphobot_inference_stall_seconds",
+    "Time the robot waited for an action chunk after the first one, in seconds.",
+)
+
+
+class ActionChunkPipeline:
+    """
+    Execute action chunks one action at a time, and request the next chunk before
+    the current one runs out.
+
+    When only `prefetch_fraction` of the current chunk remains, the next observation
+    is captured and the next chunk is requested in the background. The actions
+    executed while the request was in flight are dropped from the new chunk, and
+    the overlap with the remaining actions of the current chunk is blended with the
+    temporal ensembling weights of ACT: w_i = exp(-ensemble_decay * i), where i = 0
+    is the oldest prediction.
+
+    With prefetch_fraction=0, the next chunk is only requested once the current one
+    is exhausted and the robot waits for the inference.
+    """
+
+    def __init__(
+        self,
+        sample_actions: Callable[[dict], Awaitable[np.ndarray]],
+        prefetch_fraction: float = 0.3,
+        ensemble_decay: float = 0.01,
+    ):
+        """
+        Args:
+            sample_actions: Coroutine function returning the action chunk for some inputs.
+            prefetch_fraction: Fraction of the chunk remaining when the next chunk is requested.
+            ensemble_decay: Decay of the weights of the newer predictions in the overlap.
+        """
+        if not 0 <= prefetch_fraction < 1:
+            raise ValueError(
+                f"prefetch_fraction must be between 0 and 1, got {prefetch_fraction}"
+            )
+        self.sample_actions = sample_actions
+        self.prefetch_fraction = prefetch_fraction
+        self.ensemble_decay = ensemble_decay
+
+        self.actions: deque[np.ndarray] = deque()
+        self.chunk_size = 0
+        self._pending: asyncio.Task | None = None
+        # Number of actions executed since the pending request was sent
+        self._nb_executed_since_request = 0
+
+        self.nb_chunks = 0
+        # Time the robot waited for a chunk after the first one, in seconds
+        self.stall_times: deque[float] = deque(maxlen=1000)
+
+    async def next_action(self, get_inputs: Callable[[], dict]) -> np.ndarray:
+        """
+        Return the next action to execute. `get_inputs` captures the current
+        observation and is only called when a new chunk is requested.
+
+        Exceptions raised by `get_inputs` or `sample_actions` are propagated, and
+        the chunk is requested again on the next call.
+        """
+        if self._pending is not None and self._pending.done():
+            self._merge(self._take_pending())
+
+        if not self.actions:
+            start = time.perf_counter()
+            is_first_chunk = self.nb_chunks == 0
+            while not self.actions:
+                if self._pending is None:
+                    self._request(get_inputs)
+                chunk = await self._wait_pending()
+                if len(chunk) == 0:
+                    raise ValueError("The model returned an empty action chunk")
+                self._merge(chunk)
+            if not is_first_chunk:
+                stall_time = time.perf_counter() - start
+                self.stall_times.append(stall_time)
+                INFERENCE_STALL_SECONDS.observe(stall_time)
+
+        action = self.actions.popleft()
+        if (
+            self._pending is None
+            and self.prefetch_fraction > 0
+            and len(self.actions) <= self.prefetch_fraction * self.chunk_size
+        ):
+            self._request(get_inputs)
+        # The observation is captured before this action is executed: the first
+        # action of the next chunk is for the same step
+        self._nb_executed_since_request += 1
+        return action
+
+    @property
+    def mean_stall_ms(self) -> float | None:
+        if not self.stall_times:
+            return None
+        return 1000 * sum(self.stall_times) / len(self.stall_times)
+
+    def cancel(self) -> None:
+        """
+        Cancel the pending request and drop the remaining actions.
+        """
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        self.actions.clear()
+
+    def _request(self, get_inputs: Callable[[], dict]) -> None:
+        inputs = get_inputs()
+        self._nb_executed_since_request = 0
+        self._pending = asyncio.ensure_future(self._timed_sample_actions(inputs))
+
+    async def _timed_sample_actions(self, inputs: dict) -> np.ndarray:
+        with INFERENCE_SECONDS.time():
+            return await self.sample_actions(inputs)
+
+    async def _wait_pending(self) -> np.ndarray:
+        assert self._pending is not None
+        try:
+            await asyncio.wait([self._pending])
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        return self._take_pending()
+
+    def _take_pending(self) -> np.ndarray:
+        assert self._pending is not None
+        task, self._pending = self._pending, None
+        return task.result()
+
+    def _merge(self, chunk: np.ndarray) -> None:
+        self.nb_chunks += 1
+        self.chunk_size = len(chunk)
+        # These actions were meant for the steps executed during the inference
+        fresh = list(chunk[self._nb_executed_since_request :])
+        if not fresh:
+            logger.debug(
+                f"The action chunk arrived after {self._nb_executed_since_request} steps and is entirely stale"
+            )
+        previous = list(self.actions)
+        overlap = min(len(previous), len(fresh))
+        weight_new = math.exp(-self.ensemble_decay)
+        merged = [
+            (previous[i] + weight_new * fresh[i]) / (1 + weight_new)
+            for i in range(overlap)
+        ]
+        # Keep the longest horizon
+        merged.extend(fresh[overlap:] if len(fresh) > overlap else previous[overlap:])
+        self.actions = deque(merged)
+
+
 class TrainingParamsAct(BaseModel):
     """
     Training paramters are left to None by default and are set depending on the dataset in the training pipeline.
@@ -10,8 +10,8 @@ from io import BytesIO
 from pathlib import Path
 from typing import Any, Callable, Dict, Literal, Tuple
 
-import cv2
 import zmq
+import zmq.asyncio
 import numpy as np
 import pandas as pd
 from fastapi import HTTPException
@@ -20,6 +20,7 @@ from loguru import logger
 from pydantic import BaseModel, Field, model_validator
 
 from phosphobot.am.base import (
+    ActionChunkPipeline,
     ActionModel,
     BaseTrainer,
     BaseTrainerConfig,
@@ -29,9 +30,11 @@ from phosphobot.am.base import (
     resize_dataset,
 )
 from phosphobot.camera import AllCameras
+from phosphobot.control_loop import LoopTimer
 from phosphobot.control_signal import AIControlSignal
 from phosphobot.hardware.base import BaseManipulator
 from phosphobot.models import ModelConfigurationResponse
+from phosphobot.snapshot import get_snapshot_service
 from phosphobot.utils import background_task_log_exceptions, get_hf_token
 
 # Code from: https://github.com/NVIDIA/Isaac-GR00T/blob/main/gr00t/eval/service.py#L111
@@ -57,6 +60,69 @@ class TorchSerializer:
         return obj
 
 
+class MultipartSerializer:
+    """
+    Serialize a message as ZeroMQ multipart frames: a JSON header, the pickled
+    values that are not numpy arrays, then one frame per array. The arrays are sent
+    and received without copies.
+    """
+
+    @staticmethod
+    def to_frames(header: dict, data: dict) -> list:
+        arrays = []
+        values = {}
+        buffers = []
+        for key, value in data.items():
+            if isinstance(value, np.ndarray) and value.dtype != object:
+                value = np.ascontiguousarray(value)
+                arrays.append(
+                    {"key": key, "dtype": value.dtype.str, "shape": list(value.shape)}
+                )
+                buffers.append(value)
+            else:
+                values[key] = value
+        header = {**header, "arrays": arrays}
+        return [json.dumps(header).encode(), pickle.dumps(values), *buffers]
+
+    @staticmethod
+    def from_frames(frames: list) -> Tuple[dict, dict]:
+        """
+        The arrays are read-only views on the frames.
+        """
+        buffers = [
+            frame.buffer if isinstance(frame, zmq.Frame) else memoryview(frame)
+            for frame in frames
+        ]
+        header = json.loads(bytes(buffers[0]))
+        data = pickle.loads(buffers[1])
+        for array, buffer in zip(header.pop("arrays"), buffers[2:]):
+            data[array["key"]] = np.frombuffer(buffer, dtype=array["dtype"]).reshape(
+                array["shape"]
+            )
+        return header, data
+
+
+def _parse_pickle_response(raw: bytes) -> dict:
+    """
+    Parse the response of the server to a pickled request.
+    """
+    # legacy error token
+    if raw == b"ERROR":
+        raise RuntimeError("Server error (legacy)")
+
+    # decode envelope or raw result
+    resp = TorchSerializer.from_bytes(raw)
+    if "status" in resp:
+        if resp["status"] == "error":
+            et, msg = resp.get("error_type", "Error"), resp.get("message", "")
+            tb = resp.get("traceback", "")
+            raise RuntimeError(f"{et}: {msg}\n\n{tb}")
+        return resp.get("result", {})
+    else:
+        # legacy: the handler's own dict
+        return resp
+
+
 @dataclass
 class EndpointHandler:
     handler: Callable
@@ -67,6 +133,9 @@ class BaseInferenceServer:
     """
     An inference server that spin up a ZeroMQ socket and listen for incoming requests.
     Can add custom endpoints by calling `register_endpoint`.
+
+    Requests are either pickled (BaseInferenceClient) or multipart frames
+    (AsyncInferenceClient), and are answered in the same format.
     """
 
     def __init__(self, host: str = "*", port: int = 5555):
@@ -90,7 +159,11 @@ class BaseInferenceServer:
         """
         Simple ping handler that returns a success message.
         """
-        return {"status": "ok", "message": "Server is running"}
+        return {
+            "status": "ok",
+            "message": "Server is running",
+            "protocols": ["pickle", "multipart"],
+        }
 
     def register_endpoint(
         self, name: str, handler: Callable, requires_input: bool = True
@@ -109,21 +182,20 @@ class BaseInferenceServer:
         addr = self.socket.getsockopt_string(zmq.LAST_ENDPOINT)
         logger.info(f"Server is ready and listening on {addr}")
         while self.running:
-            raw = self.socket.recv()
+            frames = self.socket.recv_multipart(copy=False)
+            if len(frames) > 1:
+                self._handle_multipart(frames)
+                continue
+
+            raw = frames[0].bytes
             try:
                 request = TorchSerializer.from_bytes(raw)
                 version = request.get("version", 1)
                 use_envelope = version >= 2
 
-                endpoint = request.get("endpoint", "get_action")
-                if endpoint not in self._endpoints:
-                    raise ValueError(f"Unknown endpoint: {endpoint!r}")
-
-                handler = self._endpoints[endpoint]
-                if handler.requires_input:
-                    result = handler.handler(request.get("data", {}))
-                else:
-                    result = handler.handler()
+                result = self._call_handler(
+                    request.get("endpoint", "get_action"), request.get("data", {})
+                )
 
                 if use_envelope:
                     resp: Dict[str, Any] = {"status": "ok", "result": result}
@@ -149,6 +221,42 @@ class BaseInferenceServer:
                     # legacy client: single-byte ERROR token
                     self.socket.send(b"ERROR")
 
+    def _call_handler(self, endpoint: str, data: dict) -> Any:
+        if endpoint not in self._endpoints:
+            raise ValueError(f"Unknown endpoint: {endpoint!r}")
+        handler = self._endpoints[endpoint]
+        if handler.requires_input:
+            return handler.handler(data)
+        return handler.handler()
+
+    def _handle_multipart(self, frames: list) -> None:
+        """
+        Handle a request of the AsyncInferenceClient, serialized with the
+        MultipartSerializer. The reply has the id of the request.
+        """
+        header: Dict[str, Any] = {}
+        try:
+            header, data = MultipartSerializer.from_frames(frames)
+            result = self._call_handler(header.get("endpoint", "get_action"), data)
+            reply_header = {"id": header.get("id"), "status": "ok"}
+            if isinstance(result, dict):
+                reply = MultipartSerializer.to_frames(reply_header, result)
+            else:
+                reply_header["wrapped"] = True
+                reply = MultipartSerializer.to_frames(reply_header, {"result": result})
+        except Exception as e:
+            tb = traceback.format_exc()
+            logger.error(f"{e}\n{tb}")
+            error_header = {
+                "id": header.get("id"),
+                "status": "error",
+                "error_type": type(e).__name__,
+                "message": str(e),
+                "traceback": tb,
+            }
+            reply = MultipartSerializer.to_frames(error_header, {})
+        self.socket.send_multipart(reply, copy=False)
+
 
 class ModalityConfig(BaseModel):
     """Configuration for a modality."""
@@ -247,22 +355,7 @@ class BaseInferenceClient:
 
         self.socket.send(TorchSerializer.to_bytes(request))
         raw = self.socket.recv()
-
-        # legacy error token
-        if raw == b"ERROR":
-            raise RuntimeError("Server error (legacy)")
-
-        # decode envelope or raw result
-        resp = TorchSerializer.from_bytes(raw)
-        if "status" in resp:
-            if resp["status"] == "error":
-                et, msg = resp.get("error_type", "Error"), resp.get("message", "")
-                tb = resp.get("traceback", "")
-                raise RuntimeError(f"{et}: {msg}\n\n{tb}")
-            return resp.get("result", {})
-        else:
-            # legacy: the handler's own dict
-            return resp
+        return _parse_pickle_response(raw)
 
     def __del__(self):
         """Cleanup resources on destruction"""
@@ -284,6 +377,170 @@ class ExternalRobotInferenceClient(BaseInferenceClient):
         return self.call_endpoint("get_action", observations)
 
 
+class AsyncInferenceClient:
+    """
+    Asyncio client for the BaseInferenceServer, on a DEALER socket.
+
+    Unlike the REQ socket of the BaseInferenceClient, it doesn't block the event
+    loop during the inference and doesn't wedge when a reply is lost: a request
+    that times out resets the socket. Requests are sent one at a time.
+
+    The numpy arrays are sent as multipart frames without copies if the server
+    supports it (checked with a ping on the first call), and pickled otherwise.
+    """
+
+    def __init__(
+        self, host: str = "localhost", port: int = 5555, timeout_ms: int = 15000
+    ):
+        self.context = zmq.asyncio.Context()
+        self.host = host
+        self.port = port
+        self.timeout_ms = timeout_ms
+        self.version = 2
+        # Negotiated on the first call
+        self.multipart: bool | None = None
+        self.nb_resets = 0
+
+        self.socket: zmq.asyncio.Socket | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock: asyncio.Lock | None = None
+        self._request_id = 0
+
+    def _reset_socket(self) -> None:
+        if self.socket is not None:
+            self.socket.close(linger=0)
+        self.socket = self.context.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(f"tcp://{self.host}:{self.port}")
+
+    async def ping(self) -> bool:
+        try:
+            await self.call_endpoint("ping", requires_input=False)
+            return True
+        except (zmq.error.ZMQError, TimeoutError):
+            return False
+
+    async def call_endpoint(
+        self,
+        endpoint: str,
+        data: dict | None = None,
+        requires_input: bool = True,
+        timeout_ms: int | None = None,
+    ) -> dict:
+        """
+        Call an endpoint on the server.
+
+        Args:
+            endpoint: The name of the endpoint.
+            data: The input data for the endpoint.
+            requires_input: Whether the endpoint requires input data.
+            timeout_ms: Timeout of the request. Defaults to the timeout of the client.
+
+        Raises:
+            TimeoutError: If the server didn't reply in time. The socket is reset.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # The socket and the lock are bound to an event loop
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._reset_socket()
+        assert self._lock is not None
+
+        timeout = (timeout_ms if timeout_ms is not None else self.timeout_ms) / 1000
+        async with self._lock:
+            if self.multipart is None:
+                ping = await self._request("ping", None, False, timeout, False)
+                self.multipart = "multipart" in ping.get("protocols", [])
+                logger.debug(
+                    f"Gr00t inference server supports multipart: {self.multipart}"
+                )
+            return await self._request(
+                endpoint, data, requires_input, timeout, self.multipart
+            )
+
+    async def _request(
+        self,
+        endpoint: str,
+        data: dict | None,
+        requires_input: bool,
+        timeout: float,
+        multipart: bool,
+    ) -> dict:
+        assert self.socket is not None and self._loop is not None
+        self._request_id += 1
+        request_id = self._request_id
+        if multipart:
+            header = {"endpoint": endpoint, "id": request_id}
+            frames = MultipartSerializer.to_frames(
+                header, (data or {}) if requires_input else {}
+            )
+        else:
+            request: Dict[str, Any] = {"endpoint": endpoint, "version": self.version}
+            if requires_input:
+                request["data"] = data or {}
+            frames = [TorchSerializer.to_bytes(request)]
+        try:
+            # The empty frame is the delimiter expected by the REP socket of the server
+            await self.socket.send_multipart([b"", *frames], copy=False)
+            return await self._receive(endpoint, request_id, timeout, multipart)
+        except asyncio.CancelledError:
+            # The request may be half sent, or its reply may still arrive: like
+            # after a timeout, start again with a new socket
+            self._reset_socket()
+            self.nb_resets += 1
+            raise
+
+    async def _receive(
+        self, endpoint: str, request_id: int, timeout: float, multipart: bool
+    ) -> dict:
+        assert self.socket is not None and self._loop is not None
+        deadline = self._loop.time() + timeout
+        while True:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0 or not await self.socket.poll(remaining * 1000):
+                # The reply may still arrive: start again with a new socket
+                self._reset_socket()
+                self.nb_resets += 1
+                raise TimeoutError(
+                    f"No reply from the inference server for {endpoint!r} after {timeout:.1f}s"
+                )
+            reply = await self.socket.recv_multipart(copy=False)
+            frames = reply[1:]
+            if not multipart:
+                # Pickled requests have no id, but the socket is reset after a
+                # timeout: this is the reply to this request
+                return _parse_pickle_response(frames[0].bytes)
+
+            header, result = MultipartSerializer.from_frames(frames)
+            if header.get("id") != request_id:
+                logger.debug(f"Dropping the reply to the request {header.get('id')}")
+                continue
+            if header["status"] == "error":
+                raise RuntimeError(
+                    f"{header.get('error_type', 'Error')}: {header.get('message', '')}\n\n{header.get('traceback', '')}"
+                )
+            return result["result"] if header.get("wrapped") else result
+
+    def close(self) -> None:
+        if self.socket is not None:
+            self.socket.close(linger=0)
+            self.socket = None
+        self.context.term()
+
+
+class AsyncExternalRobotInferenceClient(AsyncInferenceClient):
+    """
+    Asyncio client for communicating with the RealRobotServer
+    """
+
+    async def get_action(self, observations: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the action from the server.
+        """
+        return await self.call_endpoint("get_action", observations)
+
+
 class Stats(BaseModel):
     max: list[float]
     min: list[float]
@@ -492,14 +749,27 @@ class Gr00tN1(ActionModel):
     ):
         super().__init__(server_url, server_port)
         self.client = ExternalRobotInferenceClient(host=server_url, port=server_port)
+        self.async_client = AsyncExternalRobotInferenceClient(
+            host=server_url, port=server_port
+        )
         self.action_keys = action_keys
 
     def sample_actions(self, inputs: dict) -> np.ndarray:
         # Get the dict from the server
         response = self.client.get_action(inputs)
+        return self._actions_from_response(response)
+
+    async def async_sample_actions(self, inputs: dict) -> np.ndarray:
+        response = await self.async_client.get_action(inputs)
+        return self._actions_from_response(response)
+
+    def _actions_from_response(self, response: Dict[str, Any]) -> np.ndarray:
         action_parts = []
         for key in self.action_keys:
             new_action = response[key]
+            if isinstance(new_action, np.ndarray) and not new_action.flags.writeable:
+                # Arrays received without copy are read-only
+                new_action = new_action.copy()
 
             if isinstance(new_action, np.ndarray):
                 if new_action.ndim == 1 and len(new_action) == 16:
@@ -714,6 +984,8 @@ class Gr00tN1(ActionModel):
         unit: Literal["degrees", "rad", "other"] = "rad",
         min_angle: float | None = None,
         max_angle: float | None = None,
+        prefetch_fraction: float = 0.3,
+        loop_timer: LoopTimer | None = None,
         **kwargs: Any,
     ):
         """
@@ -721,42 +993,51 @@ class Gr00tN1(ActionModel):
         It uses the model to get the actions based on the current state of the robot and the cameras.
         The loop runs until the control signal is stopped or the model is not available anymore.
         The loop runs at the specified fps and speed.
+        The next action chunk is requested when prefetch_fraction of the current chunk remains.
         """
 
         nb_iter = 0
         config = model_spawn_config.hf_model_config
         signal_marked_as_started = False
+        if loop_timer is None:
+            loop_timer = LoopTimer(name="ai_control")
+        loop_timer.period = 1.0 / (fps * speed)
+        pipeline = ActionChunkPipeline(
+            self.async_sample_actions, prefetch_fraction=prefetch_fraction
+        )
+        nb_actions_too_large = 0
 
-        while control_signal.is_in_loop():
-            logger.debug(
-                f"AI control loop iteration {nb_iter}, status: {control_signal.status}"
+        camera_ids = [
+            i
+            if cameras_keys_mapping is None
+            else cameras_keys_mapping.get(
+                f"video.{camera_name}", cameras_keys_mapping.get(camera_name, i)
             )
-            if control_signal.status == "paused":
-                logger.debug("AI control loop paused")
-                await asyncio.sleep(0.1)
-                continue
-
-            start_time = time.perf_counter()
+            for i, camera_name in enumerate(config.embodiment.modalities.video.keys())
+        ]
+        # The joints and the frames of the inputs are sampled at the same time
+        snapshots = get_snapshot_service().subscribe(
+            robots=robots,
+            cameras=[all_cameras.get_camera_by_id(i) for i in set(camera_ids)],
+            freq=fps * speed,
+        )
 
+        def get_inputs() -> Dict[str, Any]:
+            snapshot = snapshots.latest(max_age=2 / (fps * speed))
             # Get the images from the cameras based on the config
             # For now, just put as many cameras as the model config
             image_inputs: Dict[str, np.ndarray] = {}
-            for i, (camera_name, video) in enumerate(
-                config.embodiment.modalities.video.items()
+            for camera_id, (camera_name, video) in zip(
+                camera_ids, config.embodiment.modalities.video.items()
             ):
-                if cameras_keys_mapping is None:
-                    camera_id = i
+                camera_sample = snapshot.cameras.get(camera_id) if snapshot else None
+                if camera_sample is not None:
+                    image = camera_sample.bgr(resize=video.resolution)
                 else:
-                    camera_id = cameras_keys_mapping.get(
-                        f"video.{camera_name}", cameras_keys_mapping.get(camera_name, i)
+                    image = all_cameras.get_bgr_frame(
+                        camera_id=camera_id, resize=video.resolution
                     )
-
-                rgb_frame = all_cameras.get_rgb_frame(
-                    camera_id=camera_id, resize=video.resolution
-                )
-                if rgb_frame is not None:
-                    # Convert to BGR
-                    image = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
+                if image is not None:
                     # Add a batch dimension (from (240, 320, 3) to (1, 240, 320, 3))
                     converted_array = np.expand_dims(image, axis=0)
                     # Ensure dtype is uint8 (if it isn't already)
@@ -793,19 +1074,35 @@ class Gr00tN1(ActionModel):
                 raise Exception("No robot connected. Exiting AI control loop.")
 
             # Concatenate all robot states
-            state = robots[0].read_joints_position(
-                unit=unit, max_value=max_angle, min_value=min_angle
-            )
-            for robot in robots[1:]:
+            robot_samples = [
+                snapshot.robot_sample(robot) if snapshot else None for robot in robots
+            ]
+            if all(sample is not None for sample in robot_samples):
                 state = np.concatenate(
-                    (
-                        state,
-                        robot.read_joints_position(
-                            unit=unit, max_value=max_angle, min_value=min_angle
-                        ),
-                    ),
-                    axis=0,
+                    [
+                        robot.convert_joints_position(
+                            sample.joints_position,  # type: ignore
+                            unit=unit,
+                            max_value=max_angle,
+                            min_value=min_angle,
+                        )
+                        for robot, sample in zip(robots, robot_samples)
+                    ]
+                )
+            else:
+                state = robots[0].read_joints_position(
+                    unit=unit, max_value=max_angle, min_value=min_angle
                 )
+                for robot in robots[1:]:
+                    state = np.concatenate(
+                        (
+                            state,
+                            robot.read_joints_position(
+                                unit=unit, max_value=max_angle, min_value=min_angle
+                            ),
+                        ),
+                        axis=0,
+                    )
 
             inputs = {
                 **image_inputs,
@@ -823,24 +1120,34 @@ class Gr00tN1(ActionModel):
                     1, num_elements
                 )
                 state_index += num_elements
-            try:
-                actions = self(inputs)
-            except Exception as e:
-                logger.warning(
-                    f"Failed to get actions from model: {e}. Exiting AI control loop."
-                )
-                control_signal.stop()
-                break
+            return inputs
 
-            if not signal_marked_as_started:
-                control_signal.set_running()
-                signal_marked_as_started = True
+        try:
+            while control_signal.is_in_loop():
+                logger.debug(
+                    f"AI control loop iteration {nb_iter}, status: {control_signal.status}"
+                )
+                if control_signal.status == "paused":
+                    logger.debug("AI control loop paused")
+                    # The remaining actions were predicted before the pause
+                    pipeline.cancel()
+                    await asyncio.sleep(0.1)
+                    loop_timer.reset()
+                    continue
 
-            nb_actions_too_large = 0
-            for action in actions:
-                # Early stop
-                if not control_signal.is_in_loop():
+                try:
+                    action = await pipeline.next_action(get_inputs)
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to get actions from model: {e}. Exiting AI control loop."
+                    )
+                    control_signal.stop()
                     break
+
+                if not signal_marked_as_started:
+                    control_signal.set_running()
+                    signal_marked_as_started = True
+
                 # Send the new joint position to the robot
                 action_list = action.tolist()
                 for robot_index in range(len(robots)):
@@ -919,12 +1226,16 @@ class Gr00tN1(ActionModel):
                     nb_actions_too_large = 0
 
                 # Wait fps time
-                elapsed_time = time.perf_counter() - start_time
-                sleep_time = max(0, 1.0 / (fps * speed) - elapsed_time)
-                await asyncio.sleep(sleep_time)
-                start_time = time.perf_counter()
+                await loop_timer.wait()
+                nb_iter += 1
+        finally:
+            snapshots.close()
 
-            nb_iter += 1
+        pipeline.cancel()
+        if pipeline.mean_stall_ms is not None:
+            logger.info(
+                f"AI control loop stopped. Mean wait between action chunks: {pipeline.mean_stall_ms:.1f} ms"
+            )
 
 
 class Gr00tTrainerConfig(BaseTrainerConfig):
@@ -1,3 +1,4 @@
+import asyncio
 import socket
 import platform
 from random import random
@@ -8,7 +9,7 @@ import typer
 from fastapi import Depends, FastAPI, HTTPException, Request, applications
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
 from rich import print
@@ -27,11 +28,20 @@ from phosphobot.endpoints import (
     update_router,
 )
 from phosphobot.hardware import get_sim
-from phosphobot.models import ServerStatus
+from phosphobot.metrics import get_metrics
+from phosphobot.models import (
+    MetricsResponse,
+    ProfilingStartRequest,
+    ProfilingStatusResponse,
+    ServerStatus,
+)
 from phosphobot.posthog import posthog, posthog_pageview
+from phosphobot.profiler import get_profiler
 from phosphobot.recorder import Recorder, get_recorder
 from phosphobot.robot import RobotConnectionManager, get_rcm
+from phosphobot.snapshot import get_snapshot_service
 from phosphobot.teleoperation import get_udp_server
+from phosphobot.types import SimulationMode
 from phosphobot.utils import (
     get_home_app_path,
     get_resources_path,
@@ -67,8 +77,9 @@ async def lifespan(app: FastAPI):
     # Initialize telemetry
     init_telemetry()
     udp_server = get_udp_server()
-    # Initialize pybullet simulation
-    sim = get_sim()
+    # Open the GUI simulation window. In headless mode, each robot creates its own
+    # simulation world
+    sim = get_sim() if config.SIM_MODE == SimulationMode.gui else None
     # Initialize rcm
     rcm = get_rcm()
     
@@ -210,10 +221,68 @@ async def status(
         leader_follower_status=signal_leader_follower.is_in_loop(),
         server_ip=get_local_ip(),
         server_port=config.PORT,
+        snapshots=get_snapshot_service().status(),
+        episode_saves=recorder.save_queue.status(),
     )
     return server_status
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Get the latency histograms and the counters of the server, in the Prometheus
+    text format.
+    """
+    return PlainTextResponse(
+        get_metrics().render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.get("/metrics/json", response_model=MetricsResponse)
+async def metrics_json() -> MetricsResponse:
+    """
+    Get the latency histograms and the counters of the server, with estimated
+    quantiles. Used by the dashboard.
+    """
+    return get_metrics().snapshot()
+
+
+@app.post("/profiling/start", response_model=ProfilingStatusResponse)
+async def start_profiling(query: ProfilingStartRequest) -> ProfilingStatusResponse:
+    """
+    Start sampling the stacks of all the threads of the server: the API, the
+    recording, the teleoperation and AI control loops, the motors bus workers and
+    the cameras. The samples are attributed to the loop they belong to.
+    """
+    try:
+        return get_profiler().start(
+            interval=query.interval_ms / 1000, duration=query.duration_s
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/profiling/stop", response_model=ProfilingStatusResponse)
+async def stop_profiling() -> ProfilingStatusResponse:
+    """
+    Stop the profiling session and write it as a speedscope file and as folded
+    stacks for flame graphs, in the profiles folder of the app.
+    """
+    try:
+        return await asyncio.to_thread(get_profiler().stop)
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/profiling/status", response_model=ProfilingStatusResponse)
+async def profiling_status() -> ProfilingStatusResponse:
+    """
+    Get the status of the running profiling session, or of the last one.
+    """
+    return get_profiler().status()
+
+
 app.include_router(control_router)
 app.include_router(camera_router)
 app.include_router(recording_router)
@@ -236,11 +305,13 @@ app.add_middleware(
 # Add the posthog middleware
 @app.middleware("http")
 def posthog_middleware(request: Request, call_next):
-    # ignore the /move/relative, /move/absolute and /status endpoints
+    # ignore the /move/relative, /move/absolute, /status and /metrics endpoints
     if request.url.path not in [
         "/move/relative",
         "/move/absolute",
         "/status",
+        "/metrics",
+        "/metrics/json",
     ] and not request.url.path.startswith("/asset"):
         # Sample only 20% of the requests
         if random() < 0.2:
@@ -6,9 +6,22 @@ import subprocess
 import threading
 import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
-from typing import AsyncGenerator, Dict, List, Literal, Optional, Tuple, cast
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    cast,
+)
 
 import cv2
 import numpy as np
@@ -17,11 +30,29 @@ from fastapi import Request
 from loguru import logger
 
 from phosphobot.configs import config
+from phosphobot.metrics import get_metrics
 from phosphobot.models import AllCamerasStatus, SingleCameraStatus
 from phosphobot.types import CameraTypes
 
 cameras = None
 
+FRAME_CONVERSION_DESCRIPTION = (
+    "Time to convert a camera frame to RGB, resize it or encode it as JPEG, in seconds."
+)
+RGB_CONVERSION_SECONDS = get_metrics().histogram(
+    "phosphobot_frame_conversion_seconds", FRAME_CONVERSION_DESCRIPTION, operation="rgb"
+)
+RESIZE_SECONDS = get_metrics().histogram(
+    "phosphobot_frame_conversion_seconds",
+    FRAME_CONVERSION_DESCRIPTION,
+    operation="resize",
+)
+JPEG_ENCODING_SECONDS = get_metrics().histogram(
+    "phosphobot_frame_conversion_seconds",
+    FRAME_CONVERSION_DESCRIPTION,
+    operation="jpeg",
+)
+
 
 def get_camera_names() -> List[str]:
     """
@@ -295,14 +326,196 @@ def detect_video_indexes(
     return cameras
 
 
+@dataclass(frozen=True)
+class CameraFrame:
+    """
+    A frame published by the capture thread of a camera.
+    """
+
+    # Monotonically increasing for each camera, starts at 1
+    seq: int
+    # time.perf_counter() when the frame was read from the camera
+    capture_ts: float
+    # Read-only frame in the native format of the camera (BGR). It's a view on a slot of
+    # the frame ring buffer of the camera: it's valid until the slot is reused.
+    frame: np.ndarray
+    # The frame is a copy owned by the holder (see BaseCamera.copy_frame): it stays
+    # valid after its ring buffer slot is reused
+    is_copy: bool = False
+
+
+class StaleFrameError(RuntimeError):
+    """
+    The frame ring buffer slot of a CameraFrame was reused by the capture thread.
+    """
+
+
+class FrameRingBuffer:
+    """
+    Preallocated frames in which a capture thread reads the frames of a camera, so that
+    no array is allocated for each frame.
+
+    The slots are reused in a round robin. The sequence number of the frame stored in
+    each slot is kept, so that readers can check whether the frame they hold was
+    overwritten. Readers get a read-only view on the slots.
+    """
+
+    def __init__(self, size: int = 4):
+        self.size = size
+        # Number of times the slots were (re)allocated
+        self.allocations = 0
+        self._slots: List[np.ndarray] = []
+        self._slot_seqs: List[int] = []
+        self._index = 0
+
+    def _allocate(self, shape: Tuple[int, ...], dtype: np.dtype) -> None:
+        self._slots = [np.empty(shape, dtype=dtype) for _ in range(self.size)]
+        self._slot_seqs = [0] * self.size
+        self._index = 0
+        self.allocations += 1
+
+    def next_buffer(
+        self,
+        shape: Optional[Tuple[int, ...]] = None,
+        dtype: np.dtype = np.dtype(np.uint8),
+    ) -> Optional[np.ndarray]:
+        """
+        Return the buffer in which the next frame should be written, or None if the
+        shape of the frames is not known yet. The frame previously stored in this buffer
+        is invalidated.
+        """
+        if shape is not None and (
+            not self._slots
+            or self._slots[0].shape != shape
+            or self._slots[0].dtype != dtype
+        ):
+            self._allocate(shape, dtype)
+        if not self._slots:
+            return None
+        self._slot_seqs[self._index] = 0
+        return self._slots[self._index]
+
+    def commit(self, frame: np.ndarray, seq: int) -> np.ndarray:
+        """
+        Store the frame with its sequence number and return a read-only view on it.
+
+        The frame is not copied if it was written in the buffer returned by next_buffer.
+        Otherwise (first frame, resolution change), it's copied in the ring buffer.
+        """
+        if (
+            not self._slots
+            or self._slots[0].shape != frame.shape
+            or self._slots[0].dtype != frame.dtype
+        ):
+            self._allocate(frame.shape, frame.dtype)
+        slot = self._slots[self._index]
+        if frame is not slot:
+            np.copyto(slot, frame)
+        self._slot_seqs[self._index] = seq
+        self._index = (self._index + 1) % self.size
+
+        view = slot.view()
+        view.flags.writeable = False
+        return view
+
+    def holds(self, seq: int) -> bool:
+        """
+        Whether the frame with this sequence number is still stored in the ring buffer.
+        """
+        return seq != 0 and seq in self._slot_seqs
+
+
+# (frame seq, format, size, jpeg quality)
+FrameCacheKey = Tuple[
+    int, Literal["rgb", "bgr", "jpeg"], Optional[Tuple[int, int]], Optional[int]
+]
+
+
+class FrameCache:
+    """
+    Cache of the frames derived from the frames published by a camera: RGB conversion,
+    resize and JPEG encoding. Each derived frame is computed at most once per captured
+    frame and shared between all the consumers (recorder, video streams, AI control).
+
+    Only the derived frames of the most recent captured frame are kept, and at most
+    max_entries of them. Cached arrays are read-only.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[FrameCacheKey, Future] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: FrameCacheKey, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for the key. If it's missing, compute it. Consumers asking
+        for the same key while it's being computed wait for the result instead of computing it again.
+        """
+        with self._lock:
+            future = self._entries.get(key)
+            is_owner = future is None
+            if future is None:
+                self.misses += 1
+                # Derived frames of older captured frames won't be asked for again
+                for old_key in [k for k in self._entries if k[0] < key[0]]:
+                    del self._entries[old_key]
+                future = Future()
+                self._entries[key] = future
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+        if is_owner:
+            try:
+                value = compute()
+                if isinstance(value, np.ndarray):
+                    value.flags.writeable = False
+                future.set_result(value)
+            except Exception as e:
+                with self._lock:
+                    if self._entries.get(key) is future:
+                        del self._entries[key]
+                future.set_exception(e)
+
+        return future.result()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
+
+
 class BaseCamera(ABC):
     camera_type: CameraTypes
     is_active: bool = False
     width: int
     height: int
     fps: int
+    # Latest frame published by the capture thread. None if the camera doesn't have one.
+    _latest_frame: Optional[CameraFrame] = None
+    _frame_seq: int = 0
+    _frame_condition: threading.Condition
+    # Preallocated frames in which the capture thread reads the camera
+    frame_ring: FrameRingBuffer
+    # Derived frames (RGB, resized, JPEG) of the published frames
+    frame_cache: FrameCache
 
     def __init__(self):
+        self._latest_frame = None
+        self._frame_seq = 0
+        self._frame_condition = threading.Condition()
+        self.frame_ring = FrameRingBuffer()
+        self.frame_cache = FrameCache()
         atexit.register(self.stop)
 
     def __del__(self):
@@ -328,6 +541,201 @@ class BaseCamera(ABC):
         """Get the latest depth frame from the camera."""
         raise NotImplementedError("Depth frame not available")
 
+    def _publish_frame(self, frame: Optional[np.ndarray]) -> None:
+        """
+        Called by the capture thread with every new frame, or None if the capture failed.
+        To avoid a copy, the capture thread should read the frame in the buffer returned
+        by self.frame_ring.next_buffer(). Consumers get a read-only view on the frame.
+        """
+        with self._frame_condition:
+            if frame is None:
+                self._latest_frame = None
+            else:
+                self._frame_seq += 1
+                self._latest_frame = CameraFrame(
+                    seq=self._frame_seq,
+                    capture_ts=time.perf_counter(),
+                    frame=self.frame_ring.commit(frame, self._frame_seq),
+                )
+            self._frame_condition.notify_all()
+
+    def is_frame_valid(self, camera_frame: CameraFrame) -> bool:
+        """
+        Whether the frame was not overwritten yet by the capture thread.
+        Consumers keeping a frame for longer than a few frame periods should copy it.
+        """
+        return camera_frame.is_copy or self.frame_ring.holds(camera_frame.seq)
+
+    def copy_frame(self, camera_frame: CameraFrame) -> CameraFrame:
+        """
+        Copy a frame out of the ring buffer, to keep it for longer than a few frame
+        periods. Its derived frames are still shared with the other consumers.
+
+        Raises:
+            StaleFrameError: If the frame was overwritten by the capture thread.
+        """
+        if camera_frame.is_copy:
+            return camera_frame
+        frame = camera_frame.frame.copy()
+        if not self.frame_ring.holds(camera_frame.seq):
+            raise StaleFrameError(
+                f"{self.camera_name}: frame {camera_frame.seq} was overwritten"
+            )
+        frame.flags.writeable = False
+        return CameraFrame(
+            seq=camera_frame.seq,
+            capture_ts=camera_frame.capture_ts,
+            frame=frame,
+            is_copy=True,
+        )
+
+    def _get_derived_frame(
+        self,
+        camera_frame: CameraFrame,
+        frame_format: Literal["rgb", "bgr", "jpeg"],
+        resize: Optional[tuple[int, int]],
+        quality: Optional[int],
+        compute: Callable[[CameraFrame], Any],
+    ) -> Any:
+        """
+        Get a derived frame of camera_frame from the cache, or compute it.
+
+        Raises:
+            StaleFrameError: If the ring buffer slot of the frame was reused by the
+                capture thread, before or during the computation. The derived frame of
+                another frame is never returned instead.
+        """
+
+        def compute_if_valid() -> Any:
+            if not self.is_frame_valid(camera_frame):
+                raise StaleFrameError(
+                    f"{self.camera_name}: frame {camera_frame.seq} was overwritten"
+                )
+            value = compute(camera_frame)
+            if not self.is_frame_valid(camera_frame):
+                raise StaleFrameError(
+                    f"{self.camera_name}: frame {camera_frame.seq} was overwritten"
+                )
+            return value
+
+        return self.frame_cache.get_or_compute(
+            (camera_frame.seq, frame_format, resize, quality), compute_if_valid
+        )
+
+    def derive_latest_frame(self, derive: Callable[[CameraFrame], Any]) -> Any:
+        """
+        Apply derive (eg. get_rgb_from_camera_frame) to the latest frame published by
+        the capture thread. If the frame is overwritten meanwhile, derive is applied to
+        the new latest frame: the caller asked for the latest frame, not a given one.
+        Returns None if no frame is available.
+        """
+        for _ in range(self.frame_ring.size):
+            camera_frame = self.get_latest_frame()
+            if camera_frame is None:
+                return None
+            try:
+                return derive(camera_frame)
+            except StaleFrameError:
+                continue
+        raise StaleFrameError(f"{self.camera_name}: frames are overwritten too fast")
+
+    def get_latest_frame(self) -> Optional[CameraFrame]:
+        """
+        Return the latest frame published by the capture thread, without a copy.
+        Returns None if no frame is available or if the camera has no capture thread.
+        """
+        return self._latest_frame
+
+    def wait_for_frame(
+        self, last_seq: int = 0, timeout: float | None = None
+    ) -> Optional[CameraFrame]:
+        """
+        Wait until a frame more recent than last_seq is published.
+        After the timeout, return the latest frame, which can be the frame last_seq itself.
+        """
+        with self._frame_condition:
+            self._frame_condition.wait_for(
+                lambda: (
+                    self._latest_frame is not None and self._latest_frame.seq > last_seq
+                ),
+                timeout=timeout,
+            )
+            return self._latest_frame
+
+    def get_rgb_from_camera_frame(
+        self, camera_frame: CameraFrame, resize: tuple[int, int] | None = None
+    ) -> cv2.typing.MatLike:
+        """
+        Convert a frame published by the camera to RGB and resize it.
+        The result is cached and shared between consumers: it's read-only.
+        Raises StaleFrameError if the frame was overwritten by the capture thread.
+
+        Shape: (height, width, channels)
+        type: np.uint8
+        """
+
+        def compute(camera_frame: CameraFrame) -> cv2.typing.MatLike:
+            with RGB_CONVERSION_SECONDS.time():
+                frame = cv2.cvtColor(camera_frame.frame, cv2.COLOR_BGR2RGB)
+            if resize is not None:
+                with RESIZE_SECONDS.time():
+                    frame = cv2.resize(
+                        src=frame, dsize=resize, interpolation=cv2.INTER_AREA
+                    )
+            return frame
+
+        return self._get_derived_frame(camera_frame, "rgb", resize, None, compute)
+
+    def get_bgr_from_camera_frame(
+        self, camera_frame: CameraFrame, resize: tuple[int, int] | None = None
+    ) -> cv2.typing.MatLike:
+        """
+        Resize a frame published by the camera, keeping its BGR format.
+        The result is cached and shared between consumers: it's read-only.
+        Without resize, the frame is copied out of the ring buffer, so that it stays
+        valid once its slot is reused by the capture thread.
+        Raises StaleFrameError if the frame was overwritten by the capture thread.
+        """
+
+        def compute(camera_frame: CameraFrame) -> cv2.typing.MatLike:
+            if resize is None:
+                return self.copy_frame(camera_frame).frame
+            with RESIZE_SECONDS.time():
+                return cv2.resize(
+                    src=camera_frame.frame, dsize=resize, interpolation=cv2.INTER_AREA
+                )
+
+        return self._get_derived_frame(camera_frame, "bgr", resize, None, compute)
+
+    def get_jpeg_from_camera_frame(
+        self,
+        camera_frame: CameraFrame,
+        target_size: tuple[int, int] | None,
+        quality: int | None,
+    ) -> bytes | None:
+        """
+        Resize and encode a frame published by the camera as JPEG. The result is cached.
+        Raises StaleFrameError if the frame was overwritten by the capture thread.
+        """
+
+        def compute(camera_frame: CameraFrame) -> bytes | None:
+            # The frame is encoded right away: no need to copy it out of the ring buffer
+            bgr_frame = (
+                camera_frame.frame
+                if target_size is None
+                else self.get_bgr_from_camera_frame(camera_frame, resize=target_size)
+            )
+            params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality else []
+            with JPEG_ENCODING_SECONDS.time():
+                success, jpeg = cv2.imencode(".jpg", bgr_frame, params)
+            if not success:
+                return None
+            return jpeg.tobytes()
+
+        return self._get_derived_frame(
+            camera_frame, "jpeg", target_size, quality, compute
+        )
+
     def get_jpeg_rgb_frame(
         self,
         target_size: tuple[int, int] | None,
@@ -335,6 +743,12 @@ class BaseCamera(ABC):
         is_video_frame: bool = True,
     ) -> bytes | None:
         if is_video_frame:
+            if self.get_latest_frame() is not None:
+                return self.derive_latest_frame(
+                    lambda camera_frame: self.get_jpeg_from_camera_frame(
+                        camera_frame, target_size=target_size, quality=quality
+                    )
+                )
             rgb_frame = self.get_rgb_frame(resize=target_size)
         else:
             rgb_frame = self.get_depth_frame()
@@ -359,11 +773,20 @@ class BaseCamera(ABC):
         request: Request | None = None,
     ) -> AsyncGenerator:
         """Generator for video frames"""
+        last_seq = 0
         try:
             while self.is_active and (
                 request is None or not await request.is_disconnected()
             ):
                 time_start = time.perf_counter()
+                if is_video_frame:
+                    camera_frame = self.get_latest_frame()
+                    if camera_frame is not None:
+                        if camera_frame.seq == last_seq:
+                            # Don't encode and send the same frame twice
+                            await asyncio.sleep(0.5 / self.fps)
+                            continue
+                        last_seq = camera_frame.seq
                 frame = self.get_jpeg_rgb_frame(
                     is_video_frame=is_video_frame,
                     target_size=target_size,
@@ -399,7 +822,6 @@ class BaseCamera(ABC):
 class VideoCamera(threading.Thread, BaseCamera):
     camera_type: CameraTypes = "classic"
     camera_id: Optional[int] = None
-    last_frame: Optional[cv2.typing.MatLike] = None
     lock: threading.Lock
     _stop_event: threading.Event
     video: Optional[cv2.VideoCapture] = None
@@ -411,7 +833,7 @@ class VideoCamera(threading.Thread, BaseCamera):
         camera_id: Optional[int] = 0,
         camera_type: Optional[CameraTypes] = None,
     ):
-        threading.Thread.__init__(self)
+        threading.Thread.__init__(self, name=f"camera_{camera_id}")
         BaseCamera.__init__(self)
 
         if camera_type:
@@ -438,6 +860,12 @@ class VideoCamera(threading.Thread, BaseCamera):
     def camera_name(self) -> str:
         return f"VideoCamera {self.camera_type} {self.camera_id}"
 
+    @property
+    def last_frame(self) -> Optional[cv2.typing.MatLike]:
+        """Latest BGR frame read by the capture thread."""
+        camera_frame = self.get_latest_frame()
+        return camera_frame.frame if camera_frame is not None else None
+
     def stop(self) -> None:
         """Stop the video stream"""
         logger.debug(f"{self.camera_name}: Stopping. is_active={self.is_active}")
@@ -513,21 +941,24 @@ Camera type: {self.camera_type}""")
 
                 if not self.video or not self.video.isOpened():
                     logger.warning(f"{self.camera_name}: is not initialized")
-                    self.last_frame = None
+                    self._publish_frame(None)
                     continue
 
                 # The stereo camera fails on the first 2 attempts
                 success, frame = False, None
                 for _ in range(3):  # Try up to 3 times
-                    success, frame = self.video.read()
+                    # Read in a preallocated buffer to avoid allocating a frame each time
+                    success, frame = self.video.read(
+                        image=self.frame_ring.next_buffer()
+                    )
                     if success:
                         break
 
                 if not success:
                     logger.warning(f"{self.camera_name}: Failed to grab frame")
-                    self.last_frame = None
+                    self._publish_frame(None)
                 else:
-                    self.last_frame = frame
+                    self._publish_frame(frame)
 
     def get_rgb_frame(
         self, resize: tuple[int, int] | None = None
@@ -540,18 +971,16 @@ Camera type: {self.camera_type}""")
         """
         if not self.is_active:
             logger.warning(f"{self.camera_name}: is not active")
-        if self.last_frame is None:
+        camera_frame = self.get_latest_frame()
+        if camera_frame is None:
             logger.warning(f"{self.camera_name}: No frame available")
+            return None
 
-        frame: np.ndarray | None = None
-        # Convert from BGR to RGB
-        if self.last_frame is not None:
-            frame = cv2.cvtColor(self.last_frame, cv2.COLOR_BGR2RGB)
-
-        if resize is not None and frame is not None:
-            frame = cv2.resize(src=frame, dsize=resize, interpolation=cv2.INTER_AREA)
-
-        return frame
+        return self.derive_latest_frame(
+            lambda camera_frame: self.get_rgb_from_camera_frame(
+                camera_frame, resize=resize
+            )
+        )
 
 
 class DummyCamera(VideoCamera):
@@ -577,7 +1006,6 @@ class DummyCamera(VideoCamera):
         """
         The simulated camera cannot be opened with opencv, so we return True.
         """
-        self.last_frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
         return True
 
     def get_rgb_frame(
@@ -851,6 +1279,7 @@ try:
             disable: bool = False,
         ):
             threading.Thread.__init__(self)
+            BaseCamera.__init__(self)
 
             self.width = realsense_camera.width
             self.height = realsense_camera.height
@@ -862,8 +1291,6 @@ try:
             self.camera_type = cast(CameraTypes, f"realsense_{frame_type}")
             self.camera_id = camera_id
 
-            atexit.register(self.stop)
-
         @property
         def is_active(self) -> bool:
             return self.realsense_camera.is_active
@@ -1007,9 +1434,13 @@ class ZMQCamera(VideoCamera):
         frame = np.frombuffer(data["frame_bytes"], dtype=np.dtype(data["dtype"]))
         reconstructed_frame = frame.reshape(data["shape"])
 
-        with self.lock:
-            # Convert RGB from stream to BGR for OpenCV compatibility
-            self.last_frame = cv2.cvtColor(reconstructed_frame, cv2.COLOR_RGB2BGR)
+        # Convert RGB from stream to BGR for OpenCV compatibility, directly in the ring buffer
+        buffer = self.frame_ring.next_buffer(
+            shape=reconstructed_frame.shape, dtype=reconstructed_frame.dtype
+        )
+        self._publish_frame(
+            cv2.cvtColor(reconstructed_frame, cv2.COLOR_RGB2BGR, dst=buffer)
+        )
 
     def run(self) -> None:
         """
@@ -1490,6 +1921,52 @@ class AllCameras:
 
         return frame
 
+    def get_latest_frame(self, camera_id: int) -> Optional[CameraFrame]:
+        """
+        Return the latest frame published by the specified camera, without a copy.
+        Returns None if the camera is not available or has no capture thread.
+        """
+        camera = self.get_camera_by_id(camera_id)
+        if camera is None:
+            return None
+        return camera.get_latest_frame()
+
+    def get_bgr_frame(
+        self,
+        camera_id: int,
+        resize: Optional[tuple[int, int]] = None,
+    ) -> Optional[cv2.typing.MatLike]:
+        """
+        Return the latest frame of the specified camera in BGR, resized.
+        The frame is shared with the other consumers of the camera: it's read-only.
+        It's never a view on the ring buffer of the camera, so it can be kept.
+        """
+        camera = self.get_camera_by_id(camera_id)
+        if camera is None:
+            return None
+        if camera.get_latest_frame() is not None:
+            return camera.derive_latest_frame(
+                lambda camera_frame: camera.get_bgr_from_camera_frame(
+                    camera_frame, resize=resize
+                )
+            )
+
+        # No capture thread (eg: realsense): read the camera directly
+        rgb_frame = camera.get_rgb_frame(resize=resize)
+        if rgb_frame is None:
+            return None
+        return cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
+
+    def get_frame_cache_stats(self) -> Dict[int, Dict[str, int]]:
+        """
+        Return the hits, misses and number of entries of the frame cache of every camera.
+        """
+        return {
+            camera.camera_id: camera.frame_cache.stats()
+            for camera in self.cameras
+            if getattr(camera, "camera_id", None) is not None
+        }
+
     def get_rgb_frames_for_all_cameras(
         self, resize: Optional[tuple[int, int]] = None
     ) -> Dict[str, cv2.typing.MatLike | None]:
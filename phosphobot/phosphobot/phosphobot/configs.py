@@ -44,6 +44,8 @@ class Configuration(BaseModel):
 
     # Recording
     MAIN_CAMERA_ID: int | None = None  # defaults to min(detected cameras)
+    # Number of recorded episodes which can wait to be saved in the background
+    MAX_PENDING_EPISODE_SAVES: int = 3
 
     # Whether to initialize the RealSense camera
     ENABLE_REALSENSE: bool = True
@@ -55,6 +57,9 @@ class Configuration(BaseModel):
 
     # How simulation should be run
     SIM_MODE: SimulationMode = SimulationMode.headless
+    # Step the simulation physics in a background thread. Otherwise, the simulation
+    # only mirrors the joint positions of the robots.
+    SIM_PHYSICS: bool = False
     # Only simulation: Only use the simulation
     ONLY_SIMULATION: bool = False
     SIMULATE_CAMERAS: bool = False
@@ -74,6 +79,17 @@ class Configuration(BaseModel):
     )
     DEFAULT_VIDEO_CODEC: VideoCodecs = Field(default_factory=lambda: "avc1")
     DEFAULT_VIDEO_SIZE: list[int] = [320, 240]
+    # Number of videos encoded at the same time, by the recordings and the episodes
+    # being saved. Defaults to the number of CPUs
+    MAX_VIDEO_ENCODING_WORKERS: int | None = None
+    # Threads of each video encoder. 0 lets FFmpeg pick the number, which
+    # oversubscribes the CPUs when several videos are encoded at the same time
+    VIDEO_ENCODER_THREADS: int = 2
+    # The image stats of an episode are computed by the video encoders on every Nth
+    # pixel of every Nth row and on every Nth frame. 1 uses all the pixels and frames:
+    # the stats are exact. Larger strides approximate them, the min and max the most
+    IMAGE_STATS_SPATIAL_STRIDE: int = 1
+    IMAGE_STATS_TEMPORAL_STRIDE: int = 1
     DEFAULT_TASK_INSTRUCTION: str = "None"
     # List of camera ids to disable, set to -1 to disable all cameras
     DEFAULT_CAMERAS_TO_DISABLE: list[int] | None = None
@@ -0,0 +1,222 @@
+"""
+Runtime of the control loops: leader-follower, gravity compensation and AI control.
+
+The control loops read and write the motors with blocking serial I/O. Each loop runs
+in a dedicated thread with its own event loop: the loop doesn't block the API event
+loop, and the API requests don't delay the loop iterations.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Coroutine
+
+import numpy as np
+from loguru import logger
+
+from phosphobot.models import ControlLoopStats
+
+runtime = None
+
+
+class ControlLoopAlreadyRunningError(RuntimeError):
+    """
+    A control loop with the same name is still running.
+    """
+
+
+class LoopTimer:
+    """
+    Pace a control loop on absolute deadlines and measure its timing.
+
+    The next deadline is the previous one plus the period, so that the duration of an
+    iteration doesn't shift the next ones. When an iteration ends after its deadline,
+    it counts as an overrun and the missed deadlines are skipped instead of running
+    late iterations in a burst.
+    """
+
+    def __init__(self, name: str, period: float | None = None, window: int = 1000):
+        """
+        Args:
+            name: Name of the control loop.
+            period: Period of the loop in seconds. Can be changed while the loop runs.
+            window: Number of iterations the period and jitter statistics are
+                computed on.
+        """
+        self.name = name
+        self.period = period
+        self.running = True
+        self._lock = threading.Lock()
+        self._deadline: float | None = None
+        self._last_tick: float | None = None
+        self._periods: deque[float] = deque(maxlen=window)
+        self._iterations = 0
+        self._overruns = 0
+
+    def reset(self) -> None:
+        """
+        Restart the schedule from the next call to wait(), for example after a pause.
+        The time spent between the two calls isn't measured as a period.
+        """
+        with self._lock:
+            self._deadline = None
+            self._last_tick = None
+
+    async def wait(self) -> None:
+        """
+        Sleep until the deadline of the next iteration.
+        """
+        period = self.period or 0.0
+        now = time.perf_counter()
+        deadline = (now if self._deadline is None else self._deadline) + period
+        overrun = now > deadline
+        if overrun:
+            # Skip the missed deadlines
+            deadline = now
+        self._deadline = deadline
+        await asyncio.sleep(deadline - now if not overrun else 0)
+
+        tick = time.perf_counter()
+        with self._lock:
+            if self._last_tick is not None:
+                self._periods.append(tick - self._last_tick)
+            self._last_tick = tick
+            self._iterations += 1
+            if overrun:
+                self._overruns += 1
+
+    def stats(self) -> ControlLoopStats:
+        """
+        Period, jitter and overruns of the loop over the last iterations.
+        """
+        with self._lock:
+            periods = np.array(self._periods)
+            iterations = self._iterations
+            overruns = self._overruns
+
+        stats = ControlLoopStats(
+            name=self.name,
+            running=self.running,
+            iterations=iterations,
+            target_period_ms=self.period * 1000 if self.period else None,
+            overruns=overruns,
+        )
+        if periods.size > 0:
+            stats.mean_period_ms = float(np.mean(periods)) * 1000
+            stats.max_period_ms = float(np.max(periods)) * 1000
+            stats.jitter_ms = float(np.std(periods)) * 1000
+        return stats
+
+
+class ControlLoopRuntime:
+    """
+    Run each control loop in a dedicated thread, with its own event loop.
+
+    The loops communicate with the API through thread-safe objects: the control
+    signals to start and stop them, and the robots whose motors bus and simulation
+    serialize their accesses.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers: dict[str, LoopTimer] = {}
+        self._threads: dict[str, threading.Thread] = {}
+
+    def start(
+        self,
+        name: str,
+        loop_function: Callable[..., Coroutine[Any, Any, Any]],
+        *args,
+        **kwargs,
+    ) -> Future:
+        """
+        Start a control loop in a new thread.
+
+        The loop function is called with a `loop_timer` keyword argument to pace its
+        iterations with `await loop_timer.wait()`.
+
+        If the loop raises, the exception is logged and the `control_signal` keyword
+        argument of the loop, if any, is stopped: the loop can be started again.
+
+        Raises:
+            ControlLoopAlreadyRunningError: The thread of the previous loop with this
+                name is still running.
+
+        Returns:
+            A future with the result of the loop. Use `asyncio.wrap_future` to await
+            it from the API event loop.
+        """
+        timer = LoopTimer(name=name)
+        future: Future = Future()
+        control_signal = kwargs.get("control_signal")
+
+        def _on_done(future: Future) -> None:
+            if future.cancelled() or future.exception() is None:
+                return
+            exception = future.exception()
+            logger.opt(exception=exception).error(
+                f"Control loop {name} stopped with an error: {exception}"
+            )
+            if control_signal is not None:
+                control_signal.stop()
+
+        future.add_done_callback(_on_done)
+
+        def _run() -> None:
+            future.set_running_or_notify_cancel()
+            try:
+                result = asyncio.run(loop_function(*args, loop_timer=timer, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                timer.running = False
+                logger.debug(f"Control loop {name} thread stopped")
+
+        thread = threading.Thread(target=_run, name=f"control-loop-{name}", daemon=True)
+        with self._lock:
+            previous_thread = self._threads.get(name)
+            if previous_thread is not None and previous_thread.is_alive():
+                raise ControlLoopAlreadyRunningError(
+                    f"Control loop {name} is already running"
+                )
+            self._timers[name] = timer
+            self._threads[name] = thread
+        thread.start()
+        return future
+
+    def is_running(self, name: str) -> bool:
+        with self._lock:
+            thread = self._threads.get(name)
+        return thread is not None and thread.is_alive()
+
+    def join(self, name: str, timeout: float | None = None) -> None:
+        """
+        Wait for the thread of a control loop to stop.
+        """
+        with self._lock:
+            thread = self._threads.get(name)
+        if thread is not None:
+            thread.join(timeout=timeout)
+
+    def stats(self) -> list[ControlLoopStats]:
+        """
+        Timing statistics of the last run of each control loop.
+        """
+        with self._lock:
+            timers = list(self._timers.values())
+        return [timer.stats() for timer in timers]
+
+
+@lru_cache()
+def get_control_loop_runtime() -> ControlLoopRuntime:
+    global runtime
+
+    if runtime is None:
+        runtime = ControlLoopRuntime()
+
+    return runtime
@@ -20,6 +20,7 @@ from scipy.spatial.transform import Rotation as R
 
 from phosphobot.ai_control import CustomAIControlSignal, setup_ai_control
 from phosphobot.camera import AllCameras, get_all_cameras
+from phosphobot.control_loop import get_control_loop_runtime
 from phosphobot.control_signal import ControlSignal
 from phosphobot.hardware.base import BaseManipulator
 from phosphobot.leader_follower import RobotPair, leader_follower_loop
@@ -28,6 +29,7 @@ from phosphobot.models import (
     AIStatusResponse,
     AppControlData,
     CalibrateResponse,
+    ControlLoopsStatusResponse,
     EndEffectorPosition,
     EndEffectorReadRequest,
     FeedbackRequest,
@@ -43,6 +45,7 @@ from phosphobot.models import (
     StartLeaderArmControlRequest,
     StartServerRequest,
     StatusResponse,
+    TeleopStatsResponse,
     TemperatureReadResponse,
     TemperatureWriteRequest,
     TorqueControlRequest,
@@ -57,7 +60,14 @@ from phosphobot.robot import (
     SO100Hardware,
     get_rcm,
 )
+from phosphobot.snapshot import get_snapshot_service
 from phosphobot.supabase import get_client, user_is_logged_in
+from phosphobot.teleop_encoding import (
+    BINARY_SUBPROTOCOL,
+    BinaryDecodeError,
+    decode_control,
+    encode_status,
+)
 from phosphobot.teleoperation import (
     TeleopManager,
     UDPServer,
@@ -112,6 +122,18 @@ async def move_teleop_post(
     return StatusResponse()
 
 
+@router.get(
+    "/move/teleop/stats",
+    response_model=TeleopStatsResponse,
+    summary="Teleoperation statistics",
+    description="Number of executed, superseded and dropped teleoperation commands, and age of the last executed commands.",
+)
+async def move_teleop_stats(
+    teleop_manager: TeleopManager = Depends(get_teleop_manager),
+) -> TeleopStatsResponse:
+    return teleop_manager.stats()
+
+
 # WebSocket endpoint
 @router.websocket("/move/teleop/ws")
 async def move_teleop_ws(
@@ -124,11 +146,25 @@ async def move_teleop_ws(
     if not await rcm.robots:
         raise HTTPException(status_code=400, detail="No robot connected")
 
-    await websocket.accept()
+    # The client can request the binary encoding of the messages
+    binary = BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=BINARY_SUBPROTOCOL if binary else None)
 
     signal_vr_control.start()
     try:
         while True:
+            if binary:
+                data = await websocket.receive_bytes()
+                try:
+                    control_data, _ = decode_control(data)
+                except BinaryDecodeError as e:
+                    logger.error(f"WebSocket binary message error: {e}")
+                    continue
+                await teleop_manager.process_control_data(control_data)
+                for update in await teleop_manager.send_status_updates():
+                    await websocket.send_bytes(encode_status(update))
+                continue
+
             data = await websocket.receive_text()
             try:
                 control_data = AppControlData.model_validate_json(data)
@@ -140,6 +176,7 @@ async def move_teleop_ws(
     except WebSocketDisconnect:
         logger.warning("WebSocket client disconnected")
 
+    teleop_manager.stop_servos()
     signal_vr_control.stop()
 
 
@@ -502,7 +539,13 @@ async def end_effector_read(
             detail=f"Call /move/init before using this endpoint for robot {robot.name}. ",
         )
 
-    position, orientation, open_status = robot.get_end_effector_state(sync=query.sync)
+    motor_positions = None
+    if query.sync and robot.is_connected:
+        # Share the read of the motors with the other consumers
+        motor_positions = get_snapshot_service().read_robot(robot).joints_position
+    position, orientation, open_status = robot.get_end_effector_state(
+        sync=query.sync, motor_positions=motor_positions
+    )
     # Remove the initial position and orientation (used to zero the robot)
     position = position - initial_position
     orientation = orientation - initial_orientation_rad
@@ -702,9 +745,21 @@ async def read_joints(
             detail="Robot does not support reading joint positions",
         )
 
-    current_units_position = robot.read_joints_position(
-        unit=request.unit, joints_ids=request.joints_ids, source=request.source
-    )
+    if (
+        request.source == "robot"
+        and request.joints_ids is None
+        and isinstance(robot, BaseManipulator)
+        and robot.is_connected
+    ):
+        # Share the read of the motors with the other consumers
+        robot_sample = get_snapshot_service().read_robot(robot)
+        current_units_position = robot.convert_joints_position(
+            robot_sample.joints_position, unit=request.unit
+        )
+    else:
+        current_units_position = robot.read_joints_position(
+            unit=request.unit, joints_ids=request.joints_ids, source=request.source
+        )
     # Replace NaN values with None and convert to list
     current_units_position = [
         float(angle) if not np.isnan(angle) else None
@@ -804,7 +859,6 @@ async def calibrate(
 )
 async def start_leader_follower(
     request: StartLeaderArmControlRequest,
-    background_tasks: BackgroundTasks,
     rcm: RobotConnectionManager = Depends(get_rcm),
 ) -> StatusResponse:
     """
@@ -817,6 +871,11 @@ async def start_leader_follower(
             status_code=400,
             detail="Leader-follower control is already running. Call /move/leader/stop first.",
         )
+    if get_control_loop_runtime().is_running("leader_follower"):
+        raise HTTPException(
+            status_code=400,
+            detail="Leader-follower control is still stopping. Retry in a moment.",
+        )
 
     # Parse the robot IDs from the request
     robot_pairs: list[RobotPair] = []
@@ -869,9 +928,10 @@ async def start_leader_follower(
     # Create control signal for managing the leader-follower operation
     signal_leader_follower.start()
 
-    # Add background task to run the control loop
-    background_tasks.add_task(
-        background_task_log_exceptions(leader_follower_loop),
+    # Run the control loop in its own thread
+    get_control_loop_runtime().start(
+        "leader_follower",
+        leader_follower_loop,
         robot_pairs=robot_pairs,
         control_signal=signal_leader_follower,
         invert_controls=request.invert_controls,
@@ -905,7 +965,6 @@ async def stop_leader_follower(
 
 @router.post("/gravity/start", response_model=StatusResponse)
 async def start_gravity(
-    background_tasks: BackgroundTasks,
     robot_id: int = 0,
     rcm: RobotConnectionManager = Depends(get_rcm),
 ) -> StatusResponse:
@@ -916,6 +975,11 @@ async def start_gravity(
         raise HTTPException(
             status_code=400, detail="Gravity control is already running"
         )
+    if get_control_loop_runtime().is_running("gravity_compensation"):
+        raise HTTPException(
+            status_code=400,
+            detail="Gravity control is still stopping. Retry in a moment.",
+        )
 
     if len(await rcm.robots) == 0:
         raise HTTPException(status_code=400, detail="No robot connected")
@@ -928,9 +992,10 @@ async def start_gravity(
 
     signal_gravity_control.start()
 
-    # Add background task to run the control loop
-    background_tasks.add_task(
-        background_task_log_exceptions(robot.gravity_compensation_loop),
+    # Run the control loop in its own thread
+    get_control_loop_runtime().start(
+        "gravity_compensation",
+        robot.gravity_compensation_loop,
         control_signal=signal_gravity_control,
     )
     return StatusResponse()
@@ -955,6 +1020,19 @@ async def stop_gravity_compensation(
     return StatusResponse(message="Stopping gravity control")
 
 
+@router.get(
+    "/control-loops/status",
+    response_model=ControlLoopsStatusResponse,
+    summary="Get the timing of the control loops",
+    description="Get the period, jitter and overruns of the leader-follower, gravity compensation and AI control loops.",
+)
+async def control_loops_status() -> ControlLoopsStatusResponse:
+    """
+    Timing statistics of the last run of each control loop.
+    """
+    return ControlLoopsStatusResponse(control_loops=get_control_loop_runtime().stats())
+
+
 @router.post(
     "/ai-control/status",
     response_model=AIStatusResponse,
@@ -1026,7 +1104,6 @@ async def spawn_inference_server(
 )
 async def start_ai_control(
     query: StartAIControlRequest,
-    background_tasks: BackgroundTasks,
     rcm: RobotConnectionManager = Depends(get_rcm),
     all_cameras: AllCameras = Depends(get_all_cameras),
     session=Depends(user_is_logged_in),
@@ -1054,6 +1131,14 @@ async def start_ai_control(
             ai_control_signal_status=signal_ai_control.status,
             server_info=None,
         )
+    if get_control_loop_runtime().is_running("ai_control"):
+        return AIControlStatusResponse(
+            status="error",
+            message="Auto control is still stopping. Retry in a moment.",
+            ai_control_signal_id=signal_ai_control.id,
+            ai_control_signal_status=signal_ai_control.status,
+            server_info=None,
+        )
 
     signal_ai_control.new_id()
     signal_ai_control.start()
@@ -1122,7 +1207,8 @@ async def start_ai_control(
         .execute()
     )
 
-    background_tasks.add_task(
+    get_control_loop_runtime().start(
+        "ai_control",
         model.control_loop,
         robots=robots_to_control,
         control_signal=signal_ai_control,
@@ -1136,6 +1222,7 @@ async def start_ai_control(
         angle_format=query.angle_format,
         min_angle=query.min_angle,
         max_angle=query.max_angle,
+        prefetch_fraction=query.prefetch_fraction,
     )
 
     return AIControlStatusResponse(
@@ -6,7 +6,7 @@ import traceback
 from pathlib import Path, PurePath
 from typing import Literal, cast
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import FileResponse, HTMLResponse
 from huggingface_hub import HfApi
 from loguru import logger
@@ -40,6 +40,7 @@ from phosphobot.models import (
     InfoModel,
 )
 from phosphobot.models import EpisodesModel, LeRobotDataset
+from phosphobot.recorder import Recorder, get_recorder
 from phosphobot.utils import (
     get_hf_token,
     get_resources_path,
@@ -58,6 +59,20 @@ ROOT_DIR = str(get_home_app_path() / "recordings")
 INDEX_PATH = get_resources_path() / "dist" / "index.html"
 
 
+async def check_no_episode_is_saving(
+    recorder: Recorder = Depends(get_recorder),
+) -> None:
+    """
+    The endpoints editing a dataset rewrite its meta files. Episodes saved in the
+    background append to these files: wait for them to be saved first.
+    """
+    if recorder.save_queue.nb_pending > 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{recorder.save_queue.nb_pending} episodes are being saved. Please wait a few seconds and try again.",
+        )
+
+
 # Optionally, if you want the dashboard to be served at the root endpoint:
 @router.get("/auth", response_class=HTMLResponse)
 @router.get("/sign-in", response_class=HTMLResponse)
@@ -384,7 +399,7 @@ async def submit_user_settings(user_settings: AdminSettingsRequest):
         return {"status": "error", "message": f"Error saving user settings: {str(e)}"}
 
 
-@router.post("/dataset/delete")
+@router.post("/dataset/delete", dependencies=[Depends(check_no_episode_is_saving)])
 async def delete_dataset(request: Request, path: str):
     dataset_path = os.path.join(ROOT_DIR, path)
     # Check if the path exists and is a directory
@@ -473,7 +488,7 @@ async def get_dataset_info(path: str) -> InfoResponse:
     )
 
 
-@router.post("/dataset/merge")
+@router.post("/dataset/merge", dependencies=[Depends(check_no_episode_is_saving)])
 async def merge_datasets(merge_request: MergeDatasetsRequest):
     """
     Merge two datasets into one.
@@ -635,7 +650,7 @@ async def list_datasets():
     )
 
 
-@router.post("/episode/delete")
+@router.post("/episode/delete", dependencies=[Depends(check_no_episode_is_saving)])
 async def delete_episode(query: DeleteEpisodeRequest):
     """
     Delete an episode from the dataset.
@@ -893,7 +908,11 @@ async def hf_download_dataset(
             )
 
 
-@router.post("/dataset/repair", response_model=StatusResponse)
+@router.post(
+    "/dataset/repair",
+    response_model=StatusResponse,
+    dependencies=[Depends(check_no_episode_is_saving)],
+)
 async def repair_dataset(query: DatasetRepairRequest):
     """
     Repair a dataset by removing any corrupted files.
@@ -921,7 +940,11 @@ async def repair_dataset(query: DatasetRepairRequest):
         )
 
 
-@router.post("/dataset/split", response_model=StatusResponse)
+@router.post(
+    "/dataset/split",
+    response_model=StatusResponse,
+    dependencies=[Depends(check_no_episode_is_saving)],
+)
 async def split_dataset(query: DatasetSplitRequest):
     """
     Split a dataset into two datasets.
@@ -959,7 +982,11 @@ async def split_dataset(query: DatasetSplitRequest):
     return StatusResponse(status="ok", message="Dataset split successfully")
 
 
-@router.post("/dataset/shuffle", response_model=StatusResponse)
+@router.post(
+    "/dataset/shuffle",
+    response_model=StatusResponse,
+    dependencies=[Depends(check_no_episode_is_saving)],
+)
 async def shuffle_dataset(query: DatasetShuffleRequest):
     """
     Shuffle a dataset in place.
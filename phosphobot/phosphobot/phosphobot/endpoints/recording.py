@@ -25,7 +25,7 @@ from phosphobot.models.lerobot_dataset import LeRobotDataset
 from phosphobot.posthog import is_github_actions
 from phosphobot.recorder import Recorder, get_recorder
 from phosphobot.robot import RobotConnectionManager, get_rcm
-from phosphobot.utils import background_task_log_exceptions, get_home_app_path
+from phosphobot.utils import get_home_app_path
 
 router = APIRouter(tags=["recording"])
 
@@ -150,11 +150,11 @@ async def start_recording_episode(
                 detail=str(e),
             )
 
-    # Check if the recorder is not currently saving
-    if recorder.is_saving:
+    # The previous episodes are saved in the background, unless too many are waiting
+    if recorder.save_queue.is_full:
         raise HTTPException(
             status_code=400,
-            detail="Recorder is still saving an episode. Please wait a few seconds and try again.",
+            detail="Too many episodes are waiting to be saved. Please wait a few seconds and try again.",
         )
 
     # Update recorder's robots
@@ -179,18 +179,12 @@ async def start_recording_episode(
 @router.post("/recording/stop", response_model=RecordingStopResponse)
 async def stop_recording_episode(
     query: RecordingStopRequest,
-    background_tasks: BackgroundTasks,
     recorder: Recorder = Depends(get_recorder),
 ) -> RecordingStopResponse | HTTPException:
     """
     Stop the recording of the episode. The data is saved to disk to the user home directory, in the `phosphobot` folder.
+    The episode is saved in the background: the next episode can be recorded immediately. The progress of the save is in `/status`.
     """
-    if recorder.is_saving:
-        raise HTTPException(
-            status_code=400,
-            detail="Recorder is still saving an episode. Please wait a few seconds and try again.",
-        )
-
     if not recorder.is_recording:
         raise HTTPException(status_code=400, detail="No episode to stop")
 
@@ -207,11 +201,14 @@ async def stop_recording_episode(
         )
         return RecordingStopResponse(episode_folder_path=None, episode_index=None)
 
-    background_tasks.add_task(background_task_log_exceptions(recorder.save_episode))
+    episode_folder_path = str(recorder.episode.dataset_path)
+    episode_index = recorder.episode.episode_index
+    # Queue the episode. This waits only if too many episodes are waiting to be saved.
+    await recorder.save_episode()
 
     return RecordingStopResponse(
-        episode_folder_path=str(recorder.episode.dataset_path),
-        episode_index=recorder.episode.episode_index,
+        episode_folder_path=episode_folder_path,
+        episode_index=episode_index,
     )
 
 
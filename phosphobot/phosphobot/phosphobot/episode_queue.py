@@ -0,0 +1,210 @@
+"""
+Save the recorded episodes in the background, so that the next episode can be
+recorded while the previous ones are being saved.
+
+The episodes are saved one at a time, in the order they were recorded: the meta
+files of a dataset are appended episode after episode. The queue is bounded. When it
+is full, submitting an episode waits for a slot.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, List, Literal, Optional
+
+from loguru import logger
+
+from phosphobot.metrics import get_metrics
+from phosphobot.models import (
+    BaseEpisode,
+    EpisodeSaveJobStatus,
+    EpisodeSaveQueueStatus,
+)
+
+EPISODE_SAVE_SECONDS = get_metrics().histogram(
+    "phosphobot_episode_save_seconds",
+    "Time to save an episode, in seconds.",
+)
+
+
+@dataclass
+class EpisodeSaveJob:
+    episode: Optional[BaseEpisode]
+    dataset_name: str
+    dataset_path: str
+    # Called after the episode is saved, unless a later episode of the same dataset
+    # is queued: the dataset is pushed once, with all its episodes
+    push: Optional[Callable[[], Awaitable[None]]] = None
+    state: Literal["queued", "saving", "pushing", "saved", "failed"] = "queued"
+    queued_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    episode_index: int | None = None
+
+    def status(self) -> EpisodeSaveJobStatus:
+        return EpisodeSaveJobStatus(
+            dataset_name=self.dataset_name,
+            # The index can change while saving if a previous episode failed
+            episode_index=self.episode.episode_index
+            if self.episode is not None
+            else self.episode_index,
+            state=self.state,
+            queued_at=self.queued_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            error=self.error,
+        )
+
+
+class EpisodeSaveQueue:
+    """
+    Bounded queue of the episodes to save, processed by a single worker task.
+    """
+
+    def __init__(self, max_pending: int = 3, history_size: int = 10):
+        """
+        Args:
+            max_pending: Maximum number of episodes waiting to be saved, in addition
+                to the episode being saved.
+            history_size: Number of finished saves kept for the status.
+        """
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be at least 1, got {max_pending}")
+        self.max_pending = max_pending
+        self.nb_saved = 0
+        self.nb_failed = 0
+
+        self._pending: List[EpisodeSaveJob] = []
+        self._finished: Deque[EpisodeSaveJob] = deque(maxlen=history_size)
+        self._queue: asyncio.Queue[EpisodeSaveJob] | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def nb_pending(self) -> int:
+        """
+        Number of episodes waiting to be saved or being saved.
+        """
+        return len(self._pending)
+
+    @property
+    def is_full(self) -> bool:
+        return self._queue is not None and self._queue.full()
+
+    async def submit(
+        self,
+        episode: BaseEpisode,
+        dataset_path: str,
+        push: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> EpisodeSaveJob:
+        """
+        Queue an episode to be saved. Waits for a slot if the queue is full.
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._worker = asyncio.create_task(self._run())
+        assert self._queue is not None
+
+        job = EpisodeSaveJob(
+            episode=episode,
+            dataset_name=episode.metadata.get("dataset_name", "UnknownDataset"),
+            dataset_path=dataset_path,
+            push=push,
+        )
+        if self._queue.full():
+            logger.warning(
+                f"{self.nb_pending} episodes are waiting to be saved. Waiting for a slot."
+            )
+        self._pending.append(job)
+        try:
+            await self._queue.put(job)
+        except asyncio.CancelledError:
+            self._pending.remove(job)
+            raise
+        logger.info(
+            f"Episode {episode.episode_index} of dataset '{job.dataset_name}' queued for saving "
+            f"({self.nb_pending} pending)."
+        )
+        return job
+
+    async def join(self) -> None:
+        """
+        Wait for the queued episodes to be saved.
+        """
+        if self._queue is not None and self._worker is not None:
+            await self._queue.join()
+
+    async def close(self) -> None:
+        """
+        Save the queued episodes, then stop the worker.
+        """
+        await self.join()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def status(self) -> EpisodeSaveQueueStatus:
+        return EpisodeSaveQueueStatus(
+            max_pending=self.max_pending,
+            nb_pending=self.nb_pending,
+            nb_saved=self.nb_saved,
+            nb_failed=self.nb_failed,
+            jobs=[job.status() for job in list(self._finished) + self._pending],
+        )
+
+    def _has_queued(self, dataset_path: str) -> bool:
+        return any(
+            job.state == "queued" and job.dataset_path == dataset_path
+            for job in self._pending
+        )
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            finally:
+                self._pending.remove(job)
+                self._finished.append(job)
+                self._queue.task_done()
+
+    async def _process(self, job: EpisodeSaveJob) -> None:
+        assert job.episode is not None
+        job.state = "saving"
+        job.started_at = time.time()
+        try:
+            with EPISODE_SAVE_SECONDS.time():
+                await job.episode.save()
+        except Exception as e:
+            logger.error(
+                f"An error occurred while saving an episode of dataset '{job.dataset_name}': {e}",
+                exc_info=True,
+            )
+            job.state = "failed"
+            job.error = str(e)
+            self.nb_failed += 1
+            return
+        finally:
+            job.finished_at = time.time()
+            job.episode_index = job.episode.episode_index
+            # Release the steps of the episode
+            job.episode = None
+
+        self.nb_saved += 1
+        logger.success(
+            f"Episode {job.episode_index} saved successfully for dataset '{job.dataset_name}'."
+        )
+        if job.push is not None and not self._has_queued(job.dataset_path):
+            job.state = "pushing"
+            try:
+                await job.push()
+            except Exception as e:
+                logger.error(f"Failed to push dataset '{job.dataset_name}': {e}")
+            job.finished_at = time.time()
+        job.state = "saved"
@@ -1,5 +1,5 @@
 from . import motors
-from .sim import PyBulletSimulation, get_sim
+from .sim import PyBulletSimulation, create_robot_sim, get_sim
 from .base import BaseManipulator, BaseMobileRobot, BaseRobot
 from .go2 import UnitreeGo2
 from .koch11 import KochHardware
@@ -8,4 +8,22 @@ from .piper import PiperHardware
 from .so100 import SO100Hardware
 from .wx250s import WX250SHardware
 from .phosphobot import RemotePhosphobot
-from .urdfloader import URDFLoader
\ No newline at end of file
+from .urdfloader import URDFLoader
+
+__all__ = [
+    "motors",
+    "PyBulletSimulation",
+    "create_robot_sim",
+    "get_sim",
+    "BaseManipulator",
+    "BaseMobileRobot",
+    "BaseRobot",
+    "UnitreeGo2",
+    "KochHardware",
+    "LeKiwi",
+    "PiperHardware",
+    "SO100Hardware",
+    "WX250SHardware",
+    "RemotePhosphobot",
+    "URDFLoader",
+]
@@ -1,9 +1,10 @@
 import atexit
 import json
 import os
+import time
 import asyncio
 from abc import abstractmethod
-from typing import List, Literal, Optional, Union
+from typing import List, Literal, Optional, Sequence, Union
 
 from fastapi import HTTPException
 import numpy as np
@@ -11,13 +12,25 @@ from loguru import logger
 from phosphobot.configs import config as cfg
 from phosphobot.models import BaseRobot, BaseRobotConfig, BaseRobotInfo, Temperature
 from phosphobot.models.lerobot_dataset import FeatureDetails
-from phosphobot.hardware import get_sim
+from phosphobot.hardware import create_robot_sim
+from phosphobot.hardware.kinematics import KinematicChain, euler_from_rotation_matrix
+from phosphobot.metrics import get_metrics
+from phosphobot.types import SimulationMode
 from scipy.spatial.transform import Rotation as R  # type: ignore
 from phosphobot.utils import (
     euler_from_quaternion,
     get_resources_path,
 )
 
+IK_SOLVE_SECONDS = {
+    solver: get_metrics().histogram(
+        "phosphobot_ik_solve_seconds",
+        "Time to solve the inverse kinematics, in seconds.",
+        solver=solver,
+    )
+    for solver in ("chain", "pybullet")
+}
+
 
 class AxisRobot:
     """
@@ -69,6 +82,14 @@ class BaseManipulator(BaseRobot):
     # The effector is the gripper
     END_EFFECTOR_LINK_INDEX: int
 
+    # Inverse kinematics of the kinematic chain.
+    # Weight of the rotation error (radians) relative to the position error (meters),
+    # when both can't be reached (eg: yaw on a 5 DoF arm). By default, an error of one
+    # degree costs as much as an error of one centimeter.
+    IK_ORIENTATION_WEIGHT: float = 0.01 / np.deg2rad(1)
+    # More joints means more iterations to find the right position
+    IK_MAX_ITERATIONS: int = 100
+
     # calibration config: offsets, signs, pid values
     config: BaseRobotConfig | None = None
 
@@ -222,9 +243,10 @@ class BaseManipulator(BaseRobot):
 
         self._add_debug_lines = add_debug_lines
 
-        self.sim = get_sim()
+        self.sim = create_robot_sim()
 
-        if reset_simulation_bool:
+        # In GUI mode, the simulation world is shared with the other robots
+        if reset_simulation_bool and self.sim.sim_mode == SimulationMode.headless:
             self.sim.reset()
 
         logger.info(f"Loading URDF file: {self.URDF_FILE_PATH}")
@@ -258,10 +280,10 @@ class BaseManipulator(BaseRobot):
                 f"{self.__class__.__name__}.SLEEP_POSITION not set, using default: {self.SLEEP_POSITION}"
             )
 
-        self.sim.set_joints_states(
-            robot_id=self.p_robot_id,
+        self._set_sim_joints_states(
             joint_indices=self.actuated_joints,
             target_positions=self.CALIBRATION_POSITION,
+            mirror=False,
         )
 
         # Display link indices
@@ -299,6 +321,15 @@ class BaseManipulator(BaseRobot):
             joint_index=self.END_EFFECTOR_LINK_INDEX,
         )[0]
 
+        self.kinematic_chain = self._load_kinematic_chain(axis=axis)
+        # Positions in radians of the actuated joints last set in or read from the
+        # simulation. None when unknown.
+        self._sim_joints_position: np.ndarray | None = None
+        # Joint vector, position and orientation of the last forward kinematics
+        self._forward_kinematics_cache: (
+            tuple[np.ndarray, np.ndarray, np.ndarray] | None
+        ) = None
+
         if not only_simulation:
             # Register the disconnect method to be called on exit
             atexit.register(self.move_to_sleep_sync)
@@ -479,6 +510,83 @@ class BaseManipulator(BaseRobot):
 
         return int(x)
 
+    def _load_kinematic_chain(self, axis: List[float]) -> KinematicChain | None:
+        """
+        Build the NumPy kinematic chain of the robot from its URDF file.
+
+        Returns None if the chain doesn't match the robot loaded in the simulation. In
+        this case, the kinematics of pybullet is used.
+        """
+        # Rotation from the link frame to the center of mass frame of the end effector,
+        # which is the orientation returned by the forward kinematics
+        self._end_effector_inertial_rotation = np.eye(3)
+        try:
+            kinematic_chain = KinematicChain(
+                urdf_path=self.URDF_FILE_PATH,
+                end_effector_link_index=self.END_EFFECTOR_LINK_INDEX,
+                base_position=axis,
+                base_orientation=self.AXIS_ORIENTATION,
+            )
+        except Exception as e:
+            logger.warning(
+                f"[{self.name}] Could not parse the kinematic chain of the URDF: {e}"
+            )
+            return None
+
+        if kinematic_chain.joint_indices != self.actuated_joints:
+            logger.warning(
+                f"[{self.name}] The joints of the kinematic chain {kinematic_chain.joint_indices} "
+                f"don't match the actuated joints {self.actuated_joints}"
+            )
+            return None
+
+        # Check that the forward kinematics matches pybullet
+        end_effector_link_state = self.sim.get_link_state(
+            robot_id=self.p_robot_id,
+            link_index=self.END_EFFECTOR_LINK_INDEX,
+            compute_forward_kinematics=True,
+        )
+        if end_effector_link_state:
+            position, _ = kinematic_chain.forward_kinematics(
+                self.read_joints_position(
+                    unit="rad", source="sim", joints_ids=self.actuated_joints
+                )
+            )
+            if np.linalg.norm(position - np.array(end_effector_link_state[4])) > 1e-3:
+                logger.warning(
+                    f"[{self.name}] The forward kinematics of the kinematic chain doesn't match the simulation"
+                )
+                return None
+            self._end_effector_inertial_rotation = (
+                R.from_quat(end_effector_link_state[5]).inv()
+                * R.from_quat(end_effector_link_state[1])
+            ).as_matrix()
+
+        return kinematic_chain
+
+    def _chain_inverse_kinematics(
+        self,
+        target_position_cartesian: np.ndarray,
+        target_orientation_quaternions: np.ndarray | None,
+        q_init: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Solve the inverse kinematics with the kinematic chain and the IK settings of
+        the robot.
+        """
+        assert self.kinematic_chain is not None
+        actuated_joints = np.array(self.actuated_joints)
+        target_q_rad, _ = self.kinematic_chain.inverse_kinematics(
+            target_position=target_position_cartesian,
+            target_orientation=target_orientation_quaternions,
+            q_init=q_init,
+            max_iterations=self.IK_MAX_ITERATIONS,
+            orientation_weight=self.IK_ORIENTATION_WEIGHT,
+            lower_limits=np.array(self.lower_joint_limits)[actuated_joints],
+            upper_limits=np.array(self.upper_joint_limits)[actuated_joints],
+        )
+        return target_q_rad
+
     def inverse_kinematics(
         self,
         target_position_cartesian: np.ndarray,
@@ -488,8 +596,41 @@ class BaseManipulator(BaseRobot):
         Compute the inverse kinematics of the robot.
         Returns the joint angles in radians.
 
+        The damped least squares solver of the kinematic chain is warm started from the
+        current joint positions in the simulation, which are the previous solution when
+        teleoperating. It uses the joint limits of the robot. If the chain is not
+        available, the pybullet solver is used.
+
         If the IK with the orientation results in the robot not moving, we try without the orientation.
         """
+        start_time = time.perf_counter()
+        if self.kinematic_chain is not None:
+            if (
+                target_orientation_quaternions is not None
+                and np.size(target_orientation_quaternions) != 4
+            ):
+                # Like pybullet, ignore an orientation which is not a quaternion
+                target_orientation_quaternions = None
+            q_init = self.read_joints_position(
+                unit="rad", source="sim", joints_ids=self.actuated_joints
+            )
+            target_q_rad = self._chain_inverse_kinematics(
+                target_position_cartesian, target_orientation_quaternions, q_init
+            )
+            if target_orientation_quaternions is not None and np.allclose(
+                target_q_rad, q_init, atol=1e-4
+            ):
+                current_position, _ = self.kinematic_chain.forward_kinematics(q_init)
+                if np.linalg.norm(target_position_cartesian - current_position) > 1e-3:
+                    logger.debug(
+                        f"[{self.name}] The inverse kinematics with the orientation doesn't move the robot. Retrying without the orientation."
+                    )
+                    target_q_rad = self._chain_inverse_kinematics(
+                        target_position_cartesian, None, q_init
+                    )
+            IK_SOLVE_SECONDS["chain"].observe(time.perf_counter() - start_time)
+            return target_q_rad
+
         if self.name == "koch-v1.1":
             # In the URDF of Koch 1.1, the limits are fucked up. So we add
             # limits in the inverse kinematics to make it work.
@@ -584,10 +725,13 @@ class BaseManipulator(BaseRobot):
                 residual_threshold=1e-6,
             )
 
+        IK_SOLVE_SECONDS["pybullet"].observe(time.perf_counter() - start_time)
         return np.array(target_q_rad)[np.array(self.actuated_joints)]
 
     def forward_kinematics(
-        self, sync_robot_pos: bool = False
+        self,
+        sync_robot_pos: bool = False,
+        motor_positions: Optional[np.ndarray] = None,
     ) -> tuple[np.ndarray, np.ndarray]:
         """
         Compute the forward kinematics of the robot
@@ -595,20 +739,40 @@ class BaseManipulator(BaseRobot):
 
         The position is the "URDF link frame" position, not the center of mass.
         This means a tip of the plastic part.
+
+        motor_positions are the joint positions in radians to sync the simulation
+        with, if they were already read on the motors.
         """
 
         # Move the robot in simulation to the position of the motors to correct for desync
         if self.is_connected and sync_robot_pos:
-            current_motor_positions = self.read_joints_position(
-                unit="rad", source="robot"
-            )
-            self.sim.set_joints_states(
-                robot_id=self.p_robot_id,
+            current_motor_positions = motor_positions
+            if current_motor_positions is None:
+                current_motor_positions = self.read_joints_position(
+                    unit="rad", source="robot"
+                )
+            self._set_sim_joints_states(
                 joint_indices=self.actuated_joints,
                 target_positions=current_motor_positions.tolist(),
             )
-            # Update the simulation
-            self.sim.step()
+
+        if self.kinematic_chain is not None:
+            joints_position = self._sim_joints_position
+            if joints_position is None or self.sim.steps_physics:
+                joints_position = self.read_joints_position(
+                    unit="rad", source="sim", joints_ids=self.actuated_joints
+                )
+                if not self.sim.steps_physics:
+                    self._sim_joints_position = joints_position.copy()
+            # The pose only changes when the joints move
+            cache = self._forward_kinematics_cache
+            if cache is None or not np.array_equal(cache[0], joints_position):
+                position, orientation_rad = self.forward_kinematics_batch(
+                    joints_position
+                )
+                cache = (joints_position, position, orientation_rad)
+                self._forward_kinematics_cache = cache
+            return cache[1].copy(), cache[2].copy()
 
         # Get the link state of the end effector
         end_effector_link_state = self.sim.get_link_state(
@@ -632,8 +796,36 @@ class BaseManipulator(BaseRobot):
             current_effector_orientation_rad,
         )
 
+    def forward_kinematics_batch(
+        self, joints_positions: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the forward kinematics of joint positions in radians, without the
+        simulation. Use it to compute the end effector trajectory of a whole episode.
+
+        Args:
+            joints_positions: Joint positions of shape (num_actuated_joints,) or
+                (batch, num_actuated_joints).
+
+        Returns:
+            The position of the URDF link frame and the orientation in radians of the
+            end effector, with the same batch dimension as joints_positions.
+        """
+        if self.kinematic_chain is None:
+            raise ValueError(
+                f"The kinematic chain of {self.name} is not available. Use forward_kinematics."
+            )
+
+        position, rotation = self.kinematic_chain.forward_kinematics_matrix(
+            joints_positions
+        )
+        orientation_rad = euler_from_rotation_matrix(
+            rotation @ self._end_effector_inertial_rotation
+        )
+        return position, orientation_rad
+
     def get_end_effector_state(
-        self, sync: bool = False
+        self, sync: bool = False, motor_positions: Optional[np.ndarray] = None
     ) -> tuple[np.ndarray, np.ndarray, float]:
         """
         Return the position and orientation in radians of the end effector and the gripper opening value.
@@ -642,6 +834,7 @@ class BaseManipulator(BaseRobot):
         Args:
             sync: If True, the simulation will first read the motor positions, synchronize them with the simulated robot,
                 and then return the end effector position. Useful for measurements, however it will take more time to respond.
+            motor_positions: Joint positions in radians already read on the motors, to sync the simulation without reading them again.
 
         Returns:
             A tuple containing:
@@ -650,7 +843,7 @@ class BaseManipulator(BaseRobot):
                 - closing_gripper_value: The value of the gripper opening, between 0 and 1.
         """
         effector_position, effector_orientation_rad = self.forward_kinematics(
-            sync_robot_pos=sync
+            sync_robot_pos=sync, motor_positions=motor_positions
         )
         return effector_position, effector_orientation_rad, self.closing_gripper_value
 
@@ -713,14 +906,34 @@ class BaseManipulator(BaseRobot):
 
             current_position_rad = np.zeros(len(joints_ids))
 
-            for idx, joint_id in enumerate(joints_ids):
-                current_position_rad[idx] = self.sim.get_joint_state(
-                    robot_id=self.p_robot_id,
-                    joint_index=joint_id,
-                )[0]
+            joint_states = self.sim.get_joints_states(
+                robot_id=self.p_robot_id,
+                joint_indices=joints_ids,
+            )
+            for idx, joint_state in enumerate(joint_states):
+                current_position_rad[idx] = joint_state[0]
             source_unit = "rad"
             output_position = current_position_rad
 
+        return self.convert_joints_position(
+            output_position,
+            source_unit=source_unit,
+            unit=unit,
+            min_value=min_value,
+            max_value=max_value,
+        )
+
+    def convert_joints_position(
+        self,
+        output_position: np.ndarray,
+        source_unit: Literal["rad", "motor_units"] = "rad",
+        unit: Literal["rad", "motor_units", "degrees", "other"] = "rad",
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        Convert joint positions read in source_unit to unit. See read_joints_position.
+        """
         if unit == "rad":
             if source_unit == "motor_units":
                 # Convert from motor units to radians
@@ -805,13 +1018,10 @@ class BaseManipulator(BaseRobot):
             joint_indices = self.actuated_joints
             target_positions = q_target_rad.tolist()
 
-        self.sim.set_joints_states(
-            robot_id=self.p_robot_id,
+        self._set_sim_joints_states(
             joint_indices=joint_indices,
             target_positions=target_positions,
         )
-        # Update the simulation
-        self.sim.step()
 
     def read_gripper_command(self) -> float:
         """
@@ -1004,13 +1214,51 @@ class BaseManipulator(BaseRobot):
         """
         Move robot joints to the specified positions in the simulation.
         """
-        self.sim.set_joints_states(
-            robot_id=self.p_robot_id,
+        self._set_sim_joints_states(
             joint_indices=self.actuated_joints,
             target_positions=joints,
         )
-        # Update the simulation
-        self.sim.step()
+
+    def close_simulation(self) -> None:
+        """
+        Release the simulation of the robot once it's not used anymore: stop its own
+        physics client in headless mode, or remove it from the shared GUI world.
+
+        The robot keeps its simulation when it's only disconnected, since the joint
+        positions are then read from the simulation.
+        """
+        if self.sim.sim_mode == SimulationMode.headless:
+            self.sim.stop()
+        else:
+            self.sim.remove_robot(self.p_robot_id)
+
+    def _set_sim_joints_states(
+        self,
+        joint_indices: List[int],
+        target_positions: Sequence[float],
+        mirror: bool = True,
+    ) -> None:
+        """
+        Set the joints of the robot in the simulation and keep track of the positions
+        of the actuated joints, so that forward_kinematics doesn't read them back.
+        """
+        self.sim.set_joints_states(
+            robot_id=self.p_robot_id,
+            joint_indices=joint_indices,
+            target_positions=target_positions,
+            mirror=mirror,
+        )
+        if not mirror or self.sim.steps_physics:
+            # The joints only reach the targets when the physics is stepped
+            self._sim_joints_position = None
+            return
+        if list(joint_indices) == list(self.actuated_joints):
+            self._sim_joints_position = np.array(target_positions, dtype=float)
+        elif self._sim_joints_position is not None:
+            joints_position = self._sim_joints_position.copy()
+            for joint_index, position in zip(joint_indices, target_positions):
+                joints_position[self.actuated_joints.index(joint_index)] = position
+            self._sim_joints_position = joints_position
 
     async def calibrate(self) -> tuple[Literal["success", "in_progress", "error"], str]:
         raise NotImplementedError(
@@ -1109,8 +1357,7 @@ class BaseManipulator(BaseRobot):
 
         # Update simulation only if the object has not been gripped:
         if not self.is_object_gripped:
-            self.sim.set_joints_states(
-                robot_id=self.p_robot_id,
+            self._set_sim_joints_states(
                 joint_indices=[self.GRIPPER_JOINT_INDEX],
                 target_positions=[
                     close_position
@@ -1118,6 +1365,26 @@ class BaseManipulator(BaseRobot):
                 ],
             )
 
+    def joints_position_source(self) -> Literal["sim", "robot"]:
+        """
+        Where to read the joints position of the robot. While a control loop moves the
+        robot, the simulation mirrors its motors: read it instead of the motors bus,
+        which the control loop is using.
+        """
+        from phosphobot.endpoints.control import (
+            signal_ai_control,
+            signal_leader_follower,
+            signal_vr_control,
+        )
+
+        if (
+            signal_ai_control.is_in_loop()
+            or signal_leader_follower.is_in_loop()
+            or signal_vr_control.is_in_loop()
+        ):
+            return "sim"
+        return "robot"
+
     def get_observation(
         self, do_forward: bool = False
     ) -> tuple[np.ndarray, np.ndarray]:
@@ -1132,21 +1399,10 @@ class BaseManipulator(BaseRobot):
             - joints_position: np.array joints position of the robot
         """
 
-        from phosphobot.endpoints.control import (
-            signal_ai_control,
-            signal_leader_follower,
-            signal_vr_control,
+        joints_position = self.read_joints_position(
+            unit="rad", source=self.joints_position_source()
         )
 
-        if (
-            signal_ai_control.is_in_loop()
-            or signal_leader_follower.is_in_loop()
-            or signal_vr_control.is_in_loop()
-        ):
-            joints_position = self.read_joints_position(unit="rad", source="sim")
-        else:
-            joints_position = self.read_joints_position(unit="rad", source="robot")
-
         if do_forward:
             effector_position, effector_orientation_euler_rad = (
                 self.forward_kinematics()
@@ -1168,13 +1424,10 @@ class BaseManipulator(BaseRobot):
         # Update simulation
         # this take into account the leader that has less joints
         logger.debug(f"Moving to position: {joints_position}")
-        self.sim.set_joints_states(
-            robot_id=self.p_robot_id,
+        self._set_sim_joints_states(
             joint_indices=self.actuated_joints,
             target_positions=joints_position,
         )
-        # Update the simulation
-        self.sim.step()
         self.control_gripper(gripper_command)
 
     def get_info_for_dataset(self) -> BaseRobotInfo:
@@ -0,0 +1,487 @@
+"""
+Kinematics of a serial robot arm computed with NumPy, from its URDF file.
+
+This doesn't need a pybullet connection. The joint indices are the same as in pybullet
+(URDF order, loaded with URDF_MAINTAIN_LINK_ORDER).
+"""
+
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.spatial.transform import Rotation as R  # type: ignore
+
+
+def _rpy_to_matrix(rpy: np.ndarray) -> np.ndarray:
+    """URDF roll-pitch-yaw (fixed axes XYZ) to a rotation matrix"""
+    return R.from_euler("xyz", rpy).as_matrix()
+
+
+def _transform(xyz: np.ndarray, rotation: np.ndarray) -> np.ndarray:
+    transform = np.eye(4)
+    transform[:3, :3] = rotation
+    transform[:3, 3] = xyz
+    return transform
+
+
+def _rotation_error(target: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """
+    Axis-angle vector of the rotation from current to target, in the world frame.
+    target and current have shape (batch, 3, 3). Returns shape (batch, 3).
+    """
+    error = target @ np.transpose(current, (0, 2, 1))
+    # sin(angle) * axis, from the skew-symmetric part of the error rotation
+    sin_axis = 0.5 * np.stack(
+        [
+            error[:, 2, 1] - error[:, 1, 2],
+            error[:, 0, 2] - error[:, 2, 0],
+            error[:, 1, 0] - error[:, 0, 1],
+        ],
+        axis=1,
+    )
+    sin = np.linalg.norm(sin_axis, axis=1)
+    cos = 0.5 * (np.trace(error, axis1=1, axis2=2) - 1)
+    angle = np.arctan2(sin, cos)
+    # angle / sin(angle) tends to 1 for small angles
+    scale = np.where(sin > 1e-9, angle / np.maximum(sin, 1e-9), 1.0)
+    return sin_axis * scale[:, None]
+
+
+def euler_from_rotation_matrix(rotation: np.ndarray) -> np.ndarray:
+    """
+    Convert rotation matrices (..., 3, 3) into euler angles in radians (roll, pitch,
+    yaw), with the same convention as euler_from_quaternion (extrinsic xyz).
+    """
+    roll = np.arctan2(rotation[..., 2, 1], rotation[..., 2, 2])
+    pitch = np.arctan2(
+        -rotation[..., 2, 0], np.hypot(rotation[..., 2, 1], rotation[..., 2, 2])
+    )
+    yaw = np.arctan2(rotation[..., 1, 0], rotation[..., 0, 0])
+    return np.stack([roll, pitch, yaw], axis=-1)
+
+
+@dataclass
+class ChainJoint:
+    # pybullet joint index
+    index: int
+    # Fixed transform from the parent link frame to the joint frame
+    origin: np.ndarray
+    # Unit axis in the joint frame. None for fixed joints.
+    axis: np.ndarray | None
+    prismatic: bool
+    lower_limit: float
+    upper_limit: float
+
+
+class KinematicChain:
+    """
+    Kinematic chain from the base link of a URDF to an end effector link.
+
+    Joint vectors passed to and returned by this class have one value per movable joint
+    of the robot (joint_indices), like the actuated joints in pybullet. Joints which are
+    not in the chain (eg: gripper) are ignored by the kinematics and kept as is by the IK.
+    """
+
+    def __init__(
+        self,
+        urdf_path: str,
+        end_effector_link_index: int,
+        base_position: np.ndarray | list[float] | None = None,
+        base_orientation: np.ndarray | list[float] | None = None,
+    ):
+        """
+        Args:
+            urdf_path: Path to the URDF file.
+            end_effector_link_index: pybullet index of the end effector link, which is the
+                index of the joint that has this link as child.
+            base_position: Position of the base link frame in the world.
+            base_orientation: Quaternion (x, y, z, w) of the base link frame in the world.
+        """
+        root = ET.parse(urdf_path).getroot()
+        joints_by_child: dict[str, ET.Element] = {}
+        for urdf_joint in root.findall("joint"):
+            child = urdf_joint.find("child")
+            if child is not None:
+                joints_by_child[child.get("link", "")] = urdf_joint
+
+        # pybullet indexes the links (and the joint which has the link as child) in the
+        # order of the URDF file, without the base link
+        urdf_joints = [
+            joints_by_child[link.get("name", "")]
+            for link in root.findall("link")
+            if link.get("name", "") in joints_by_child
+        ]
+        index_by_child = {
+            urdf_joint.find("child").get("link", ""): index  # type: ignore
+            for index, urdf_joint in enumerate(urdf_joints)
+        }
+
+        # Movable joints of the robot, in pybullet order
+        self.joint_indices: list[int] = [
+            index
+            for index, urdf_joint in enumerate(urdf_joints)
+            if urdf_joint.get("type") != "fixed"
+        ]
+
+        if not 0 <= end_effector_link_index < len(urdf_joints):
+            raise ValueError(
+                f"End effector link index {end_effector_link_index} is out of range: "
+                f"the URDF has {len(urdf_joints)} links"
+            )
+
+        # Walk from the end effector link to the base link
+        chain: list[ChainJoint] = []
+        urdf_joint = urdf_joints[end_effector_link_index]
+        index = end_effector_link_index
+        while True:
+            chain.append(self._parse_joint(index, urdf_joint))
+            parent = urdf_joint.find("parent")
+            parent_link = parent.get("link", "") if parent is not None else ""
+            if parent_link not in index_by_child:
+                break
+            index = index_by_child[parent_link]
+            urdf_joint = urdf_joints[index]
+        self.chain = chain[::-1]
+
+        # Position of the chain joints in the joint vectors
+        self.chain_positions = [
+            self.joint_indices.index(joint.index)
+            for joint in self.chain
+            if joint.axis is not None
+        ]
+
+        if base_position is None:
+            base_position = np.zeros(3)
+        if base_orientation is None:
+            base_orientation = np.array([0, 0, 0, 1])
+        self.base_transform = _transform(
+            np.asarray(base_position, dtype=float),
+            R.from_quat(np.asarray(base_orientation, dtype=float)).as_matrix(),
+        )
+
+        # Precompute the constant part of the chain: the fixed transforms are merged
+        # into the transform of the next movable joint, or in the tip transform.
+        # The transform of the movable joint i is constants[i] + sin(angle) *
+        # sin_terms[i] - cos(angle) * cos_terms[i] for a revolute joint (Rodrigues
+        # formula), and constants[i] + distance * sin_terms[i] for a prismatic joint.
+        constants, sin_terms, cos_terms = [], [], []
+        fixed_transform = self.base_transform
+        for joint in self.chain:
+            fixed_transform = fixed_transform @ joint.origin
+            if joint.axis is None:
+                continue
+            x, y, z = joint.axis
+            sin_term = np.zeros((4, 4))
+            if joint.prismatic:
+                # Translation along the axis
+                sin_term[:3, 3] = joint.axis
+                cos_term = np.zeros((4, 4))
+                constant = np.eye(4)
+            else:
+                # Cross product matrix of the axis and its square
+                sin_term[:3, :3] = [[0, -z, y], [z, 0, -x], [-y, x, 0]]
+                cos_term = sin_term @ sin_term
+                constant = np.eye(4) + cos_term
+            constants.append(fixed_transform @ constant)
+            sin_terms.append(fixed_transform @ sin_term)
+            cos_terms.append(fixed_transform @ cos_term)
+            fixed_transform = np.eye(4)
+        if not constants:
+            raise ValueError(
+                f"The chain of the end effector link {end_effector_link_index} has no "
+                "movable joint"
+            )
+        movable_joints = [joint for joint in self.chain if joint.axis is not None]
+        self._constants = np.array(constants)
+        self._sin_terms = np.array(sin_terms)
+        self._cos_terms = np.array(cos_terms)
+        self._axes = np.array([joint.axis for joint in movable_joints])
+        self._is_prismatic = np.array([joint.prismatic for joint in movable_joints])
+        self._tip_transform = fixed_transform
+
+    @staticmethod
+    def _parse_joint(index: int, urdf_joint: ET.Element) -> ChainJoint:
+        origin = urdf_joint.find("origin")
+        xyz = np.zeros(3)
+        rpy = np.zeros(3)
+        if origin is not None:
+            xyz = np.array([float(v) for v in origin.get("xyz", "0 0 0").split()])
+            rpy = np.array([float(v) for v in origin.get("rpy", "0 0 0").split()])
+
+        joint_type = urdf_joint.get("type")
+        axis = None
+        if joint_type != "fixed":
+            axis_element = urdf_joint.find("axis")
+            axis = np.array([1.0, 0.0, 0.0])
+            if axis_element is not None:
+                axis = np.array([float(v) for v in axis_element.get("xyz").split()])
+            axis = axis / np.linalg.norm(axis)
+
+        lower_limit, upper_limit = -np.inf, np.inf
+        limit = urdf_joint.find("limit")
+        if joint_type in ("revolute", "prismatic") and limit is not None:
+            lower = float(limit.get("lower", 0))
+            upper = float(limit.get("upper", 0))
+            # Like pybullet, ignore the limits if they are not a valid range
+            if lower < upper:
+                lower_limit, upper_limit = lower, upper
+
+        return ChainJoint(
+            index=index,
+            origin=_transform(xyz, _rpy_to_matrix(rpy)),
+            axis=axis,
+            prismatic=joint_type == "prismatic",
+            lower_limit=lower_limit,
+            upper_limit=upper_limit,
+        )
+
+    @property
+    def num_joints(self) -> int:
+        """Size of the joint vectors"""
+        return len(self.joint_indices)
+
+    def _forward(
+        self, q: np.ndarray, with_joints: bool = True
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray | None, np.ndarray | None]:
+        """
+        Batched forward kinematics of q (batch, num_joints).
+
+        Returns:
+            - the end effector rotations (batch, 3, 3)
+            - the end effector positions (batch, 3)
+            - the world positions of the movable chain joints (batch, n_chain, 3)
+            - the world axes of the movable chain joints (batch, n_chain, 3)
+            The joint positions and axes are None if with_joints is False.
+        """
+        values = q[:, self.chain_positions]
+        sines = np.where(self._is_prismatic, values, np.sin(values))
+        cosines = np.where(self._is_prismatic, 0.0, np.cos(values))
+        motions = (
+            self._constants
+            + sines[:, :, None, None] * self._sin_terms
+            - cosines[:, :, None, None] * self._cos_terms
+        )
+
+        transform = motions[:, 0]
+        transforms = [transform]
+        for i in range(1, motions.shape[1]):
+            transform = transform @ motions[:, i]
+            transforms.append(transform)
+        transform = transform @ self._tip_transform
+        if not with_joints:
+            return transform[:, :3, :3], transform[:, :3, 3], None, None
+
+        # A joint motion doesn't move the axis of the joint. A prismatic joint moves
+        # its origin along the axis.
+        frames = np.stack(transforms, axis=1)
+        joint_axes = np.einsum("bnij,nj->bni", frames[:, :, :3, :3], self._axes)
+        joint_positions = frames[:, :, :3, 3] - np.where(
+            self._is_prismatic[:, None], values[:, :, None] * joint_axes, 0.0
+        )
+        return transform[:, :3, :3], transform[:, :3, 3], joint_positions, joint_axes
+
+    def forward_kinematics_matrix(self, q: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Position and rotation matrix of the end effector link frame in the world.
+
+        q has shape (num_joints,) or (batch, num_joints). The outputs have the same
+        batch dimension.
+        """
+        q = np.asarray(q, dtype=float)
+        rotation, position, _, _ = self._forward(np.atleast_2d(q), with_joints=False)
+        if q.ndim == 1:
+            return position[0], rotation[0]
+        return position, rotation
+
+    def forward_kinematics(self, q: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Position and quaternion (x, y, z, w) of the end effector link frame in the world.
+
+        q has shape (num_joints,) or (batch, num_joints). The outputs have the same
+        batch dimension.
+        """
+        position, rotation = self.forward_kinematics_matrix(q)
+        return position, R.from_matrix(rotation).as_quat()
+
+    def _jacobian(
+        self,
+        position: np.ndarray,
+        joint_positions: np.ndarray,
+        joint_axes: np.ndarray,
+        with_orientation: bool,
+    ) -> np.ndarray:
+        """Geometric jacobian (batch, 3 or 6, n_chain) of the end effector"""
+        is_prismatic = self._is_prismatic[None, :, None]
+        linear = np.where(
+            is_prismatic,
+            joint_axes,
+            np.cross(joint_axes, position[:, None, :] - joint_positions),
+        )
+        if not with_orientation:
+            return np.transpose(linear, (0, 2, 1))
+        angular = np.where(is_prismatic, 0.0, joint_axes)
+        return np.transpose(np.concatenate([linear, angular], axis=2), (0, 2, 1))
+
+    def _error(
+        self,
+        rotation: np.ndarray,
+        position: np.ndarray,
+        target_position: np.ndarray,
+        target_rotation: np.ndarray | None,
+    ) -> np.ndarray:
+        """Position and rotation error (batch, 3 or 6) of the end effector"""
+        error = target_position - position
+        if target_rotation is None:
+            return error
+        rotation_error = _rotation_error(target_rotation, rotation)
+        return np.concatenate([error, rotation_error], axis=1)
+
+    def inverse_kinematics(
+        self,
+        target_position: np.ndarray,
+        target_orientation: np.ndarray | None = None,
+        q_init: np.ndarray | None = None,
+        max_iterations: int = 100,
+        tolerance: float = 1e-4,
+        damping: float = 1e-2,
+        min_progress: float = 1e-2,
+        orientation_weight: float = 1.0,
+        lower_limits: np.ndarray | list[float] | None = None,
+        upper_limits: np.ndarray | list[float] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Damped least squares inverse kinematics of the end effector link frame.
+
+        Args:
+            target_position: Target position (3,) or batch of targets (batch, 3).
+            target_orientation: Target quaternions (x, y, z, w), with the same batch
+                dimension. If None, only the position is solved.
+            q_init: Initial joint vector (num_joints,) or (batch, num_joints). Use the
+                previous solution (warm start) to converge in a few iterations.
+            max_iterations: Maximum number of iterations.
+            tolerance: Stop when the error norm (meters + radians) is below this value.
+            damping: Damping factor of the least squares.
+            min_progress: Stop when an iteration reduces the error by less than this
+                fraction. This happens when the target is out of reach, or when the
+                orientation can't be reached with the joints of the arm.
+            orientation_weight: Weight of the rotation error (radians) relative to the
+                position error (meters), when both can't be reached.
+            lower_limits: Lower limits of the joint vectors (num_joints,). Defaults to
+                the limits of the URDF.
+            upper_limits: Upper limits of the joint vectors (num_joints,). Defaults to
+                the limits of the URDF.
+
+        Returns:
+            - the joint vectors, with the same batch dimension as target_position
+            - the final error norm of each target, with the orientation weight (a float
+              if there is no batch)
+        """
+        target_position = np.asarray(target_position, dtype=float)
+        is_batch = target_position.ndim == 2
+        target_position = np.atleast_2d(target_position)
+        batch_size = target_position.shape[0]
+
+        target_rotation = None
+        if target_orientation is not None:
+            target_rotation = R.from_quat(
+                np.atleast_2d(np.asarray(target_orientation, dtype=float))
+            ).as_matrix()
+            target_rotation = np.broadcast_to(target_rotation, (batch_size, 3, 3))
+
+        if q_init is None:
+            q = np.zeros((batch_size, self.num_joints))
+        else:
+            q = np.broadcast_to(
+                np.atleast_2d(np.asarray(q_init, dtype=float)),
+                (batch_size, self.num_joints),
+            ).copy()
+
+        chain = [joint for joint in self.chain if joint.axis is not None]
+        if lower_limits is None:
+            lower_limits = np.array([joint.lower_limit for joint in chain])
+        else:
+            lower_limits = np.asarray(lower_limits, dtype=float)[self.chain_positions]
+        if upper_limits is None:
+            upper_limits = np.array([joint.upper_limit for joint in chain])
+        else:
+            upper_limits = np.asarray(upper_limits, dtype=float)[self.chain_positions]
+        q_chain = np.clip(q[:, self.chain_positions], lower_limits, upper_limits)
+        q[:, self.chain_positions] = q_chain
+
+        error_dim = 3 if target_rotation is None else 6
+        error_weights = np.array([1.0] * 3 + [orientation_weight] * (error_dim - 3))
+        # Targets still being solved
+        active = np.ones(batch_size, dtype=bool)
+        error_norm = np.full(batch_size, np.inf)
+        # Damping of each target, increased when a step doesn't reduce the error
+        dampings = np.full(batch_size, damping)
+        q_previous = q.copy()
+
+        def evaluate(indices: np.ndarray):
+            rotation, position, joint_positions, joint_axes = self._forward(q[indices])
+            assert joint_positions is not None and joint_axes is not None
+            error = self._error(
+                rotation,
+                position,
+                target_position[indices],
+                target_rotation[indices] if target_rotation is not None else None,
+            )
+            return error * error_weights, position, joint_positions, joint_axes
+
+        for iteration in range(max_iterations + 1):
+            indices = np.flatnonzero(active)
+            error, position, joint_positions, joint_axes = evaluate(indices)
+            new_error_norm = np.linalg.norm(error, axis=1)
+
+            # Undo the steps which increased the error (eg: target out of reach)
+            worse = new_error_norm > error_norm[indices]
+            if worse.any():
+                q[indices[worse]] = q_previous[indices[worse]]
+                dampings[indices[worse]] *= 10
+                error, position, joint_positions, joint_axes = evaluate(indices)
+                new_error_norm = np.linalg.norm(error, axis=1)
+            dampings[indices[~worse]] = np.maximum(
+                dampings[indices[~worse]] / 2, damping
+            )
+            stalled = ~worse & (
+                error_norm[indices] - new_error_norm < min_progress * new_error_norm
+            )
+            error_norm[indices] = new_error_norm
+
+            done = (new_error_norm < tolerance) | stalled
+            active[indices[done]] = False
+            if not active.any() or iteration == max_iterations:
+                break
+
+            jacobian = self._jacobian(
+                position, joint_positions, joint_axes, target_rotation is not None
+            )
+            jacobian = jacobian * error_weights[:, None]
+            # Joints at a limit which the error pushes further are removed from the
+            # jacobian, so that the other joints compensate
+            q_chain = q[np.ix_(indices, self.chain_positions)]
+            gradient = np.einsum("bij,bi->bj", jacobian, error)
+            blocked = ((q_chain <= lower_limits) & (gradient < 0)) | (
+                (q_chain >= upper_limits) & (gradient > 0)
+            )
+            jacobian = jacobian * ~blocked[:, None, :]
+
+            # dq = J^T (J J^T + lambda^2 I)^-1 e
+            jacobian_t = np.transpose(jacobian, (0, 2, 1))
+            damping_matrix = dampings[indices, None, None] ** 2 * np.eye(error_dim)
+            step = jacobian_t @ np.linalg.solve(
+                jacobian @ jacobian_t + damping_matrix, error[:, :, None]
+            )
+
+            # Only the targets which are still being solved are updated
+            update_indices = indices[~done]
+            q_previous[update_indices] = q[update_indices]
+            q[np.ix_(update_indices, self.chain_positions)] = np.clip(
+                q[np.ix_(update_indices, self.chain_positions)] + step[~done, :, 0],
+                lower_limits,
+                upper_limits,
+            )
+
+        if is_batch:
+            return q, error_norm
+        return q[0], error_norm[0]
@@ -25,6 +25,24 @@ import numpy as np
 import tqdm
 from loguru import logger
 
+from phosphobot.metrics import get_metrics
+
+BUS_TRANSFER_DESCRIPTION = (
+    "Time to read or write a group of motors on the serial bus, in seconds."
+)
+BUS_READ_SECONDS = get_metrics().histogram(
+    "phosphobot_bus_transfer_seconds",
+    BUS_TRANSFER_DESCRIPTION,
+    bus="dynamixel",
+    operation="read",
+)
+BUS_WRITE_SECONDS = get_metrics().histogram(
+    "phosphobot_bus_transfer_seconds",
+    BUS_TRANSFER_DESCRIPTION,
+    bus="dynamixel",
+    operation="write",
+)
+
 PROTOCOL_VERSION = 2.0
 BAUDRATE = 1_000_000
 TIMEOUT_MS = 1000
@@ -747,7 +765,7 @@ class DynamixelMotorsBus:
         addr, bytes = self.model_ctrl_table[model][data_name]
         group_key = get_group_sync_key(data_name, motor_names)
 
-        if data_name not in self.group_readers:
+        if group_key not in self.group_readers:
             # create new group reader
             self.group_readers[group_key] = dxl.GroupSyncRead(
                 self.port_handler, self.packet_handler, addr, bytes
@@ -785,6 +803,7 @@ class DynamixelMotorsBus:
             "delta_timestamp_s", "read", data_name, motor_names
         )
         self.logs[delta_ts_name] = time.perf_counter() - start_time
+        BUS_READ_SECONDS.observe(self.logs[delta_ts_name])
 
         # log the utc time at which the data was received
         ts_utc_name = get_log_name("timestamp_utc", "read", data_name, motor_names)
@@ -868,7 +887,7 @@ class DynamixelMotorsBus:
         addr, bytes = self.model_ctrl_table[model][data_name]
         group_key = get_group_sync_key(data_name, motor_names)
 
-        init_group = data_name not in self.group_readers
+        init_group = group_key not in self.group_writers
         if init_group:
             self.group_writers[group_key] = dxl.GroupSyncWrite(
                 self.port_handler, self.packet_handler, addr, bytes
@@ -893,6 +912,7 @@ class DynamixelMotorsBus:
             "delta_timestamp_s", "write", data_name, motor_names
         )
         self.logs[delta_ts_name] = time.perf_counter() - start_time
+        BUS_WRITE_SECONDS.observe(self.logs[delta_ts_name])
 
         # TODO(rcadene): should we log the time before sending the write command?
         # log the utc time when the write has been completed
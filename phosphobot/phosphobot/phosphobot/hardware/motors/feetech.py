@@ -17,11 +17,9 @@
 import enum
 import logging
 import math
-import queue
 import threading
 import time
 from copy import deepcopy
-from uuid import uuid4
 
 import numpy as np
 import scservo_sdk as scs
@@ -33,6 +31,33 @@ from phosphobot.hardware.motors.motor_utils import (
     RobotDeviceNotConnectedError,
     capture_timestamp_utc,
 )
+from phosphobot.metrics import get_metrics
+
+BUS_TRANSFER_DESCRIPTION = (
+    "Time to read or write a group of motors on the serial bus, in seconds."
+)
+BUS_READ_SECONDS = get_metrics().histogram(
+    "phosphobot_bus_transfer_seconds",
+    BUS_TRANSFER_DESCRIPTION,
+    bus="feetech",
+    operation="read",
+)
+BUS_WRITE_SECONDS = get_metrics().histogram(
+    "phosphobot_bus_transfer_seconds",
+    BUS_TRANSFER_DESCRIPTION,
+    bus="feetech",
+    operation="write",
+)
+# Including the wait for the worker thread that owns the serial port
+BUS_REQUEST_SECONDS = {
+    action: get_metrics().histogram(
+        "phosphobot_bus_request_seconds",
+        "Time between the submission of a request to the bus worker thread and its result, in seconds.",
+        bus="feetech",
+        action=action,
+    )
+    for action in ("read", "write")
+}
 
 PROTOCOL_VERSION = 0
 BAUDRATE = 1_000_000
@@ -255,6 +280,60 @@ class JointOutOfRangeError(Exception):
         super().__init__(self.message)
 
 
+class BusRequest:
+    """
+    A blocking request to the worker thread of a FeetechMotorsBus.
+
+    Each calling thread reuses the same BusRequest for all its requests, so that no
+    result channel is allocated for each request.
+    """
+
+    __slots__ = ("action", "args", "kwargs", "result", "error", "done")
+
+    def __init__(self):
+        self.action = None
+        self.args = ()
+        self.kwargs = {}
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def resolve(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+
+class PendingWrite:
+    """
+    A non-blocking write to the worker thread of a FeetechMotorsBus.
+
+    The non-blocking writes of the same data_name submitted one after the other are
+    coalesced into one PendingWrite, sent as a single sync write. Once it is sent,
+    done() is True and error is the exception of the sync write, if any.
+    """
+
+    __slots__ = ("data_name", "motor_values", "error", "_done")
+
+    def __init__(self, data_name: str):
+        self.data_name = data_name
+        # {motor_name: value}. A new write of the same motor overrides the value.
+        self.motor_values: dict[str, int | float] = {}
+        self.error: Exception | None = None
+        self._done = threading.Event()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until the write is sent. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def resolve(self, error: Exception | None = None):
+        self.error = error
+        self._done.set()
+
+
 class FeetechMotorsBus:
     """
     The FeetechMotorsBus class allows to efficiently read and write to the attached motors. It relies on
@@ -318,72 +397,166 @@ class FeetechMotorsBus:
         self.packet_handler = None
         self.calibration = None
         self.is_connected = False
+        # Prepared GroupSyncRead/GroupSyncWrite transactions, by group key (data_name + motor names).
+        # They are built once and reused for every read/write of the same group of motors.
         self.group_readers = {}
         self.group_writers = {}
         self.logs = {}
 
         self.track_positions = {}
 
-        # Adding for port already in use error
-
-        self.task_queue = queue.Queue()
+        # A single worker thread owns the serial port. On each tick, it processes the
+        # blocking requests and the non-blocking writes in the order of submission,
+        # as separate sync write and sync read transactions (see _worker).
         self.worker_thread = None
         self._stop_event = threading.Event()
+        self._work_condition = threading.Condition()
+        self._pending_requests: list[BusRequest | PendingWrite] = []
+        # BusRequest of each calling thread
+        self._thread_requests = threading.local()
 
     def _worker(self):
-        """The single worker thread that processes all requests in FIFO order."""
-        # The worker needs its own reference to the SDK
+        """
+        The single worker thread that processes all requests.
 
+        A tick sends at most one sync write per data_name, coalescing the non-blocking
+        writes of all the motors, and one sync read per identical read request. They
+        stay separate transactions: the Feetech protocol has no instruction writing
+        and reading in one packet. A leader-follower tick is thus one sync write of
+        Goal_Position plus one sync read of Present_Position.
+        """
         while not self._stop_event.is_set():
-            try:
-                task_id, action, args, kwargs, result_queue = self.task_queue.get(
-                    timeout=0.01
-                )
-
-                result = None
-                error = None
+            with self._work_condition:
+                if not self._pending_requests:
+                    self._work_condition.wait(timeout=0.01)
+                requests, self._pending_requests = self._pending_requests, []
+
+            # Identical reads requested during the same tick share one sync read,
+            # unless the register is written in between: {data_name: {motor_names: result}}
+            tick_reads: dict[str, dict] = {}
+            for request in requests:
+                if isinstance(request, PendingWrite):
+                    motor_names = [
+                        name
+                        for name in self.motor_names
+                        if name in request.motor_values
+                    ]
+                    try:
+                        self._perform_write(
+                            request.data_name,
+                            [request.motor_values[name] for name in motor_names],
+                            motor_names,
+                        )
+                        request.resolve()
+                    except Exception as e:
+                        request.resolve(error=e)
+                    tick_reads.pop(request.data_name, None)
+                    continue
 
                 try:
-                    # --- Task Dispatcher ---
-                    if action == "connect":
-                        self._perform_connect()
-                    elif action == "disconnect":
-                        self._perform_disconnect()
-                    elif action == "read":
-                        result = self._perform_read(*args, **kwargs)
-                    elif action == "write":
-                        self._perform_write(*args, **kwargs)
-                    elif action == "read_with_motor_ids":
-                        result = self._perform_read_with_motor_ids(*args, **kwargs)
-                    elif action == "write_with_motor_ids":
-                        self._perform_write_with_motor_ids(*args, **kwargs)
-                    elif action == "set_bus_baudrate":
-                        self._perform_set_bus_baudrate(*args, **kwargs)
-
+                    if request.action == "read":
+                        data_name, motor_names = request.args
+                        if isinstance(motor_names, list):
+                            motor_names = tuple(motor_names)
+                        reads = tick_reads.setdefault(data_name, {})
+                        if motor_names in reads:
+                            result = reads[motor_names].copy()
+                        else:
+                            result = self._perform_read(*request.args, **request.kwargs)
+                            reads[motor_names] = result
+                    else:
+                        if request.action == "write":
+                            tick_reads.pop(request.args[0], None)
+                        result = self._dispatch(
+                            request.action, request.args, request.kwargs
+                        )
+                    request.resolve(result=result)
                 except Exception as e:
-                    error = e
-
-                result_queue.put((result, error))
-
-            except queue.Empty:
-                continue
+                    request.resolve(error=e)
+
+    def _dispatch(self, action, args, kwargs):
+        if action == "connect":
+            return self._perform_connect()
+        elif action == "disconnect":
+            return self._perform_disconnect()
+        elif action == "read":
+            return self._perform_read(*args, **kwargs)
+        elif action == "write":
+            return self._perform_write(*args, **kwargs)
+        elif action == "read_with_motor_ids":
+            return self._perform_read_with_motor_ids(*args, **kwargs)
+        elif action == "write_with_motor_ids":
+            return self._perform_write_with_motor_ids(*args, **kwargs)
+        elif action == "set_bus_baudrate":
+            return self._perform_set_bus_baudrate(*args, **kwargs)
+        raise ValueError(f"Unknown action: {action}")
 
     def _submit_task_and_wait(self, action, args=(), kwargs={}):
         """Helper function to submit a task and block until a result is available."""
         if self._stop_event.is_set() or not self.worker_thread.is_alive():
             raise ConnectionError("Worker thread is not running.")
 
-        task_id = uuid4()
-        result_queue = queue.Queue(maxsize=1)  # Per-task result channel
-        task = (task_id, action, args, kwargs, result_queue)
-        self.task_queue.put(task)
+        request = getattr(self._thread_requests, "request", None)
+        if request is None:
+            request = BusRequest()
+            self._thread_requests.request = request
+
+        request.action = action
+        request.args = args
+        request.kwargs = kwargs
+        request.done.clear()
+        start_time = time.perf_counter()
+        with self._work_condition:
+            self._pending_requests.append(request)
+            self._work_condition.notify()
 
         # Block and wait for the result
-        result, error = result_queue.get()
+        request.done.wait()
+        request_histogram = BUS_REQUEST_SECONDS.get(action)
+        if request_histogram is not None:
+            request_histogram.observe(time.perf_counter() - start_time)
+        result, error = request.result, request.error
+        request.result, request.error = None, None
         if error:
             raise error
         return result
 
+    def _submit_write(self, data_name, values, motor_names=None) -> PendingWrite:
+        """
+        Queue a write without waiting for it. The worker thread sends it on its next tick,
+        coalesced with the pending write of the same data_name if no blocking request was
+        submitted since: the requests are processed in the order of submission.
+        """
+        if self._stop_event.is_set() or not self.worker_thread.is_alive():
+            raise ConnectionError("Worker thread is not running.")
+
+        if motor_names is None:
+            motor_names = self.motor_names
+        if isinstance(motor_names, str):
+            motor_names = [motor_names]
+        if isinstance(values, (int, float, np.integer, np.floating)):
+            values = [values] * len(motor_names)
+        motor_values = dict(zip(motor_names, values, strict=True))
+
+        with self._work_condition:
+            pending_write = None
+            for request in reversed(self._pending_requests):
+                if not isinstance(request, PendingWrite):
+                    break
+                if request.data_name == data_name:
+                    pending_write = request
+                    break
+            if pending_write is None:
+                pending_write = PendingWrite(data_name)
+            else:
+                # Move it to the end, so that the writes are sent in the order of
+                # their last update
+                self._pending_requests.remove(pending_write)
+            pending_write.motor_values.update(motor_values)
+            self._pending_requests.append(pending_write)
+            self._work_condition.notify()
+        return pending_write
+
     # --- Public-Facing API ---
     # These methods just submit tasks to the queue.
 
@@ -392,7 +565,9 @@ class FeetechMotorsBus:
             raise RobotDeviceAlreadyConnectedError(...)
 
         self._stop_event.clear()
-        self.worker_thread = threading.Thread(target=self._worker, daemon=True)
+        self.worker_thread = threading.Thread(
+            target=self._worker, name=f"feetech_bus_{self.port}", daemon=True
+        )
         self.worker_thread.start()
         # The 'connect' task initializes the port handler inside the worker
         self._submit_task_and_wait("connect")
@@ -411,7 +586,14 @@ class FeetechMotorsBus:
     def read(self, data_name, motor_names=None):
         return self._submit_task_and_wait("read", args=(data_name, motor_names))
 
-    def write(self, data_name, values, motor_names=None):
+    def write(self, data_name, values, motor_names=None, blocking=True):
+        """
+        Write values to the motors. If blocking is False, the write is queued and sent on
+        the next tick of the worker thread, coalesced with the other pending writes, and
+        the PendingWrite is returned: its error is set once it is sent.
+        """
+        if not blocking:
+            return self._submit_write(data_name, values, motor_names)
         return self._submit_task_and_wait(
             "write", args=(data_name, values, motor_names)
         )
@@ -769,6 +951,9 @@ class FeetechMotorsBus:
     # These contain the actual hardware logic and are NOT called directly.
 
     def _perform_connect(self):
+        # Prepared transactions are bound to the port handler
+        self.group_readers = {}
+        self.group_writers = {}
         self.port_handler = scs.PortHandler(self.port)
         self.port_handler.setPacketTimeoutMillis(TIMEOUT_MS)
         self.packet_handler = scs.PacketHandler(PROTOCOL_VERSION)
@@ -780,6 +965,38 @@ class FeetechMotorsBus:
             self.port_handler.closePort()
         self.port_handler = None
         self.packet_handler = None
+        self.group_readers = {}
+        self.group_writers = {}
+
+    def _get_group_reader(self, group_key, addr, bytes, motor_ids):
+        """Return the prepared GroupSyncRead of the group of motors. It's built on first use."""
+        group = self.group_readers.get(group_key)
+        if group is None:
+            group = scs.GroupSyncRead(
+                self.port_handler, self.packet_handler, addr, bytes
+            )
+            for idx in motor_ids:
+                group.addParam(idx)
+            self.group_readers[group_key] = group
+        return group
+
+    def _get_group_writer(self, group_key, addr, bytes, motor_ids, values):
+        """
+        Return the prepared GroupSyncWrite of the group of motors, with its data set to values.
+        It's built on first use, then only its data is changed.
+        """
+        group = self.group_writers.get(group_key)
+        if group is None:
+            group = scs.GroupSyncWrite(
+                self.port_handler, self.packet_handler, addr, bytes
+            )
+            for idx, value in zip(motor_ids, values, strict=True):
+                group.addParam(idx, convert_to_bytes(value, bytes, self.mock))
+            self.group_writers[group_key] = group
+        else:
+            for idx, value in zip(motor_ids, values, strict=True):
+                group.changeParam(idx, convert_to_bytes(value, bytes, self.mock))
+        return group
 
     def _perform_read_with_motor_ids(
         self, motor_models, motor_ids, data_name, num_retry=NUM_READ_RETRY
@@ -840,17 +1057,10 @@ class FeetechMotorsBus:
         assert_same_address(self.model_ctrl_table, models, data_name)
         addr, bytes = self.model_ctrl_table[model][data_name]
         group_key = get_group_sync_key(data_name, motor_names)
-
-        if data_name not in self.group_readers:
-            # create new group reader
-            self.group_readers[group_key] = scs.GroupSyncRead(
-                self.port_handler, self.packet_handler, addr, bytes
-            )
-            for idx in motor_ids:
-                self.group_readers[group_key].addParam(idx)
+        group = self._get_group_reader(group_key, addr, bytes, motor_ids)
 
         for _ in range(NUM_READ_RETRY):
-            comm = self.group_readers[group_key].txRxPacket()
+            comm = group.txRxPacket()
             if comm == scs.COMM_SUCCESS:
                 break
 
@@ -860,12 +1070,7 @@ class FeetechMotorsBus:
                 f"{self.packet_handler.getTxRxResult(comm)}"
             )
 
-        values = []
-        for idx in motor_ids:
-            value = self.group_readers[group_key].getData(idx, addr, bytes)
-            values.append(value)
-
-        values = np.array(values)
+        values = np.array([group.getData(idx, addr, bytes) for idx in motor_ids])
 
         # Convert to signed int to use range [-2048, 2048] for our motor positions.
         if data_name in CONVERT_UINT32_TO_INT32_REQUIRED:
@@ -882,6 +1087,7 @@ class FeetechMotorsBus:
             "delta_timestamp_s", "read", data_name, motor_names
         )
         self.logs[delta_ts_name] = time.perf_counter() - start_time
+        BUS_READ_SECONDS.observe(self.logs[delta_ts_name])
 
         # log the utc time at which the data was received
         ts_utc_name = get_log_name("timestamp_utc", "read", data_name, motor_names)
@@ -954,21 +1160,9 @@ class FeetechMotorsBus:
         assert_same_address(self.model_ctrl_table, models, data_name)
         addr, bytes = self.model_ctrl_table[model][data_name]
         group_key = get_group_sync_key(data_name, motor_names)
+        group = self._get_group_writer(group_key, addr, bytes, motor_ids, values)
 
-        init_group = data_name not in self.group_readers
-        if init_group:
-            self.group_writers[group_key] = scs.GroupSyncWrite(
-                self.port_handler, self.packet_handler, addr, bytes
-            )
-
-        for idx, value in zip(motor_ids, values, strict=True):
-            data = convert_to_bytes(value, bytes, self.mock)
-            if init_group:
-                self.group_writers[group_key].addParam(idx, data)
-            else:
-                self.group_writers[group_key].changeParam(idx, data)
-
-        comm = self.group_writers[group_key].txPacket()
+        comm = group.txPacket()
         if comm != scs.COMM_SUCCESS:
             raise ConnectionError(
                 f"Write failed due to communication error on port {self.port} for group_key {group_key}: "
@@ -980,6 +1174,7 @@ class FeetechMotorsBus:
             "delta_timestamp_s", "write", data_name, motor_names
         )
         self.logs[delta_ts_name] = time.perf_counter() - start_time
+        BUS_WRITE_SECONDS.observe(self.logs[delta_ts_name])
 
         # TODO(rcadene): should we log the time before sending the write command?
         # log the utc time when the write has been completed
@@ -19,25 +19,40 @@ class PyBulletSimulation:
     A comprehensive wrapper class for PyBullet simulation environment.
     """
 
-    def __init__(self, sim_mode="headless"):
+    def __init__(self, sim_mode="headless", physics: bool = False):
         """
         Initialize the PyBullet simulation environment.
 
+        By default, the simulation only mirrors the joint positions of the robots
+        (kinematics): no physics is stepped when the robots are moved.
+
         Args:
             sim_mode (str): Simulation mode - "headless" or "gui"
+            physics (bool): Step the physics in a background thread (headless mode only,
+                the GUI server already steps the physics)
         """
         self.sim_mode = sim_mode
         self.connected = False
+        # Every call is sent to this physics server, so that several simulations
+        # can live in the same process
+        self.client_id = -1
         self.robots = {}  # Store loaded robots
+        # Serializes the physics steps and the joint updates
+        self._lock = threading.RLock()
+        self._physics_thread: threading.Thread | None = None
+        self._physics_stop_event = threading.Event()
         self.init_simulation()
 
+        if physics and self.sim_mode == "headless":
+            self.start_physics()
+
     def init_simulation(self):
         """
         Initialize the pybullet simulation environment based on the configuration.
         """
         if self.sim_mode == "headless":
-            p.connect(p.DIRECT)
-            p.setGravity(0, 0, -9.81)
+            self.client_id = p.connect(p.DIRECT)
+            p.setGravity(0, 0, -9.81, physicsClientId=self.client_id)
             self.connected = True
             logger.debug("Simulation: headless mode enabled")
 
@@ -81,19 +96,67 @@ class PyBulletSimulation:
 
             # Wait for 1 second to allow the simulation to start
             time.sleep(1)
-            p.connect(p.SHARED_MEMORY)
+            self.client_id = p.connect(p.SHARED_MEMORY)
             self.connected = True
             logger.debug("Simulation: GUI mode enabled")
 
         else:
             raise ValueError("Invalid simulation mode")
 
+    def start_physics(self, frequency: float = 240):
+        """
+        Step the physics in a background thread at the given frequency (Hz).
+        The robots then reach their motor targets and interact with the other objects.
+        """
+        if self._physics_thread is not None and self._physics_thread.is_alive():
+            return
+
+        self._physics_stop_event.clear()
+
+        def _step_physics():
+            period = 1 / frequency
+            while not self._physics_stop_event.is_set():
+                start_time = time.perf_counter()
+                with self._lock:
+                    if not self.connected or not p.isConnected(
+                        physicsClientId=self.client_id
+                    ):
+                        break
+                    p.stepSimulation(physicsClientId=self.client_id)
+                elapsed = time.perf_counter() - start_time
+                self._physics_stop_event.wait(max(0, period - elapsed))
+
+        self._physics_thread = threading.Thread(target=_step_physics, daemon=True)
+        self._physics_thread.start()
+        logger.debug(f"Simulation: physics stepped in background at {frequency} Hz")
+
+    @property
+    def steps_physics(self) -> bool:
+        """
+        Whether the physics is stepped: the joints can then move away from the
+        positions they were set to.
+        """
+        physics_running = (
+            self._physics_thread is not None and self._physics_thread.is_alive()
+        )
+        return self.sim_mode == "gui" or physics_running
+
+    def stop_physics(self):
+        """
+        Stop the background physics thread.
+        """
+        self._physics_stop_event.set()
+        if self._physics_thread is not None:
+            self._physics_thread.join(timeout=1)
+            self._physics_thread = None
+
     def stop(self):
         """
         Cleanup the simulation environment.
         """
-        if self.connected and p.isConnected():
-            p.disconnect()
+        self.stop_physics()
+        if self.connected and p.isConnected(physicsClientId=self.client_id):
+            p.disconnect(physicsClientId=self.client_id)
             self.connected = False
             logger.info("Simulation disconnected")
 
@@ -118,11 +181,12 @@ class PyBulletSimulation:
         """
         Reset the simulation environment.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot reset")
             return
 
-        p.resetSimulation()
+        with self._lock:
+            p.resetSimulation(physicsClientId=self.client_id)
         self.robots.clear()
         logger.info("Simulation reset")
 
@@ -133,12 +197,13 @@ class PyBulletSimulation:
         Args:
             steps (int): Number of simulation steps to execute
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot step")
             return
 
-        for _ in range(steps):
-            p.stepSimulation()
+        with self._lock:
+            for _ in range(steps):
+                p.stepSimulation(physicsClientId=self.client_id)
 
     def set_joint_state(self, robot_id, joint_id: int, joint_position: float):
         """
@@ -149,11 +214,14 @@ class PyBulletSimulation:
             joint_id (int): The ID of the joint to set.
             joint_position (float): The position to set the joint to.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot set joint state")
             return
 
-        p.resetJointState(robot_id, joint_id, joint_position)
+        with self._lock:
+            p.resetJointState(
+                robot_id, joint_id, joint_position, physicsClientId=self.client_id
+            )
 
     def inverse_dynamics(
         self, robot_id, positions: list, velocities: list, accelerations: list
@@ -170,14 +238,18 @@ class PyBulletSimulation:
         Returns:
             list: Joint torques
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning(
                 "Simulation is not connected, cannot perform inverse dynamics"
             )
             return []
 
         joint_angles = p.calculateInverseDynamics(
-            robot_id, positions, velocities, accelerations
+            robot_id,
+            positions,
+            velocities,
+            accelerations,
+            physicsClientId=self.client_id,
         )
         return joint_angles
 
@@ -200,7 +272,7 @@ class PyBulletSimulation:
         Returns:
             tuple: (robot_id, num_joints, actuated_joints)
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot load URDF")
             return None, 0, []
 
@@ -210,9 +282,10 @@ class PyBulletSimulation:
             baseOrientation=axis_orientation,
             useFixedBase=use_fixed_base,
             flags=p.URDF_MAINTAIN_LINK_ORDER,
+            physicsClientId=self.client_id,
         )
 
-        num_joints = p.getNumJoints(robot_id)
+        num_joints = p.getNumJoints(robot_id, physicsClientId=self.client_id)
         actuated_joints = []
 
         for i in range(num_joints):
@@ -234,7 +307,9 @@ class PyBulletSimulation:
 
         return robot_id, num_joints, actuated_joints
 
-    def set_joints_states(self, robot_id, joint_indices, target_positions):
+    def set_joints_states(
+        self, robot_id, joint_indices, target_positions, mirror: bool = True
+    ):
         """
         Set multiple joint states of a robot in the simulation.
 
@@ -242,17 +317,30 @@ class PyBulletSimulation:
             robot_id (int): The ID of the robot in the simulation.
             joint_indices (list[int]): The indices of the joints to set.
             target_positions (list[float]): The positions to set the joints to.
+            mirror (bool): Move the joints to the target positions right away, without
+                stepping the physics. Otherwise, only the motor targets are set and the
+                joints move when the physics is stepped.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot set joint states")
             return
 
-        p.setJointMotorControlArray(
-            bodyIndex=robot_id,
-            jointIndices=joint_indices,
-            controlMode=p.POSITION_CONTROL,
-            targetPositions=target_positions,
-        )
+        with self._lock:
+            if mirror:
+                p.resetJointStatesMultiDof(
+                    robot_id,
+                    jointIndices=joint_indices,
+                    targetValues=[[position] for position in target_positions],
+                    physicsClientId=self.client_id,
+                )
+            # The motors hold the target positions when the physics is stepped
+            p.setJointMotorControlArray(
+                bodyIndex=robot_id,
+                jointIndices=joint_indices,
+                controlMode=p.POSITION_CONTROL,
+                targetPositions=target_positions,
+                physicsClientId=self.client_id,
+            )
 
     def get_joint_state(self, robot_id, joint_index: int) -> list:
         """
@@ -265,13 +353,32 @@ class PyBulletSimulation:
         Returns:
             list: pybullet list describing the joint state.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot get joint state")
             return []
 
-        joint_state = p.getJointState(robot_id, joint_index)
+        joint_state = p.getJointState(
+            robot_id, joint_index, physicsClientId=self.client_id
+        )
         return joint_state
 
+    def get_joints_states(self, robot_id, joint_indices: list[int]) -> list:
+        """
+        Get the states of several joints in the simulation, in a single call.
+
+        Args:
+            robot_id (int): The ID of the robot in the simulation.
+            joint_indices (list[int]): The indices of the joints to get.
+
+        Returns:
+            list: pybullet list of joint states, in the order of joint_indices.
+        """
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
+            logger.warning("Simulation is not connected, cannot get joint states")
+            return []
+
+        return p.getJointStates(robot_id, joint_indices, physicsClientId=self.client_id)
+
     def inverse_kinematics(
         self,
         robot_id,
@@ -305,7 +412,7 @@ class PyBulletSimulation:
         Returns:
             list: Joint angles computed by inverse kinematics.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning(
                 "Simulation is not connected, cannot perform inverse kinematics"
             )
@@ -323,6 +430,7 @@ class PyBulletSimulation:
                 jointRanges=joint_ranges,
                 maxNumIterations=max_num_iterations,
                 residualThreshold=residual_threshold,
+                physicsClientId=self.client_id,
             )
 
         return p.calculateInverseKinematics(
@@ -338,6 +446,7 @@ class PyBulletSimulation:
             jointRanges=joint_ranges,
             maxNumIterations=max_num_iterations,
             residualThreshold=residual_threshold,
+            physicsClientId=self.client_id,
         )
 
     def get_link_state(
@@ -354,12 +463,15 @@ class PyBulletSimulation:
         Returns:
             list: pybullet list describing the link state.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot get link state")
             return []
 
         link_state = p.getLinkState(
-            robot_id, link_index, computeForwardKinematics=compute_forward_kinematics
+            robot_id,
+            link_index,
+            computeForwardKinematics=compute_forward_kinematics,
+            physicsClientId=self.client_id,
         )
         return link_state
 
@@ -374,11 +486,13 @@ class PyBulletSimulation:
         Returns:
             list: pybullet list describing the joint info.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot get joint info")
             return []
 
-        joint_info = p.getJointInfo(robot_id, joint_index)
+        joint_info = p.getJointInfo(
+            robot_id, joint_index, physicsClientId=self.client_id
+        )
         return joint_info
 
     def add_debug_text(
@@ -393,7 +507,7 @@ class PyBulletSimulation:
             text_color_RGB (list): The color of the text in RGB format.
             life_time (int, optional): The lifetime of the debug text in seconds. Defaults to 3.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot add debug text")
             return
 
@@ -402,6 +516,7 @@ class PyBulletSimulation:
             textPosition=text_position,
             textColorRGB=text_color_RGB,
             lifeTime=life_time,
+            physicsClientId=self.client_id,
         )
 
     def add_debug_points(
@@ -420,7 +535,7 @@ class PyBulletSimulation:
             point_size (int, optional): The size of the points. Defaults to 4.
             life_time (int, optional): The lifetime of the debug points in seconds. Defaults to 3.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot add debug points")
             return
 
@@ -429,6 +544,7 @@ class PyBulletSimulation:
             pointColorsRGB=point_colors_RGB,
             pointSize=point_size,
             lifeTime=life_time,
+            physicsClientId=self.client_id,
         )
 
     def add_debug_lines(
@@ -449,7 +565,7 @@ class PyBulletSimulation:
             line_width (int, optional): The width of the line. Defaults to 4.
             life_time (int, optional): The lifetime of the debug line in seconds. Defaults to 3.
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot add debug lines")
             return
 
@@ -459,8 +575,23 @@ class PyBulletSimulation:
             lineColorRGB=line_color_RGB,
             lineWidth=line_width,
             lifeTime=life_time,
+            physicsClientId=self.client_id,
         )
 
+    def remove_robot(self, robot_id):
+        """
+        Remove a robot from the simulation.
+
+        Args:
+            robot_id (int): The ID of the robot
+        """
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
+            return
+
+        with self._lock:
+            p.removeBody(robot_id, physicsClientId=self.client_id)
+        self.robots.pop(robot_id, None)
+
     def get_robot_info(self, robot_id):
         """
         Get information about a loaded robot.
@@ -489,7 +620,7 @@ class PyBulletSimulation:
         Returns:
             bool: True if connected, False otherwise
         """
-        return self.connected and p.isConnected()
+        return self.connected and p.isConnected(physicsClientId=self.client_id)
 
     def set_gravity(self, gravity_vector: list = [0, 0, -9.81]):
         """
@@ -498,11 +629,11 @@ class PyBulletSimulation:
         Args:
             gravity_vector (list): The gravity vector [x, y, z]
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot set gravity")
             return
 
-        p.setGravity(*gravity_vector)
+        p.setGravity(*gravity_vector, physicsClientId=self.client_id)
 
     def get_dynamics_info(self, robot_id, link_index: int = -1):
         """
@@ -515,11 +646,11 @@ class PyBulletSimulation:
         Returns:
             list: Dynamics information
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot get dynamics info")
             return []
 
-        return p.getDynamicsInfo(robot_id, link_index)
+        return p.getDynamicsInfo(robot_id, link_index, physicsClientId=self.client_id)
 
     def change_dynamics(self, robot_id, link_index: int = -1, **kwargs):
         """
@@ -530,11 +661,11 @@ class PyBulletSimulation:
             link_index (int): The link index (-1 for base)
             **kwargs: Dynamics properties to change (mass, friction, etc.)
         """
-        if not self.connected or not p.isConnected():
+        if not self.connected or not p.isConnected(physicsClientId=self.client_id):
             logger.warning("Simulation is not connected, cannot change dynamics")
             return
 
-        p.changeDynamics(robot_id, link_index, **kwargs)
+        p.changeDynamics(robot_id, link_index, **kwargs, physicsClientId=self.client_id)
 
 
 def get_sim() -> PyBulletSimulation:
@@ -543,6 +674,22 @@ def get_sim() -> PyBulletSimulation:
     if sim is None:
         from phosphobot.configs import config
 
-        sim = PyBulletSimulation(sim_mode=config.SIM_MODE)
+        sim = PyBulletSimulation(sim_mode=config.SIM_MODE, physics=config.SIM_PHYSICS)
+
+    return sim
+
+
+def create_robot_sim() -> PyBulletSimulation:
+    """
+    Create the simulation world of a robot.
+
+    In headless mode, every robot gets its own physics client: the robots don't share
+    a world, so resetting or stepping the simulation of one robot doesn't affect the
+    others. In GUI mode, the robots are all loaded in the shared GUI simulation.
+    """
+    from phosphobot.configs import config
+
+    if config.SIM_MODE != "headless":
+        return get_sim()
 
-    return sim
\ No newline at end of file
+    return PyBulletSimulation(sim_mode=config.SIM_MODE, physics=config.SIM_PHYSICS)
\ No newline at end of file
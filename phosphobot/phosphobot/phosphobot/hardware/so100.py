@@ -1,5 +1,6 @@
 import asyncio
 import time
+from collections import deque
 from typing import Literal, Optional, List
 
 import numpy as np
@@ -7,9 +8,10 @@ from loguru import logger
 from serial.tools.list_ports_common import ListPortInfo
 
 from phosphobot.configs import SimulationMode, config
+from phosphobot.control_loop import LoopTimer
 from phosphobot.control_signal import ControlSignal
 from phosphobot.hardware.base import BaseManipulator
-from phosphobot.hardware.motors.feetech import FeetechMotorsBus  # type: ignore
+from phosphobot.hardware.motors.feetech import FeetechMotorsBus, PendingWrite  # type: ignore
 from phosphobot.utils import get_resources_path
 from phosphobot.models import RobotConfigStatus
 
@@ -34,6 +36,10 @@ class SO100Hardware(BaseManipulator):
 
     END_EFFECTOR_LINK_INDEX = 4
     GRIPPER_JOINT_INDEX = 5
+    # The arm yaws with its base joint, which also moves the gripper sideways. This
+    # weight keeps both the position within 2 cm and the yaw within 2 degrees, like
+    # the pybullet solver
+    IK_ORIENTATION_WEIGHT = 0.49
 
     # Dynamixel settings
     motors = {
@@ -103,6 +109,8 @@ class SO100Hardware(BaseManipulator):
         # Create serial connection
         self.motors_bus = FeetechMotorsBus(port=self.device_name, motors=self.motors)
         self.motors_bus.connect()
+        # Non-blocking writes whose result was not reported yet, in the order of submission
+        self._pending_writes: deque[PendingWrite] = deque()
         self.is_connected = True
         self.init_config()
         self._max_temperature_cache: dict = {}
@@ -205,6 +213,29 @@ class SO100Hardware(BaseManipulator):
             logger.error("Too many communication errors. Disconnecting robot.")
             self.disconnect()
 
+    def _track_write(self, pending_write: PendingWrite) -> None:
+        """
+        Keep the non-blocking write to report its result later. Coalesced writes share
+        the same PendingWrite.
+        """
+        if not self._pending_writes or self._pending_writes[-1] is not pending_write:
+            self._pending_writes.append(pending_write)
+
+    def _report_write_results(self) -> None:
+        """
+        Update the motor communication errors with the result of the non-blocking writes
+        sent by the bus since the last call. The other ones are reported later.
+        """
+        while self._pending_writes and self._pending_writes[0].done():
+            error = self._pending_writes.popleft().error
+            if error is None:
+                self.motor_communication_errors = 0
+            else:
+                logger.warning(f"Error writing motor position: {error}")
+                self.update_motor_errors()
+                if not self.is_connected:
+                    self._pending_writes.clear()
+
     def read_motor_position(self, servo_id: int, **kwargs) -> int | None:
         """
         Read the position of a Feetech servo.
@@ -230,13 +261,17 @@ class SO100Hardware(BaseManipulator):
         if not self.is_connected:
             return None
 
+        self._report_write_results()
         try:
-            self.motors_bus.write(
+            # Non-blocking: sent with the other goal positions on the next bus tick.
+            # Its result is reported by the next calls.
+            pending_write = self.motors_bus.write(
                 "Goal_Position",
                 values=[units],
                 motor_names=self.servo_id_to_motor_name[servo_id],
+                blocking=False,
             )
-            self.motor_communication_errors = 0
+            self._track_write(pending_write)
         except Exception as e:
             logger.warning(f"Error writing motor position: {e}")
             self.update_motor_errors()
@@ -258,11 +293,14 @@ class SO100Hardware(BaseManipulator):
             values = values[:-1]
             motor_names = motor_names[:-1]
 
+        self._report_write_results()
         try:
-            self.motors_bus.write(
-                "Goal_Position", values=values, motor_names=motor_names
+            # Non-blocking: sent with the other goal positions on the next bus tick.
+            # Its result is reported by the next calls.
+            pending_write = self.motors_bus.write(
+                "Goal_Position", values=values, motor_names=motor_names, blocking=False
             )
-            self.motor_communication_errors = 0
+            self._track_write(pending_write)
         except Exception as e:
             logger.warning(f"Error writing motor position: {e}")
             self.update_motor_errors()
@@ -280,6 +318,8 @@ class SO100Hardware(BaseManipulator):
                 "Present_Position", motor_names=motor_names
             )
             self.motor_communication_errors = 0
+            # The writes submitted before the read are sent
+            self._report_write_results()
         except Exception as e:
             logger.warning(f"Error reading motor position: {e}")
             self.update_motor_errors()
@@ -552,6 +592,7 @@ class SO100Hardware(BaseManipulator):
     async def gravity_compensation_loop(
         self,
         control_signal: ControlSignal,
+        loop_timer: LoopTimer | None = None,
     ):
         """
         Background task that implements gravity compensation control:
@@ -595,20 +636,17 @@ class SO100Hardware(BaseManipulator):
 
         # Control loop parameters
         num_joints = len(self.actuated_joints)
-        joint_indices = list(range(num_joints))
-        loop_period = 1 / 50
+        if loop_timer is None:
+            loop_timer = LoopTimer(name="gravity_compensation")
+        loop_timer.period = 1 / 50
 
         # Main control loop
         while control_signal.is_in_loop():
-            start_time = time.perf_counter()
-
             # Get leader's current joint positions
             pos_rad = self.read_joints_position(unit="rad")
 
             # Update PyBullet simulation for gravity calculation
-            for i, idx in enumerate(joint_indices):
-                self.sim.set_joint_state(self.p_robot_id, idx, pos_rad[i])
-            self.sim.step()
+            self.set_simulation_positions(pos_rad)
 
             # Calculate gravity compensation torque
             positions = list(pos_rad)
@@ -626,9 +664,7 @@ class SO100Hardware(BaseManipulator):
             self.write_joint_positions(theta_des_rad, unit="rad")
 
             # Maintain loop frequency
-            elapsed = time.perf_counter() - start_time
-            sleep_time = max(0, loop_period - elapsed)
-            await asyncio.sleep(sleep_time)
+            await loop_timer.wait()
 
         # Cleanup: Reset leader's PID gains to default for all six motors
         for i in range(6):  # Changed from 4 to 6
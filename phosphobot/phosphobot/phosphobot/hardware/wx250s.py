@@ -67,6 +67,8 @@ class WX250SHardware(KochHardware):
     ]
 
     END_EFFECTOR_LINK_INDEX = 11  # This is the beginning of the fingers
+    # More joints means longer IK to find the right position
+    IK_MAX_ITERATIONS = 250
 
     # If your code checks torque readouts to see if something is grasped,
     # you can set these thresholds. They might differ from the Koch’s defaults.
@@ -1,12 +1,12 @@
 import asyncio
-import time
 from dataclasses import dataclass
 
 import numpy as np
 from loguru import logger
 
+from phosphobot.control_loop import LoopTimer
 from phosphobot.control_signal import ControlSignal
-from phosphobot.hardware import SO100Hardware, PiperHardware, RemotePhosphobot, get_sim
+from phosphobot.hardware import SO100Hardware, PiperHardware, RemotePhosphobot
 
 
 @dataclass
@@ -21,7 +21,7 @@ async def leader_follower_loop(
     invert_controls: bool,
     enable_gravity_compensation: bool,
     compensation_values: dict[str, int] | None,
-    sim=get_sim(),
+    loop_timer: LoopTimer | None = None,
 ):
     """
     Background task that implements leader-follower control:
@@ -30,6 +30,9 @@ async def leader_follower_loop(
     """
     logger.info("Starting leader-follower control.")
     loop_period = 1 / 150 if not enable_gravity_compensation else 1 / 60
+    if loop_timer is None:
+        loop_timer = LoopTimer(name="leader_follower")
+    loop_timer.period = loop_period
 
     # Check if the initial position is set, otherwise move them
     wait_for_initial_position = False
@@ -116,15 +119,12 @@ async def leader_follower_loop(
 
     # Main control loop
     while control_signal.is_in_loop():
-        start_time = time.perf_counter()
-
         for pair in robot_pairs:
             leader = pair.leader
             follower = pair.follower
 
             # Control loop parameters
             num_joints = len(leader.actuated_joints)
-            joint_indices = list(range(num_joints))
 
             # Get leader's current joint positions
             pos_rad = leader.read_joints_position(unit="rad")
@@ -157,14 +157,13 @@ async def leader_follower_loop(
                     "Gravity compensation is only supported for SO100Hardware."
                 )
                 # Calculate gravity compensation torque
-                # Update PyBullet simulation for gravity calculation
-                for i, idx in enumerate(joint_indices):
-                    sim.set_joint_state(leader.p_robot_id, idx, pos_rad[i])
+                # Update the PyBullet simulation of the leader for gravity calculation
+                leader.set_simulation_positions(pos_rad)
 
                 positions = list(pos_rad)
                 velocities = [0.0] * num_joints
                 accelerations = [0.0] * num_joints
-                tau_g = sim.inverse_dynamics(
+                tau_g = leader.sim.inverse_dynamics(
                     leader.p_robot_id,
                     positions=positions,
                     velocities=velocities,
@@ -200,9 +199,7 @@ async def leader_follower_loop(
                 )
 
         # Maintain loop frequency
-        elapsed = time.perf_counter() - start_time
-        sleep_time = max(0, loop_period - elapsed)
-        await asyncio.sleep(sleep_time)
+        await loop_timer.wait()
 
     # Cleanup: Reset leader's PID gains to default for all six motors
     for pair in robot_pairs:
@@ -422,6 +422,10 @@ def run(
     only_simulation: Annotated[
         bool, typer.Option(help="Simulation only")
     ] = False,
+    sim_physics: Annotated[
+        bool,
+        typer.Option(help="Step the simulation physics in background"),
+    ] = False,
     simulate_cameras: Annotated[
         bool,
         typer.Option(help="Use simulated cameras"),
@@ -480,6 +484,7 @@ def run(
 
     config.SIM_MODE = simulation
     config.ONLY_SIMULATION = only_simulation
+    config.SIM_PHYSICS = sim_physics
     config.SIMULATE_CAMERAS = simulate_cameras
     config.ENABLE_REALSENSE = realsense
     config.ENABLE_CAMERAS = cameras
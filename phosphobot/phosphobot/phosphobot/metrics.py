@@ -0,0 +1,251 @@
+"""
+Always-on counters and latency histograms of the hot paths.
+
+Recording a value increments a bucket of a fixed array under a lock, so the metrics
+stay on without measurable overhead. They are only aggregated when /metrics
+(Prometheus text format) or /metrics/json is requested.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from phosphobot.models import CounterSnapshot, HistogramSnapshot, MetricsResponse
+
+metrics = None
+
+# In seconds, from a serial transfer to an episode save
+DEFAULT_LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+LabelsKey = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self, name: str, labels: Dict[str, str]):
+        self.name = name
+        self.labels = labels
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> CounterSnapshot:
+        return CounterSnapshot(name=self.name, labels=self.labels, value=self._value)
+
+
+class Histogram:
+    """
+    Distribution of values in fixed buckets, like a Prometheus histogram.
+    """
+
+    def __init__(self, name: str, labels: Dict[str, str], buckets: Sequence[float]):
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # The last bucket counts the values above the largest bound
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """
+        Observe the duration of the block, in seconds.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _read(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+    def snapshot(self) -> HistogramSnapshot:
+        counts, total, count = self._read()
+        cumulative_counts = []
+        cumulative = 0
+        for bucket_count in counts[:-1]:
+            cumulative += bucket_count
+            cumulative_counts.append(cumulative)
+        return HistogramSnapshot(
+            name=self.name,
+            labels=self.labels,
+            count=count,
+            sum=total,
+            mean=total / count if count else None,
+            p50=self._quantile(0.5, counts, count),
+            p90=self._quantile(0.9, counts, count),
+            p99=self._quantile(0.99, counts, count),
+            buckets=list(self.buckets),
+            cumulative_counts=cumulative_counts,
+        )
+
+    def _quantile(self, q: float, counts: List[int], count: int) -> float | None:
+        """
+        Estimate a quantile by linear interpolation in its bucket, like the
+        histogram_quantile function of Prometheus.
+        """
+        if count == 0:
+            return None
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                if index == len(self.buckets):
+                    # Above the largest bound
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    The metrics of the server, by name and labels. Get or create a metric once, at
+    import time of the instrumented module, and keep a reference to it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._descriptions: Dict[str, str] = {}
+        self._types: Dict[str, str] = {}
+        self._counters: Dict[Tuple[str, LabelsKey], Counter] = {}
+        self._histograms: Dict[Tuple[str, LabelsKey], Histogram] = {}
+
+    def _register(self, name: str, description: str, metric_type: str) -> None:
+        registered_type = self._types.setdefault(name, metric_type)
+        if registered_type != metric_type:
+            raise ValueError(f"Metric {name} is already a {registered_type}")
+        self._descriptions.setdefault(name, description)
+
+    def counter(self, name: str, description: str, **labels: str) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._register(name, description, "counter")
+            if key not in self._counters:
+                self._counters[key] = Counter(name, labels)
+            return self._counters[key]
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        **labels: str,
+    ) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._register(name, description, "histogram")
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(name, labels, buckets)
+            return self._histograms[key]
+
+    def snapshot(self) -> MetricsResponse:
+        with self._lock:
+            counters = list(self._counters.values())
+            histograms = list(self._histograms.values())
+        return MetricsResponse(
+            counters=[counter.snapshot() for counter in counters],
+            histograms=[histogram.snapshot() for histogram in histograms],
+        )
+
+    def render_prometheus(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            descriptions = dict(self._descriptions)
+            types = dict(self._types)
+            counters = list(self._counters.values())
+            histograms = list(self._histograms.values())
+
+        lines: List[str] = []
+        for name in sorted(types):
+            lines.append(f"# HELP {name} {_escape_help(descriptions[name])}")
+            lines.append(f"# TYPE {name} {types[name]}")
+            for counter in counters:
+                if counter.name == name:
+                    lines.append(
+                        f"{name}{_format_labels(counter.labels)} {counter.value!r}"
+                    )
+            for histogram in histograms:
+                if histogram.name != name:
+                    continue
+                counts, total, count = histogram._read()
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(histogram.labels, le=repr(bound))
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                labels = _format_labels(histogram.labels, le="+Inf")
+                lines.append(f"{name}_bucket{labels} {count}")
+                lines.append(f"{name}_sum{_format_labels(histogram.labels)} {total!r}")
+                lines.append(f"{name}_count{_format_labels(histogram.labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str], **extra: str) -> str:
+    all_labels = {**labels, **extra}
+    if not all_labels:
+        return ""
+    formatted = ",".join(
+        f'{key}="{_escape_label(str(value))}"' for key, value in all_labels.items()
+    )
+    return "{" + formatted + "}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+@lru_cache()
+def get_metrics() -> MetricsRegistry:
+    global metrics
+
+    if metrics is None:
+        metrics = MetricsRegistry()
+
+    return metrics
@@ -8,7 +8,13 @@ from phosphobot.types import VideoCodecs
 from phosphobot.utils import NetworkDevice
 
 from .camera import AllCamerasStatus, SingleCameraStatus
-from .dataset import BaseDataset, BaseEpisode, JsonEpisode, Observation, Step
+from .dataset import (
+    BaseDataset,
+    BaseEpisode,
+    JsonEpisode,
+    Observation,
+    Step,
+)
 from .lerobot_dataset import (
     BaseRobotInfo,
     EpisodesModel,
@@ -26,6 +32,70 @@ from .robot import (
 )
 
 
+class SnapshotServiceStatus(BaseModel):
+    """
+    Sampling of the robots and the cameras shared by the recorder, the AI control
+    and the read endpoints.
+    """
+
+    running: bool = Field(..., description="Whether the sampler is running.")
+    rate_hz: float | None = Field(
+        None, description="Sampling rate requested by the subscribers."
+    )
+    nb_subscriptions: int = Field(0, description="Number of active subscriptions.")
+    nb_snapshots: int = Field(0, description="Number of snapshots taken.")
+    nb_robot_reads: int = Field(
+        0, description="Number of robot reads, by the sampler or on demand."
+    )
+    mean_skew_ms: float | None = Field(
+        None,
+        description="Mean spread of the capture times of the sensors in a snapshot, over the last snapshots.",
+    )
+    max_skew_ms: float | None = Field(
+        None, description="Largest spread of the capture times over the last snapshots."
+    )
+    latest_age_ms: float | None = Field(
+        None, description="Age of the latest snapshot, in milliseconds."
+    )
+
+
+class EpisodeSaveJobStatus(BaseModel):
+    """
+    An episode saved in the background.
+    """
+
+    dataset_name: str = Field(..., description="Name of the dataset of the episode.")
+    episode_index: int | None = Field(
+        None,
+        description="Index of the episode in the dataset. Can change if a previous episode failed to save.",
+    )
+    state: Literal["queued", "saving", "pushing", "saved", "failed"] = Field(
+        ..., description="Progress of the save."
+    )
+    queued_at: float = Field(..., description="Time the episode was queued.")
+    started_at: float | None = Field(None, description="Time the save started.")
+    finished_at: float | None = Field(None, description="Time the save finished.")
+    error: str | None = Field(None, description="Error if the save failed.")
+
+
+class EpisodeSaveQueueStatus(BaseModel):
+    """
+    Episodes saved in the background while the next ones are recorded.
+    """
+
+    max_pending: int = Field(
+        ..., description="Maximum number of episodes waiting to be saved."
+    )
+    nb_pending: int = Field(
+        0, description="Number of episodes waiting to be saved or being saved."
+    )
+    nb_saved: int = Field(0, description="Number of episodes saved.")
+    nb_failed: int = Field(0, description="Number of episodes which failed to save.")
+    jobs: List[EpisodeSaveJobStatus] = Field(
+        default_factory=list, description="The pending and the last saved episodes."
+    )
+
+
 class ServerStatus(BaseModel):
     """Contains the status of the app"""
 
@@ -54,6 +124,14 @@ class ServerStatus(BaseModel):
     server_port: int = Field(
         ..., description="Port of the phosphobot server", examples=[80, 8020, 8021]
     )
+    snapshots: Optional[SnapshotServiceStatus] = Field(
+        None,
+        description="Status of the service sampling the robots and the cameras.",
+    )
+    episode_saves: Optional[EpisodeSaveQueueStatus] = Field(
+        None,
+        description="Episodes being saved in the background.",
+    )
 
 
 class RobotStatus(BaseModel):
@@ -906,6 +984,12 @@ class StartAIControlRequest(BaseModel):
         None,
         description="If angle_format is 'other', this is the maximum angle value used in the model. If None and angle_format is 'other', will raise an error.",
     )
+    prefetch_fraction: float = Field(
+        0.3,
+        ge=0,
+        lt=1,
+        description="Fraction of the action chunk remaining when the next chunk is requested, so that the inference runs while the robot moves. 0 waits for the end of the chunk.",
+    )
 
     @model_validator(mode="after")
     def check_angle_format(self) -> "StartAIControlRequest":
@@ -1089,6 +1173,135 @@ class UDPServerInformationResponse(BaseModel):
     port: int
 
 
+class ControlLoopStats(BaseModel):
+    """
+    Timing of a control loop running in its dedicated thread.
+    """
+
+    name: str = Field(..., description="Name of the control loop.")
+    running: bool = Field(..., description="Whether the control loop is running.")
+    iterations: int = Field(..., description="Number of iterations of the loop.")
+    target_period_ms: float | None = Field(
+        None, description="Period the loop is scheduled at, in milliseconds."
+    )
+    mean_period_ms: float | None = Field(
+        None, description="Mean measured period over the last iterations."
+    )
+    max_period_ms: float | None = Field(
+        None, description="Longest measured period over the last iterations."
+    )
+    jitter_ms: float | None = Field(
+        None,
+        description="Standard deviation of the measured period over the last iterations.",
+    )
+    overruns: int = Field(
+        0,
+        description="Number of iterations that ended after their deadline.",
+    )
+
+
+class ControlLoopsStatusResponse(BaseModel):
+    control_loops: List[ControlLoopStats]
+
+
+class CounterSnapshot(BaseModel):
+    name: str
+    labels: Dict[str, str] = Field(default_factory=dict)
+    value: float
+
+
+class HistogramSnapshot(BaseModel):
+    """
+    Distribution of a measure, in seconds for the latencies. The quantiles are
+    estimated by interpolation in the buckets.
+    """
+
+    name: str
+    labels: Dict[str, str] = Field(default_factory=dict)
+    count: int
+    sum: float
+    mean: float | None = None
+    p50: float | None = None
+    p90: float | None = None
+    p99: float | None = None
+    buckets: List[float] = Field(
+        default_factory=list, description="Upper bounds of the buckets."
+    )
+    cumulative_counts: List[int] = Field(
+        default_factory=list,
+        description="Number of values lower or equal to each bucket bound.",
+    )
+
+
+class MetricsResponse(BaseModel):
+    counters: List[CounterSnapshot] = Field(default_factory=list)
+    histograms: List[HistogramSnapshot] = Field(default_factory=list)
+
+
+class ProfilingStartRequest(BaseModel):
+    interval_ms: float = Field(
+        10,
+        gt=0,
+        description="Time between two samples of the threads, in milliseconds.",
+    )
+    duration_s: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Stop the session after this duration, in seconds. If None, the session runs until /profiling/stop is called.",
+    )
+
+
+class ProfilingStatusResponse(BaseModel):
+    """
+    Status of the running profiling session, or of the last one.
+    """
+
+    running: bool = Field(..., description="Whether a session is sampling.")
+    session_id: Optional[str] = None
+    interval_ms: Optional[float] = None
+    elapsed_s: float = 0.0
+    nb_samples: int = Field(0, description="Number of times the threads were sampled.")
+    samples_per_loop: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Number of samples attributed to each loop or thread.",
+    )
+    overhead_percent: Optional[float] = Field(
+        None, description="Share of the elapsed time spent sampling."
+    )
+    speedscope_path: Optional[str] = Field(
+        None, description="Profile to open in https://www.speedscope.app"
+    )
+    flamegraph_path: Optional[str] = Field(
+        None, description="Folded stacks, the input of flamegraph.pl"
+    )
+
+
+class TeleopStatsResponse(BaseModel):
+    """
+    Counters of the teleoperation commands since the server started.
+    """
+
+    nb_commands_executed: int = Field(
+        ..., description="Number of commands sent to the robots."
+    )
+    nb_commands_superseded: int = Field(
+        ...,
+        description="Number of commands replaced by a newer one before being executed.",
+    )
+    nb_commands_dropped: int = Field(
+        ...,
+        description="Number of commands rejected: rate limited, stale, or whose move failed or timed out.",
+    )
+    mean_command_age_ms: float | None = Field(
+        None,
+        description="Mean time between the reception and the end of the execution of the last commands.",
+    )
+    max_command_age_ms: float | None = Field(
+        None,
+        description="Longest time between the reception and the end of the execution of the last commands.",
+    )
+
+
 class StartTrainingResponse(StatusResponse):
     training_id: int | None = Field(
         ...,
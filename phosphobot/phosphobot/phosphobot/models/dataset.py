@@ -6,7 +6,17 @@ import shutil
 import time
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List, Literal, Optional, cast
+from typing import (
+    Any,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Union,
+    cast,
+    overload,
+)
 
 import numpy as np
 from huggingface_hub import (
@@ -17,7 +27,7 @@ from huggingface_hub import (
     delete_repo,
 )
 from loguru import logger
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from phosphobot.models.robot import BaseRobot
 from phosphobot.utils import (
@@ -78,8 +88,227 @@ class Step(BaseModel):
         extra = "ignore"
 
 
+class _StepBufferObservation(Observation):
+    """
+    Observation of a row of a StepBuffer. Assigning its joints_position writes to
+    the buffer.
+    """
+
+    _buffer: Optional["StepBuffer"] = PrivateAttr(default=None)
+    _index: int = PrivateAttr(default=0)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "joints_position" and self._buffer is not None:
+            self._buffer.set_joints_position(self._index, value)
+
+
+class _StepBufferStep(Step):
+    """
+    Step view of a row of a StepBuffer. Assigning its action writes to the buffer.
+    """
+
+    _buffer: Optional["StepBuffer"] = PrivateAttr(default=None)
+    _index: int = PrivateAttr(default=0)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "action" and self._buffer is not None:
+            self._buffer.set_action(self._index, value)
+
+
+def _grow_column(column: np.ndarray, capacity: int, fill_value: Any) -> np.ndarray:
+    grown = np.full((capacity,) + column.shape[1:], fill_value, dtype=column.dtype)
+    grown[: len(column)] = column
+    return grown
+
+
+class StepBuffer(Sequence[Step]):
+    """
+    Steps of an episode being recorded, stored by column in preallocated NumPy
+    arrays which double in size when full, instead of a list of Step objects.
+
+    Indexing returns a Step view of a row, built on demand. Assigning the action or
+    the joints_position of a view writes to the buffer. The is_first and is_last
+    flags follow from the position of the step, and only the created_at key of the
+    step metadata is kept. The images are kept only if keep_images is True: else
+    the caller consumes them, eg. with video encoders.
+    """
+
+    def __init__(self, capacity: int = 256, keep_images: bool = False):
+        self.keep_images = keep_images
+        self._capacity = max(capacity, 1)
+        self._length = 0
+        # Allocated at the first step, once the number of joints is known
+        self._joints_position: np.ndarray | None = None
+        self._action: np.ndarray | None = None
+        self._state: np.ndarray | None = None
+        self._action_is_set = np.zeros(self._capacity, dtype=bool)
+        self._timestamp = np.full(self._capacity, np.nan)
+        self._created_at = np.full(self._capacity, np.nan)
+        self._language_instruction = np.full(self._capacity, None, dtype=object)
+        self._main_images: List[np.ndarray] = []
+        self._secondary_images: List[List[np.ndarray]] = []
+
+    @classmethod
+    def from_steps(
+        cls, steps: Sequence[Step], keep_images: bool = True
+    ) -> "StepBuffer":
+        buffer = cls(capacity=len(steps), keep_images=keep_images)
+        for step in steps:
+            buffer.append(step)
+        return buffer
+
+    @property
+    def joints_positions(self) -> np.ndarray:
+        """
+        Joints positions of the steps, of shape (nb_steps, nb_joints).
+        """
+        if self._joints_position is None:
+            return np.empty((0, 0))
+        return self._joints_position[: self._length]
+
+    @property
+    def actions(self) -> np.ndarray:
+        """
+        Actions of the steps, of shape (nb_steps, nb_joints). NaN where not set.
+        """
+        if self._action is None:
+            return np.empty((0, 0))
+        return self._action[: self._length]
+
+    @property
+    def action_is_set(self) -> np.ndarray:
+        return self._action_is_set[: self._length]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """
+        Timestamps of the steps. NaN where not set.
+        """
+        return self._timestamp[: self._length]
+
+    def _allocate(self, nb_joints: int, state_size: int) -> None:
+        self._joints_position = np.full((self._capacity, nb_joints), np.nan)
+        self._action = np.full((self._capacity, nb_joints), np.nan)
+        self._state = np.full((self._capacity, state_size), np.nan)
+
+    def _grow(self) -> None:
+        assert self._joints_position is not None
+        assert self._action is not None and self._state is not None
+        capacity = self._capacity * 2
+        self._joints_position = _grow_column(self._joints_position, capacity, np.nan)
+        self._action = _grow_column(self._action, capacity, np.nan)
+        self._state = _grow_column(self._state, capacity, np.nan)
+        self._action_is_set = _grow_column(self._action_is_set, capacity, False)
+        self._timestamp = _grow_column(self._timestamp, capacity, np.nan)
+        self._created_at = _grow_column(self._created_at, capacity, np.nan)
+        self._language_instruction = _grow_column(
+            self._language_instruction, capacity, None
+        )
+        self._capacity = capacity
+
+    def append(self, step: Step) -> None:
+        observation = step.observation
+        joints_position = np.asarray(observation.joints_position).reshape(-1)
+        state = np.asarray(observation.state).reshape(-1)
+        if self._joints_position is None:
+            self._allocate(len(joints_position), len(state))
+        assert self._joints_position is not None and self._state is not None
+        if len(joints_position) != self._joints_position.shape[1]:
+            raise ValueError(
+                f"Step {self._length} has {len(joints_position)} joints, expected {self._joints_position.shape[1]}"
+            )
+        if len(state) != self._state.shape[1]:
+            raise ValueError(
+                f"Step {self._length} has a state of size {len(state)}, expected {self._state.shape[1]}"
+            )
+        if self._length == self._capacity:
+            self._grow()
+
+        index = self._length
+        self._joints_position[index] = joints_position
+        self._state[index] = state
+        self.set_action(index, step.action)
+        self._timestamp[index] = (
+            observation.timestamp if observation.timestamp is not None else np.nan
+        )
+        self._created_at[index] = step.metadata.get("created_at", np.nan)
+        self._language_instruction[index] = observation.language_instruction
+        if self.keep_images:
+            self._main_images.append(observation.main_image)
+            self._secondary_images.append(list(observation.secondary_images))
+        self._length += 1
+
+    def set_action(self, index: int, action: Optional[np.ndarray]) -> None:
+        assert self._action is not None
+        if action is None:
+            self._action_is_set[index] = False
+            self._action[index] = np.nan
+        else:
+            self._action[index] = np.asarray(action).reshape(-1)
+            self._action_is_set[index] = True
+
+    def set_joints_position(self, index: int, joints_position: np.ndarray) -> None:
+        assert self._joints_position is not None
+        self._joints_position[index] = np.asarray(joints_position).reshape(-1)
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> Step: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Step]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Step, List[Step]]:
+        if isinstance(index, slice):
+            return [self._view(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(f"Step index {index} out of range")
+        return self._view(index)
+
+    def __iter__(self) -> Iterator[Step]:
+        for index in range(self._length):
+            yield self._view(index)
+
+    def _view(self, index: int) -> Step:
+        assert self._joints_position is not None
+        assert self._action is not None and self._state is not None
+        timestamp = self._timestamp[index]
+        created_at = self._created_at[index]
+        observation = _StepBufferObservation.model_construct(
+            main_image=self._main_images[index] if self.keep_images else np.array([]),
+            secondary_images=list(self._secondary_images[index])
+            if self.keep_images
+            else [],
+            state=self._state[index],
+            joints_position=self._joints_position[index],
+            language_instruction=self._language_instruction[index],
+            timestamp=None if np.isnan(timestamp) else float(timestamp),
+        )
+        observation._buffer = self
+        observation._index = index
+        is_last = index == self._length - 1
+        step = _StepBufferStep.model_construct(
+            observation=observation,
+            action=self._action[index] if self._action_is_set[index] else None,
+            is_first=index == 0,
+            is_terminal=is_last,
+            is_last=is_last,
+            metadata={} if np.isnan(created_at) else {"created_at": float(created_at)},
+        )
+        step._buffer = self
+        step._index = index
+        return step
+
+
 class BaseEpisode(BaseModel, ABC):
-    steps: List[Step] = Field(default_factory=list)
+    # A StepBuffer while recording, a list when loaded from a file
+    steps: Union[List[Step], StepBuffer] = Field(default_factory=list)
     # metadata stores: episode_index, created_at, robot_type, episode_format, dataset_name, instruction (optional)
     # For JsonEpisode, it might also store base_recording_folder, created_at_str (for filename)
     # For LeRobotEpisode, dataset_manager (the LeRobotDataset instance) is a direct attribute, not in metadata.
@@ -104,6 +333,12 @@ class BaseEpisode(BaseModel, ABC):
                 -1
             ].observation.joints_position.copy()
 
+        if isinstance(self.steps, StepBuffer):
+            # The flags of the buffered steps follow from their position
+            step.is_first = len(self.steps) == 0
+            self.steps.append(step)
+            return
+
         if not self.steps:  # This is the first step
             step.is_first = True
         else:  # Not the first step
@@ -120,7 +355,12 @@ class BaseEpisode(BaseModel, ABC):
         The action that led to `current_step_data.observation` was `current_step_data.observation.joints_position`.
         So, `self.steps[-1].action` becomes `current_step_data.observation.joints_position`.
         """
-        if len(self.steps) > 0:
+        if isinstance(self.steps, StepBuffer):
+            if len(self.steps) > 0:
+                self.steps.set_action(
+                    len(self.steps) - 1, current_step_data.observation.joints_position
+                )
+        elif len(self.steps) > 0:
             # The action of the previous step is the joints_position of the current observation
             self.steps[-1].action = current_step_data.observation.joints_position.copy()
 
@@ -165,6 +405,10 @@ class BaseEpisode(BaseModel, ABC):
         """Saves the episode data and any related metadata or artifacts."""
         pass
 
+    def discard(self) -> None:
+        """Releases the resources of an episode that will not be saved (e.g., video encoders)."""
+        pass
+
     # Common helper methods from old Episode class
     def get_episode_frames_main_camera(self) -> List[np.ndarray]:
         return [
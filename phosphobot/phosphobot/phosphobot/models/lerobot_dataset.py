@@ -1,13 +1,18 @@
+import asyncio
 import json
 import os
 import shutil
+import threading
 import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Literal, Optional, Tuple, cast
+from typing import Dict, List, Literal, Optional, Set, Tuple, Union, cast
 import tempfile
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from huggingface_hub import delete_file, upload_folder
 from loguru import logger
 from pydantic import (
@@ -18,20 +23,48 @@ from pydantic import (
     model_validator,
 )
 
+from phosphobot.configs import config
 from phosphobot.types import VideoCodecs
 from phosphobot.utils import (
+    ImageStatsAccumulator,
     NdArrayAsList,
+    StreamingVideoEncoder,
+    VideoEncodingJob,
+    append_lines_durably,
     compute_sum_squaresum_framecount_from_video,
-    create_video_file,
+    encode_videos,
     get_field_min_max,
     get_home_app_path,
+    get_video_encoding_jobs,
+    write_file_atomically,
 )
 from phosphobot.models.robot import BaseRobot
-from phosphobot.models.dataset import BaseDataset, BaseEpisode, Step
+from phosphobot.models.dataset import BaseDataset, BaseEpisode, Step, StepBuffer
 
 DEFAULT_FILE_ENCODING = "utf-8"
 
 
+@lru_cache()
+def get_video_encoding_slots() -> threading.Semaphore:
+    """
+    Semaphore shared by the video encoders of all the episodes, so that at most
+    MAX_VIDEO_ENCODING_WORKERS videos are encoded at the same time.
+    """
+    return threading.Semaphore(config.MAX_VIDEO_ENCODING_WORKERS or os.cpu_count() or 1)
+
+
+def _list_array(values: np.ndarray) -> pa.ListArray:
+    """
+    Rows of a 2D array as an Arrow list column of float32 values stored as doubles,
+    like the lists of floats written by LeRobotEpisodeModel.to_parquet.
+    """
+    nb_rows, row_size = values.shape
+    offsets = np.arange(0, (nb_rows + 1) * row_size, row_size, dtype=np.int32)
+    return pa.ListArray.from_arrays(
+        offsets, values.astype(np.float32).astype(np.float64).reshape(-1)
+    )
+
+
 class LeRobotDataset(BaseDataset):
     format_version: Literal["lerobot_v2", "lerobot_v2.1"] = "lerobot_v2.1"
 
@@ -70,6 +103,15 @@ class LeRobotDataset(BaseDataset):
         self.stats_model: Optional[StatsModel] = None  # For lerobot_v2
         self.episodes_model: Optional[EpisodesModel] = None
         self.tasks_model: Optional[TasksModel] = None
+        # Size and modification time of the meta files when the models were last
+        # loaded or saved, to reload them if another process edited the dataset
+        self._meta_files_signature: Optional[Tuple] = None
+        # Indices of the episodes being recorded or saved. The next episode can be
+        # started while the previous ones are still being saved.
+        self._pending_episode_indices: Set[int] = set()
+        # lerobot_v2: stats of the pending episodes, added to stats_model when they are
+        # saved, so that stats.json never contains the frames of an unsaved episode
+        self._pending_stats_models: Dict[int, StatsModel] = {}
         logger.info(
             f"LeRobotDataset manager initialized for path: {self.folder_full_path}"
         )
@@ -83,10 +125,33 @@ class LeRobotDataset(BaseDataset):
         all_camera_key_names: List[str] | None = None,
         force: bool = False,
     ):
-        """Loads existing meta files or initializes new ones if they don't exist."""
+        """
+        Loads existing meta files or initializes new ones if they don't exist.
+
+        The models stay loaded between episodes. They are reloaded if the meta files
+        were modified by something else than this dataset manager, eg. a deletion.
+        """
         logger.debug(
             f"Initializing/loading meta models for dataset: {self.dataset_name}"
         )
+        if (
+            not force
+            and self._meta_files_signature is not None
+            and self._meta_files_signature != self._read_meta_files_signature()
+        ):
+            if self._pending_episode_indices:
+                # Reloading would lose the steps of the episodes in progress
+                logger.warning(
+                    f"Meta files of dataset {self.dataset_name} were modified while "
+                    f"episodes {sorted(self._pending_episode_indices)} are in progress. Not reloading them."
+                )
+            else:
+                logger.info(
+                    f"Meta files of dataset {self.dataset_name} were modified. Reloading them."
+                )
+                force = True
+        was_loaded = self.info_model is not None and self.episodes_model is not None
+
         if self.info_model is None or force:
             self.info_model = InfoModel.from_json(
                 meta_folder_path=self.meta_folder_full_path,  # Correct path to 'meta' dir
@@ -123,8 +188,9 @@ class LeRobotDataset(BaseDataset):
             self.tasks_model = TasksModel.from_jsonl(
                 meta_folder_path=self.meta_folder_full_path
             )
-        # Consistency checks and fix
-        if self.info_model.total_frames != sum(
+        # Consistency checks and fix, on the files just loaded. The models already
+        # loaded may contain the episode being recorded.
+        if (force or not was_loaded) and self.info_model.total_frames != sum(
             [e.length for e in self.episodes_model.episodes]
         ):
             logger.warning(
@@ -144,8 +210,29 @@ class LeRobotDataset(BaseDataset):
             )
             self.info_model.save(meta_folder_path=self.meta_folder_full_path)
 
+        self._meta_files_signature = self._read_meta_files_signature()
         logger.debug("Meta models initialization/loading complete.")
 
+    def _read_meta_files_signature(self) -> Tuple:
+        signature = []
+        for file_name in sorted(os.listdir(self.meta_folder_full_path)):
+            file_stat = os.stat(os.path.join(self.meta_folder_full_path, file_name))
+            signature.append((file_name, file_stat.st_size, file_stat.st_mtime_ns))
+        return tuple(signature)
+
+    def unload_meta_models(self) -> None:
+        """
+        Forget the loaded meta models, eg. when they contain an episode which was not
+        saved. They are loaded again from the files by load_meta_models.
+        """
+        self.info_model = None
+        self.episodes_stats_model = None
+        self.stats_model = None
+        self.episodes_model = None
+        self.tasks_model = None
+        self._meta_files_signature = None
+        self._pending_stats_models = {}
+
     def load_episodes(self):
         """Loads all episodes from the dataset."""
         if self.episodes_model is None:
@@ -175,6 +262,57 @@ class LeRobotDataset(BaseDataset):
             )
         return self.info_model.total_episodes  # total_episodes is 0-indexed for next
 
+    def reserve_episode_index(self) -> int:
+        """
+        Reserve the index of a new episode. The index follows the saved episodes and
+        the episodes still being recorded or saved.
+        """
+        episode_index = self.get_next_episode_index()
+        if self._pending_episode_indices:
+            episode_index = max(episode_index, max(self._pending_episode_indices) + 1)
+        self._pending_episode_indices.add(episode_index)
+        return episode_index
+
+    def get_pending_stats_model(self, episode_index: int) -> "StatsModel":
+        """
+        lerobot_v2: the stats of an episode being recorded or saved.
+        """
+        if episode_index not in self._pending_stats_models:
+            self._pending_stats_models[episode_index] = StatsModel()
+        return self._pending_stats_models[episode_index]
+
+    def release_episode_index(self, episode_index: int) -> None:
+        """
+        Release the index of an episode which won't be saved, and remove its lines
+        from the loaded meta models. The next saved episode takes its index.
+        """
+        self._pending_episode_indices.discard(episode_index)
+        self._pending_stats_models.pop(episode_index, None)
+        if not self._pending_episode_indices:
+            # Reload everything from the files
+            self.unload_meta_models()
+            return
+        if self.episodes_model is not None:
+            self.episodes_model.remove_episode(episode_index)
+        if self.episodes_stats_model is not None:
+            self.episodes_stats_model.remove_episode(episode_index)
+
+    def move_episode_index(self, old_index: int, new_index: int) -> None:
+        """
+        Move the lines of an episode which isn't saved yet to a new index in the
+        loaded meta models.
+        """
+        self._pending_episode_indices.discard(old_index)
+        self._pending_episode_indices.add(new_index)
+        stats_model = self._pending_stats_models.pop(old_index, None)
+        if stats_model is not None:
+            stats_model.set_episode_index(new_index)
+            self._pending_stats_models[new_index] = stats_model
+        if self.episodes_model is not None:
+            self.episodes_model.reindex_episode(old_index, new_index)
+        if self.episodes_stats_model is not None:
+            self.episodes_stats_model.reindex_episode(old_index, new_index)
+
     def get_current_total_frames(self) -> int:
         if self.info_model is None:
             raise ValueError("InfoModel not initialized in LeRobotDataset.")
@@ -193,8 +331,41 @@ class LeRobotDataset(BaseDataset):
             self.episodes_model.save(self.meta_folder_full_path, save_mode="overwrite")
         if self.tasks_model:
             self.tasks_model.save(self.meta_folder_full_path)
+        self._meta_files_signature = self._read_meta_files_signature()
         logger.debug("All meta models saved.")
 
+    def save_episode_meta_models(self, episode_index: int) -> None:
+        """
+        Saves the meta models after a new episode, in a time which doesn't depend on
+        the number of episodes in the dataset: the lines of the episode are appended
+        to episodes.jsonl and episodes_stats.jsonl, the new tasks to tasks.jsonl, and
+        the small info.json (and stats.json in v2) are replaced atomically.
+
+        info.json is written last. After a crash, its total of frames doesn't match
+        episodes.jsonl and the episodes are recomputed from the parquet files.
+        Edits of the dataset (delete, shuffle, merge) rewrite the files instead.
+        """
+        assert self.info_model is not None
+        assert self.episodes_model is not None
+        assert self.tasks_model is not None
+        logger.debug(
+            f"Saving meta models of episode {episode_index} for dataset: {self.dataset_name}"
+        )
+        if self.episodes_stats_model:
+            self.episodes_stats_model.append_episode(
+                self.meta_folder_full_path, episode_index
+            )
+        if self.stats_model:  # v2 only
+            episode_stats_model = self._pending_stats_models.pop(episode_index, None)
+            if episode_stats_model is not None:
+                self.stats_model.add_episode_stats(episode_stats_model)
+            self.stats_model.save(self.meta_folder_full_path)
+        self.tasks_model.to_jsonl(self.meta_folder_full_path, save_mode="append")
+        self.episodes_model.append_episode(self.meta_folder_full_path, episode_index)
+        self.info_model.save(self.meta_folder_full_path)
+        self._meta_files_signature = self._read_meta_files_signature()
+        self._pending_episode_indices.discard(episode_index)
+
     def delete_episode(self, episode_id: int, update_hub: bool = True) -> None:
         """
         Delete the episode data from the dataset.
@@ -1165,6 +1336,10 @@ class LeRobotEpisode(BaseEpisode):
     freq: int  # Recording frequency (Hz)
     codec: VideoCodecs  # For saving videos
     target_size: tuple[int, int]  # For video creation (width, height)
+    # One encoder per camera key, filled while recording. None if the frames are kept in the steps.
+    _video_encoders: Dict[str, StreamingVideoEncoder] | None = None
+    # Image stats counted by the video encoders, by key of the observation images stats
+    _image_stats: Dict[str, ImageStatsAccumulator] | None = None
 
     # Paths are derived from the dataset_manager and episode_index (from metadata)
     @property
@@ -1244,9 +1419,8 @@ class LeRobotEpisode(BaseEpisode):
         elif dataset_manager.format_version == "lerobot_v2":
             assert dataset_manager.stats_model is not None
 
-        episode_idx = (
-            dataset_manager.get_next_episode_index()
-        )  # e.g., if 0 episodes, next is 0
+        # e.g., if 0 episodes, next is 0. Follows the episodes still being saved.
+        episode_idx = dataset_manager.reserve_episode_index()
 
         task_idx = len(dataset_manager.tasks_model.tasks)  # Default: new task
         if instruction:  # If an instruction is provided, try to find its index
@@ -1271,14 +1445,105 @@ class LeRobotEpisode(BaseEpisode):
             f"Starting new LeRobotEpisode, index: {episode_idx}, task: '{instruction}' (idx: {task_idx}) for dataset '{dataset_manager.dataset_name}'."
         )
 
-        return cls(
-            steps=[],
+        episode = cls(
+            # Steps are stored by column while recording
+            steps=StepBuffer(),
             metadata=episode_metadata,
             dataset_manager=dataset_manager,
             freq=freq,
             codec=codec,
             target_size=target_size,
         )
+        episode._start_video_encoders()
+        return episode
+
+    def _start_video_encoders(self) -> None:
+        """
+        Start one streaming video encoder per camera key of the dataset.
+        Frames are encoded while recording instead of being kept in the steps until save().
+        """
+        assert self.dataset_manager.info_model is not None
+        self._video_encoders = {}
+        self._image_stats = {}
+        for camera_index, (
+            cam_key_in_info,
+            video_feature_details,
+        ) in enumerate(
+            self.dataset_manager.info_model.features.observation_images.items()
+        ):
+            # Same keys as StatsModel.update, which matches the cameras by position
+            image_stats_key = (
+                cam_key_in_info
+                if cam_key_in_info == "observation.images.main"
+                else f"observation.images.secondary_{camera_index - 1}"
+            )
+            self._image_stats[image_stats_key] = ImageStatsAccumulator(
+                spatial_stride=config.IMAGE_STATS_SPATIAL_STRIDE,
+                temporal_stride=config.IMAGE_STATS_TEMPORAL_STRIDE,
+            )
+            # video_feature_details.shape is [height, width, channels]
+            self._video_encoders[cam_key_in_info] = StreamingVideoEncoder(
+                output_path=str(self._get_video_path(camera_key=cam_key_in_info)),
+                target_size=(
+                    video_feature_details.shape[1],
+                    video_feature_details.shape[0],
+                ),
+                fps=video_feature_details.info.video_fps,
+                codec=video_feature_details.info.video_codec,
+                thread_count=config.VIDEO_ENCODER_THREADS,
+                image_stats=self._image_stats[image_stats_key],
+                encoding_slots=get_video_encoding_slots(),
+            )
+
+    @staticmethod
+    def _get_step_frame(
+        step: Step, camera_index: int, camera_key: str
+    ) -> Optional[np.ndarray]:
+        """
+        Return the frame of the step matching the camera key of the InfoModel.
+        Secondary cameras are matched by position, after the main camera.
+        """
+        if camera_key == "observation.images.main":
+            frame = step.observation.main_image
+        else:
+            secondary_cam_idx = camera_index - 1
+            if not 0 <= secondary_cam_idx < len(step.observation.secondary_images):
+                return None
+            frame = step.observation.secondary_images[secondary_cam_idx]
+        if frame is None or frame.size == 0:
+            return None
+        return frame
+
+    async def _push_frames_to_video_encoders(self, step: Step) -> None:
+        """
+        Send the frames of the step to the video encoders and release them from the step.
+        If an encoder is late, waits for it without blocking the event loop.
+        """
+        if self._video_encoders is None:
+            return
+        for camera_index, (cam_key_in_info, encoder) in enumerate(
+            self._video_encoders.items()
+        ):
+            frame = self._get_step_frame(step, camera_index, cam_key_in_info)
+            if frame is not None:
+                await encoder.write_async(frame)
+        # The frames now live in the encoders: don't keep the whole episode in RAM
+        step.observation.main_image = np.array([])
+        step.observation.secondary_images = []
+
+    def discard(self) -> None:
+        """
+        Stop the video encoders and remove the partial video files of this unsaved
+        episode. Its index is released.
+        """
+        # The meta models of the dataset manager were updated with the steps
+        self.dataset_manager.release_episode_index(self.episode_index)
+        if self._video_encoders is None:
+            return
+        for encoder in self._video_encoders.values():
+            encoder.abort()
+        self._video_encoders = None
+        self._image_stats = None
 
     async def append_step(self, step: Step, **kwargs) -> None:
         self.add_step(step)  # Appends to self.steps, manages is_first/is_last flags
@@ -1288,19 +1553,23 @@ class LeRobotEpisode(BaseEpisode):
         )  # 0-indexed count of steps in this episode
 
         # Update live meta models stored in the dataset_manager
+        # The image stats are computed by the video encoders, outside of the recording loop
+        update_images = self._video_encoders is None
         if self.dataset_manager.format_version == "lerobot_v2.1":
             assert self.dataset_manager.episodes_stats_model is not None
             self.dataset_manager.episodes_stats_model.update(
                 step=step,
                 episode_index=self.episode_index,  # from self.metadata
                 current_step_index=current_step_in_episode_index,
+                update_images=update_images,
             )
         elif self.dataset_manager.format_version == "lerobot_v2":
-            assert self.dataset_manager.stats_model is not None
-            self.dataset_manager.stats_model.update(
+            # Added to the stats of the dataset when the episode is saved
+            self.dataset_manager.get_pending_stats_model(self.episode_index).update(
                 step=step,
                 episode_index=self.episode_index,
                 current_step_index=current_step_in_episode_index,
+                update_images=update_images,
             )
 
         assert self.dataset_manager.episodes_model is not None
@@ -1312,79 +1581,37 @@ class LeRobotEpisode(BaseEpisode):
         # tasks_model.update will add the instruction as a new task if it's not already present
         self.dataset_manager.tasks_model.update(step=step)
 
-    def _convert_to_le_robot_episode_model(self) -> "LeRobotEpisodeModel":
-        """Converts internal steps to the LeRobotEpisodeModel for Parquet saving."""
+        await self._push_frames_to_video_encoders(step)
+
+    def _write_parquet(self) -> None:
+        """
+        Write the columns of the steps to the parquet file of the episode, with the
+        same schema as LeRobotEpisodeModel.to_parquet.
+        """
+        assert isinstance(self.steps, StepBuffer)
         assert self.dataset_manager.info_model is not None
+        nb_steps = len(self.steps)
+        frame_index = np.arange(nb_steps, dtype=np.int64)
         # global_frame_offset is the total number of frames in the dataset *before* this episode's frames.
         global_frame_offset = self.dataset_manager.info_model.total_frames
 
-        episode_data_dict: Dict[str, List] = {
-            "action": [],
-            "observation.state": [],
-            "timestamp": [],
-            "task_index": [],
-            "episode_index": [],
-            "frame_index": [],
-            "index": [],
-        }
-
-        # We rewrite the timestamps based on the frequency to validate LeRobot tests
-        timestamps_for_episode = (np.arange(len(self.steps)) / self.freq).tolist()
-
-        episode_data_dict["timestamp"] = timestamps_for_episode
-
-        for local_frame_idx, step_item in enumerate(self.steps):
-            episode_data_dict["episode_index"].append(
-                self.episode_index
-            )  # from self.metadata
-            episode_data_dict["frame_index"].append(
-                local_frame_idx
-            )  # 0 to N-1 for this episode
-            # LeRobot's "observation.state" is our "joints_position"
-            episode_data_dict["observation.state"].append(
-                step_item.observation.joints_position.astype(np.float32)
-            )
-            # "index" is the global frame index across the entire dataset
-            episode_data_dict["index"].append(local_frame_idx + global_frame_offset)
-            episode_data_dict["task_index"].append(self.metadata["task_index"])
-
-            if (
-                step_item.action is None
-            ):  # Should have been set by update_previous_step, except for the very last step
-                if (
-                    local_frame_idx == len(self.steps) - 1
-                ):  # Last step, action can be a placeholder (e.g., repeat joints_position)
-                    logger.debug(
-                        f"Last step (idx {local_frame_idx}) of episode {self.episode_index} has no action; using its own joints_position."
-                    )
-                    episode_data_dict["action"].append(
-                        step_item.observation.joints_position.astype(
-                            np.float32
-                        ).tolist()
-                    )
-                else:  # Should not happen for intermediate steps
-                    raise ValueError(
-                        f"Step {local_frame_idx} in episode {self.episode_index} has no action set before saving."
-                    )
-            else:
-                episode_data_dict["action"].append(
-                    step_item.action.astype(np.float32).tolist()
-                )
-
-        # Basic validation for main camera frames (if any)
-        main_cam_frames = self.get_episode_frames_main_camera()
-        if main_cam_frames:
-            first_frame_shape = main_cam_frames[0].shape
-            if not all(
-                f.shape == first_frame_shape and f.ndim == 3 for f in main_cam_frames
-            ):
-                logger.warning(
-                    "Main camera frames have inconsistent shapes or dimensions."
-                )
-                # This could be an error depending on strictness:
-                # raise ValueError("All main_image frames must have the same dimensions and be 3-channel RGB images.")
-
-        return LeRobotEpisodeModel(**episode_data_dict)
+        table = pa.table(
+            {
+                "action": _list_array(self.steps.actions),
+                # LeRobot's "observation.state" is our "joints_position"
+                "observation.state": _list_array(self.steps.joints_positions),
+                # We rewrite the timestamps based on the frequency to validate LeRobot tests
+                "timestamp": frame_index / self.freq,
+                "task_index": np.full(
+                    nb_steps, self.metadata["task_index"], dtype=np.int64
+                ),
+                "episode_index": np.full(nb_steps, self.episode_index, dtype=np.int64),
+                "frame_index": frame_index,
+                # "index" is the global frame index across the entire dataset
+                "index": frame_index + global_frame_offset,
+            }
+        )
+        pq.write_table(table, str(self._parquet_path))
 
     async def save(self, **kwargs) -> None:
         if not self.steps:
@@ -1400,106 +1627,69 @@ class LeRobotEpisode(BaseEpisode):
             self.dataset_manager.info_model is not None
         )  # Should have been initialized
 
-        # Sanity check: make sure the actions and observations don't have any null or nan values
-        for step in self.steps:
-            if step.action is None or np.isnan(step.action).any():
-                # Attempt to repair the action by using the observation's joints_position
-                if (
-                    step.observation.joints_position is not None
-                    and not np.isnan(step.observation.joints_position).any()
-                ):
-                    logger.warning(
-                        f"Action in episode {self.episode_index} is None or NaN, automatically filling in the value."
-                    )
-                    step.action = step.observation.joints_position
-                else:
-                    raise ValueError(
-                        f"Step action in episode {self.episode_index} is None or NaN"
-                    )
-            if (
-                step.observation.joints_position is None
-                or np.isnan(step.observation.joints_position).any()
-            ):
-                # Attempt to repair the observation by using the action
-                if step.action is not None and not np.isnan(step.action).any():
-                    logger.warning(
-                        f"Observation in episode {self.episode_index} is None or NaN, automatically filling in the value."
-                    )
-                    step.observation.joints_position = step.action
-                else:
-                    raise ValueError(
-                        f"Step observation in episode {self.episode_index} is None or NaN"
-                    )
-
-        # 1. Save Parquet data for the episode
-        lerobot_parquet_model = self._convert_to_le_robot_episode_model()
-        lerobot_parquet_model.to_parquet(str(self._parquet_path))
-        logger.debug(
-            f"Episode data for {self.episode_index} saved to {self._parquet_path}"
+        try:
+            if not isinstance(self.steps, StepBuffer):
+                self.steps = StepBuffer.from_steps(self.steps)
+            self._repair_steps()
+            await self._save_files()
+        except Exception:
+            # The meta models of the dataset manager may be partially updated
+            self.discard()
+            raise
+        logger.success(
+            f"LeRobotEpisode {self.episode_index} and all dataset meta files saved for '{self.dataset_manager.dataset_name}'."
         )
 
-        # 2. Save Videos for the episode
-        main_camera_frames = self.get_episode_frames_main_camera()
-        secondary_camera_frames_by_cam = (
-            self.get_episode_frames_secondary_cameras()
-        )  # List of frame lists
+    def _repair_steps(self) -> None:
+        """
+        Sanity check: make sure the actions and observations don't have any null or nan values
+        """
+        assert isinstance(self.steps, StepBuffer)
+        actions = self.steps.actions
+        joints_positions = self.steps.joints_positions
+        valid_joints = ~np.isnan(joints_positions).any(axis=1)
 
-        # Iterate through camera configurations in InfoModel to ensure all expected videos are handled
-        for i, (cam_key_in_info, video_feature_details) in enumerate(
-            self.dataset_manager.info_model.features.observation_images.items()
-        ):
-            frames_for_this_video: Optional[List[np.ndarray]] = None
-
-            if cam_key_in_info == "observation.images.main":
-                frames_for_this_video = main_camera_frames
-            else:  # Secondary camera
-                # Try to match cam_key_in_info with available secondary_camera_frames_by_cam
-                # This assumes secondary_camera_frames_by_cam is ordered as per info_model's secondary keys.
-                # A more robust match would use actual keys if secondary_images in Observation were a dict.
-                # For now, simple positional matching after main.
-                secondary_cam_idx = (
-                    i - 1
-                )  # If i=0 is main, i=1 is first secondary (idx 0 in list)
-                if 0 <= secondary_cam_idx < len(secondary_camera_frames_by_cam):
-                    frames_for_this_video = secondary_camera_frames_by_cam[
-                        secondary_cam_idx
-                    ]
+        # Attempt to repair the actions by using the observation's joints_position.
+        # The last step has no next observation: its action is always filled in.
+        invalid_actions = ~self.steps.action_is_set | np.isnan(actions).any(axis=1)
+        if (invalid_actions & ~valid_joints).any():
+            raise ValueError(
+                f"Step action in episode {self.episode_index} is None or NaN"
+            )
+        if invalid_actions[:-1].any():
+            logger.warning(
+                f"{invalid_actions[:-1].sum()} actions in episode {self.episode_index} are None or NaN, automatically filling in the values."
+            )
+        actions[invalid_actions] = joints_positions[invalid_actions]
+        self.steps.action_is_set[invalid_actions] = True
 
-            if frames_for_this_video and len(frames_for_this_video) > 0:
-                video_file_path = self._get_video_path(camera_key=cam_key_in_info)
-                # target_size for create_video_file is (width, height)
-                # video_feature_details.shape is [height, width, channels]
-                video_target_size = (
-                    video_feature_details.shape[1],
-                    video_feature_details.shape[0],
-                )
+        # Attempt to repair the observations by using the actions
+        if not valid_joints.all():
+            logger.warning(
+                f"{(~valid_joints).sum()} observations in episode {self.episode_index} are None or NaN, automatically filling in the values."
+            )
+            joints_positions[~valid_joints] = actions[~valid_joints]
 
-                saved_path = create_video_file(
-                    frames=np.array(
-                        frames_for_this_video
-                    ),  # create_video_file expects np.array of frames
-                    output_path=str(video_file_path),
-                    target_size=video_target_size,  # Ensure this is (width, height)
-                    fps=video_feature_details.info.video_fps,
-                    codec=video_feature_details.info.video_codec,
-                )
-                if (isinstance(saved_path, str) and os.path.exists(saved_path)) or (
-                    isinstance(saved_path, tuple)
-                    and all(os.path.exists(p) for p in saved_path)
-                ):  # Stereo case
-                    logger.debug(
-                        f"Video for {cam_key_in_info} (episode {self.episode_index}) saved to {video_file_path}"
-                    )
-                else:
-                    logger.error(
-                        f"Failed to save video for {cam_key_in_info} (episode {self.episode_index}) to {video_file_path}"
-                    )
-            else:
-                logger.warning(
-                    f"No frames found for camera {cam_key_in_info} in episode {self.episode_index}. Skipping video saving."
-                )
+    async def _save_files(self) -> None:
+        assert self.dataset_manager.info_model is not None
+
+        # 1. Finalize the videos of the episode
+        if self._video_encoders is not None:
+            await asyncio.to_thread(self._close_video_encoders)
+            self._update_image_stats()
+        else:
+            await asyncio.to_thread(self._save_videos_from_steps)
 
-        # 3. Update Dataset-level InfoModel (after this episode is fully processed)
+        # 2. An episode before this one failed to save: take its index
+        self._fill_episode_index_gap()
+
+        # 3. Save Parquet data for the episode
+        self._write_parquet()
+        logger.debug(
+            f"Episode data for {self.episode_index} saved to {self._parquet_path}"
+        )
+
+        # 4. Update Dataset-level InfoModel (after this episode is fully processed)
         self.dataset_manager.info_model.total_frames += len(self.steps)
         # total_episodes should be the count of saved episodes. If this is episode N, total_episodes becomes N+1.
         # This assumes episodes are saved sequentially and episode_index is 0-based.
@@ -1518,11 +1708,166 @@ class LeRobotEpisode(BaseEpisode):
                 self.metadata["task_index"] + 1
             )
 
-        # 4. Save all (potentially updated) meta models from the dataset manager
-        self.dataset_manager.save_all_meta_models()
-        logger.success(
-            f"LeRobotEpisode {self.episode_index} and all dataset meta files saved for '{self.dataset_manager.dataset_name}'."
+        # 5. Append the meta data of the episode to the meta files
+        self.dataset_manager.save_episode_meta_models(self.episode_index)
+
+    def _fill_episode_index_gap(self) -> None:
+        """
+        The episodes are saved in order. If an episode recorded before this one was
+        not saved, its index is free: move the videos and the meta data of this
+        episode to it, so that the indices of the dataset stay contiguous.
+        """
+        assert self.dataset_manager.info_model is not None
+        new_index = self.dataset_manager.info_model.total_episodes
+        old_index = self.episode_index
+        if old_index <= new_index:
+            return
+        logger.warning(
+            f"Episode {new_index} was not saved. Saving episode {old_index} as episode {new_index}."
         )
+        old_prefix = f"episode_{old_index:06d}"
+        new_prefix = f"episode_{new_index:06d}"
+        for camera_folder in self.dataset_manager.get_camera_folders_full_paths():
+            for file_name in os.listdir(camera_folder):
+                if file_name.startswith(old_prefix):
+                    os.replace(
+                        os.path.join(camera_folder, file_name),
+                        os.path.join(
+                            camera_folder, file_name.replace(old_prefix, new_prefix, 1)
+                        ),
+                    )
+        self.dataset_manager.move_episode_index(old_index, new_index)
+        self.episode_index = new_index
+
+    def _log_saved_video(
+        self,
+        saved_path: Union[str, Tuple[str, str], None],
+        cam_key_in_info: str,
+        video_file_path: Path,
+    ) -> None:
+        if (isinstance(saved_path, str) and os.path.exists(saved_path)) or (
+            isinstance(saved_path, tuple) and all(os.path.exists(p) for p in saved_path)
+        ):  # Stereo case
+            logger.debug(
+                f"Video for {cam_key_in_info} (episode {self.episode_index}) saved to {video_file_path}"
+            )
+        else:
+            logger.error(
+                f"Failed to save video for {cam_key_in_info} (episode {self.episode_index}) to {video_file_path}"
+            )
+
+    def _close_video_encoders(self) -> None:
+        """
+        Flush the streaming video encoders started in start_new and finalize the video files.
+        The encoders are flushed concurrently. They share the video encoding slots, so
+        at most MAX_VIDEO_ENCODING_WORKERS videos are encoded at a time.
+        """
+        assert self._video_encoders is not None
+        encoders = []
+        for cam_key_in_info, encoder in self._video_encoders.items():
+            if encoder.frame_count == 0:
+                encoder.abort()
+                logger.warning(
+                    f"No frames found for camera {cam_key_in_info} in episode {self.episode_index}. Skipping video saving."
+                )
+                continue
+            encoders.append((cam_key_in_info, encoder))
+
+        for _, encoder in encoders:
+            encoder.finish()
+        for cam_key_in_info, encoder in encoders:
+            saved_path = encoder.close()
+            self._log_saved_video(
+                saved_path, cam_key_in_info, Path(encoder.output_path)
+            )
+        self._video_encoders = None
+
+    def _update_image_stats(self) -> None:
+        """
+        Add the image stats counted by the video encoders to the stats of the episode.
+        """
+        if self._image_stats is None:
+            return
+        stats_model: Optional[StatsModel] = None
+        if self.dataset_manager.format_version == "lerobot_v2.1":
+            assert self.dataset_manager.episodes_stats_model is not None
+            # Other episodes can be recording or waiting to be saved
+            for (
+                episode_stats
+            ) in self.dataset_manager.episodes_stats_model.episodes_stats:
+                if episode_stats.episode_index == self.episode_index:
+                    stats_model = episode_stats.stats
+        elif self.dataset_manager.format_version == "lerobot_v2":
+            stats_model = self.dataset_manager.get_pending_stats_model(
+                self.episode_index
+            )
+        if stats_model is None:
+            return
+
+        for image_stats_key, accumulator in self._image_stats.items():
+            image_stats = accumulator.stats()
+            if image_stats is None:
+                continue
+            if image_stats_key not in stats_model.observation_images:
+                stats_model.observation_images[image_stats_key] = Stats()
+            stats_model.observation_images[image_stats_key].update_image_stats(
+                *image_stats
+            )
+        self._image_stats = None
+
+    def _save_videos_from_steps(self) -> None:
+        """
+        Encode the videos from the frames stored in the steps. The cameras and the
+        eyes of the stereo cameras are encoded concurrently.
+        """
+        assert self.dataset_manager.info_model is not None
+
+        # Iterate through camera configurations in InfoModel to ensure all expected videos are handled
+        jobs: Dict[str, List[VideoEncodingJob]] = {}
+        for i, (cam_key_in_info, video_feature_details) in enumerate(
+            self.dataset_manager.info_model.features.observation_images.items()
+        ):
+            frames_for_this_video = [
+                frame
+                for frame in (
+                    self._get_step_frame(step, i, cam_key_in_info)
+                    for step in self.steps
+                )
+                if frame is not None
+            ]
+
+            if len(frames_for_this_video) > 0:
+                # target_size is (width, height)
+                # video_feature_details.shape is [height, width, channels]
+                jobs[cam_key_in_info] = get_video_encoding_jobs(
+                    frames=np.array(frames_for_this_video),
+                    output_path=str(self._get_video_path(camera_key=cam_key_in_info)),
+                    target_size=(
+                        video_feature_details.shape[1],
+                        video_feature_details.shape[0],
+                    ),
+                    fps=video_feature_details.info.video_fps,
+                    codec=video_feature_details.info.video_codec,
+                )
+            else:
+                logger.warning(
+                    f"No frames found for camera {cam_key_in_info} in episode {self.episode_index}. Skipping video saving."
+                )
+
+        saved_paths = iter(
+            encode_videos(
+                [job for camera_jobs in jobs.values() for job in camera_jobs],
+                max_workers=config.MAX_VIDEO_ENCODING_WORKERS,
+                thread_count=config.VIDEO_ENCODER_THREADS,
+            )
+        )
+        for cam_key_in_info, camera_jobs in jobs.items():
+            paths = [next(saved_paths) for _ in camera_jobs]
+            self._log_saved_video(
+                paths[0] if len(paths) == 1 else (paths[0], paths[1]),
+                cam_key_in_info,
+                self._get_video_path(camera_key=cam_key_in_info),
+            )
 
     @classmethod
     def from_parquet(
@@ -1777,7 +2122,11 @@ class TasksModel(BaseModel):
         ) as f:
             tasks = []
             for line in f:
-                tasks.append(TasksFeatures(**json.loads(line)))
+                try:
+                    tasks.append(TasksFeatures(**json.loads(line)))
+                except ValueError:
+                    # Partial line written during a crash
+                    logger.warning(f"Skipping invalid line in tasks.jsonl: {line!r}")
 
         tasks_model = cls(tasks=tasks)
         # Do it after model init, otherwise pydantic ignores the value of _original_nb_total_tasks
@@ -1804,16 +2153,22 @@ class TasksModel(BaseModel):
         """
 
         if save_mode == "overwrite":
-            with open(f"{meta_folder_path}/tasks.jsonl", "w") as f:
-                for task in self.tasks:
-                    f.write(task.model_dump_json() + "\n")
+            write_file_atomically(
+                f"{meta_folder_path}/tasks.jsonl",
+                "".join(task.model_dump_json() + "\n" for task in self.tasks),
+                encoding=DEFAULT_FILE_ENCODING,
+            )
         elif save_mode == "append":
-            with open(
-                f"{meta_folder_path}/tasks.jsonl", "a", encoding=DEFAULT_FILE_ENCODING
-            ) as f:
-                # Only append the new tasks to the file
-                for task in self.tasks[self._initial_nb_total_tasks :]:
-                    f.write(task.model_dump_json() + "\n")
+            # Only append the new tasks to the file
+            append_lines_durably(
+                f"{meta_folder_path}/tasks.jsonl",
+                [
+                    task.model_dump_json()
+                    for task in self.tasks[self._initial_nb_total_tasks :]
+                ],
+                encoding=DEFAULT_FILE_ENCODING,
+            )
+        self._initial_nb_total_tasks = len(self.tasks)
 
     def update(self, step: Step) -> None:
         """
@@ -2021,20 +2376,68 @@ class EpisodesModel(BaseModel):
         Write the episodes.jsonl file in the meta folder path.
         """
         if save_mode == "append":
-            with open(f"{meta_folder_path}/episodes.jsonl", "a") as f:
-                for episode in self.episodes[self._original_nb_total_episodes :]:
-                    f.write(episode.model_dump_json() + "\n")
+            append_lines_durably(
+                f"{meta_folder_path}/episodes.jsonl",
+                [
+                    episode.model_dump_json()
+                    for episode in self.episodes[self._original_nb_total_episodes :]
+                ],
+            )
         elif save_mode == "overwrite":
             if self._episodes_features is None:
                 self._episodes_features = {
                     episode.episode_index: episode for episode in self.episodes
                 }
 
-            with open(f"{meta_folder_path}/episodes.jsonl", "w") as f:
-                for episode in self._episodes_features.values():
-                    f.write(episode.model_dump_json() + "\n")
+            write_file_atomically(
+                f"{meta_folder_path}/episodes.jsonl",
+                "".join(
+                    episode.model_dump_json() + "\n"
+                    for episode in self._episodes_features.values()
+                ),
+            )
         else:
             raise ValueError("save_mode must be 'append' or 'overwrite'")
+        self._original_nb_total_episodes = len(self.episodes)
+
+    def remove_episode(self, episode_index: int) -> None:
+        """
+        Remove an episode which was not saved.
+        """
+        self.episodes = [
+            episode
+            for episode in self.episodes
+            if episode.episode_index != episode_index
+        ]
+        if self._episodes_features is not None:
+            self._episodes_features.pop(episode_index, None)
+
+    def reindex_episode(self, old_index: int, new_index: int) -> None:
+        """
+        Change the index of an episode which was not saved yet.
+        """
+        for episode in self.episodes:
+            if episode.episode_index == old_index:
+                episode.episode_index = new_index
+                if self._episodes_features is not None:
+                    self._episodes_features.pop(old_index, None)
+                    self._episodes_features[new_index] = episode
+
+    def append_episode(self, meta_folder_path: str, episode_index: int) -> None:
+        """
+        Append the line of a new episode to the episodes.jsonl file, without
+        rewriting the previous ones.
+        """
+        if self._episodes_features is None:
+            self._episodes_features = {
+                episode.episode_index: episode for episode in self.episodes
+            }
+        episode = self._episodes_features.get(episode_index)
+        if episode is None:
+            raise ValueError(f"Episode {episode_index} not found in the episodes model")
+        append_lines_durably(
+            f"{meta_folder_path}/episodes.jsonl", [episode.model_dump_json()]
+        )
 
     @classmethod
     def from_jsonl(
@@ -2054,7 +2457,13 @@ class EpisodesModel(BaseModel):
         ) as f:
             last_index = 0
             for line in f:
-                episodes_feature = EpisodesFeatures.model_validate_json(line)
+                try:
+                    episodes_feature = EpisodesFeatures.model_validate_json(line)
+                except ValueError:
+                    # Partial line written during a crash. The episode is recovered
+                    # from its parquet file below.
+                    logger.warning(f"Skipping invalid line in episodes.jsonl: {line!r}")
+                    continue
                 _episodes_features[episodes_feature.episode_index] = episodes_feature
                 # If we skipped an index, check if the parquet file exists and if so recreate the episode
                 if episodes_feature.episode_index != last_index + 1:
@@ -2375,6 +2784,37 @@ class Stats(BaseModel):
             self.square_sum = self.square_sum + value**2
             self.count += 1
 
+    def merge(self, other: "Stats", offset: int = 0) -> None:
+        """
+        Add the rolling stats of other, eg. of an episode, to these stats.
+        offset is added to the values of other, eg. to shift the frame indices of
+        an episode after the frames already counted.
+        """
+        if other.count == 0 or other.sum is None or other.square_sum is None:
+            return
+        assert other.min is not None and other.max is not None
+        other_min = other.min + offset
+        other_max = other.max + offset
+        other_sum = other.sum + offset * other.count
+        other_square_sum = (
+            other.square_sum + 2 * offset * other.sum + offset**2 * other.count
+        )
+
+        # If square_sum is None, use the std to compute the square sum
+        if self.square_sum is None and self.std is not None and self.mean is not None:
+            self.square_sum = self.std**2 + self.mean**2
+
+        self.max = other_max if self.max is None else np.maximum(self.max, other_max)
+        self.min = other_min if self.min is None else np.minimum(self.min, other_min)
+        if self.sum is None or self.square_sum is None:
+            self.sum = other_sum
+            self.square_sum = other_square_sum
+            self.count = other.count
+        else:
+            self.sum = self.sum + other_sum
+            self.square_sum = self.square_sum + other_square_sum
+            self.count += other.count
+
     def compute_from_rolling(self):
         """
         Compute the mean and std from the rolling sum and square sum.
@@ -2412,41 +2852,52 @@ class Stats(BaseModel):
         if image_value is None:
             return None
 
+        image_norm_32 = image_value.astype(dtype=np.float32) / 255.0
+        self.update_image_stats(
+            min_value=np.min(image_norm_32, axis=(0, 1)),
+            max_value=np.max(image_norm_32, axis=(0, 1)),
+            sum_value=np.sum(image_norm_32, axis=(0, 1)),
+            square_sum_value=np.sum(image_norm_32**2, axis=(0, 1)),
+            nb_pixels=image_norm_32.shape[0] * image_norm_32.shape[1],
+        )
+
+    def update_image_stats(
+        self,
+        min_value: np.ndarray,
+        max_value: np.ndarray,
+        sum_value: np.ndarray,
+        square_sum_value: np.ndarray,
+        nb_pixels: int,
+    ) -> None:
+        """
+        Update the stats with the per channel min, max, sum and square sum of the
+        normalized values of nb_pixels pixels, eg. from an ImageStatsAccumulator.
+        """
+
         # Compute the square sum if not available
         if self.square_sum is None and self.std is not None and self.mean is not None:
             self.square_sum = self.std**2 + self.mean**2
 
-        image_norm_32 = image_value.astype(dtype=np.float32) / 255.0
-
-        # Update the max and min
+        # Update the max and min in each channel
+        # Reshape to have the same shape as the mean and std
         if self.max is None:
-            self.max = np.max(image_norm_32, axis=(0, 1)).reshape(3, 1, 1)
+            self.max = max_value.reshape(3, 1, 1)
         else:
-            image_max_pixel = np.max(image_norm_32, axis=(0, 1)).reshape(3, 1, 1)
-            # maximum is the max in each channel
-            self.max = np.maximum(self.max, image_max_pixel)
+            self.max = np.maximum(self.max, max_value.reshape(3, 1, 1))
 
         if self.min is None:
-            self.min = np.min(image_norm_32, axis=(0, 1)).reshape(3, 1, 1)
-            # Reshape to have the same shape as the mean and std
-            self.min = self.min.reshape(3, 1, 1)
+            self.min = min_value.reshape(3, 1, 1)
         else:
-            image_min_pixel = np.min(image_norm_32, axis=(0, 1)).reshape(3, 1, 1)
-            # Set the min to the min in each channel
-            self.min = np.minimum(self.min, image_min_pixel)
-            # Reshape to have the same shape as the mean and std
-            self.min = self.min.reshape(3, 1, 1) if self.min is not None else self.min
+            self.min = np.minimum(self.min, min_value.reshape(3, 1, 1)).reshape(3, 1, 1)
 
         # Update the rolling sum and square sum
-        nb_pixels = image_norm_32.shape[0] * image_norm_32.shape[1]
-        # Convert to int32 to avoid overflow when computing the square sum
         if self.sum is None or self.square_sum is None:
-            self.sum = np.sum(image_norm_32, axis=(0, 1))
-            self.square_sum = np.sum(image_norm_32**2, axis=(0, 1))
+            self.sum = sum_value
+            self.square_sum = square_sum_value
             self.count = nb_pixels
         else:
-            self.sum = self.sum + np.sum(image_norm_32, axis=(0, 1))
-            self.square_sum = self.square_sum + np.sum(image_norm_32**2, axis=(0, 1))
+            self.sum = self.sum + sum_value
+            self.square_sum = self.square_sum + square_sum_value
             self.count += nb_pixels
 
     def compute_from_rolling_images(self):
@@ -2550,20 +3001,24 @@ class StatsModel(BaseModel):
             model_dict[key] = value
         model_dict.pop("observation.images")
 
-        with open(
-            f"{meta_folder_path}/stats.json", "w", encoding=DEFAULT_FILE_ENCODING
-        ) as f:
-            # Write the pydantic Basemodel as a str
-            f.write(json.dumps(model_dict, indent=4))
+        # Write the pydantic Basemodel as a str
+        write_file_atomically(
+            f"{meta_folder_path}/stats.json",
+            json.dumps(model_dict, indent=4),
+            encoding=DEFAULT_FILE_ENCODING,
+        )
 
     def update(
         self,
         step: Step,
         episode_index: int,
         current_step_index: int,
+        update_images: bool = True,
     ) -> None:
         """
         Updates the stats with the given step.
+        If update_images is False, the image stats are updated separately, eg. by
+        the video encoders of the episode.
         """
 
         self.action.update(
@@ -2579,6 +3034,9 @@ class StatsModel(BaseModel):
         # This should be the index of the instruction as it's in tasks.jsonl (TasksModel)
         self.task_index.update(np.array([0]))
 
+        if not update_images:
+            return
+
         main_image = step.observation.main_image
         if main_image is not None:
             if "observation.images.main" not in self.observation_images.keys():
@@ -2600,10 +3058,43 @@ class StatsModel(BaseModel):
                 f"observation.images.secondary_{image_index}"
             ].update_image(image)
 
-    def save(self, meta_folder_path: str) -> None:
+    def add_episode_stats(self, episode_stats: "StatsModel") -> None:
         """
-        Save the stats to the meta folder path.
-        Also computes the final mean and std for the Stats objects.
+        Add the rolling stats of an episode, recorded in its own StatsModel, to these
+        stats of the whole dataset. The indices of the frames of the episode follow
+        the frames already counted.
+        """
+        self.index.merge(episode_stats.index, offset=self.index.count)
+        for field_name in [
+            "observation_state",
+            "action",
+            "timestamp",
+            "frame_index",
+            "episode_index",
+            "task_index",
+        ]:
+            getattr(self, field_name).merge(getattr(episode_stats, field_name))
+        for key, image_stats in episode_stats.observation_images.items():
+            if key not in self.observation_images:
+                self.observation_images[key] = Stats()
+            self.observation_images[key].merge(image_stats)
+
+    def set_episode_index(self, episode_index: int) -> None:
+        """
+        Set the stats of the episode_index column of an episode which was not saved yet.
+        """
+        count = self.episode_index.count
+        self.episode_index = Stats(
+            max=np.array([episode_index]),
+            min=np.array([episode_index]),
+            sum=np.array([episode_index * count]),
+            square_sum=np.array([episode_index**2 * count]),
+            count=count,
+        )
+
+    def compute_from_rolling(self) -> None:
+        """
+        Compute the final mean and std of the Stats objects from their rolling sums.
         """
         for field_key, field_value in self.__dict__.items():
             # if field is a Stats object, call .compute_from_rolling() to get the final mean and std
@@ -2619,6 +3110,12 @@ class StatsModel(BaseModel):
                     except ValueError as e:
                         logger.error(f"Error computing mean and std for {key}: {e}")
 
+    def save(self, meta_folder_path: str) -> None:
+        """
+        Save the stats to the meta folder path.
+        Also computes the final mean and std for the Stats objects.
+        """
+        self.compute_from_rolling()
         self.to_json(meta_folder_path)
 
     def _update_for_episode_removal_mean_std_count(
@@ -3011,7 +3508,13 @@ class EpisodesStatsModel(BaseModel):
 
     episodes_stats: List[EpisodesStatsFeatures] = Field(default_factory=list)
 
-    def update(self, step: Step, episode_index: int, current_step_index: int) -> None:
+    def update(
+        self,
+        step: Step,
+        episode_index: int,
+        current_step_index: int,
+        update_images: bool = True,
+    ) -> None:
         """
         Updates the episodes_stats with the given step.
         """
@@ -3025,6 +3528,7 @@ class EpisodesStatsModel(BaseModel):
                 step=step,
                 episode_index=episode_index,
                 current_step_index=current_step_index,
+                update_images=update_images,
             )
             return
 
@@ -3037,6 +3541,7 @@ class EpisodesStatsModel(BaseModel):
             step=step,
             episode_index=episode_index,
             current_step_index=current_step_index,
+            update_images=update_images,
         )
         self.episodes_stats.append(new_episode_stats)
 
@@ -3044,13 +3549,53 @@ class EpisodesStatsModel(BaseModel):
         """
         Write the episodes_stats.jsonl file in the meta folder path.
         """
-        with open(
+        write_file_atomically(
             f"{meta_folder_path}/episodes_stats.jsonl",
-            "w",
+            "".join(
+                episode_stats.to_json() + "\n" for episode_stats in self.episodes_stats
+            ),
             encoding=DEFAULT_FILE_ENCODING,
-        ) as f:
-            for episode_stats in self.episodes_stats:
-                f.write(episode_stats.to_json() + "\n")
+        )
+
+    def remove_episode(self, episode_index: int) -> None:
+        """
+        Remove an episode which was not saved.
+        """
+        self.episodes_stats = [
+            episode_stats
+            for episode_stats in self.episodes_stats
+            if episode_stats.episode_index != episode_index
+        ]
+
+    def reindex_episode(self, old_index: int, new_index: int) -> None:
+        """
+        Change the index of an episode which was not saved yet, and the stats of
+        its episode_index column.
+        """
+        for episode_stats in self.episodes_stats:
+            if episode_stats.episode_index == old_index:
+                episode_stats.episode_index = new_index
+                episode_stats.stats.set_episode_index(new_index)
+
+    def append_episode(self, meta_folder_path: str, episode_index: int) -> None:
+        """
+        Compute the final stats of a new episode and append its line to the
+        episodes_stats.jsonl file, without rewriting the previous ones.
+        """
+        # The new episode is usually the last one
+        for episode_stats in reversed(self.episodes_stats):
+            if episode_stats.episode_index == episode_index:
+                break
+        else:
+            raise ValueError(
+                f"Episode {episode_index} not found in the episodes stats model"
+            )
+        episode_stats.stats.compute_from_rolling()
+        append_lines_durably(
+            f"{meta_folder_path}/episodes_stats.jsonl",
+            [episode_stats.to_json()],
+            encoding=DEFAULT_FILE_ENCODING,
+        )
 
     @classmethod
     def from_jsonl(cls, meta_folder_path: str) -> "EpisodesStatsModel":
@@ -3071,7 +3616,14 @@ class EpisodesStatsModel(BaseModel):
         ) as f:
             _episodes_stats_dict: dict[int, EpisodesStatsFeatures] = {}
             for line in f:
-                parsed_line: dict = json.loads(line)
+                try:
+                    parsed_line: dict = json.loads(line)
+                except ValueError:
+                    # Partial line written during a crash
+                    logger.warning(
+                        f"Skipping invalid line in episodes_stats.jsonl: {line[:100]!r}"
+                    )
+                    continue
 
                 episodes_stats_feature = EpisodesStatsFeatures.model_validate(
                     parsed_line
@@ -3105,19 +3657,7 @@ class EpisodesStatsModel(BaseModel):
         Also computes the final mean and std for the Stats objects.
         """
         for episode_stats in self.episodes_stats:
-            for field_key, field_value in episode_stats.stats.__dict__.items():
-                # if field is a Stats object, call .compute_from_rolling() to get the final mean and std
-                if isinstance(field_value, Stats):
-                    field_value.compute_from_rolling()
-
-                # Special case for images
-                if isinstance(field_value, dict) and field_key == "observation_images":
-                    for key, value in field_value.items():
-                        try:
-                            if isinstance(value, Stats):
-                                value.compute_from_rolling_images()
-                        except ValueError as e:
-                            logger.error(f"Error computing mean and std for {key}: {e}")
+            episode_stats.stats.compute_from_rolling()
 
         self.to_jsonl(meta_folder_path)
 
@@ -3646,10 +4186,11 @@ class InfoModel(BaseModel):
         """
         Write the info.json file in the meta folder path.
         """
-        with open(
-            f"{meta_folder_path}/info.json", "w", encoding=DEFAULT_FILE_ENCODING
-        ) as f:
-            f.write(json.dumps(self.to_dict(), indent=4))
+        write_file_atomically(
+            f"{meta_folder_path}/info.json",
+            json.dumps(self.to_dict(), indent=4),
+            encoding=DEFAULT_FILE_ENCODING,
+        )
 
     def update(self, episode: LeRobotEpisode) -> None:
         """
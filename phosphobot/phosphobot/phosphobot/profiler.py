@@ -0,0 +1,321 @@
+"""
+Sampling profiler of all the threads of the server: the API event loop and its
+background tasks, the control loops, the motors bus workers and the cameras.
+
+A sampler thread reads the stacks of the other threads with sys._current_frames() at
+a fixed interval. Each sample is attributed to a named loop: the innermost function
+registered with `register_loop` in the stack, or else the name of the thread. The
+samples are aggregated by stack, so the memory doesn't grow with the duration of the
+session. Like any profiler running in the process, the sampler needs the GIL: a thread
+running Python code is sampled when it releases the GIL or at the switch interval. When the session stops, it is written as a speedscope file
+(https://www.speedscope.app) and as folded stacks for flamegraph.pl.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from types import CodeType
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from loguru import logger
+
+from phosphobot.models import ProfilingStatusResponse
+from phosphobot.utils import get_home_app_path
+
+profiler = None
+
+F = TypeVar("F", bound=Callable)
+
+# Code of the registered functions -> name of their loop
+_loop_codes: Dict[CodeType, str] = {}
+
+
+def register_loop(name: str) -> Callable[[F], F]:
+    """
+    Attribute the samples whose stack goes through the decorated function to the loop
+    `name`, whatever the thread it runs in. Used for the loops running as asyncio
+    tasks in the API event loop.
+    """
+
+    def decorator(function: F) -> F:
+        _loop_codes[function.__code__] = name
+        return function
+
+    return decorator
+
+
+class ProfilingSession:
+    """
+    Samples of the threads between a start and a stop of the profiler.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        duration: Optional[float],
+        output_dir: Path,
+    ):
+        self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.interval = interval
+        self.duration = duration
+        self.speedscope_path = output_dir / f"profile_{self.session_id}.speedscope.json"
+        self.flamegraph_path = output_dir / f"profile_{self.session_id}.folded"
+
+        # Functions of the stacks: code -> index in self._frames
+        self._frame_indices: Dict[CodeType, int] = {}
+        self._frames: List[CodeType] = []
+        # (loop, stack from the root to the leaf) -> [number of samples, seconds]
+        self._stacks: Dict[Tuple[str, Tuple[int, ...]], List[float]] = {}
+        self._samples_per_loop: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.nb_samples = 0
+        self.sampling_time = 0.0
+        self.start_time = time.perf_counter()
+        self.stop_time: Optional[float] = None
+        self.files_written = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profiler_sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling and wait for the files to be written.
+        """
+        self._stop_event.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self._stop_event.is_set()
+
+    @property
+    def elapsed(self) -> float:
+        end = self.stop_time if self.stop_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    def _run(self) -> None:
+        last_sample = time.perf_counter()
+        try:
+            while not self._stop_event.wait(self.interval):
+                now = time.perf_counter()
+                self._sample(weight=now - last_sample)
+                last_sample = now
+                self.sampling_time += time.perf_counter() - now
+                if self.duration is not None and self.elapsed >= self.duration:
+                    break
+        except Exception as e:
+            logger.error(f"Profiling session {self.session_id} failed: {e}")
+        finally:
+            self.stop_time = time.perf_counter()
+            self._write_files()
+
+    def _frame_index(self, code: CodeType) -> int:
+        index = self._frame_indices.get(code)
+        if index is None:
+            index = len(self._frames)
+            self._frame_indices[code] = index
+            self._frames.append(code)
+        return index
+
+    def _sample(self, weight: float) -> None:
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        sampler_id = threading.get_ident()
+        with self._lock:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id:
+                    continue
+                loop: Optional[str] = None
+                stack: List[int] = []
+                current = frame
+                while current is not None:
+                    code = current.f_code
+                    stack.append(self._frame_index(code))
+                    if loop is None:
+                        loop = _loop_codes.get(code)
+                    current = current.f_back
+                stack.reverse()
+                if loop is None:
+                    loop = thread_names.get(thread_id, f"thread_{thread_id}")
+
+                key = (loop, tuple(stack))
+                counts = self._stacks.get(key)
+                if counts is None:
+                    self._stacks[key] = [1, weight]
+                else:
+                    counts[0] += 1
+                    counts[1] += weight
+                self._samples_per_loop[loop] = self._samples_per_loop.get(loop, 0) + 1
+            self.nb_samples += 1
+
+    def speedscope(self) -> dict:
+        """
+        The session in the speedscope file format, with one profile per loop.
+        """
+        with self._lock:
+            stacks = list(self._stacks.items())
+            frames = [
+                {
+                    "name": code.co_name,
+                    "file": code.co_filename,
+                    "line": code.co_firstlineno,
+                }
+                for code in self._frames
+            ]
+
+        profiles: Dict[str, dict] = {}
+        for (loop, stack), (_, weight) in stacks:
+            profile = profiles.setdefault(
+                loop,
+                {
+                    "type": "sampled",
+                    "name": loop,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": 0.0,
+                    "samples": [],
+                    "weights": [],
+                },
+            )
+            profile["samples"].append(list(stack))
+            profile["weights"].append(weight)
+            profile["endValue"] += weight
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"phosphobot {self.session_id}",
+            "exporter": "phosphobot",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": sorted(profiles.values(), key=lambda p: -p["endValue"]),
+        }
+
+    def folded_stacks(self) -> str:
+        """
+        The session as folded stacks, one line per stack prefixed by its loop, with
+        the number of samples. Input of flamegraph.pl and of most flame graph tools.
+        """
+        with self._lock:
+            stacks = list(self._stacks.items())
+            names = [
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(
+                    ";", ":"
+                )
+                for code in self._frames
+            ]
+
+        lines = []
+        for (loop, stack), (count, _) in stacks:
+            frames = ";".join([loop.replace(";", ":")] + [names[i] for i in stack])
+            lines.append(f"{frames} {int(count)}")
+        return "\n".join(lines) + "\n"
+
+    def _write_files(self) -> None:
+        try:
+            self.speedscope_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.speedscope_path, "w") as f:
+                json.dump(self.speedscope(), f)
+            with open(self.flamegraph_path, "w") as f:
+                f.write(self.folded_stacks())
+            self.files_written = True
+            logger.info(
+                f"Profiling session {self.session_id}: {self.nb_samples} samples "
+                f"in {self.elapsed:.1f}s written to {self.speedscope_path}"
+            )
+        except Exception as e:
+            logger.error(
+                f"Failed to write the profiling session {self.session_id}: {e}"
+            )
+
+    def status(self) -> ProfilingStatusResponse:
+        with self._lock:
+            samples_per_loop = dict(self._samples_per_loop)
+        elapsed = self.elapsed
+        return ProfilingStatusResponse(
+            running=self.running,
+            session_id=self.session_id,
+            interval_ms=self.interval * 1000,
+            elapsed_s=elapsed,
+            nb_samples=self.nb_samples,
+            samples_per_loop=samples_per_loop,
+            overhead_percent=100 * self.sampling_time / elapsed
+            if elapsed > 0
+            else None,
+            speedscope_path=str(self.speedscope_path) if self.files_written else None,
+            flamegraph_path=str(self.flamegraph_path) if self.files_written else None,
+        )
+
+
+class SamplingProfiler:
+    """
+    Start and stop profiling sessions on demand, one at a time.
+    """
+
+    def __init__(self, output_dir: Optional[Path] = None):
+        self.output_dir = output_dir or get_home_app_path() / "profiles"
+        self._lock = threading.Lock()
+        self._session: Optional[ProfilingSession] = None
+
+    def start(
+        self, interval: float = 0.01, duration: Optional[float] = None
+    ) -> ProfilingStatusResponse:
+        """
+        Start a profiling session.
+
+        Args:
+            interval: Time between two samples of the threads, in seconds.
+            duration: Stop the session after this duration, in seconds. If None, the
+                session runs until stop() is called.
+        """
+        with self._lock:
+            if self._session is not None and self._session.running:
+                raise RuntimeError(
+                    f"Profiling session {self._session.session_id} is already running"
+                )
+            self._session = ProfilingSession(
+                interval=interval, duration=duration, output_dir=self.output_dir
+            )
+            self._session.start()
+            logger.info(f"Profiling session {self._session.session_id} started")
+            return self._session.status()
+
+    def stop(self) -> ProfilingStatusResponse:
+        """
+        Stop the running session and write its files.
+        """
+        with self._lock:
+            session = self._session
+        if session is None:
+            raise RuntimeError("No profiling session was started")
+        session.stop()
+        return session.status()
+
+    def status(self) -> ProfilingStatusResponse:
+        """
+        Status of the running session, or of the last one.
+        """
+        with self._lock:
+            session = self._session
+        if session is None:
+            return ProfilingStatusResponse(running=False)
+        return session.status()
+
+
+@lru_cache()
+def get_profiler() -> SamplingProfiler:
+    global profiler
+
+    if profiler is None:
+        profiler = SamplingProfiler()
+
+    return profiler
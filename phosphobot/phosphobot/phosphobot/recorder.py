@@ -2,16 +2,20 @@ import asyncio
 import os
 import time
 from concurrent.futures import ThreadPoolExecutor
-from typing import Literal, Optional, List
+from functools import partial
+from typing import Awaitable, Callable, Dict, Literal, Optional, List
 
 import numpy as np
 from fastapi import BackgroundTasks, Depends, Request
 from loguru import logger
 
-from phosphobot.camera import AllCameras, get_all_cameras
+from phosphobot.camera import AllCameras, BaseCamera, get_all_cameras
 from phosphobot.configs import config
+from phosphobot.episode_queue import EpisodeSaveQueue
 from phosphobot.hardware import BaseRobot
+from phosphobot.metrics import get_metrics
 from phosphobot.models import BaseDataset, Observation, Step
+from phosphobot.profiler import register_loop
 
 # New imports for refactored Episode structure
 from phosphobot.models import (
@@ -24,6 +28,16 @@ from phosphobot.robot import RobotConnectionManager, get_rcm
 from phosphobot.types import VideoCodecs
 from phosphobot.utils import background_task_log_exceptions, get_home_app_path
 from phosphobot.rerun_visualizer import RerunVisualizer
+from phosphobot.snapshot import Snapshot, SnapshotSubscription, get_snapshot_service
+
+RECORDER_LOOP_PERIOD_SECONDS = get_metrics().histogram(
+    "phosphobot_recorder_loop_period_seconds",
+    "Time between the starts of two steps of the recording loop, in seconds.",
+)
+RECORDER_OVERRUNS = get_metrics().counter(
+    "phosphobot_recorder_overruns_total",
+    "Steps of the recording loop which took longer than the recording period.",
+)
 
 # Recorder is now initialized in app startup and stored in app.state
 
@@ -31,7 +45,6 @@ from phosphobot.rerun_visualizer import RerunVisualizer
 class Recorder:
     episode_format: Literal["json", "lerobot_v2", "lerobot_v2.1"] = "lerobot_v2.1"
 
-    is_saving: bool = False
     is_recording: bool = False
     episode: Optional[BaseEpisode] = None  # Link to an Episode instance
     start_ts: float | None
@@ -40,11 +53,22 @@ class Recorder:
     cameras: AllCameras
     robots: list[BaseRobot]
 
-    # Performance optimization: thread pools for concurrent operations
+    # Performance optimization: the frames are converted concurrently. The robots and
+    # the cameras are sampled by the snapshot service, shared with the other consumers
     _image_thread_pool: Optional[ThreadPoolExecutor] = None
-    _robot_thread_pool: Optional[ThreadPoolExecutor] = None
     _max_image_workers: int = 4
-    _max_robot_workers: int = 2
+
+    # Per camera_id: sequence number of the last recorded frame, number of frames
+    # recorded twice because the camera had no new frame, and age of the last frame
+    _last_frame_seqs: Dict[int, int]
+    _duplicated_frames: Dict[int, int]
+    _frame_ages: Dict[int, float]
+
+    # Dataset managers by path: their meta models stay loaded between episodes
+    _lerobot_datasets: Dict[str, LeRobotDataset]
+
+    # The stopped episodes are saved in the background while the next ones record
+    save_queue: EpisodeSaveQueue
 
     # For push_to_hub, if Recorder handles it directly after save
     # _current_dataset_full_path_for_push: Optional[str] = None
@@ -57,31 +81,33 @@ class Recorder:
     ) -> str:  # Base folder for all recordings (".../phosphobot/recordings")
         return str(get_home_app_path() / "recordings")
 
+    @property
+    def is_saving(self) -> bool:
+        return self.save_queue.nb_pending > 0
+
     def __init__(self, robots: list[BaseRobot], cameras: AllCameras):
         self.robots = robots
         self.cameras = cameras
         self.rerun_visualizer = RerunVisualizer()
+        self._last_frame_seqs = {}
+        self._duplicated_frames = {}
+        self._frame_ages = {}
+        self._lerobot_datasets = {}
+        self.save_queue = EpisodeSaveQueue(max_pending=config.MAX_PENDING_EPISODE_SAVES)
 
         # Initialize thread pools for performance optimization with caps
         MAX_IMAGE_WORKERS = 8
-        MAX_ROBOT_WORKERS = 4
-        
+
         self._max_image_workers = min(
             MAX_IMAGE_WORKERS, max(1, len(cameras.camera_ids))
         )  # At least 1, capped at MAX_IMAGE_WORKERS
-        self._max_robot_workers = min(
-            MAX_ROBOT_WORKERS, max(1, len(robots) + 1)
-        )  # At least 1, capped at MAX_ROBOT_WORKERS
 
         self._image_thread_pool = ThreadPoolExecutor(
             max_workers=self._max_image_workers, thread_name_prefix="recorder_images"
         )
-        self._robot_thread_pool = ThreadPoolExecutor(
-            max_workers=self._max_robot_workers, thread_name_prefix="recorder_robots"
-        )
 
         logger.info(
-            f"Recorder initialized with {self._max_image_workers} image workers and {self._max_robot_workers} robot workers"
+            f"Recorder initialized with {self._max_image_workers} image workers"
         )
 
     async def start(
@@ -108,6 +134,11 @@ class Recorder:
             )
             await self.stop()  # Stop does not save, just halts the loop
 
+        if self.episode is not None:
+            # The previous episode was stopped without being saved
+            self.episode.discard()
+            self.episode = None
+
         self.robots = robots  # Update robots if a new list is provided
         self.cameras.cameras_ids_to_record = cameras_ids_to_record  # type: ignore
         self.freq = freq  # Store for record_loop
@@ -139,8 +170,7 @@ class Recorder:
             dataset_full_path = os.path.join(
                 self.episode_recording_folder, episode_format, dataset_name
             )
-            # LeRobotDataset constructor will ensure directories like meta, data, videos exist.
-            lerobot_dataset_manager = LeRobotDataset(path=dataset_full_path)
+            lerobot_dataset_manager = self._get_lerobot_dataset(dataset_full_path)
 
             # if self._use_push_to_hub_after_save:
             #     self._current_dataset_full_path_for_push = lerobot_dataset_manager.folder_full_path
@@ -163,6 +193,9 @@ class Recorder:
             episode_index = self.episode.episode_index if self.episode else 0
             self.rerun_visualizer.initialize(dataset_name, episode_index)
 
+        self._last_frame_seqs = {}
+        self._duplicated_frames = {}
+        self._frame_ages = {}
         self.is_recording = True
         self.start_ts = time.perf_counter()
 
@@ -176,6 +209,23 @@ class Recorder:
             f"Recording started for {self.episode_format} dataset '{dataset_name}'. Episode index: {self.episode.episode_index if self.episode else 'N/A'}"
         )
 
+    def _get_lerobot_dataset(self, dataset_full_path: str) -> LeRobotDataset:
+        """
+        Reuse the dataset manager of the previous episodes of the dataset, so that its
+        meta models aren't loaded again for every episode. The episodes being saved
+        share it to reserve their indices.
+        """
+        dataset = self._lerobot_datasets.get(dataset_full_path)
+        if (
+            dataset is None
+            # The dataset was deleted
+            or not os.path.isdir(dataset.meta_folder_full_path)
+        ):
+            # LeRobotDataset constructor will ensure directories like meta, data, videos exist.
+            dataset = LeRobotDataset(path=dataset_full_path)
+            self._lerobot_datasets[dataset_full_path] = dataset
+        return dataset
+
     async def stop(self) -> None:
         """
         Stop the recording without saving.
@@ -193,62 +243,38 @@ class Recorder:
         # self.episode remains as is, until save_episode or a new start clears it.
 
     async def save_episode(self) -> None:
-        if self.is_saving:
-            logger.warning("Already in the process of saving an episode. Please wait.")
-            return None  # Or raise an error/return a specific status
-
+        """
+        Stop the recording and queue the episode to be saved in the background.
+        Waits for a slot if too many episodes are waiting to be saved.
+        """
         if not self.episode:
             logger.error(
                 "No episode data found. Was recording started and were steps recorded?"
             )
             return None
 
-        if not self.episode.steps:
-            logger.warning("Episode contains no steps. Nothing to save.")
-            self.episode = None  # Clear the empty episode
-            return None
-
-        self.is_saving = True
         # Ensure recording is stopped before saving
         if self.is_recording:
             logger.info("Stopping active recording before saving.")
             await self.stop()
 
-        episode_to_save = self.episode  # Keep a reference
-        dataset_name_for_log = episode_to_save.metadata.get(
-            "dataset_name", "UnknownDataset"
-        )
-        episode_format_for_log = episode_to_save.metadata.get(
-            "episode_format", "UnknownFormat"
-        )
-
-        logger.info(
-            f"Starting to save episode for dataset '{dataset_name_for_log}' (format: {episode_format_for_log})..."
-        )
-
-        save_succeeded = False
-        try:
-            await episode_to_save.save()  # The episode handles all its saving logic
-            save_succeeded = True
-            self.episode = None  # Clear episode after successful save
-            logger.success(
-                f"Episode saved successfully for dataset '{dataset_name_for_log}'."
-            )
+        # The recorder can start the next episode
+        episode_to_save = self.episode
+        self.episode = None
 
-        except Exception as e:
-            logger.error(f"An error occurred during episode saving: {e}", exc_info=True)
-            # Keep episode for retry/inspection on failure
-            raise  # Re-throw for higher level handling if necessary
-        finally:
-            self.is_saving = False
-            # Only clear episode if save succeeded (already cleared above on success)
+        if not episode_to_save.steps:
+            logger.warning("Episode contains no steps. Nothing to save.")
+            episode_to_save.discard()
+            return None
 
+        dataset_path = str(episode_to_save.dataset_path)
+        push: Optional[Callable[[], Awaitable[None]]] = None
         if self.use_push_to_hf and isinstance(episode_to_save, LeRobotEpisode):
-            await self.push_to_hub(
-                dataset_path=str(episode_to_save.dataset_path),
-                branch_path=self.branch_path,
+            push = partial(
+                self.push_to_hub, dataset_path=dataset_path, branch_path=self.branch_path
             )
 
+        await self.save_queue.submit(episode_to_save, dataset_path=dataset_path, push=push)
         return None
 
     async def push_to_hub(self, dataset_path: str, branch_path: str | None = None) -> None:
@@ -277,6 +303,7 @@ class Recorder:
                 exc_info=True,
             )
 
+    @register_loop("recording")
     async def record_loop(
         self,
         target_size: tuple[int, int],
@@ -297,13 +324,53 @@ class Recorder:
             f"Record loop engaged for episode {self.episode.episode_index if self.episode else 'N/A'}. Cameras: {self.cameras.camera_ids=} ({self.cameras.main_camera=})"
         )
 
+        main_camera = self.cameras.main_camera
+        snapshots = get_snapshot_service().subscribe(
+            robots=self.robots,
+            cameras=[main_camera, *self.cameras.get_secondary_cameras()],
+            freq=self.freq,
+        )
+        try:
+            await self._record_steps(snapshots, target_size, language_instruction)
+        finally:
+            snapshots.close()
+
+        if self.rerun_visualizer and self.rerun_visualizer.enabled:
+            self.rerun_visualizer.finalize()
+
+        logger.info(
+            f"Recording loop for episode {self.episode.episode_index if self.episode else 'N/A'} has gracefully exited."
+        )
+
+    async def _record_steps(
+        self,
+        snapshots: SnapshotSubscription,
+        target_size: tuple[int, int],
+        language_instruction: str,
+    ) -> None:
+        assert self.episode is not None and self.start_ts is not None
+
         step_count = 0
+        previous_iteration_start_time: float | None = None
         while self.is_recording:  # This flag is controlled by self.stop()
             loop_iteration_start_time = time.perf_counter()
+            if previous_iteration_start_time is not None:
+                RECORDER_LOOP_PERIOD_SECONDS.observe(
+                    loop_iteration_start_time - previous_iteration_start_time
+                )
+            previous_iteration_start_time = loop_iteration_start_time
+
+            # The frames and the joints of a step are sampled at the same time
+            snapshot = await snapshots.next(timeout=1 / self.freq)
+            if snapshot is None:
+                snapshot = snapshots.latest()
+                if snapshot is None:
+                    logger.debug("Recording: waiting for the first snapshot")
+                    continue
 
             # --- Optimized Image Gathering with Parallel Processing ---
             main_frames, secondary_frames = await self._gather_frames_parallel(
-                target_size
+                snapshot, target_size
             )
 
             if main_frames and len(main_frames) > 0:
@@ -313,13 +380,9 @@ class Recorder:
                     (target_size[1], target_size[0], 3), dtype=np.uint8
                 )
 
-            # --- Optimized Robot Observation with Parallel Processing ---
-            (
-                final_state,
-                final_joints_position,
-            ) = await self._gather_robot_observations_parallel()
+            final_state, final_joints_position = self._get_robot_observations(snapshot)
 
-            current_time_in_episode = loop_iteration_start_time - self.start_ts
+            current_time_in_episode = max(snapshot.timestamp - self.start_ts, 0)
 
             # The language instruction for the step should be the one active for this episode.
             # If instructions can change mid-episode, this needs more complex handling.
@@ -373,28 +436,31 @@ class Recorder:
 
             elapsed_this_iteration = time.perf_counter() - loop_iteration_start_time
             time_to_wait = max((1 / self.freq) - elapsed_this_iteration, 0)
+            if elapsed_this_iteration > 1 / self.freq:
+                RECORDER_OVERRUNS.inc()
 
             # Log performance metrics every 100 steps
             if step_count % 100 == 0:
                 logger.debug(
                     f"Step {step_count}: Processing time: {elapsed_this_iteration:.3f}s, Target: {1/self.freq:.3f}s"
                 )
+                if self._frame_ages:
+                    frame_ages = ", ".join(
+                        f"{camera_id}: {age * 1000:.1f}ms"
+                        for camera_id, age in self._frame_ages.items()
+                    )
+                    logger.debug(
+                        f"Step {step_count}: Camera frame age: {frame_ages}. Duplicated frames: {self._duplicated_frames}"
+                    )
 
             await asyncio.sleep(time_to_wait)
             step_count += 1
 
-        if self.rerun_visualizer and self.rerun_visualizer.enabled:
-            self.rerun_visualizer.finalize()
-
-        logger.info(
-            f"Recording loop for episode {self.episode.episode_index if self.episode else 'N/A'} has gracefully exited."
-        )
-
     async def _gather_frames_parallel(
-        self, target_size: tuple[int, int]
+        self, snapshot: Snapshot, target_size: tuple[int, int]
     ) -> tuple[List[np.ndarray], List[np.ndarray]]:
         """
-        Simple parallel frame capture - each camera runs independently.
+        Simple parallel frame conversion of the snapshot - each camera runs independently.
         Returns (main_frames, secondary_frames).
         """
         loop = asyncio.get_event_loop()
@@ -416,6 +482,7 @@ class Recorder:
                 self._image_thread_pool,
                 self._capture_single_camera,
                 main_camera,
+                snapshot,
                 target_size,
             )
             camera_futures.append(("main", main_camera.camera_id, future))
@@ -427,6 +494,7 @@ class Recorder:
                     self._image_thread_pool,
                     self._capture_single_camera,
                     camera,
+                    snapshot,
                     target_size,
                 )
                 camera_futures.append(("secondary", camera.camera_id, future))
@@ -449,55 +517,53 @@ class Recorder:
         return main_frames, secondary_frames
 
     def _capture_single_camera(
-        self, camera, target_size: tuple[int, int]
+        self, camera: BaseCamera, snapshot: Snapshot, target_size: tuple[int, int]
     ) -> Optional[np.ndarray]:
         """
-        Capture frame from a single camera.
+        Convert the frame of a single camera in the snapshot.
+        The snapshot service waits up to half a period for a new frame: if the camera
+        didn't publish one, the same frame is recorded again.
         This runs in the thread pool.
         """
         try:
-            return camera.get_rgb_frame(resize=target_size)
+            camera_id: int = getattr(camera, "camera_id")
+            camera_sample = snapshot.cameras.get(camera_id)
+            if camera_sample is None:
+                # No capture thread (eg: realsense): read the camera directly
+                return camera.get_rgb_frame(resize=target_size)
+
+            camera_frame = camera_sample.frame
+            if camera_frame.seq <= self._last_frame_seqs.get(camera_id, 0):
+                self._duplicated_frames[camera_id] = (
+                    self._duplicated_frames.get(camera_id, 0) + 1
+                )
+
+            self._last_frame_seqs[camera_id] = camera_frame.seq
+            self._frame_ages[camera_id] = time.perf_counter() - camera_frame.capture_ts
+            return camera_sample.rgb(resize=target_size)
         except Exception as e:
             logger.warning(
                 f"Exception capturing frame from camera {getattr(camera, 'camera_id', 'unknown')}: {e}"
             )
             return None
 
-    async def _gather_robot_observations_parallel(
-        self,
+    def _get_robot_observations(
+        self, snapshot: Snapshot
     ) -> tuple[np.ndarray, np.ndarray]:
         """
-        Simple parallel robot observation gathering - each robot runs independently.
+        Observations of the robots in the snapshot.
         Returns (final_state, final_joints_position).
         """
         if not self.robots:
             return np.array([]), np.array([])
 
-        loop = asyncio.get_event_loop()
-
-        # Submit individual robot observation tasks
-        robot_futures = []
-        for i, robot_instance in enumerate(self.robots):
-            future = loop.run_in_executor(
-                self._robot_thread_pool,
-                self._get_single_robot_observation,
-                robot_instance,
-                i,
-            )
-            robot_futures.append(future)
-
-        # Wait for all robot observations
         all_robot_states = []
         all_robot_joints_positions = []
-
-        for future in robot_futures:
-            try:
-                robot_state, robot_joints = await future
-                if robot_state is not None and robot_joints is not None:
-                    all_robot_states.append(robot_state)
-                    all_robot_joints_positions.append(robot_joints)
-            except Exception as e:
-                logger.warning(f"Failed to get robot observation: {e}")
+        for robot in self.robots:
+            robot_sample = snapshot.robot_sample(robot)
+            if robot_sample is not None:
+                all_robot_states.append(robot_sample.state)
+                all_robot_joints_positions.append(robot_sample.joints_position)
 
         # Concatenate if multiple robots, otherwise use the first robot's data
         final_state = (
@@ -517,25 +583,21 @@ class Recorder:
 
         return final_state, final_joints_position
 
-    def _get_single_robot_observation(
-        self, robot, robot_idx: int
-    ) -> tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    async def cleanup(self) -> None:
         """
-        Get observation from a single robot.
-        This runs in the thread pool.
+        Stop the recording and wait for the queued episodes to be saved.
         """
-        try:
-            return robot.get_observation()
-        except Exception as e:
-            logger.warning(f"Exception getting observation from robot {robot_idx}: {e}")
-            return None, None
+        if self.is_recording:
+            await self.stop()
+        await self.save_queue.close()
+        if self._image_thread_pool:
+            self._image_thread_pool.shutdown(wait=True)
+            self._image_thread_pool = None
 
     def __del__(self):
         """Cleanup thread pools on deletion."""
         if hasattr(self, "_image_thread_pool") and self._image_thread_pool:
             self._image_thread_pool.shutdown(wait=True)
-        if hasattr(self, "_robot_thread_pool") and self._robot_thread_pool:
-            self._robot_thread_pool.shutdown(wait=True)
 
 
 async def get_recorder(
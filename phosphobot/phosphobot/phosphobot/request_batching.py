@@ -0,0 +1,150 @@
+"""
+Dynamic batching of the requests of an inference server.
+
+Concurrent requests (several arms, several phosphobot instances sharing one
+inference machine) are collected for a short time window, or until the batch is
+full, and processed with a single batched forward pass. The results are then
+scattered to the requests.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Generic, List, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class _PendingRequest(Generic[T, R]):
+    item: T
+    future: "asyncio.Future[R]"
+    received_at: float = field(default_factory=time.perf_counter)
+
+
+class RequestBatcher(Generic[T, R]):
+    """
+    Collect the items submitted concurrently and process them in batches.
+
+    The batch function runs in a thread, so that the next batch is collected
+    during the forward pass.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[T]], List[R]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+    ):
+        """
+        Args:
+            process_batch: Function that takes a list of items and returns the list
+                of results, in the same order.
+            max_batch_size: Maximum number of items in a batch.
+            max_wait_ms: Maximum time to wait for other items after the first item
+                of a batch is received.
+        """
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self.nb_batches = 0
+        self.nb_items = 0
+
+        self._queue: asyncio.Queue[_PendingRequest[T, R]] | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def mean_batch_size(self) -> float | None:
+        if self.nb_batches == 0:
+            return None
+        return self.nb_items / self.nb_batches
+
+    async def submit(self, item: T) -> R:
+        """
+        Add an item to the next batch and wait for its result.
+
+        If the batch function raises, the items of the batch are processed again one
+        by one: an invalid item only fails its own request.
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        assert self._queue is not None
+
+        future: asyncio.Future[R] = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(item, future))
+        return await future
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _collect(self) -> List[_PendingRequest[T, R]]:
+        assert self._queue is not None
+        batch = [await self._queue.get()]
+        deadline = batch[0].received_at + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                # Take the requests that are already queued without waiting
+                if self._queue.empty():
+                    break
+                batch.append(self._queue.get_nowait())
+                continue
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # Requests whose client disconnected
+            batch = [request for request in batch if not request.future.done()]
+            if not batch:
+                continue
+
+            self.nb_batches += 1
+            self.nb_items += len(batch)
+            try:
+                await self._process(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.error(f"Error while processing a request: {e}")
+                    if not batch[0].future.done():
+                        batch[0].future.set_exception(e)
+                    continue
+                logger.warning(
+                    f"Error while processing a batch of {len(batch)}: {e}. "
+                    "Processing the requests one by one."
+                )
+                for request in batch:
+                    try:
+                        await self._process([request])
+                    except Exception as item_error:
+                        logger.error(f"Error while processing a request: {item_error}")
+                        if not request.future.done():
+                            request.future.set_exception(item_error)
+
+    async def _process(self, batch: List[_PendingRequest[T, R]]) -> None:
+        """Process a batch and set the results of its requests"""
+        results = await asyncio.to_thread(
+            self.process_batch, [request.item for request in batch]
+        )
+        if len(results) != len(batch):
+            raise ValueError(f"Expected {len(batch)} results, got {len(results)}")
+        for request, result in zip(batch, results):
+            if not request.future.done():
+                request.future.set_result(result)
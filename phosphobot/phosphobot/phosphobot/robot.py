@@ -11,6 +11,7 @@ from serial.tools.list_ports_common import ListPortInfo
 
 from phosphobot.configs import config
 from phosphobot.hardware import (
+    BaseManipulator,
     BaseRobot,
     URDFLoader,
     KochHardware,
@@ -20,7 +21,6 @@ from phosphobot.hardware import (
     SO100Hardware,
     UnitreeGo2,
     WX250SHardware,
-    get_sim,
 )
 from phosphobot.models import RobotConfigStatus
 from phosphobot.utils import is_can_plugged
@@ -39,6 +39,14 @@ robot_name_to_class = {
 }
 
 
+def _close_simulation(robot: BaseRobot) -> None:
+    """
+    Release the simulation of a robot that the connection manager drops.
+    """
+    if isinstance(robot, BaseManipulator):
+        robot.close_simulation()
+
+
 @dataclass
 class NewAndOldPorts:
     new_ports: List[ListPortInfo]
@@ -50,6 +58,8 @@ class NewAndOldPorts:
 class RobotConnectionManager:
     _all_robots: list[BaseRobot]
     _manually_added_robots: list[BaseRobot]
+    # Robots detected on a serial or CAN port, by port name
+    _robots_by_port: dict[str, BaseRobot]
 
     available_ports: List[ListPortInfo]
     available_can_ports: List[str]
@@ -62,11 +72,13 @@ class RobotConnectionManager:
 
         self._all_robots = []
         self._manually_added_robots = []
+        self._robots_by_port = {}
 
     def __del__(self):
         # Disconnect all robots
         for robot in self._all_robots:
             robot.disconnect()
+            _close_simulation(robot)
 
     def _scan_ports(self) -> tuple[list, list]:
         """
@@ -128,24 +140,42 @@ class RobotConnectionManager:
 
     async def _find_robots(self) -> None:
         """
-        Loop through all available ports and try to connect to a robot.
+        Loop through the available ports and try to connect to a robot on the new ones.
+
+        The robots on the ports that are still plugged stay connected with their own
+        simulation: only the robots on the unplugged ports are disconnected.
 
         Use self.scan_ports() before to update self.available_ports and self.available_can_ports
         """
 
-        sim = get_sim()
-        sim.reset()
-        self._all_robots = []
-
         # If we are only simulating, we can just use the SO100Hardware class
         if config.ONLY_SIMULATION:
             logger.debug("ONLY_SIMULATION is set to True. Using SO-100 in simulation.")
+            for robot in self._all_robots:
+                _close_simulation(robot)
             self._all_robots = [SO100Hardware(only_simulation=True)]
             return
 
+        # Disconnect the robots on the unplugged ports
+        plugged_ports = {port.device for port in self.available_ports}
+        plugged_ports.update(self.available_can_ports)
+        for port_name in list(self._robots_by_port.keys()):
+            if port_name not in plugged_ports:
+                robot = self._robots_by_port.pop(port_name)
+                logger.info(f"{port_name} unplugged. Disconnecting {robot.name}.")
+                from phosphobot.teleoperation import get_teleop_manager
+
+                get_teleop_manager().stop_servos(robot)
+                robot.disconnect()
+                _close_simulation(robot)
+
         # Keep track of connected devices by port name and serial to avoid duplicates
-        connected_devices: Set[str] = set()
-        connected_serials: Set[str] = set()
+        connected_devices: Set[str] = set(self._robots_by_port.keys())
+        connected_serials: Set[str] = {
+            port.serial_number
+            for port in self.available_ports
+            if port.device in connected_devices and getattr(port, "serial_number", None)
+        }
 
         # Try each serial port exactly once
         for port in self.available_ports:
@@ -177,11 +207,18 @@ class RobotConnectionManager:
                     )
                     continue
                 logger.debug(f"Robot created: {robot}")
-                await robot.connect()
+                try:
+                    await robot.connect()
+                except Exception as e:
+                    logger.warning(
+                        f"Error connecting to {robot_class.name} on {port.device}: {e}. Skipping."
+                    )
+                    _close_simulation(robot)
+                    continue
 
                 if robot is not None:
                     logger.success(f"Connected to {robot_class.name} on {port.device}.")
-                    self._all_robots.append(robot)
+                    self._robots_by_port[port.device] = robot
                     # Mark both device and serial as connected
                     connected_devices.add(port.device)
                     if serial_num:
@@ -191,7 +228,11 @@ class RobotConnectionManager:
         # Detect CAN-based Agilex Piper robots
         if config.ENABLE_CAN:
             for can_name in self.available_can_ports:
+                if can_name in self._robots_by_port:
+                    logger.debug(f"Skipping {can_name}: already connected.")
+                    continue
                 logger.info(f"Attempting to connect to Agilex Piper on {can_name}")
+                robot = None
                 try:
                     robot = PiperHardware.from_can_port(can_name=can_name)
                     if robot is None:
@@ -204,12 +245,15 @@ class RobotConnectionManager:
                     logger.warning(
                         f"Error connecting to Agilex Piper on {can_name}: {e}. Skipping."
                     )
+                    if robot is not None:
+                        _close_simulation(robot)
                     continue
                 if robot is not None:
-                    self._all_robots.append(robot)
+                    self._robots_by_port[can_name] = robot
                     logger.success(f"Connected to Agilex Piper on {can_name}")
 
         # Add manually added robots
+        self._all_robots = list(self._robots_by_port.values())
         self._all_robots.extend(self._manually_added_robots)
 
         if not self._all_robots:
@@ -243,9 +287,7 @@ class RobotConnectionManager:
                 or difference.new_can_ports
                 or difference.old_can_ports
             ):
-                # First, disconnect all robots
-                for robot in self._all_robots:
-                    robot.disconnect()
+                # Only the robots on the changed ports are disconnected or connected
                 self.available_ports = ports
                 self.available_can_ports = can_ports
                 await self._find_robots()
@@ -0,0 +1,472 @@
+"""
+Synchronized snapshots of the robots and the cameras.
+
+The recorder, the AI control loops and the read endpoints share a single sampler
+instead of reading the motors and the cameras themselves. The sampler runs while at
+least one consumer is subscribed: at each tick, it waits for a new frame of every
+camera, reads every robot once, and stores the timestamped snapshot in a ring buffer.
+The number of reads on the motors bus doesn't depend on the number of consumers.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from phosphobot.camera import BaseCamera, CameraFrame, StaleFrameError
+from phosphobot.control_loop import (
+    ControlLoopAlreadyRunningError,
+    LoopTimer,
+    get_control_loop_runtime,
+)
+from phosphobot.hardware import BaseManipulator, BaseRobot
+from phosphobot.metrics import get_metrics
+from phosphobot.models import SnapshotServiceStatus
+
+snapshot_service = None
+
+CAMERA_FRAME_AGE_SECONDS = get_metrics().histogram(
+    "phosphobot_camera_frame_age_seconds",
+    "Time between the capture of a camera frame and its sampling in a snapshot.",
+)
+
+
+@dataclass(frozen=True)
+class RobotSample:
+    """
+    Observation of a robot, read once for all the consumers.
+    """
+
+    robot: BaseRobot
+    # State of the robot, as in robot.get_observation()
+    state: np.ndarray
+    # Joint positions in radians
+    joints_position: np.ndarray
+    # time.perf_counter() in the middle of the read
+    capture_ts: float
+
+
+@dataclass(frozen=True)
+class CameraSample:
+    """
+    Frame of a camera in a snapshot. The frame is copied out of the ring buffer of the
+    camera, so that old snapshots returned by SnapshotService.at() keep the frame
+    captured with their robot samples.
+    """
+
+    camera: BaseCamera
+    frame: CameraFrame
+
+    @property
+    def capture_ts(self) -> float:
+        return self.frame.capture_ts
+
+    def rgb(self, resize: Optional[tuple[int, int]] = None) -> cv2.typing.MatLike:
+        return self.camera.get_rgb_from_camera_frame(self.frame, resize=resize)
+
+    def bgr(self, resize: Optional[tuple[int, int]] = None) -> cv2.typing.MatLike:
+        return self.camera.get_bgr_from_camera_frame(self.frame, resize=resize)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    Samples of the robots and the cameras taken at the same tick of the sampler.
+    """
+
+    # Monotonically increasing, starts at 1
+    seq: int
+    robots: List[RobotSample]
+    # By camera_id
+    cameras: Dict[int, CameraSample]
+    # time.perf_counter() at the end of the sampling
+    sampled_at: float
+
+    @property
+    def capture_timestamps(self) -> List[float]:
+        return [sample.capture_ts for sample in self.robots] + [
+            sample.capture_ts for sample in self.cameras.values()
+        ]
+
+    @property
+    def timestamp(self) -> float:
+        """
+        Mean capture time of the samples: the time the snapshot represents.
+        """
+        timestamps = self.capture_timestamps
+        if not timestamps:
+            return self.sampled_at
+        return float(np.mean(timestamps))
+
+    @property
+    def skew(self) -> float:
+        """
+        Spread of the capture times of the samples, in seconds.
+        """
+        timestamps = self.capture_timestamps
+        if len(timestamps) < 2:
+            return 0.0
+        return max(timestamps) - min(timestamps)
+
+    def robot_sample(self, robot: BaseRobot) -> Optional[RobotSample]:
+        for sample in self.robots:
+            if sample.robot is robot:
+                return sample
+        return None
+
+    def joints_position(self, robots: Sequence[BaseRobot]) -> Optional[np.ndarray]:
+        """
+        Concatenated joint positions in radians of the robots, or None if a robot
+        isn't in the snapshot.
+        """
+        samples = [self.robot_sample(robot) for robot in robots]
+        if not samples or any(sample is None for sample in samples):
+            return None
+        return np.concatenate([sample.joints_position for sample in samples])  # type: ignore
+
+
+class SnapshotSubscription:
+    """
+    A consumer of the snapshots. The robots and the cameras of all the subscriptions
+    are sampled at the highest rate requested. Close the subscription when done.
+    """
+
+    def __init__(
+        self,
+        service: "SnapshotService",
+        robots: List[BaseRobot],
+        cameras: List[BaseCamera],
+        freq: float,
+    ):
+        self.service = service
+        self.robots = robots
+        self.cameras = cameras
+        self.freq = freq
+        self.closed = False
+        self._last_seq = 0
+
+    def latest(self, max_age: Optional[float] = None) -> Optional[Snapshot]:
+        return self.service.latest(max_age=max_age)
+
+    def at(self, timestamp: float) -> Optional[Snapshot]:
+        return self.service.at(timestamp)
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Snapshot]:
+        """
+        Return the latest snapshot if this subscription didn't get it yet with next(),
+        otherwise wait for the next one. Returns None after the timeout.
+        """
+        snapshot = self.service.latest()
+        if snapshot is None or snapshot.seq <= self._last_seq:
+            snapshot = await asyncio.to_thread(
+                self.service.wait_for_snapshot, self._last_seq, timeout
+            )
+        if snapshot is not None:
+            self._last_seq = snapshot.seq
+        return snapshot
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.service._unsubscribe(self)
+
+    def __enter__(self) -> "SnapshotSubscription":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class SnapshotService:
+    """
+    Sample the robots and the cameras of the subscriptions in a control loop thread,
+    and keep the last snapshots in a ring buffer.
+    """
+
+    def __init__(self, buffer_size: int = 64, max_robot_workers: int = 4):
+        """
+        Args:
+            buffer_size: Number of snapshots kept for the queries by time. Each
+                snapshot holds a copy of the frames of its cameras.
+            max_robot_workers: Number of robots read in parallel.
+        """
+        self._condition = threading.Condition()
+        self._subscriptions: List[SnapshotSubscription] = []
+        self._buffer: deque[Snapshot] = deque(maxlen=buffer_size)
+        self._skews: deque[float] = deque(maxlen=1000)
+        self._running = False
+        self._period: Optional[float] = None
+        self._seq = 0
+        # By id of the camera
+        self._last_frame_seqs: Dict[int, int] = {}
+        # Reads of the robots outside of the sampler, by id of the robot
+        self._on_demand_samples: Dict[int, RobotSample] = {}
+        self._read_locks: Dict[int, threading.Lock] = {}
+        self._robot_pool = ThreadPoolExecutor(
+            max_workers=max_robot_workers, thread_name_prefix="snapshot_robots"
+        )
+
+        self.nb_snapshots = 0
+        self.nb_robot_reads = 0
+
+    def subscribe(
+        self,
+        robots: Sequence[BaseRobot] = (),
+        cameras: Sequence[Optional[BaseCamera]] = (),
+        freq: float = 30,
+    ) -> SnapshotSubscription:
+        """
+        Start sampling the robots and the cameras at freq Hz or faster, if another
+        subscription requests a higher rate. Cameras that are None are ignored.
+        """
+        subscription = SnapshotSubscription(
+            self,
+            robots=list(robots),
+            cameras=[camera for camera in cameras if camera is not None],
+            freq=freq,
+        )
+        with self._condition:
+            self._subscriptions.append(subscription)
+            self._update_period()
+            start = not self._running
+            self._running = True
+
+        if start:
+            runtime = get_control_loop_runtime()
+            # The previous sampler thread may still be exiting
+            runtime.join("snapshots", timeout=1)
+            try:
+                runtime.start("snapshots", self._run)
+            except ControlLoopAlreadyRunningError:
+                self._unsubscribe(subscription)
+                with self._condition:
+                    self._running = False
+                raise
+        return subscription
+
+    def _unsubscribe(self, subscription: SnapshotSubscription) -> None:
+        with self._condition:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            self._update_period()
+
+    def _update_period(self) -> None:
+        if self._subscriptions:
+            self._period = 1 / max(
+                subscription.freq for subscription in self._subscriptions
+            )
+        else:
+            self._period = None
+
+    def _sources(self) -> tuple[List[BaseRobot], List[BaseCamera]]:
+        """
+        Robots and cameras of all the subscriptions, without duplicates.
+        """
+        robots: List[BaseRobot] = []
+        cameras: List[BaseCamera] = []
+        for subscription in self._subscriptions:
+            robots.extend(r for r in subscription.robots if not _contains(robots, r))
+            cameras.extend(c for c in subscription.cameras if not _contains(cameras, c))
+        return robots, cameras
+
+    async def _run(self, loop_timer: LoopTimer) -> None:
+        logger.debug("Snapshot sampler started")
+        while True:
+            with self._condition:
+                if not self._subscriptions:
+                    self._running = False
+                    break
+                loop_timer.period = self._period
+                robots, cameras = self._sources()
+
+            await loop_timer.wait()
+            try:
+                self.sample(robots, cameras, frame_timeout=(loop_timer.period or 0) / 2)
+            except Exception as e:
+                logger.warning(f"Failed to take a snapshot: {e}")
+        logger.debug("Snapshot sampler stopped")
+
+    def sample(
+        self,
+        robots: Sequence[BaseRobot],
+        cameras: Sequence[BaseCamera],
+        frame_timeout: float = 0.0,
+    ) -> Snapshot:
+        """
+        Take a snapshot and add it to the ring buffer.
+
+        Wait up to frame_timeout for a frame newer than the one of the previous
+        snapshot for each camera, then read the robots in parallel, right after the
+        frames were captured. Cameras without a capture thread are not sampled.
+        """
+        deadline = time.perf_counter() + frame_timeout
+        camera_samples: Dict[int, CameraSample] = {}
+        for camera in cameras:
+            camera_id = getattr(camera, "camera_id", None)
+            if camera_id is None or camera.get_latest_frame() is None:
+                continue
+            camera_frame = camera.wait_for_frame(
+                last_seq=self._last_frame_seqs.get(id(camera), 0),
+                timeout=max(deadline - time.perf_counter(), 0),
+            )
+            if camera_frame is None:
+                continue
+            try:
+                camera_frame = camera.copy_frame(camera_frame)
+            except StaleFrameError:
+                logger.warning(f"{camera.camera_name}: frame overwritten while sampled")
+                continue
+            self._last_frame_seqs[id(camera)] = camera_frame.seq
+            CAMERA_FRAME_AGE_SECONDS.observe(
+                time.perf_counter() - camera_frame.capture_ts
+            )
+            camera_samples[camera_id] = CameraSample(camera=camera, frame=camera_frame)
+
+        futures = [self._robot_pool.submit(self._read_robot, robot) for robot in robots]
+        robot_samples = []
+        for robot, future in zip(robots, futures):
+            try:
+                robot_samples.append(future.result())
+            except Exception as e:
+                logger.warning(f"Failed to read robot {robot.name}: {e}")
+
+        with self._condition:
+            self._seq += 1
+            snapshot = Snapshot(
+                seq=self._seq,
+                robots=robot_samples,
+                cameras=camera_samples,
+                sampled_at=time.perf_counter(),
+            )
+            self._buffer.append(snapshot)
+            self._skews.append(snapshot.skew)
+            self.nb_snapshots += 1
+            self._condition.notify_all()
+        return snapshot
+
+    def _read_robot(self, robot: BaseRobot) -> RobotSample:
+        start = time.perf_counter()
+        if isinstance(robot, BaseManipulator):
+            # Like get_observation(), without the forward kinematics: read the
+            # simulation when a control loop moves the robot
+            joints_position = robot.read_joints_position(
+                unit="rad", source=robot.joints_position_source()
+            )
+            state = np.full(6, np.nan)
+        else:
+            state, joints_position = robot.get_observation()
+        end = time.perf_counter()
+        with self._condition:
+            self.nb_robot_reads += 1
+        return RobotSample(
+            robot=robot,
+            state=state,
+            joints_position=joints_position,
+            capture_ts=(start + end) / 2,
+        )
+
+    def _latest_robot_sample(self, robot: BaseRobot) -> Optional[RobotSample]:
+        candidates = [self._on_demand_samples.get(id(robot))]
+        if self._buffer:
+            candidates.append(self._buffer[-1].robot_sample(robot))
+        samples = [s for s in candidates if s is not None and s.robot is robot]
+        return max(samples, key=lambda s: s.capture_ts, default=None)
+
+    def read_robot(self, robot: BaseRobot, max_age: float = 0.05) -> RobotSample:
+        """
+        Return the latest sample of the robot if it's more recent than max_age seconds,
+        otherwise read the robot. Concurrent calls for the same robot share the read.
+        """
+        with self._condition:
+            sample = self._latest_robot_sample(robot)
+            if sample is not None and time.perf_counter() - sample.capture_ts < max_age:
+                return sample
+            read_lock = self._read_locks.setdefault(id(robot), threading.Lock())
+
+        with read_lock:
+            with self._condition:
+                # The robot may have been read while waiting for the lock
+                sample = self._latest_robot_sample(robot)
+            if sample is None or time.perf_counter() - sample.capture_ts >= max_age:
+                sample = self._read_robot(robot)
+                with self._condition:
+                    self._on_demand_samples[id(robot)] = sample
+        return sample
+
+    def latest(self, max_age: Optional[float] = None) -> Optional[Snapshot]:
+        """
+        Return the latest snapshot, or None if there is none more recent than max_age
+        seconds.
+        """
+        with self._condition:
+            snapshot = self._buffer[-1] if self._buffer else None
+        if snapshot is None:
+            return None
+        if max_age is not None and time.perf_counter() - snapshot.sampled_at > max_age:
+            return None
+        return snapshot
+
+    def at(self, timestamp: float) -> Optional[Snapshot]:
+        """
+        Return the snapshot of the ring buffer closest to timestamp, a
+        time.perf_counter() value.
+        """
+        with self._condition:
+            snapshots = list(self._buffer)
+        return min(snapshots, key=lambda s: abs(s.timestamp - timestamp), default=None)
+
+    def wait_for_snapshot(
+        self, last_seq: int = 0, timeout: Optional[float] = None
+    ) -> Optional[Snapshot]:
+        """
+        Wait until a snapshot more recent than last_seq is taken. Returns None after
+        the timeout.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: bool(self._buffer) and self._buffer[-1].seq > last_seq,
+                timeout=timeout,
+            )
+            if self._buffer and self._buffer[-1].seq > last_seq:
+                return self._buffer[-1]
+        return None
+
+    def status(self) -> SnapshotServiceStatus:
+        with self._condition:
+            skews = np.array(self._skews)
+            latest = self._buffer[-1] if self._buffer else None
+            status = SnapshotServiceStatus(
+                running=self._running,
+                rate_hz=1 / self._period if self._period else None,
+                nb_subscriptions=len(self._subscriptions),
+                nb_snapshots=self.nb_snapshots,
+                nb_robot_reads=self.nb_robot_reads,
+            )
+        if skews.size > 0:
+            status.mean_skew_ms = float(np.mean(skews)) * 1000
+            status.max_skew_ms = float(np.max(skews)) * 1000
+        if latest is not None:
+            status.latest_age_ms = (time.perf_counter() - latest.sampled_at) * 1000
+        return status
+
+
+def _contains(items: Sequence[object], item: object) -> bool:
+    return any(other is item for other in items)
+
+
+@lru_cache()
+def get_snapshot_service() -> SnapshotService:
+    global snapshot_service
+
+    if snapshot_service is None:
+        snapshot_service = SnapshotService()
+
+    return snapshot_service
@@ -0,0 +1,216 @@
+"""
+Binary encoding of the teleoperation messages.
+
+The JSON messages (AppControlData and RobotStatus) are parsed and validated with
+pydantic, which dominates the CPU usage at hundreds of messages per second. The
+binary encoding is a fixed layout of little-endian fields, decoded with a single
+struct.unpack call.
+
+Control message (client to server), 56 bytes:
+
+| Field        | Type    | Description                                   |
+|--------------|---------|-----------------------------------------------|
+| magic        | 2 bytes | b"PT"                                         |
+| version      | uint8   | BINARY_VERSION                                |
+| message type | uint8   | 1 for control                                 |
+| source       | uint8   | 0 for left, 1 for right                       |
+| padding      | 3 bytes |                                               |
+| sequence     | uint32  | Incremented by the client for every message   |
+| timestamp    | float64 | Unix timestamp in seconds, NaN if not set     |
+| x, y, z      | float32 | Position                                      |
+| rx, ry, rz   | float32 | Orientation in degrees                        |
+| open         | float32 | 0 for closed, 1 for open                      |
+| direction_x  | float32 | Between -1 and 1                              |
+| direction_y  | float32 | Between -1 and 1                              |
+
+Status message (server to client), 12 bytes:
+
+| Field               | Type    | Description                                 |
+|---------------------|---------|---------------------------------------------|
+| magic               | 2 bytes | b"PT"                                       |
+| version             | uint8   | BINARY_VERSION                              |
+| message type        | uint8   | 2 for status                                |
+| flags               | uint8   | bit 0: gripping status is set               |
+|                     |         | bit 1: object gripped                       |
+|                     |         | bit 2: gripping source is right             |
+| padding             | 3 bytes |                                             |
+| nb_actions_received | uint32  |                                             |
+
+On the WebSocket, the client requests the binary encoding with the
+BINARY_SUBPROTOCOL subprotocol. On UDP, the server detects the encoding of every
+packet and replies with the same encoding.
+"""
+
+import math
+import struct
+
+from pydantic import ValidationError
+
+from phosphobot.models import AppControlData, RobotStatus
+
+BINARY_MAGIC = b"PT"
+BINARY_VERSION = 1
+BINARY_SUBPROTOCOL = f"phosphobot-teleop-binary-v{BINARY_VERSION}"
+
+CONTROL_MESSAGE = 1
+STATUS_MESSAGE = 2
+
+CONTROL_STRUCT = struct.Struct("<2sBBB3xId9f")
+STATUS_STRUCT = struct.Struct("<2sBBB3xI")
+
+_SOURCES = ("left", "right")
+_HAS_GRIPPED = 1
+_GRIPPED = 2
+_GRIPPED_SOURCE_RIGHT = 4
+
+
+class BinaryDecodeError(ValueError):
+    """The binary message is malformed."""
+
+
+def is_binary_message(data: bytes) -> bool:
+    """
+    Whether the message uses the binary encoding. JSON messages start with "{".
+    """
+    return data[:2] == BINARY_MAGIC
+
+
+def encode_control(control_data: AppControlData, sequence: int = 0) -> bytes:
+    """
+    Encode a control message. Used by the clients and the tests.
+    """
+    return CONTROL_STRUCT.pack(
+        BINARY_MAGIC,
+        BINARY_VERSION,
+        CONTROL_MESSAGE,
+        _SOURCES.index(control_data.source),
+        sequence % 2**32,
+        control_data.timestamp if control_data.timestamp is not None else math.nan,
+        control_data.x,
+        control_data.y,
+        control_data.z,
+        control_data.rx,
+        control_data.ry,
+        control_data.rz,
+        control_data.open,
+        control_data.direction_x,
+        control_data.direction_y,
+    )
+
+
+def decode_control(data: bytes) -> tuple[AppControlData, int]:
+    """
+    Decode a control message.
+
+    Returns:
+        The control data and the sequence number of the message.
+
+    Raises:
+        BinaryDecodeError: If the message is malformed.
+    """
+    if len(data) != CONTROL_STRUCT.size:
+        raise BinaryDecodeError(
+            f"Control message must be {CONTROL_STRUCT.size} bytes, got {len(data)}"
+        )
+    (
+        magic,
+        version,
+        message_type,
+        source,
+        sequence,
+        timestamp,
+        x,
+        y,
+        z,
+        rx,
+        ry,
+        rz,
+        open_command,
+        direction_x,
+        direction_y,
+    ) = CONTROL_STRUCT.unpack(data)
+
+    if magic != BINARY_MAGIC:
+        raise BinaryDecodeError("Not a binary teleoperation message")
+    if version != BINARY_VERSION:
+        raise BinaryDecodeError(
+            f"Unsupported version {version}, expected {BINARY_VERSION}"
+        )
+    if message_type != CONTROL_MESSAGE:
+        raise BinaryDecodeError(f"Expected a control message, got type {message_type}")
+    if source >= len(_SOURCES):
+        raise BinaryDecodeError(f"Unknown source {source}")
+    # A sum with an infinite or NaN value isn't finite
+    if not math.isfinite(x + y + z + rx + ry + rz + open_command):
+        raise BinaryDecodeError("Values must be finite")
+
+    try:
+        control_data = AppControlData(
+            x=x,
+            y=y,
+            z=z,
+            rx=rx,
+            ry=ry,
+            rz=rz,
+            open=open_command,
+            source=_SOURCES[source],
+            timestamp=None if math.isnan(timestamp) else timestamp,
+            direction_x=direction_x,
+            direction_y=direction_y,
+        )
+    except ValidationError as e:
+        raise BinaryDecodeError(str(e)) from e
+    return control_data, sequence
+
+
+def encode_status(status: RobotStatus) -> bytes:
+    """
+    Encode a status message.
+    """
+    flags = 0
+    if status.is_object_gripped is not None:
+        flags |= _HAS_GRIPPED
+        if status.is_object_gripped:
+            flags |= _GRIPPED
+        if status.is_object_gripped_source == "right":
+            flags |= _GRIPPED_SOURCE_RIGHT
+    return STATUS_STRUCT.pack(
+        BINARY_MAGIC,
+        BINARY_VERSION,
+        STATUS_MESSAGE,
+        flags,
+        status.nb_actions_received,
+    )
+
+
+def decode_status(data: bytes) -> RobotStatus:
+    """
+    Decode a status message. Used by the clients and the tests.
+    """
+    if len(data) != STATUS_STRUCT.size:
+        raise BinaryDecodeError(
+            f"Status message must be {STATUS_STRUCT.size} bytes, got {len(data)}"
+        )
+    magic, version, message_type, flags, nb_actions_received = STATUS_STRUCT.unpack(
+        data
+    )
+    if magic != BINARY_MAGIC or message_type != STATUS_MESSAGE:
+        raise BinaryDecodeError("Not a binary status message")
+
+    if not flags & _HAS_GRIPPED:
+        return RobotStatus(nb_actions_received=nb_actions_received)
+    return RobotStatus(
+        is_object_gripped=bool(flags & _GRIPPED),
+        is_object_gripped_source="right" if flags & _GRIPPED_SOURCE_RIGHT else "left",
+        nb_actions_received=nb_actions_received,
+    )
+
+
+def is_newer_sequence(sequence: int, last_sequence: int | None) -> bool:
+    """
+    Whether the sequence number is after the last one, with the uint32 wrap around.
+    """
+    if last_sequence is None:
+        return True
+    difference = (sequence - last_sequence) % 2**32
+    return 0 < difference < 2**31
@@ -1,8 +1,9 @@
 import asyncio
 import json
 import time
+from collections import deque
 from copy import copy
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from functools import lru_cache
 from typing import Dict, Literal, Optional, Tuple, cast
@@ -12,12 +13,39 @@ from fastapi import WebSocket
 from loguru import logger
 from pydantic import ValidationError
 
-from phosphobot.hardware import BaseManipulator
+from phosphobot.control_loop import LoopTimer
+from phosphobot.hardware import BaseManipulator, BaseRobot
 from phosphobot.hardware.base import BaseMobileRobot
-from phosphobot.models import AppControlData, RobotStatus, UDPServerInformationResponse
+from phosphobot.metrics import get_metrics
+from phosphobot.models import (
+    AppControlData,
+    RobotStatus,
+    TeleopStatsResponse,
+    UDPServerInformationResponse,
+)
+from phosphobot.profiler import register_loop
 from phosphobot.robot import RobotConnectionManager
+from phosphobot.teleop_encoding import (
+    BinaryDecodeError,
+    decode_control,
+    encode_status,
+    is_binary_message,
+    is_newer_sequence,
+)
 from phosphobot.utils import get_local_network_ip
 
+TELEOP_COMMAND_AGE_SECONDS = get_metrics().histogram(
+    "phosphobot_teleop_command_age_seconds",
+    "Time between the reception of a teleoperation command and the end of its execution, in seconds.",
+)
+TELEOP_COMMANDS = {
+    outcome: get_metrics().counter(
+        "phosphobot_teleop_commands_total",
+        "Teleoperation commands, by outcome.",
+        outcome=outcome,
+    )
+    for outcome in ("executed", "dropped")
+}
 
 @dataclass
 class RobotState:
@@ -26,6 +54,73 @@ class RobotState:
     gripped: bool = False
 
 
+@dataclass
+class TeleopCommand:
+    control_data: AppControlData
+    # time.perf_counter() when the command was received by the server
+    received_at: float
+
+
+def robot_key(robot: BaseRobot) -> str:
+    """
+    Identifier of the robot that doesn't change while it's connected: its name and
+    its serial number or device.
+    """
+    device = getattr(robot, "SERIAL_ID", None) or getattr(robot, "device_name", None)
+    return f"{robot.name}:{device}"
+
+
+class CommandMailbox:
+    """
+    Latest-wins mailbox of the teleoperation commands of one robot and one source.
+
+    Only the newest command is kept: a command that isn't executed yet is replaced by
+    the next one, so the robot always moves to the latest target of the hand.
+    """
+
+    def __init__(self, robot: BaseManipulator | BaseMobileRobot, source: str):
+        self.robot = robot
+        self.source = source
+        self._command: TeleopCommand | None = None
+        self._new_command = asyncio.Event()
+        # Set when the robot isn't executing a command of this mailbox
+        self.robot_ready = asyncio.Event()
+        self.robot_ready.set()
+        self.servo_task: asyncio.Task | None = None
+
+    def post(self, command: TeleopCommand) -> bool:
+        """
+        Put a command in the mailbox. Returns True if it replaced a pending command.
+        """
+        superseded = self._command is not None
+        self._command = command
+        self._new_command.set()
+        return superseded
+
+    def has_command(self) -> bool:
+        return self._command is not None
+
+    async def take(self) -> TeleopCommand:
+        """
+        Wait for a command and remove it from the mailbox.
+        """
+        while self._command is None:
+            await self._new_command.wait()
+            self._new_command.clear()
+        command = self._command
+        self._command = None
+        return command
+
+
+@dataclass
+class TeleopCounters:
+    executed: int = 0
+    superseded: int = 0
+    dropped: int = 0
+    # Time between the reception and the end of the execution of the last commands
+    command_ages: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+
 class TeleopManager:
     robot_id: int | None
     rcm: RobotConnectionManager
@@ -34,6 +129,8 @@ class TeleopManager:
     last_report: datetime
     MOVE_TIMEOUT: float = 1.0  # seconds
     MAX_INSTRUCTIONS_PER_SEC: int = 200
+    # Rate at which the servo tasks send the latest command to the robots
+    SERVO_FREQUENCY: int = 100
 
     def __init__(self, rcm: RobotConnectionManager, robot_id: int | None = None):
         self.rcm = rcm
@@ -52,6 +149,10 @@ class TeleopManager:
         self._robots: list[BaseManipulator | BaseMobileRobot] = []
         self.is_initializing: bool = False
 
+        # Mailboxes by robot and source, consumed by the servo tasks
+        self._mailboxes: dict[tuple[str, str], CommandMailbox] = {}
+        self.counters = TeleopCounters()
+
     def allow_instruction(self) -> bool:
         """Simple 1-second sliding window rate limiter."""
         if self.is_initializing:
@@ -67,8 +168,137 @@ class TeleopManager:
             self._instr_in_window += 1
             return True
 
+        self.counters.dropped += 1
         return False
 
+    def stats(self) -> TeleopStatsResponse:
+        """
+        Counters of the executed, superseded and dropped commands, and age of the
+        last executed commands.
+        """
+        command_ages = np.array(self.counters.command_ages)
+        return TeleopStatsResponse(
+            nb_commands_executed=self.counters.executed,
+            nb_commands_superseded=self.counters.superseded,
+            nb_commands_dropped=self.counters.dropped,
+            mean_command_age_ms=float(np.mean(command_ages)) * 1000
+            if command_ages.size
+            else None,
+            max_command_age_ms=float(np.max(command_ages)) * 1000
+            if command_ages.size
+            else None,
+        )
+
+    def post_command(
+        self,
+        robot: BaseManipulator | BaseMobileRobot,
+        source: str,
+        control_data: AppControlData,
+        received_at: float | None = None,
+    ) -> None:
+        """
+        Put the command in the mailbox of the robot and source, and start the servo
+        task that moves the robot if it's not running.
+        """
+        key = (robot_key(robot), source)
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None or mailbox.robot is not robot:
+            # The robot was reconnected: don't move the previous object anymore
+            if mailbox is not None and mailbox.servo_task is not None:
+                mailbox.servo_task.cancel()
+            mailbox = CommandMailbox(robot=robot, source=source)
+            self._mailboxes[key] = mailbox
+
+        command = TeleopCommand(
+            control_data=control_data,
+            received_at=received_at if received_at is not None else time.perf_counter(),
+        )
+        if mailbox.post(command):
+            self.counters.superseded += 1
+
+        if mailbox.servo_task is None or mailbox.servo_task.done():
+            mailbox.servo_task = asyncio.create_task(self._servo(mailbox))
+
+    def stop_servos(self, robot: BaseRobot | None = None) -> None:
+        """
+        Cancel the servo tasks and drop the mailboxes of the robot, or of all the
+        robots if robot is None. Called when the teleoperation stops or when the robot
+        is disconnected.
+        """
+        for key, mailbox in list(self._mailboxes.items()):
+            if robot is not None and key[0] != robot_key(robot):
+                continue
+            if mailbox.servo_task is not None:
+                mailbox.servo_task.cancel()
+            del self._mailboxes[key]
+
+    @register_loop("teleoperation")
+    async def _servo(self, mailbox: CommandMailbox) -> None:
+        """
+        Move the robot to the latest command of the mailbox, at most SERVO_FREQUENCY
+        times per second.
+        """
+        robot = mailbox.robot
+        loop_timer = LoopTimer(
+            name=f"teleop_{mailbox.source}", period=1 / self.SERVO_FREQUENCY
+        )
+        while True:
+            idle = not mailbox.has_command()
+            command = await mailbox.take()
+            if idle:
+                # Don't count the wait for a command as an overrun
+                loop_timer.reset()
+
+            if time.perf_counter() - command.received_at > self.MOVE_TIMEOUT:
+                logger.warning("Teleoperation command is too old, skipping command")
+                self.counters.dropped += 1
+                continue
+
+            if isinstance(robot, BaseManipulator) and (
+                robot.initial_position is None or robot.initial_orientation_rad is None
+            ):
+                await self.move_init()
+
+            mailbox.robot_ready.clear()
+            try:
+                if isinstance(robot, BaseManipulator):
+                    executed = await self._process_control_data_manipulator(
+                        command.control_data, robot
+                    )
+                else:
+                    executed = await self._process_control_data_mobile_robot(
+                        command.control_data, robot
+                    )
+            except Exception as e:
+                logger.exception(f"Error moving robot {robot.name}: {e}")
+                executed = False
+            finally:
+                mailbox.robot_ready.set()
+
+            if executed:
+                command_age = time.perf_counter() - command.received_at
+                self.counters.executed += 1
+                self.counters.command_ages.append(command_age)
+                TELEOP_COMMANDS["executed"].inc()
+                TELEOP_COMMAND_AGE_SECONDS.observe(command_age)
+            else:
+                self.counters.dropped += 1
+                TELEOP_COMMANDS["dropped"].inc()
+
+            await loop_timer.wait()
+
+    async def wait_robots_ready(self, timeout: float | None = None) -> None:
+        """
+        Wait for the robots to finish the teleoperation commands being executed.
+        """
+        events = [mailbox.robot_ready.wait() for mailbox in self._mailboxes.values()]
+        if not events:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*events), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Robots are still executing teleoperation commands")
+
     async def get_manipulator_robot(self, source: str) -> Optional[BaseManipulator]:
         """
         Get the manipulator robot based on source
@@ -118,6 +348,7 @@ class TeleopManager:
             return
 
         self.is_initializing = True
+        await self.wait_robots_ready(timeout=self.MOVE_TIMEOUT)
         for i, robot in enumerate(await self.rcm.robots):
             logger.debug(f"Initializing robot {i}: {robot.name}")
             if robot_id is not None and i != robot_id:
@@ -144,17 +375,23 @@ class TeleopManager:
 
         logger.debug("All robots initialized")
         self._robots = copy(await self.rcm.robots)
+        # Stop moving the robots that were disconnected
+        connected_keys = {robot_key(robot) for robot in self._robots}
+        for mailbox in list(self._mailboxes.values()):
+            if robot_key(mailbox.robot) not in connected_keys:
+                self.stop_servos(mailbox.robot)
         self.is_initializing = False
 
     async def _process_control_data_manipulator(
         self, control_data: AppControlData, robot: BaseManipulator
-    ):
+    ) -> bool:
         """
         We transform the control data into a target position, orientation and gripper state.
         We then move the robot to that position and orientation.
+
+        Returns:
+            True if the robot was moved, False otherwise.
         """
-        if robot.initial_position is None or robot.initial_orientation_rad is None:
-            await self.move_init()
         (
             target_pos,
             target_orient_deg,
@@ -168,20 +405,7 @@ class TeleopManager:
         target_position = target_pos + initial_position
         target_orientation_rad = np.deg2rad(target_orient_deg) + initial_orientation_rad
 
-        # if robot.is_moving, wait for it to stop
-        start_wait_time = time.perf_counter()
-        while (
-            robot.is_moving
-            and time.perf_counter() - start_wait_time < self.MOVE_TIMEOUT
-        ):
-            await asyncio.sleep(0.00001)
-        if time.perf_counter() - start_wait_time >= self.MOVE_TIMEOUT:
-            logger.warning(
-                f"Robot {robot.name} is still moving after {self.MOVE_TIMEOUT}s; skipping this command"
-            )
-            # skip gripper & counting if move failed
-            return False
-
+        # The servo task of the robot only sends the next command once this one is done
         try:
             # off-load blocking move_robot into threadpool + enforce timeout
             await asyncio.wait_for(
@@ -198,15 +422,19 @@ class TeleopManager:
         robot.control_gripper(open_command=target_open)
         robot.update_object_gripping_status()
         self.action_counter += 1
+        return True
 
     async def _process_control_data_mobile_robot(
         self, control_data: AppControlData, robot: BaseMobileRobot
-    ):
+    ) -> bool:
         """
         We use the control_data.direction_x and control_data.direction_y to move the mobile robot.
         These values are between -1 and 1, where 0 means no movement.
         - direction_y: forward/backward movement
         - direction_x: rotate left/right (rz axis rotation)
+
+        Returns:
+            True if the robot was moved, False otherwise.
         """
         # TODO:
         # - deadzone detection
@@ -214,8 +442,6 @@ class TeleopManager:
         # - some trig ?
         # - progressive acceleration ?
 
-        start_wait_time = time.perf_counter()
-
         # deadzone: zero if below 0.3
         if abs(control_data.direction_x) < 0.5:
             control_data.direction_x = 0.0
@@ -229,17 +455,6 @@ class TeleopManager:
         rz = -control_data.direction_x * np.pi / 2
         x = control_data.direction_y / 100
 
-        while (
-            robot.is_moving
-            and time.perf_counter() - start_wait_time < self.MOVE_TIMEOUT
-        ):
-            await asyncio.sleep(0.00001)
-        if time.perf_counter() - start_wait_time >= self.MOVE_TIMEOUT:
-            logger.warning(
-                f"Robot {robot.name} is still moving after {self.MOVE_TIMEOUT}s; skipping this command"
-            )
-            return False
-
         try:
             await asyncio.wait_for(
                 robot.move_robot_absolute(
@@ -254,15 +469,29 @@ class TeleopManager:
                 f"move_robot timed out for mobile robot {robot.name}; skipping this command"
             )
             return False
+        return True
 
-    async def process_control_data(self, control_data: AppControlData) -> bool:
+    async def process_control_data(
+        self, control_data: AppControlData, received_at: float | None = None
+    ) -> bool:
         """
-        Process control data
+        Process control data: post the command to the mailboxes of the robots to move.
+        The servo tasks of the robots execute the latest command of each mailbox.
+
+        Args:
+            control_data: The teleoperation command.
+            received_at: time.perf_counter() when the command was received. Defaults
+                to now.
+
         Returns:
-            True if the command was processed successfully, False otherwise.
+            True if the command was posted, False otherwise.
         """
+        if received_at is None:
+            received_at = time.perf_counter()
+
         if self.is_initializing:
             logger.debug("Initialization in progress, skipping control data processing")
+            self.counters.dropped += 1
             return False
 
         state = self.states[control_data.source]
@@ -272,12 +501,14 @@ class TeleopManager:
         # Check timestamp freshness
         if control_data.timestamp is not None:
             if control_data.timestamp <= state.last_timestamp:
+                self.counters.dropped += 1
                 return False
             # Check if the timestamp is too old
             if time.time() - control_data.timestamp > self.MOVE_TIMEOUT:
                 logger.warning(
                     f"Control data timestamp {control_data.timestamp} is too old, skipping command"
                 )
+                self.counters.dropped += 1
                 return False
 
             state.last_timestamp = time.time()
@@ -290,11 +521,8 @@ class TeleopManager:
             except IndexError:
                 logger.warning(f"Robot ID {self.robot_id} not found in the robot list")
                 return False
-            if isinstance(robot, BaseManipulator):
-                await self._process_control_data_manipulator(control_data, robot)
-                return True
-            elif isinstance(robot, BaseMobileRobot):
-                await self._process_control_data_mobile_robot(control_data, robot)
+            if isinstance(robot, (BaseManipulator, BaseMobileRobot)):
+                self.post_command(robot, control_data.source, control_data, received_at)
                 return True
             else:
                 logger.error(f"Unknown robot type for robot_id {self.robot_id}")
@@ -310,13 +538,15 @@ class TeleopManager:
 
         # Manipulator -> move it
         if manipulator_robot is not None:
-            await self._process_control_data_manipulator(
-                control_data, manipulator_robot
+            self.post_command(
+                manipulator_robot, control_data.source, control_data, received_at
             )
 
         # Mobile robot -> move it
         if mobile_robot is not None:
-            await self._process_control_data_mobile_robot(control_data, mobile_robot)
+            self.post_command(
+                mobile_robot, control_data.source, control_data, received_at
+            )
 
         return True
 
@@ -363,9 +593,12 @@ udp_server = None
 
 @dataclass
 class PacketData:
-    data: bytes
+    control_data: AppControlData
     addr: Tuple[str, int]
-    timestamp: float
+    # time.perf_counter() when the packet was received
+    received_at: float
+    # The client uses the binary encoding: reply with the same encoding
+    binary: bool = False
 
 
 class _TeleopProtocol(asyncio.DatagramProtocol):
@@ -373,13 +606,15 @@ class _TeleopProtocol(asyncio.DatagramProtocol):
         self.manager = manager
         self.transport: Optional[asyncio.DatagramTransport] = None
 
-        # Worker pool configuration
-        # We use a single worker because we want to process packets sequentially
-        # (they are robotics movements, not parallelizable)
-        self.worker_count = 1
-        self.packet_queue: asyncio.Queue = asyncio.Queue(maxsize=1000)  # Bounded queue
-        self.workers: list[asyncio.Task] = []
+        # Latest packet of each source, waiting to be dispatched to the robots.
+        # A packet that isn't dispatched yet is replaced by the next one of the
+        # same source: the robots only follow the latest position of the hands.
+        self.pending_packets: Dict[str, PacketData] = {}
+        self.new_packet = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
         self.running = False
+        # Last sequence number of the binary packets, by client address and source
+        self.last_sequences: Dict[Tuple[Tuple[str, int], str], int] = {}
 
         # Pre-allocated objects for performance
         self.error_responses = {
@@ -392,9 +627,6 @@ class _TeleopProtocol(asyncio.DatagramProtocol):
             "invalid_encoding": json.dumps(
                 {"error": "invalid_encoding", "detail": "Invalid UTF-8 encoding"}
             ).encode("utf-8"),
-            "queue_full": json.dumps(
-                {"error": "queue_full", "detail": "Server overloaded, try again"}
-            ).encode("utf-8"),
         }
 
     def connection_made(self, transport: asyncio.BaseTransport):
@@ -402,17 +634,13 @@ class _TeleopProtocol(asyncio.DatagramProtocol):
         sockname = transport.get_extra_info("sockname")
         logger.info(f"UDP socket opened on {sockname}")
 
-        # Start worker pool
         self.running = True
-        for i in range(self.worker_count):
-            worker = asyncio.create_task(self._worker(f"worker-{i}"))
-            self.workers.append(worker)
+        self.worker = asyncio.create_task(self._worker())
 
     def connection_lost(self, exc):
-        # Cleanup workers
         self.running = False
-        for worker in self.workers:
-            worker.cancel()
+        if self.worker is not None:
+            self.worker.cancel()
 
     def datagram_received(self, data: bytes, addr: Tuple[str, int]):
         # Fast path: immediate rate limiting check
@@ -421,54 +649,59 @@ class _TeleopProtocol(asyncio.DatagramProtocol):
                 self.transport.sendto(self.error_responses["rate_limited"], addr)
             return
 
-        # Try to queue packet (non-blocking)
-        try:
-            packet = PacketData(data, addr, time.time())
-            self.packet_queue.put_nowait(packet)
-        except asyncio.QueueFull:
-            # Queue is full, drop packet with error response
-            if self.transport:
-                self.transport.sendto(self.error_responses["queue_full"], addr)
-            logger.warning(f"Packet queue full, dropping packet from {addr}")
+        received_at = time.perf_counter()
+        binary = is_binary_message(data)
+        if binary:
+            control = self._parse_binary_packet(data, addr)
+        else:
+            control = self._parse_packet(data, addr)
+        if control is None:
+            return
 
-    async def _worker(self, worker_name: str):
-        """Worker coroutine that processes packets from the queue"""
-        logger.info(f"Starting worker: {worker_name}")
+        if control.source in self.pending_packets:
+            self.manager.counters.superseded += 1
+        self.pending_packets[control.source] = PacketData(
+            control, addr, received_at, binary
+        )
+        self.new_packet.set()
 
-        while self.running:
-            try:
-                # Get packet with timeout to allow graceful shutdown
-                packet = await asyncio.wait_for(self.packet_queue.get(), timeout=1.0)
-                await self._process_packet(packet)
-                self.packet_queue.task_done()
+    def _parse_binary_packet(
+        self, data: bytes, addr: Tuple[str, int]
+    ) -> Optional[AppControlData]:
+        """Decode a binary packet. Drop it if it's older than the last one received."""
+        if self.transport is None:
+            return None
 
-            except asyncio.TimeoutError:
-                # No packet received, continue loop
-                continue
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.exception(f"Worker {worker_name} error: {e}")
+        try:
+            control, sequence = decode_control(data)
+        except BinaryDecodeError as e:
+            error_msg = json.dumps(
+                {"error": "invalid_binary", "detail": str(e)}
+            ).encode("utf-8")
+            self.transport.sendto(error_msg, addr)
+            return None
 
-        logger.info(f"Worker {worker_name} stopped")
+        # UDP packets can arrive out of order
+        key = (addr, control.source)
+        if not is_newer_sequence(sequence, self.last_sequences.get(key)):
+            self.manager.counters.dropped += 1
+            return None
+        self.last_sequences[key] = sequence
+        return control
 
-    async def _process_packet(self, packet: PacketData):
-        """Process a single packet - optimized version of original _handle"""
+    def _parse_packet(
+        self, data: bytes, addr: Tuple[str, int]
+    ) -> Optional[AppControlData]:
+        """Decode and validate a packet. Send the error to the client if it's invalid."""
         if self.transport is None:
-            return
-
-        data, addr = packet.data, packet.addr
-
-        # Check packet age (drop stale packets)
-        if time.time() - packet.timestamp > 0.1:  # 100ms timeout
-            return
+            return None
 
         # Fast decode - most packets should be valid UTF-8
         try:
             text = data.decode("utf-8")
         except UnicodeDecodeError:
             self.transport.sendto(self.error_responses["invalid_encoding"], addr)
-            return
+            return None
 
         # Parse JSON
         try:
@@ -478,26 +711,63 @@ class _TeleopProtocol(asyncio.DatagramProtocol):
                 "utf-8"
             )
             self.transport.sendto(error_msg, addr)
-            return
+            return None
 
         # Validate schema
         try:
-            control = AppControlData.model_validate(raw)
+            return AppControlData.model_validate(raw)
         except ValidationError as e:
             error_msg = json.dumps(
                 {"error": "validation_error", "detail": str(e)}
             ).encode("utf-8")
             self.transport.sendto(error_msg, addr)
+            return None
+
+    async def _worker(self):
+        """Worker coroutine that dispatches the latest packets to the robots"""
+        logger.info("Starting UDP teleoperation worker")
+
+        while self.running:
+            try:
+                await self.new_packet.wait()
+                self.new_packet.clear()
+                packets = list(self.pending_packets.values())
+                self.pending_packets.clear()
+                for packet in packets:
+                    await self._process_packet(packet)
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception(f"UDP teleoperation worker error: {e}")
+
+        logger.info("UDP teleoperation worker stopped")
+
+    async def _process_packet(self, packet: PacketData):
+        """Send the control data of a packet to the robots"""
+        if self.transport is None:
+            return
+
+        addr = packet.addr
+
+        # Check packet age (drop stale packets)
+        if time.perf_counter() - packet.received_at > 0.1:  # 100ms timeout
+            self.manager.counters.dropped += 1
             return
 
         # Process control data
         try:
-            await self.manager.process_control_data(control)
+            await self.manager.process_control_data(
+                packet.control_data, received_at=packet.received_at
+            )
 
             # Send status updates
             updates = await self.manager.send_status_updates()
             for update in updates:
-                self.transport.sendto(update.model_dump_json().encode(), addr)
+                if packet.binary:
+                    self.transport.sendto(encode_status(update), addr)
+                else:
+                    self.transport.sendto(update.model_dump_json().encode(), addr)
 
         except Exception as e:
             error_msg = json.dumps(
@@ -562,6 +832,7 @@ class UDPServer:
         """
         Close the transport; no more packets will be received.
         """
+        self.manager.stop_servos()
         if self.transport:
             self.transport.close()
             logger.info("UDP server transport closed")
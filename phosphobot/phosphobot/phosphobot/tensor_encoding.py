@@ -0,0 +1,186 @@
+"""
+Binary encoding of the inference requests and responses of the action models.
+
+The JSON encoding sends {"encoded": json_numpy.dumps(inputs)}: the arrays are
+base64 encoded in a JSON string, itself nested in a JSON document. The binary
+encoding sends the raw buffers of the arrays after a small JSON header, and the
+arrays are decoded without copies with np.frombuffer.
+
+Message layout:
+
+| Field         | Type          | Description                                  |
+|---------------|---------------|----------------------------------------------|
+| magic         | 4 bytes       | b"PTT1"                                      |
+| header length | uint32        | Length of the header in bytes                |
+| header        | JSON          | See below                                    |
+| buffers       | bytes         | Buffers of the arrays, one after the other   |
+
+The header is {"arrays": [...], "values": {...}}. Every array is described by
+{"key", "dtype", "shape", "offset", "nbytes", "encoding"}, where the offset is
+relative to the start of the buffers and the encoding is "raw" or "jpeg". The
+values are the inputs that are not arrays, like the prompt.
+
+Images (uint8 arrays of shape (H, W, 3)) can be JPEG compressed to reduce the
+size of the request further, at the cost of a lossy encoding.
+
+The inference servers accept both encodings on the same endpoint, based on the
+Content-Type of the request, and answer with the encoding of the request.
+"""
+
+import json
+import struct
+from typing import Any
+
+import cv2
+import json_numpy  # type: ignore
+import numpy as np
+from fastapi import Request, Response
+
+TENSOR_MAGIC = b"PTT1"
+TENSOR_CONTENT_TYPE = "application/x-phosphobot-tensors"
+
+_PREFIX_STRUCT = struct.Struct("<4sI")
+
+
+class TensorDecodeError(ValueError):
+    """The binary message is malformed."""
+
+
+def is_jpeg_compatible(array: np.ndarray) -> bool:
+    """
+    Whether the array is an image that can be JPEG compressed.
+    """
+    return array.dtype == np.uint8 and array.ndim == 3 and array.shape[2] == 3
+
+
+def encode_tensors(inputs: dict[str, Any], jpeg_quality: int | None = None) -> bytes:
+    """
+    Encode a dict of arrays and JSON serializable values.
+
+    Args:
+        inputs: The arrays and values to encode.
+        jpeg_quality: If set, the images are JPEG compressed with this quality (1-100).
+    """
+    arrays: list[dict[str, Any]] = []
+    values: dict[str, Any] = {}
+    buffers: list[bytes | memoryview] = []
+    offset = 0
+    for key, value in inputs.items():
+        if not isinstance(value, np.ndarray):
+            values[key] = value
+            continue
+
+        encoding = "raw"
+        if jpeg_quality is not None and is_jpeg_compatible(value):
+            success, encoded = cv2.imencode(
+                ".jpg", value, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+            )
+            if not success:
+                raise ValueError(f"Failed to JPEG encode {key}")
+            buffer: bytes | memoryview = encoded.tobytes()
+            encoding = "jpeg"
+        else:
+            buffer = memoryview(np.ascontiguousarray(value)).cast("B")
+
+        arrays.append(
+            {
+                "key": key,
+                "dtype": value.dtype.str,
+                "shape": list(value.shape),
+                "offset": offset,
+                "nbytes": len(buffer),
+                "encoding": encoding,
+            }
+        )
+        buffers.append(buffer)
+        offset += len(buffer)
+
+    header = json.dumps({"arrays": arrays, "values": values}).encode()
+    return b"".join([_PREFIX_STRUCT.pack(TENSOR_MAGIC, len(header)), header, *buffers])
+
+
+def decode_tensors(data: bytes | bytearray | memoryview) -> dict[str, Any]:
+    """
+    Decode a message encoded with encode_tensors.
+
+    The raw arrays are views on `data`: they are read-only if `data` is bytes. Pass
+    a bytearray to get writable arrays.
+
+    Raises:
+        TensorDecodeError: If the message is malformed.
+    """
+    view = memoryview(data)
+    if len(view) < _PREFIX_STRUCT.size:
+        raise TensorDecodeError("Message is too short")
+    magic, header_length = _PREFIX_STRUCT.unpack_from(view)
+    if magic != TENSOR_MAGIC:
+        raise TensorDecodeError("Not a binary tensor message")
+
+    start = _PREFIX_STRUCT.size + header_length
+    if len(view) < start:
+        raise TensorDecodeError("Message is shorter than its header")
+    try:
+        header = json.loads(bytes(view[_PREFIX_STRUCT.size : start]))
+        arrays = header["arrays"]
+        result: dict[str, Any] = dict(header["values"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise TensorDecodeError(f"Invalid header: {e}") from e
+
+    buffers = view[start:]
+    for array in arrays:
+        try:
+            key = array["key"]
+            dtype = np.dtype(array["dtype"])
+            shape = tuple(array["shape"])
+            begin, end = array["offset"], array["offset"] + array["nbytes"]
+            encoding = array["encoding"]
+        except (KeyError, TypeError) as e:
+            raise TensorDecodeError(f"Invalid array description: {e}") from e
+        if begin < 0 or end > len(buffers):
+            raise TensorDecodeError(f"Buffer of {key} is out of bounds")
+
+        if encoding == "raw":
+            try:
+                value = np.frombuffer(buffers[begin:end], dtype=dtype).reshape(shape)
+            except ValueError as e:
+                raise TensorDecodeError(f"Invalid buffer for {key}: {e}") from e
+        elif encoding == "jpeg":
+            value = cv2.imdecode(
+                np.frombuffer(buffers[begin:end], dtype=np.uint8), cv2.IMREAD_COLOR
+            )
+            if value is None or value.shape != shape:
+                raise TensorDecodeError(f"Invalid JPEG image for {key}")
+        else:
+            raise TensorDecodeError(f"Unknown encoding {encoding} for {key}")
+        result[key] = value
+    return result
+
+
+async def read_inference_request(request: Request) -> tuple[dict[str, Any], bool]:
+    """
+    Read the inputs of an inference request, in the binary or the JSON encoding.
+
+    Returns:
+        The inputs, and whether the request uses the binary encoding.
+    """
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith(TENSOR_CONTENT_TYPE):
+        # Copy the body to get writable arrays
+        return decode_tensors(bytearray(body)), True
+    # Double-encoded JSON: {"encoded": json_numpy.dumps(inputs)}
+    return json_numpy.loads(json.loads(body)["encoded"]), False
+
+
+def inference_response(actions: np.ndarray, binary: bool) -> Response:
+    """
+    Build the response of an inference request, in the encoding of the request.
+    """
+    if binary:
+        return Response(
+            content=encode_tensors({"actions": actions}),
+            media_type=TENSOR_CONTENT_TYPE,
+        )
+    return Response(
+        content=json.dumps(json_numpy.dumps(actions)),
+        media_type="application/json",
+    )
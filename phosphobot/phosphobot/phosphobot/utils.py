@@ -6,16 +6,20 @@ import ipaddress
 import json
 import os
 import platform
+import queue
 import re
 import shutil
 import socket
 import subprocess
 import sys
+import threading
 import traceback
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Annotated, Any, Literal, Tuple, Union
+from typing import Annotated, Any, ContextManager, List, Literal, Tuple, Union
 
 import av
 import cv2
@@ -235,6 +239,74 @@ def zip_folder(folder_path, zip_path):
                 zipf.write(file_path, arcname)
 
 
+def _fsync_directory(directory: str) -> None:
+    """
+    Persist the entries of a directory, eg. after a rename. No-op on Windows.
+    """
+    if platform.system() == "Windows":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_file_atomically(path: str | Path, content: str, encoding: str = "utf-8"):
+    """
+    Replace the content of a file so that a crash leaves either the old or the new
+    content: the content is written and fsynced to a temporary file, which is then
+    renamed over the file.
+    """
+    path = str(path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding=encoding) as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def append_lines_durably(path: str | Path, lines: list[str], encoding: str = "utf-8"):
+    """
+    Append lines to a text file (eg. a .jsonl file) and fsync it.
+
+    A crash during a previous append can leave a partial last line. It is
+    truncated before appending, so that each line of the file is complete.
+    """
+    if not lines:
+        return
+    path = str(path)
+    data = "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+    created = not os.path.exists(path)
+    with open(path, "a+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size > 0:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                # Find the end of the last complete line
+                position = size
+                while position > 0:
+                    chunk_start = max(0, position - 4096)
+                    f.seek(chunk_start)
+                    chunk = f.read(position - chunk_start)
+                    index = chunk.rfind(b"\n")
+                    if index != -1:
+                        position = chunk_start + index + 1
+                        break
+                    position = chunk_start
+                logger.warning(
+                    f"Truncating the partial last line of {path} ({size - position} bytes)"
+                )
+                f.truncate(position)
+        f.write(data.encode(encoding))
+        f.flush()
+        os.fsync(f.fileno())
+    if created:
+        _fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
 def is_can_plugged(interface: str = "can0") -> bool:
     """
     Checks if a specified CAN interface exists.
@@ -417,16 +489,230 @@ NdArrayAsList = Annotated[
 ]
 
 
+# Map FourCC-style codec literals to PyAV codec names
+VIDEO_CODEC_MAP = {
+    "avc1": "h264",
+    "avc3": "h264",
+    "mp4v": "mpeg4",
+    "hev1": "hevc",
+    "hvc1": "hevc",
+    "av01": "av1",
+    "vp09": "vp9",
+}
+
+
+def is_stereo_frame_shape(height: int, width: int) -> bool:
+    """
+    Stereo cameras concatenate the left and right eye frames side by side,
+    which gives an aspect ratio of 32:9 instead of 16:9.
+    """
+    return width / height >= 8 / 3
+
+
+def get_stereo_video_paths(output_path: str) -> Tuple[str, str]:
+    """
+    Return the (left, right) video paths used to store a stereo camera.
+    eg: videos/chunk-000/observation.images.main/episode_000000.mp4 ->
+        videos/chunk-000/observation.images.main.left/episode_000000.mp4
+    """
+    base, suffix = output_path.rsplit("/episode", 1)
+    return f"{base}.left/episode{suffix}", f"{base}.right/episode{suffix}"
+
+
+def open_video_container(
+    path: str,
+    size: Tuple[int, int],
+    fps: float,
+    codec: VideoCodecs,
+    thread_count: int = 0,
+) -> Tuple[Any, Any]:
+    """
+    Open a PyAV container for writing and add a video stream to it.
+
+    Args:
+        path (str): Path to the video file. Parent folders are created if needed.
+        size (Tuple[int, int]): Dimensions (width, height) of the video.
+        fps (float): Frames per second for the video.
+        codec (str): FourCC-style codec literal or PyAV codec name.
+        thread_count (int): Number of threads of the encoder. 0 lets FFmpeg pick it.
+
+    Returns:
+        Tuple: (container, stream)
+    """
+    codec_av = VIDEO_CODEC_MAP.get(codec, codec)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    container = av.open(path, mode="w")
+
+    # pick encoder options based on codec
+    encoder_opts: dict[str, str] = {}
+    if codec_av in ("h264", "mpeg4", "hevc"):
+        # CRF = quality (lower = better), preset = speed/efficiency trade-off
+        encoder_opts = {"crf": "18", "preset": "slow"}
+    elif codec_av == "av1":
+        # AV1 needs slightly higher CRF to match visually (~30),
+        # and cpu-used trades speed vs. quality (0=slowest/best)
+        encoder_opts = {
+            "crf": "30",
+            "cpu-used": "4",
+            "row-mt": "1",  # multi-threading
+            "tile-columns": "2",  # parallel tile encoding
+        }
+    elif codec_av == "vp9":
+        # VP9: crf + speed (0=best, 5=fastest)
+        encoder_opts = {"crf": "30", "speed": "1"}
+    elif codec_av == "mpeg4":
+        # old MPEG-4 Part 2: no CRF, use qscale OR fixed bitrate
+        # Lower qscale = better quality. 2–5 is a good range.
+        encoder_opts = {"qscale": "2"}
+    # else: leave encoder_opts empty for codecs that don’t support these flags
+
+    stream = container.add_stream(
+        codec_av,
+        rate=fps,
+        options=encoder_opts or None,  # type: ignore
+    )  # type: ignore
+    # Force a minimum bitrate for mpeg4 to avoid artifacts
+    if codec_av == "mpeg4":
+        # ~5 Mb/s
+        stream.bit_rate = 5_000_000  # type: ignore
+
+    stream.width, stream.height = size  # type: ignore
+    stream.pix_fmt = "yuv420p"  # type: ignore
+    # Frame and slice threading, when the encoder supports them
+    stream.codec_context.thread_type = "AUTO"  # type: ignore
+    stream.codec_context.thread_count = thread_count  # type: ignore
+    return container, stream
+
+
+def encode_video_frame(
+    frame: np.ndarray, stream: Any, container: Any, size: Tuple[int, int]
+) -> None:
+    """
+    Resize an RGB frame to size (width, height), encode it and mux the packets.
+    """
+    # Convert to uint8 RGB if needed
+    if frame.dtype != np.uint8:
+        frame = np.clip(frame, 0, 255).astype(np.uint8)
+    # Wrap as PyAV frame and resize/convert
+    video_frame = av.VideoFrame.from_ndarray(frame, format="rgb24")
+    video_frame = video_frame.reformat(width=size[0], height=size[1], format="yuv420p")
+    for packet in stream.encode(video_frame):
+        container.mux(packet)
+
+
+def flush_video_stream(stream: Any, container: Any) -> None:
+    """
+    Flush the frames buffered in the encoder into the container.
+    """
+    for packet in stream.encode():
+        container.mux(packet)
+
+
+@dataclass
+class VideoEncodingJob:
+    """
+    Frames to encode into one video file.
+    """
+
+    frames: np.ndarray  # (N, height, width, 3) RGB
+    output_path: str
+    size: Tuple[int, int]  # (width, height) of the video
+    fps: float
+    codec: VideoCodecs
+
+
+def get_video_encoding_jobs(
+    frames: np.ndarray,
+    target_size: Tuple[int, int],
+    output_path: str,
+    fps: float,
+    codec: VideoCodecs,
+) -> List[VideoEncodingJob]:
+    """
+    Split the frames of a camera into one job per video file: stereo frames
+    (aspect ratio >= 8/3) give a job for the left eye and a job for the right eye.
+    """
+    if frames.ndim != 4 or frames.shape[-1] != 3:
+        raise ValueError(
+            f"Frames must be a 4D array with shape (N, H, W, 3), got {frames.shape}"
+        )
+    num_frames, h, w, _ = frames.shape
+    if num_frames == 0:
+        raise ValueError("Frames array is empty (N=0)")
+
+    if not is_stereo_frame_shape(h, w):
+        return [VideoEncodingJob(frames, output_path, target_size, fps, codec)]
+
+    size = (target_size[0] // 2, target_size[1])
+    left_path, right_path = get_stereo_video_paths(output_path)
+    mid_w = w // 2
+    return [
+        VideoEncodingJob(frames[:, :, :mid_w, :], left_path, size, fps, codec),
+        VideoEncodingJob(frames[:, :, mid_w:, :], right_path, size, fps, codec),
+    ]
+
+
+def encode_video_job(job: VideoEncodingJob, thread_count: int = 0) -> str:
+    """
+    Encode the frames of a job into its video file.
+    """
+    container = None
+    try:
+        container, stream = open_video_container(
+            job.output_path, job.size, job.fps, job.codec, thread_count
+        )
+        for frame in job.frames:
+            encode_video_frame(frame, stream, container, job.size)
+        flush_video_stream(stream, container)
+        return job.output_path
+    except Exception:
+        logger.error(f"Error writing video {job.output_path}", exc_info=True)
+        raise
+    finally:
+        if container:
+            container.close()
+
+
+def encode_videos(
+    jobs: List[VideoEncodingJob],
+    max_workers: int | None = None,
+    thread_count: int = 0,
+) -> List[str]:
+    """
+    Encode the video files of several cameras and stereo eyes concurrently.
+    PyAV releases the GIL while converting and encoding the frames.
+
+    Args:
+        jobs (List[VideoEncodingJob]): One job per video file.
+        max_workers (int | None): Maximum number of videos encoded at the same
+            time. Defaults to the number of CPUs.
+        thread_count (int): Number of threads of each encoder. 0 lets FFmpeg pick it.
+
+    Returns:
+        List[str]: Paths of the video files, in the order of the jobs.
+    """
+    max_workers = min(len(jobs), max_workers or os.cpu_count() or 1)
+    if max_workers <= 1:
+        return [encode_video_job(job, thread_count) for job in jobs]
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="video_encoding"
+    ) as executor:
+        return list(executor.map(lambda job: encode_video_job(job, thread_count), jobs))
+
+
 def create_video_file(
     frames: np.ndarray,
     target_size: Tuple[int, int],
     output_path: str,
     fps: float,
     codec: VideoCodecs,
+    max_workers: int | None = None,
+    thread_count: int = 0,
 ) -> Union[str, Tuple[str, str]]:
     """
     Create a video file from a 4D numpy array of frames and resize to target size.
-    For stereo cameras (aspect ratio >= 8/3), creates separate left and right video files.
+    For stereo cameras (aspect ratio >= 8/3), creates separate left and right video
+    files, encoded concurrently.
 
     Args:
         frames (np.ndarray): Array of shape (N, height, width, 3) in RGB format.
@@ -434,6 +720,8 @@ def create_video_file(
         output_path (str): Path to save the video file.
         fps (float): Frames per second for the video.
         codec (str): Codec name for PyAV (e.g. "mpeg4", "h264").
+        max_workers (int | None): Maximum number of stereo eyes encoded at the same time.
+        thread_count (int): Number of threads of each encoder. 0 lets FFmpeg pick it.
 
     Returns:
         Union[str, Tuple[str, str]]: Path(s) to created video file(s). Returns tuple of paths for stereo.
@@ -442,141 +730,332 @@ def create_video_file(
         ValueError: If frames array is empty or has incorrect shape.
         RuntimeError: If writing fails unexpectedly.
     """
-    # Map FourCC-style codec literals to PyAV codec names
-    CODEC_MAP = {
-        "avc1": "h264",
-        "avc3": "h264",
-        "mp4v": "mpeg4",
-        "hev1": "hevc",
-        "hvc1": "hevc",
-        "av01": "av1",
-        "vp09": "vp9",
-    }
-    codec_av = CODEC_MAP.get(codec, codec)
     logger.info(f"Using codec: {codec}")
 
-    # Validate input array
-    if frames.ndim != 4 or frames.shape[-1] != 3:
-        raise ValueError(
-            f"Frames must be a 4D array with shape (N, H, W, 3), got {frames.shape}"
-        )
-    num_frames, h, w, _ = frames.shape
-    if num_frames == 0:
-        raise ValueError("Frames array is empty (N=0)")
+    jobs = get_video_encoding_jobs(frames, target_size, output_path, fps, codec)
+    logger.info(
+        f"Stereo={len(jobs) == 2}, aspect_ratio={frames.shape[2] / frames.shape[1]:.2f}"
+    )
+    paths = encode_videos(jobs, max_workers=max_workers, thread_count=thread_count)
+    if len(paths) == 2:
+        return paths[0], paths[1]
+    return paths[0]
 
-    aspect_ratio = w / h
-    is_stereo = aspect_ratio >= 8 / 3
-    logger.info(f"Stereo={is_stereo}, aspect_ratio={aspect_ratio:.2f}")
-
-    def open_container(path: str, size: Tuple[int, int]):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        container = av.open(path, mode="w")
-
-        # pick encoder options based on codec
-        encoder_opts: dict[str, str] = {}
-        if codec_av in ("h264", "mpeg4", "hevc"):
-            # CRF = quality (lower = better), preset = speed/efficiency trade-off
-            encoder_opts = {"crf": "18", "preset": "slow"}
-        elif codec_av == "av1":
-            # AV1 needs slightly higher CRF to match visually (~30),
-            # and cpu-used trades speed vs. quality (0=slowest/best)
-            encoder_opts = {
-                "crf": "30",
-                "cpu-used": "4",
-                "row-mt": "1",  # multi-threading
-                "tile-columns": "2",  # parallel tile encoding
-            }
-        elif codec_av == "vp9":
-            # VP9: crf + speed (0=best, 5=fastest)
-            encoder_opts = {"crf": "30", "speed": "1"}
-        elif codec_av == "mpeg4":
-            # old MPEG-4 Part 2: no CRF, use qscale OR fixed bitrate
-            # Lower qscale = better quality. 2–5 is a good range.
-            encoder_opts = {"qscale": "2"}
-        # else: leave encoder_opts empty for codecs that don’t support these flags
-
-        stream = container.add_stream(
-            codec_av,
-            rate=fps,
-            options=encoder_opts or None,  # type: ignore
-        )  # type: ignore
-        # Force a minimum bitrate for mpeg4 to avoid artifacts
-        if codec_av == "mpeg4":
-            # ~5 Mb/s
-            stream.bit_rate = 5_000_000  # type: ignore
-
-        stream.width, stream.height = size  # type: ignore
-        stream.pix_fmt = "yuv420p"  # type: ignore
-        return container, stream
-
-    def process_and_encode(frame: np.ndarray, stream, container, size: Tuple[int, int]):
-        # Convert to uint8 RGB if needed
-        if frame.dtype != np.uint8:
-            frame = np.clip(frame, 0, 255).astype(np.uint8)
-        # Wrap as PyAV frame and resize/convert
-        video_frame = av.VideoFrame.from_ndarray(frame, format="rgb24")
-        video_frame = video_frame.reformat(
-            width=size[0], height=size[1], format="yuv420p"
+
+class ImageStatsAccumulator:
+    """
+    Histogram of the values of each RGB channel of the frames of a video, to compute
+    their image stats (min, max, sum and square sum of the values normalized to
+    [0, 1]) without converting the frames to float. With all the pixels, the stats
+    are exact.
+
+    Only every spatial_stride-th pixel of every spatial_stride-th row of every
+    temporal_stride-th frame is counted. The sums are scaled to the number of pixels
+    of all the frames, so that they weigh the same as exact stats.
+    """
+
+    def __init__(self, spatial_stride: int = 1, temporal_stride: int = 1) -> None:
+        if spatial_stride < 1 or temporal_stride < 1:
+            raise ValueError(
+                f"Strides must be at least 1, got {spatial_stride} and {temporal_stride}"
+            )
+        self.spatial_stride = spatial_stride
+        self.temporal_stride = temporal_stride
+        self.histogram = np.zeros((3, 256), dtype=np.int64)
+        self.nb_frames = 0
+        # Pixels of all the frames, sampled or not
+        self.nb_pixels = 0
+
+    def update(self, frame: np.ndarray) -> None:
+        """
+        Count an RGB frame of shape (height, width, 3).
+        """
+        if self.nb_frames % self.temporal_stride == 0:
+            sample = frame[:: self.spatial_stride, :: self.spatial_stride]
+            if sample.dtype != np.uint8:
+                sample = np.clip(sample, 0, 255).astype(np.uint8)
+            sample = np.ascontiguousarray(sample)
+            for channel in range(3):
+                self.histogram[channel] += (
+                    cv2.calcHist([sample], [channel], None, [256], [0, 256])
+                    .ravel()
+                    .astype(np.int64)
+                )
+        self.nb_frames += 1
+        self.nb_pixels += frame.shape[0] * frame.shape[1]
+
+    def stats(
+        self,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int] | None:
+        """
+        Returns:
+            The per channel min, max, sum and square sum of the values normalized to
+            [0, 1], and the number of pixels. None if no frame was counted.
+        """
+        nb_sampled_pixels = int(self.histogram[0].sum())
+        if nb_sampled_pixels == 0:
+            return None
+        values = np.arange(256) / 255.0
+        scale = self.nb_pixels / nb_sampled_pixels
+        counted = self.histogram > 0
+        min_value = values[np.argmax(counted, axis=1)]
+        max_value = values[255 - np.argmax(counted[:, ::-1], axis=1)]
+        return (
+            min_value,
+            max_value,
+            self.histogram @ values * scale,
+            self.histogram @ values**2 * scale,
+            self.nb_pixels,
         )
-        for packet in stream.encode(video_frame):
-            container.mux(packet)
 
-    if is_stereo:
-        size = (target_size[0] // 2, target_size[1])
-        base, suffix = output_path.rsplit("/episode", 1)
-        left_path = f"{base}.left/episode{suffix}"
-        right_path = f"{base}.right/episode{suffix}"
 
-        left_ct = right_ct = None
-        try:
-            left_ct, left_stream = open_container(left_path, size)
-            right_ct, right_stream = open_container(right_path, size)
-
-            mid_w = w // 2
-            for frame in frames:
-                left_frame = frame[:, :mid_w, :]
-                right_frame = frame[:, mid_w:, :]
-                process_and_encode(left_frame, left_stream, left_ct, size)
-                process_and_encode(right_frame, right_stream, right_ct, size)
-
-            # flush encoders
-            for packet in left_stream.encode():
-                left_ct.mux(packet)
-            for packet in right_stream.encode():
-                right_ct.mux(packet)
-
-            return left_path, right_path
-
-        except Exception:
-            logger.error("Error writing stereo video", exc_info=True)
-            raise
-        finally:
-            if left_ct:
-                left_ct.close()
-            if right_ct:
-                right_ct.close()
+class StreamingVideoEncoder:
+    """
+    Encode frames into a video file while they are being recorded.
 
-    else:
-        size = target_size
-        container = None
-        try:
-            container, stream = open_container(output_path, size)
-            for frame in frames:
-                process_and_encode(frame, stream, container, size)
+    Frames are pushed to a bounded queue with write() or write_async() and encoded
+    by a background thread, so that a recording never holds more than max_queue_size
+    frames in RAM.
+    Call close() to flush the encoder and finalize the file.
 
-            # flush encoder
-            for packet in stream.encode():
-                container.mux(packet)
+    The container is opened when the first frame arrives. Like create_video_file,
+    stereo frames (aspect ratio >= 8/3) are split into a left and a right video file.
+    The right eye is encoded by a second thread, at the same time as the left eye.
 
-            return output_path
+    If image_stats is given, the encoder thread also counts the frames in it, so that
+    the image stats are computed outside of the recording loop.
 
-        except Exception:
-            logger.error("Error writing video", exc_info=True)
-            raise
+    Encoders that share an encoding_slots semaphore encode at most as many frames at
+    the same time as the semaphore allows: the others wait with their frames queued.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        target_size: Tuple[int, int],
+        fps: float,
+        codec: VideoCodecs,
+        max_queue_size: int = 64,
+        thread_count: int = 0,
+        image_stats: ImageStatsAccumulator | None = None,
+        encoding_slots: threading.Semaphore | None = None,
+    ) -> None:
+        """
+        Args:
+            output_path (str): Path to save the video file.
+            target_size (Tuple[int, int]): Target dimensions (width, height) for the output video.
+            fps (float): Frames per second for the video.
+            codec (str): Codec name for PyAV (e.g. "mpeg4", "h264").
+            max_queue_size (int): Number of frames waiting to be encoded before write() blocks.
+            thread_count (int): Number of threads of each encoder. 0 lets FFmpeg pick it.
+            image_stats (ImageStatsAccumulator | None): Stats updated with the encoded frames.
+            encoding_slots (threading.Semaphore | None): Held while a frame is encoded
+                or the video is flushed. Share it to cap the encoders running at once.
+        """
+        self.output_path = output_path
+        self.target_size = target_size
+        self.fps = fps
+        self.codec = codec
+        self.thread_count = thread_count
+        self.image_stats = image_stats
+        self._encoding_slots: ContextManager = encoding_slots or nullcontext()
+        self.frame_count = 0
+        # Frames written while the queue was full
+        self.nb_late_writes = 0
+
+        self._queue: queue.Queue[np.ndarray | None] = queue.Queue(
+            maxsize=max_queue_size
+        )
+        self._is_closed = False
+        self._is_aborted = False
+        self._error: Exception | None = None
+        self._written_paths: list[str] = []
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"video_encoder_{os.path.basename(os.path.dirname(output_path))}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def write(self, frame: np.ndarray, block: bool = True) -> None:
+        """
+        Queue an RGB frame of shape (height, width, 3) for encoding.
+        The frame must not be modified afterwards. If the encoder is late, blocks, or
+        raises queue.Full if block is False.
+        """
+        if self._is_closed:
+            raise RuntimeError(f"Video encoder for {self.output_path} is closed")
+        if self._error is not None:
+            # The error is raised by close(). Don't stop the recording for it.
+            return
+        if frame.ndim != 3 or frame.shape[-1] != 3:
+            raise ValueError(
+                f"Frame must be a 3D array with shape (H, W, 3), got {frame.shape}"
+            )
+        self._queue.put(frame, block=block)
+        self.frame_count += 1
+
+    async def write_async(self, frame: np.ndarray) -> None:
+        """
+        Like write(), without blocking the event loop: if the encoder is late, the
+        frame is queued from a thread. No frame is dropped.
+        """
+        try:
+            self.write(frame, block=False)
+        except queue.Full:
+            self.nb_late_writes += 1
+            await asyncio.to_thread(self.write, frame)
+
+    def close(self) -> Union[str, Tuple[str, str], None]:
+        """
+        Wait for the queued frames to be encoded and finalize the video file(s).
+
+        Returns:
+            Union[str, Tuple[str, str], None]: Path(s) to the created video file(s),
+                a tuple of paths for stereo, or None if no frame was written.
+
+        Raises:
+            RuntimeError: If encoding failed.
+        """
+        self.finish()
+        self._thread.join()
+
+        if self._error is not None:
+            raise RuntimeError(
+                f"Error writing video {self.output_path}: {self._error}"
+            ) from self._error
+        if not self._written_paths:
+            return None
+        if len(self._written_paths) == 2:
+            return self._written_paths[0], self._written_paths[1]
+        return self._written_paths[0]
+
+    def finish(self) -> None:
+        """
+        Stop accepting frames, without waiting for the queued frames to be encoded.
+        Call finish() on several encoders before close() to flush them concurrently.
+        """
+        if not self._is_closed:
+            self._is_closed = True
+            self._queue.put(None)
+
+    def abort(self) -> None:
+        """
+        Stop encoding, drop the queued frames and delete the partial video file(s).
+        """
+        self._is_aborted = True
+        if not self._is_closed:
+            self._is_closed = True
+            # Unblock the encoder thread if the queue is full
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queue.put(None)
+        self._thread.join()
+
+        for path in self._written_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self._written_paths = []
+
+    def _run(self) -> None:
+        containers: list[tuple[Any, Any]] = []
+        # Size of the video(s): half the width for each eye of the stereo frames
+        self._size = self.target_size
+        # Encodes the right eye of the stereo frames
+        self._eye_executor: ThreadPoolExecutor | None = None
+
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            # After an error or an abort, keep draining so that write() never blocks
+            if self._error is not None or self._is_aborted:
+                continue
+
+            try:
+                with self._encoding_slots:
+                    self._encode(frame, containers)
+            except Exception as e:
+                logger.error(f"Error writing video {self.output_path}", exc_info=True)
+                self._error = e
+
+        try:
+            if self._error is None and not self._is_aborted:
+                with self._encoding_slots:
+                    self._flush(containers)
+        except Exception as e:
+            logger.error(f"Error flushing video {self.output_path}", exc_info=True)
+            self._error = e
         finally:
-            if container:
+            if self._eye_executor is not None:
+                self._eye_executor.shutdown()
+            for container, _ in containers:
                 container.close()
 
+    def _encode(self, frame: np.ndarray, containers: list[tuple[Any, Any]]) -> None:
+        """
+        Encode a frame, opening the video container(s) on the first frame.
+        """
+        if self.image_stats is not None:
+            self.image_stats.update(frame)
+        if not containers:
+            h, w, _ = frame.shape
+            if is_stereo_frame_shape(h, w):
+                self._size = (self.target_size[0] // 2, self.target_size[1])
+                paths = list(get_stereo_video_paths(self.output_path))
+                self._eye_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=self._thread.name
+                )
+            else:
+                paths = [self.output_path]
+            for path in paths:
+                containers.append(
+                    open_video_container(
+                        path, self._size, self.fps, self.codec, self.thread_count
+                    )
+                )
+                self._written_paths.append(path)
+
+        if self._eye_executor is not None:
+            mid_w = frame.shape[1] // 2
+            (left_ct, left_stream), (right_ct, right_stream) = containers
+            right_eye = self._eye_executor.submit(
+                encode_video_frame,
+                frame[:, mid_w:, :],
+                right_stream,
+                right_ct,
+                self._size,
+            )
+            try:
+                encode_video_frame(
+                    frame[:, :mid_w, :], left_stream, left_ct, self._size
+                )
+            finally:
+                right_eye.result()
+        else:
+            container, stream = containers[0]
+            encode_video_frame(frame, stream, container, self._size)
+
+    def _flush(self, containers: list[tuple[Any, Any]]) -> None:
+        """
+        Encode the frames buffered by the codec(s).
+        """
+        if self._eye_executor is not None:
+            (left_ct, left_stream), (right_ct, right_stream) = containers
+            right_eye = self._eye_executor.submit(
+                flush_video_stream, right_stream, right_ct
+            )
+            try:
+                flush_video_stream(left_stream, left_ct)
+            finally:
+                right_eye.result()
+        else:
+            for container, stream in containers:
+                flush_video_stream(stream, container)
+
 
 def get_home_app_path() -> Path:
     """
@@ -8,12 +8,15 @@ pytest tests/test_so100.py
 
 import os
 import sys
+from collections import deque
 
+import numpy as np
 import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from phosphobot.hardware import SO100Hardware
+from phosphobot.hardware.motors.feetech import PendingWrite
 
 
 # Create robot pytest fixture
@@ -27,4 +30,38 @@ def robot() -> SO100Hardware:
     return robot
 
 
+class FakeMotorsBus:
+    """Keeps the non-blocking writes pending until the test resolves them"""
+
+    def __init__(self):
+        self.pending_writes: list[PendingWrite] = []
+
+    def write(self, data_name, values, motor_names=None, blocking=True):
+        pending_write = PendingWrite(data_name)
+        self.pending_writes.append(pending_write)
+        return pending_write
+
+
+def test_non_blocking_write_errors_are_counted(robot: SO100Hardware):
+    motors_bus = FakeMotorsBus()
+    robot.motors_bus = motors_bus  # type: ignore
+    robot._pending_writes = deque()
+    robot.is_connected = True
+    robot.motor_communication_errors = 3
+
+    robot.write_group_motor_position(np.zeros(6))
+    # Not sent yet: the errors are not reset
+    robot.write_group_motor_position(np.zeros(6))
+    assert robot.motor_communication_errors == 3
+
+    motors_bus.pending_writes[0].resolve(error=ConnectionError("No status packet"))
+    robot.write_group_motor_position(np.zeros(6))
+    assert robot.motor_communication_errors == 4
+
+    motors_bus.pending_writes[1].resolve()
+    robot.write_group_motor_position(np.zeros(6))
+    assert robot.motor_communication_errors == 0
+    robot.is_connected = False
+
+
 # TODO: implement SO100 specific tests here
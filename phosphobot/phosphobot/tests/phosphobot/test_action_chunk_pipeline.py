@@ -0,0 +1,170 @@
+"""
+Tests for the action chunk pipeline of the AI control loops: prefetch of the next
+chunk, temporal ensembling and stall time between chunks.
+
+```
+pytest tests/phosphobot/test_action_chunk_pipeline.py -s
+```
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import json_numpy  # type: ignore
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.am.base import ActionChunkPipeline
+from phosphobot.control_loop import LoopTimer
+
+CHUNK_SIZE = 20
+INFERENCE_TIME = 0.05
+CONTROL_PERIOD = 0.01
+
+
+class FakeInferenceHandler(BaseHTTPRequestHandler):
+    """
+    Answers like the ACT inference server, after INFERENCE_TIME. The action i of the
+    chunk is the step of the observation plus i, so that the tests can check which
+    step every executed action was meant for.
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        inputs = json_numpy.loads(json.loads(body)["encoded"])
+        time.sleep(INFERENCE_TIME)
+        step = float(inputs["observation.state"][0])
+        chunk = (step + np.arange(CHUNK_SIZE, dtype=np.float32)).reshape(-1, 1, 1)
+        response = json.dumps(json_numpy.dumps(chunk)).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+        except (BrokenPipeError, ConnectionResetError):
+            # The prefetch was cancelled at the end of the test
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def inference_server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeInferenceHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_merge_drops_stale_actions_and_blends():
+    async def sample_actions(inputs):
+        raise NotImplementedError
+
+    pipeline = ActionChunkPipeline(sample_actions, ensemble_decay=0.0)
+    pipeline.actions = deque(np.array([[10.0], [20.0], [30.0]]))
+    # 2 actions were executed while the chunk was computed
+    pipeline._nb_executed_since_request = 2
+    pipeline._merge(np.array([[0.0], [1.0], [2.0], [4.0], [6.0], [7.0]]))
+
+    # The first 2 actions are dropped, the overlap is averaged
+    assert [action[0] for action in pipeline.actions] == [6.0, 12.0, 18.0, 7.0]
+    assert pipeline.chunk_size == 6
+
+    # A chunk that arrives too late does not replace the remaining actions
+    pipeline._nb_executed_since_request = 10
+    pipeline._merge(np.zeros((6, 1)))
+    assert [action[0] for action in pipeline.actions] == [6.0, 12.0, 18.0, 7.0]
+
+
+@pytest.mark.asyncio
+async def test_inference_errors_are_propagated():
+    nb_calls = 0
+
+    async def sample_actions(inputs):
+        nonlocal nb_calls
+        nb_calls += 1
+        if nb_calls == 2:
+            raise RuntimeError("Inference server unavailable")
+        return np.arange(4.0).reshape(-1, 1)
+
+    pipeline = ActionChunkPipeline(sample_actions, prefetch_fraction=0.5)
+    for _ in range(2):
+        await pipeline.next_action(dict)
+    await asyncio.sleep(0)
+    # The prefetch failed: the error is raised by the next call
+    with pytest.raises(RuntimeError):
+        await pipeline.next_action(dict)
+    # The remaining actions are kept and the next chunk is requested again
+    assert (await pipeline.next_action(dict))[0] == 2.0
+    assert (await pipeline.next_action(dict))[0] == 3.0
+    # The chunk requested with the observation of the step 2
+    assert (await pipeline.next_action(dict))[0] == 2.0
+    assert nb_calls == 3
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_prefetch_stall_benchmark(inference_server_url: str):
+    """
+    Time the robot waits for the next action chunk with a fake inference server,
+    with and without prefetching the next chunk.
+    """
+    nb_steps = 120
+    results = {}
+
+    for prefetch_fraction in (0.0, 0.5):
+        client = httpx.AsyncClient(base_url=inference_server_url, timeout=5)
+
+        async def sample_actions(
+            inputs: dict, client: httpx.AsyncClient = client
+        ) -> np.ndarray:
+            response = await client.post(
+                "/act", json={"encoded": json_numpy.dumps(inputs)}
+            )
+            return json_numpy.loads(response.json())
+
+        pipeline = ActionChunkPipeline(
+            sample_actions, prefetch_fraction=prefetch_fraction
+        )
+        loop_timer = LoopTimer(name="ai_control", period=CONTROL_PERIOD)
+        lags = []
+        start = time.perf_counter()
+        for step in range(nb_steps):
+
+            def get_inputs(step: int = step) -> dict:
+                return {"observation.state": np.array([step], dtype=np.float32)}
+
+            actions = await pipeline.next_action(get_inputs)
+            # How many steps behind the robot the executed action is
+            lags.append(step - actions[0][0])
+            await loop_timer.wait()
+        elapsed = time.perf_counter() - start
+        pipeline.cancel()
+        await client.aclose()
+
+        results[prefetch_fraction] = pipeline.mean_stall_ms
+        print(
+            f"\nPrefetch fraction {prefetch_fraction}: {pipeline.nb_chunks} chunks, "
+            f"mean stall between chunks {pipeline.mean_stall_ms or 0:.1f} ms, "
+            f"{nb_steps} steps in {elapsed:.2f} s, "
+            f"max lag {max(lags):.1f} steps"
+        )
+        # The actions predicted for the steps executed during the inference are dropped
+        assert max(lags) == pytest.approx(0, abs=1e-3)
+
+    assert results[0.0] is not None
+    assert results[0.0] >= INFERENCE_TIME * 1000 * 0.8
+    assert (results[0.5] or 0) < results[0.0] / 4
@@ -20,6 +20,7 @@ from phosphobot.configs import config
 from phosphobot.types import SimulationMode
 from phosphobot.hardware import KochHardware, SO100Hardware, get_sim
 from phosphobot.hardware.base import BaseManipulator
+from scipy.spatial.transform import Rotation as R
 
 
 # Create robot pytest fixture
@@ -190,3 +191,46 @@ async def test_rotate_robot_z(robot: BaseManipulator):
     await move_robot_testing(
         robot, np.array([0, 0, 0]), np.array([0, 0, 0.1]), atol_pos=2e-2
     )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("robot", ["koch", "so100"], indirect=True)
+async def test_move_robot_diagonal_and_rotate(robot: BaseManipulator):
+    """
+    Pose which the inverse kinematics settings were not chosen on: a move along the
+    three axes with a pitch and a yaw.
+    """
+    await move_robot_testing(
+        robot, np.array([0.01, 0.01, 0.01]), np.array([0, 0.05, 0.05])
+    )
+
+
+@pytest.mark.parametrize("robot", ["koch", "so100"], indirect=True)
+def test_inverse_kinematics_retries_without_orientation(
+    robot: BaseManipulator, monkeypatch
+):
+    """
+    If the IK with the orientation doesn't move the robot, the IK is solved again
+    without the orientation.
+    """
+    robot.set_simulation_positions(np.zeros(6))
+    position, orientation = robot.forward_kinematics()
+    target_position = position + np.array([0.02, 0, 0])
+
+    chain_inverse_kinematics = robot._chain_inverse_kinematics
+    orientations = []
+
+    def stuck_with_orientation(target_position, target_orientation, q_init):
+        orientations.append(target_orientation)
+        if target_orientation is not None:
+            return q_init
+        return chain_inverse_kinematics(target_position, target_orientation, q_init)
+
+    monkeypatch.setattr(robot, "_chain_inverse_kinematics", stuck_with_orientation)
+    q_robot_rad = robot.inverse_kinematics(
+        target_position, R.from_euler("xyz", orientation).as_quat()
+    )
+
+    assert orientations[0] is not None and orientations[1] is None
+    reached_position, _ = robot.kinematic_chain.forward_kinematics(q_robot_rad)
+    assert np.allclose(reached_position, target_position, atol=1e-3)
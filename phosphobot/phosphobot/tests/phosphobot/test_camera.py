@@ -0,0 +1,226 @@
+"""
+Tests for the frames published by the cameras.
+
+```
+pytest tests/phosphobot/test_camera.py
+```
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.camera import DummyCamera, FrameRingBuffer, StaleFrameError
+
+
+@pytest.fixture
+def camera():
+    camera = DummyCamera(camera_type="dummy", width=32, height=24)
+    yield camera
+    camera.stop()
+
+
+def make_frame(value: int) -> np.ndarray:
+    return np.full((24, 32, 3), value, dtype=np.uint8)
+
+
+def test_published_frames_have_increasing_seq(camera: DummyCamera):
+    assert camera.get_latest_frame() is None
+
+    camera._publish_frame(make_frame(1))
+    first = camera.get_latest_frame()
+    camera._publish_frame(make_frame(2))
+    second = camera.get_latest_frame()
+
+    assert first is not None and second is not None
+    assert second.seq == first.seq + 1
+    assert second.capture_ts >= first.capture_ts
+    # Consumers share the frame: it must not be modified
+    assert not second.frame.flags.writeable
+
+
+def test_wait_for_frame(camera: DummyCamera):
+    camera._publish_frame(make_frame(1))
+    first = camera.get_latest_frame()
+    assert first is not None
+
+    # No new frame: the latest frame is returned after the timeout
+    assert camera.wait_for_frame(last_seq=first.seq, timeout=0.01) == first
+
+    timer = threading.Timer(0.05, camera._publish_frame, args=(make_frame(2),))
+    timer.start()
+    new_frame = camera.wait_for_frame(last_seq=first.seq, timeout=2)
+    timer.join()
+
+    assert new_frame is not None
+    assert new_frame.seq == first.seq + 1
+    assert new_frame.frame[0, 0, 0] == 2
+
+
+def test_rgb_from_camera_frame(camera: DummyCamera):
+    bgr_frame = make_frame(0)
+    bgr_frame[..., 0] = 255  # Blue channel
+    camera._publish_frame(bgr_frame)
+    camera_frame = camera.get_latest_frame()
+    assert camera_frame is not None
+
+    rgb_frame = camera.get_rgb_from_camera_frame(camera_frame, resize=(16, 12))
+
+    assert rgb_frame.shape == (12, 16, 3)
+    assert np.all(rgb_frame[..., 2] == 255)
+    assert np.all(rgb_frame[..., 0] == 0)
+
+
+def test_derived_frames_are_cached(camera: DummyCamera):
+    camera._publish_frame(make_frame(1))
+    camera_frame = camera.get_latest_frame()
+    assert camera_frame is not None
+
+    # Several consumers ask for the same derived frame: it's computed once
+    first = camera.get_rgb_from_camera_frame(camera_frame, resize=(16, 12))
+    second = camera.get_rgb_from_camera_frame(camera_frame, resize=(16, 12))
+    assert first is second
+    assert not first.flags.writeable
+    assert camera.frame_cache.misses == 1
+    assert camera.frame_cache.hits == 1
+
+    jpeg = camera.get_jpeg_from_camera_frame(camera_frame, (16, 12), quality=80)
+    assert jpeg is not None
+    assert camera.get_jpeg_from_camera_frame(camera_frame, (16, 12), 80) is jpeg
+
+    # A new frame evicts the derived frames of the previous one
+    camera._publish_frame(make_frame(2))
+    new_frame = camera.get_latest_frame()
+    assert new_frame is not None
+    camera.get_bgr_from_camera_frame(new_frame, resize=(16, 12))
+    assert camera.frame_cache.stats()["entries"] == 1
+
+
+def test_frame_cache_compute_error_is_not_cached(camera: DummyCamera):
+    def failing_compute():
+        raise ValueError("encoding failed")
+
+    with pytest.raises(ValueError):
+        camera.frame_cache.get_or_compute((1, "jpeg", None, None), failing_compute)
+    assert (
+        camera.frame_cache.get_or_compute((1, "jpeg", None, None), lambda: b"ok")
+        == b"ok"
+    )
+
+
+def test_frames_are_read_in_the_ring_buffer(camera: DummyCamera):
+    camera._publish_frame(make_frame(1))
+    first = camera.get_latest_frame()
+    assert first is not None
+    assert camera.is_frame_valid(first)
+
+    # The capture thread writes the next frames in the preallocated buffers
+    for value in range(2, camera.frame_ring.size + 2):
+        buffer = camera.frame_ring.next_buffer()
+        assert buffer is not None
+        buffer[:] = value
+        camera._publish_frame(buffer)
+
+    latest = camera.get_latest_frame()
+    assert latest is not None
+    assert latest.frame[0, 0, 0] == camera.frame_ring.size + 1
+    assert not latest.frame.flags.writeable
+    assert camera.frame_ring.allocations == 1
+    # The slot of the first frame was reused
+    assert not camera.is_frame_valid(first)
+    assert camera.is_frame_valid(latest)
+
+
+def test_derived_frame_of_an_overwritten_frame(camera: DummyCamera):
+    camera._publish_frame(make_frame(1))
+    first = camera.get_latest_frame()
+    assert first is not None
+    for value in range(2, camera.frame_ring.size + 2):
+        camera._publish_frame(make_frame(value))
+
+    # The derived frame of another frame is never returned instead
+    with pytest.raises(StaleFrameError):
+        camera.get_rgb_from_camera_frame(first)
+    with pytest.raises(StaleFrameError):
+        camera.get_jpeg_from_camera_frame(first, (16, 12), quality=80)
+
+    # Asking for the latest frame gets the latest frame
+    rgb_frame = camera.derive_latest_frame(camera.get_rgb_from_camera_frame)
+    assert rgb_frame[0, 0, 0] == camera.frame_ring.size + 1
+
+
+def test_bgr_frame_outlives_its_ring_buffer_slot(camera: DummyCamera):
+    camera._publish_frame(make_frame(1))
+    first = camera.get_latest_frame()
+    assert first is not None
+
+    bgr_frame = camera.get_bgr_from_camera_frame(first)
+    assert not np.shares_memory(bgr_frame, first.frame)
+    assert not bgr_frame.flags.writeable
+    # Several consumers share the same copy
+    assert camera.get_bgr_from_camera_frame(first) is bgr_frame
+
+    for value in range(2, camera.frame_ring.size + 2):
+        buffer = camera.frame_ring.next_buffer()
+        assert buffer is not None
+        buffer[:] = value
+        camera._publish_frame(buffer)
+
+    assert np.all(bgr_frame == 1)
+    with pytest.raises(StaleFrameError):
+        camera.get_bgr_from_camera_frame(first, resize=(16, 12))
+
+@pytest.mark.benchmark
+def test_capture_allocations_benchmark(tmp_path):
+    """
+    Allocations per second of a capture loop reading a 640x480 stream at 30 fps,
+    with and without the frame ring buffer.
+    """
+    video_path = str(tmp_path / "capture.avi")
+    fps = 30
+    nb_warmup_frames, nb_frames = 8, 60
+    writer = cv2.VideoWriter(
+        video_path, cv2.VideoWriter.fourcc("M", "J", "P", "G"), fps, (640, 480)
+    )
+    for i in range(nb_warmup_frames + nb_frames):
+        writer.write(np.full((480, 640, 3), i, dtype=np.uint8))
+    writer.release()
+
+    def capture(use_ring_buffer: bool) -> float:
+        """Return the number of bytes allocated per frame"""
+        video = cv2.VideoCapture(video_path)
+        ring = FrameRingBuffer()
+        # Keep the frames alive: the traced memory then grows by every allocation
+        frames = []
+        for seq in range(1, nb_warmup_frames + nb_frames + 1):
+            if seq == nb_warmup_frames + 1:
+                tracemalloc.start()
+            buffer = ring.next_buffer() if use_ring_buffer else None
+            success, frame = video.read(image=buffer)
+            assert success
+            frames.append(ring.commit(frame, seq) if use_ring_buffer else frame)
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        video.release()
+        return allocated / nb_frames
+
+    frame_size = 640 * 480 * 3
+    for use_ring_buffer in (False, True):
+        bytes_per_frame = capture(use_ring_buffer)
+        print(
+            f"\nRing buffer: {use_ring_buffer}. At {fps} fps: "
+            f"{bytes_per_frame * fps / frame_size:.1f} frame allocations/s, "
+            f"{bytes_per_frame * fps / 1e6:.2f} MB/s"
+        )
+        if use_ring_buffer:
+            # Only small objects (array views) are allocated
+            assert bytes_per_frame < frame_size / 100
+        else:
+            assert bytes_per_frame >= frame_size
@@ -0,0 +1,182 @@
+"""
+Tests for the control loop runtime: deadline scheduling, timing statistics and
+isolation from the API event loop.
+
+```
+pytest tests/phosphobot/test_control_loop.py -s
+```
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.control_loop import (
+    ControlLoopAlreadyRunningError,
+    ControlLoopRuntime,
+    LoopTimer,
+)
+from phosphobot.control_signal import ControlSignal
+
+
+async def blocking_loop(
+    control_signal: ControlSignal,
+    period: float,
+    work_durations: list[float],
+    loop_timer: LoopTimer | None = None,
+):
+    """A control loop that does blocking I/O, like a serial bus round trip"""
+    if loop_timer is None:
+        loop_timer = LoopTimer(name="blocking")
+    loop_timer.period = period
+    for work_duration in work_durations:
+        if not control_signal.is_in_loop():
+            break
+        time.sleep(work_duration)
+        await loop_timer.wait()
+    return loop_timer.stats()
+
+
+@pytest.mark.asyncio
+async def test_deadline_scheduling():
+    control_signal = ControlSignal()
+    control_signal.start()
+    period = 0.01
+    # The work duration varies, but the iterations stay on the deadlines
+    work_durations = [0.001, 0.006] * 25
+
+    stats = await blocking_loop(control_signal, period, work_durations)
+    assert stats.iterations == 50
+    # A few iterations can be late when the machine is busy
+    assert stats.overruns <= 5
+    assert stats.mean_period_ms == pytest.approx(period * 1000, rel=0.1)
+
+
+@pytest.mark.asyncio
+async def test_overruns_are_counted_and_skipped():
+    control_signal = ControlSignal()
+    control_signal.start()
+    period = 0.02
+    # Every fifth iteration takes 3 periods
+    work_durations = [0.06 if i % 5 == 4 else 0.001 for i in range(20)]
+
+    start = time.perf_counter()
+    stats = await blocking_loop(control_signal, period, work_durations)
+    elapsed = time.perf_counter() - start
+
+    # A few short iterations can also be late when the machine is busy
+    assert 4 <= stats.overruns <= 8
+    # The missed deadlines are skipped: no burst of iterations to catch up
+    assert stats.mean_period_ms is not None
+    assert stats.mean_period_ms > period * 1000
+    assert elapsed > 4 * 0.06 + 16 * period * 0.9
+
+
+@pytest.mark.asyncio
+async def test_runtime_runs_loop_in_thread():
+    runtime = ControlLoopRuntime()
+    control_signal = ControlSignal()
+    control_signal.start()
+
+    future = runtime.start(
+        "blocking",
+        blocking_loop,
+        control_signal=control_signal,
+        period=0.005,
+        work_durations=[0.002] * 10_000,
+    )
+    await asyncio.sleep(0.2)
+    assert runtime.is_running("blocking")
+    (stats,) = runtime.stats()
+    assert stats.running
+    assert stats.iterations > 0
+
+    control_signal.stop()
+    stats = await asyncio.wait_for(asyncio.wrap_future(future), timeout=1)
+    runtime.join("blocking", timeout=1)
+    assert not runtime.is_running("blocking")
+    assert not runtime.stats()[0].running
+    assert stats.target_period_ms == pytest.approx(5)
+
+
+@pytest.mark.asyncio
+async def test_runtime_refuses_a_second_loop_with_the_same_name():
+    runtime = ControlLoopRuntime()
+    control_signal = ControlSignal()
+    control_signal.start()
+    kwargs = dict(
+        control_signal=control_signal, period=0.005, work_durations=[0.002] * 10_000
+    )
+
+    future = runtime.start("blocking", blocking_loop, **kwargs)
+    with pytest.raises(ControlLoopAlreadyRunningError):
+        runtime.start("blocking", blocking_loop, **kwargs)
+
+    control_signal.stop()
+    await asyncio.wait_for(asyncio.wrap_future(future), timeout=1)
+    runtime.join("blocking", timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_failed_loop_stops_its_control_signal():
+    runtime = ControlLoopRuntime()
+    control_signal = ControlSignal()
+    control_signal.start()
+
+    async def failing_loop(control_signal: ControlSignal, loop_timer: LoopTimer):
+        raise RuntimeError("motor disconnected")
+
+    future = runtime.start("failing", failing_loop, control_signal=control_signal)
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(asyncio.wrap_future(future), timeout=1)
+    assert not control_signal.is_in_loop()
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_event_loop_lag_benchmark():
+    """
+    Lag of the API event loop while a control loop with blocking I/O runs on it,
+    compared with the control loop in its own thread.
+    """
+
+    async def measure_lag(duration: float) -> np.ndarray:
+        lags = []
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+        return np.array(lags)
+
+    lags = {}
+    for in_thread in (False, True):
+        control_signal = ControlSignal()
+        control_signal.start()
+        # 10 ms of blocking I/O per iteration, 50 Hz
+        kwargs = dict(
+            control_signal=control_signal, period=0.02, work_durations=[0.01] * 20
+        )
+        if in_thread:
+            future = ControlLoopRuntime().start("blocking", blocking_loop, **kwargs)
+            lags[in_thread] = await measure_lag(0.3)
+            control_signal.stop()
+            await asyncio.wrap_future(future)
+        else:
+            task = asyncio.create_task(blocking_loop(**kwargs))
+            lags[in_thread] = await measure_lag(0.3)
+            control_signal.stop()
+            await task
+        print(
+            f"\nControl loop in its own thread: {in_thread}. "
+            f"Event loop lag: mean {np.mean(lags[in_thread]) * 1000:.2f} ms, "
+            f"max {np.max(lags[in_thread]) * 1000:.1f} ms"
+        )
+
+    assert np.mean(lags[True]) < np.mean(lags[False])
@@ -0,0 +1,287 @@
+"""
+Tests for the Feetech motors bus, with a fake serial port.
+
+```
+pytest tests/phosphobot/test_feetech.py -s
+```
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+import scservo_sdk as scs
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.hardware.motors.feetech import FeetechMotorsBus
+
+MOTORS = {
+    "shoulder_pan": (1, "sts3215"),
+    "shoulder_lift": (2, "sts3215"),
+    "elbow_flex": (3, "sts3215"),
+    "wrist_flex": (4, "sts3215"),
+    "wrist_roll": (5, "sts3215"),
+    "gripper": (6, "sts3215"),
+}
+
+
+class FakePortHandler:
+    def __init__(self, port_name):
+        self.port_name = port_name
+
+    def setPacketTimeoutMillis(self, timeout_ms):
+        pass
+
+    def openPort(self):
+        return True
+
+    def closePort(self):
+        pass
+
+
+class FakePacketHandler:
+    """Answers every motor with position 2048 and remembers the written goal positions"""
+
+    # Simulated duration of a transaction on the serial bus
+    latency_s = 0.0
+
+    def __init__(self, protocol_version):
+        self.written = {}
+        self.nb_sync_writes = 0
+        self.nb_sync_reads = 0
+
+    def syncReadTx(self, port, start_address, data_length, param, param_length):
+        self.nb_sync_reads += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return scs.COMM_SUCCESS
+
+    def readRx(self, port, scs_id, length):
+        return [scs.SCS_LOBYTE(2048), scs.SCS_HIBYTE(2048)], scs.COMM_SUCCESS, 0
+
+    def syncWriteTxOnly(self, port, start_address, data_length, param, param_length):
+        self.nb_sync_writes += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        for i in range(0, len(param), 1 + data_length):
+            self.written[param[i]] = scs.SCS_MAKEWORD(param[i + 1], param[i + 2])
+        return scs.COMM_SUCCESS
+
+    def getTxRxResult(self, result):
+        return str(result)
+
+
+@pytest.fixture
+def motors_bus(monkeypatch):
+    monkeypatch.setattr(scs, "PortHandler", FakePortHandler)
+    monkeypatch.setattr(scs, "PacketHandler", FakePacketHandler)
+
+    built_groups = {"read": 0, "write": 0}
+
+    class CountingGroupSyncRead(scs.GroupSyncRead):
+        def __init__(self, *args, **kwargs):
+            built_groups["read"] += 1
+            super().__init__(*args, **kwargs)
+
+    class CountingGroupSyncWrite(scs.GroupSyncWrite):
+        def __init__(self, *args, **kwargs):
+            built_groups["write"] += 1
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(scs, "GroupSyncRead", CountingGroupSyncRead)
+    monkeypatch.setattr(scs, "GroupSyncWrite", CountingGroupSyncWrite)
+
+    motors_bus = FeetechMotorsBus(port="/dev/fake", motors=MOTORS)
+    motors_bus.built_groups = built_groups
+    motors_bus.connect()
+    yield motors_bus
+    motors_bus.disconnect()
+
+
+def test_group_transactions_are_reused(motors_bus: FeetechMotorsBus):
+    motor_names = list(MOTORS.keys())
+    for _ in range(10):
+        positions = motors_bus.read("Present_Position", motor_names=motor_names)
+    assert positions.tolist() == [2048] * len(MOTORS)
+    assert motors_bus.built_groups["read"] == 1
+
+    for goal in (1000, 1500):
+        motors_bus.write(
+            "Goal_Position", values=[goal] * len(MOTORS), motor_names=motor_names
+        )
+        # The values of the prepared transaction are updated
+        written = motors_bus.packet_handler.written
+        assert [written[idx] for idx, _ in MOTORS.values()] == [goal] * len(MOTORS)
+    assert motors_bus.built_groups["write"] == 1
+
+    # Another group of motors gets its own transaction
+    motors_bus.write("Goal_Position", values=[1200], motor_names=["gripper"])
+    assert motors_bus.built_groups["write"] == 2
+
+
+@pytest.mark.benchmark
+def test_read_group_motor_position_benchmark(motors_bus: FeetechMotorsBus):
+    """
+    Round-trip time of a read of all the motor positions, through the worker thread,
+    with and without reusing the prepared GroupSyncRead.
+    """
+    motor_names = list(MOTORS.keys())
+    nb_reads = 500
+
+    def benchmark(reuse_transaction: bool) -> tuple[float, float]:
+        built_before = motors_bus.built_groups["read"]
+        start = time.perf_counter()
+        for _ in range(nb_reads):
+            if not reuse_transaction:
+                # Previous behaviour: the reader was rebuilt on every read
+                motors_bus.group_readers.clear()
+            motors_bus.read("Present_Position", motor_names=motor_names)
+        elapsed = time.perf_counter() - start
+        built = motors_bus.built_groups["read"] - built_before
+        return elapsed / nb_reads * 1e6, built / nb_reads
+
+    # Warmup
+    benchmark(reuse_transaction=True)
+    for reuse_transaction in (False, True):
+        round_trip_us, built_per_read = benchmark(reuse_transaction)
+        print(
+            f"\nReuse transaction: {reuse_transaction}. Round trip: {round_trip_us:.1f} us, "
+            f"GroupSyncRead built per read: {built_per_read:.2f}"
+        )
+        assert built_per_read == (0 if reuse_transaction else 1)
+
+
+def test_non_blocking_writes_are_coalesced(motors_bus: FeetechMotorsBus):
+    arm_names = list(MOTORS.keys())[:-1]
+    packet_handler = motors_bus.packet_handler
+
+    # Hold the worker while the writes of a control tick are submitted
+    with motors_bus._work_condition:
+        motors_bus.write(
+            "Goal_Position", [1000] * 5, motor_names=arm_names, blocking=False
+        )
+        motors_bus.write("Goal_Position", [1100], motor_names="gripper", blocking=False)
+        # Overrides the pending value
+        motors_bus.write("Goal_Position", [1200], motor_names="gripper", blocking=False)
+
+    # The read is processed after the pending writes
+    motors_bus.read("Present_Position")
+
+    assert packet_handler.nb_sync_writes == 1
+    assert packet_handler.written == {
+        1: 1000,
+        2: 1000,
+        3: 1000,
+        4: 1000,
+        5: 1000,
+        6: 1200,
+    }
+
+
+def test_non_blocking_write_errors_are_reported(motors_bus: FeetechMotorsBus):
+    pending_write = motors_bus.write(
+        "Goal_Position", [1000], motor_names="gripper", blocking=False
+    )
+    assert pending_write.wait(timeout=1)
+    assert pending_write.error is None
+
+    pending_write = motors_bus.write(
+        "Goal_Position", ["invalid"], motor_names="gripper", blocking=False
+    )
+    assert pending_write.wait(timeout=1)
+    assert pending_write.error is not None
+
+    # The error is only reported by its own write
+    pending_write = motors_bus.write(
+        "Goal_Position", [1000], motor_names="gripper", blocking=False
+    )
+    assert pending_write.wait(timeout=1)
+    assert pending_write.error is None
+
+
+def test_blocking_and_non_blocking_writes_keep_their_order(
+    motors_bus: FeetechMotorsBus,
+):
+    packet_handler = motors_bus.packet_handler
+    sync_write = packet_handler.syncWriteTxOnly
+    worker_held = threading.Event()
+    release_worker = threading.Event()
+
+    def held_sync_write(*args, **kwargs):
+        # The first write holds the worker until the next requests are submitted
+        if packet_handler.nb_sync_writes == 0:
+            worker_held.set()
+            release_worker.wait(timeout=5)
+        return sync_write(*args, **kwargs)
+
+    packet_handler.syncWriteTxOnly = held_sync_write
+    threads = [
+        threading.Thread(
+            target=motors_bus.write,
+            args=("Goal_Position", [value]),
+            kwargs={"motor_names": "gripper"},
+        )
+        for value in (1000, 1100)
+    ]
+    threads[0].start()
+    assert worker_held.wait(timeout=5)
+    threads[1].start()
+    while not motors_bus._pending_requests:
+        time.sleep(0.001)
+    # Submitted after the blocking write of 1100: sent after it
+    pending_write = motors_bus.write(
+        "Goal_Position", [1200], motor_names="gripper", blocking=False
+    )
+    release_worker.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert pending_write.wait(timeout=1)
+    assert packet_handler.written[6] == 1200
+
+
+@pytest.mark.benchmark
+def test_control_tick_benchmark(motors_bus: FeetechMotorsBus, monkeypatch):
+    """
+    Rate of a leader-follower control tick: read the positions, write the arm goal
+    positions, write the gripper goal position. Every bus transaction takes 0.5 ms.
+    """
+    monkeypatch.setattr(FakePacketHandler, "latency_s", 0.0005)
+    motor_names = list(MOTORS.keys())
+    nb_ticks = 200
+
+    def benchmark(blocking: bool) -> tuple[float, float]:
+        packet_handler = motors_bus.packet_handler
+        nb_transactions = packet_handler.nb_sync_reads + packet_handler.nb_sync_writes
+        start = time.perf_counter()
+        for _ in range(nb_ticks):
+            motors_bus.read("Present_Position", motor_names=motor_names)
+            motors_bus.write(
+                "Goal_Position",
+                [2048] * 5,
+                motor_names=motor_names[:-1],
+                blocking=blocking,
+            )
+            motors_bus.write(
+                "Goal_Position", [2048], motor_names="gripper", blocking=blocking
+            )
+        elapsed = time.perf_counter() - start
+        nb_transactions = (
+            packet_handler.nb_sync_reads
+            + packet_handler.nb_sync_writes
+            - nb_transactions
+        )
+        return nb_ticks / elapsed, nb_transactions / nb_ticks
+
+    rates = {}
+    for blocking in (True, False):
+        rate_hz, transactions_per_tick = benchmark(blocking)
+        rates[blocking] = rate_hz
+        print(
+            f"\nBlocking writes: {blocking}. Control rate: {rate_hz:.0f} Hz, "
+            f"bus transactions per tick: {transactions_per_tick:.1f}"
+        )
+    assert rates[False] > rates[True]
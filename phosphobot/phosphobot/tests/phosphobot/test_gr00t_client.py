@@ -0,0 +1,213 @@
+"""
+Tests for the asyncio ZeroMQ client of the Gr00t inference server.
+
+```
+pytest tests/phosphobot/test_gr00t_client.py -s
+```
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.am.gr00t import (
+    AsyncExternalRobotInferenceClient,
+    BasePolicy,
+    ExternalRobotInferenceClient,
+    ModalityConfig,
+    RobotInferenceServer,
+)
+
+
+class FakePolicy(BasePolicy):
+    def __init__(self):
+        self.delay = 0.0
+
+    def get_action(self, observations):
+        time.sleep(self.delay)
+        state = observations["state.arm_0"]
+        return {"action.arm_0": np.tile(state, (16, 1)) + np.arange(16).reshape(-1, 1)}
+
+    def get_modality_config(self):
+        return {
+            "video": ModalityConfig(delta_indices=[0], modality_keys=["video.main"])
+        }
+
+
+class LegacyServer(RobotInferenceServer):
+    """A server that only supports pickled requests"""
+
+    def _handle_ping(self) -> dict:
+        return {"status": "ok", "message": "Server is running"}
+
+
+def start_server(server_class=RobotInferenceServer):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    policy = FakePolicy()
+    server = server_class(policy, host="127.0.0.1", port=port)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    return policy, server, port
+
+
+def stop_server(server, port: int):
+    ExternalRobotInferenceClient(host="127.0.0.1", port=port).kill_server()
+    server.socket.close(linger=0)
+
+
+def make_observations(height: int = 240, width: int = 320) -> dict:
+    return {
+        "video.main": np.full((1, height, width, 3), 7, dtype=np.uint8),
+        "video.wrist": np.full((1, height, width, 3), 9, dtype=np.uint8),
+        "state.arm_0": np.linspace(-1, 1, 6).reshape(1, 6),
+        "annotation.human.action.task_description": "Pick up the lego brick",
+    }
+
+
+@pytest.mark.asyncio
+async def test_async_round_trip():
+    policy, server, port = start_server()
+    client = AsyncExternalRobotInferenceClient(host="127.0.0.1", port=port)
+    try:
+        observations = make_observations()
+        result = await client.get_action(observations)
+        assert client.multipart
+        np.testing.assert_allclose(
+            result["action.arm_0"], policy.get_action(observations)["action.arm_0"]
+        )
+
+        # Values that are not arrays are pickled
+        config = await client.call_endpoint("get_modality_config", requires_input=False)
+        assert config["video"].modality_keys == ["video.main"]
+
+        with pytest.raises(RuntimeError, match="Unknown endpoint"):
+            await client.call_endpoint("unknown")
+    finally:
+        client.close()
+        stop_server(server, port)
+
+
+@pytest.mark.asyncio
+async def test_timeout_resets_socket():
+    policy, server, port = start_server()
+    client = AsyncExternalRobotInferenceClient(
+        host="127.0.0.1", port=port, timeout_ms=200
+    )
+    try:
+        assert await client.ping()
+        policy.delay = 0.5
+        with pytest.raises(TimeoutError):
+            await client.get_action(make_observations())
+        assert client.nb_resets == 1
+
+        # The late reply is dropped and the next request gets its own reply
+        policy.delay = 0.0
+        observations = make_observations()
+        observations["state.arm_0"] = np.ones((1, 6))
+        result = await client.call_endpoint("get_action", observations, timeout_ms=2000)
+        assert result["action.arm_0"][0, 0] == 1
+    finally:
+        client.close()
+        stop_server(server, port)
+
+
+@pytest.mark.asyncio
+async def test_cancellation_resets_socket():
+    policy, server, port = start_server()
+    client = AsyncExternalRobotInferenceClient(host="127.0.0.1", port=port)
+    try:
+        assert await client.ping()
+        policy.delay = 0.5
+        # wait_for cancels the request
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.get_action(make_observations()), 0.1)
+        assert client.nb_resets == 1
+
+        # The reply to the cancelled request is not read by the next request
+        policy.delay = 0.0
+        observations = make_observations()
+        observations["state.arm_0"] = np.ones((1, 6))
+        result = await client.call_endpoint("get_action", observations, timeout_ms=2000)
+        assert result["action.arm_0"][0, 0] == 1
+    finally:
+        client.close()
+        stop_server(server, port)
+
+
+@pytest.mark.asyncio
+async def test_legacy_server_uses_pickle():
+    policy, server, port = start_server(LegacyServer)
+    client = AsyncExternalRobotInferenceClient(host="127.0.0.1", port=port)
+    try:
+        result = await client.get_action(make_observations())
+        assert client.multipart is False
+        assert result["action.arm_0"].shape == (16, 6)
+    finally:
+        client.close()
+        stop_server(server, port)
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_round_trip_benchmark():
+    """
+    Round trip time of a request with 2 camera frames of 480x640 to a local server
+    with an inference of 20 ms, with the blocking REQ client and the asyncio
+    DEALER client, and lag of the event loop during the requests.
+    """
+    policy, server, port = start_server()
+    policy.delay = 0.02
+    observations = make_observations(height=480, width=640)
+    nb_requests = 20
+
+    async def measure_lag(task: asyncio.Future) -> list[float]:
+        lags = []
+        while not task.done():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+        return lags
+
+    sync_client = ExternalRobotInferenceClient(host="127.0.0.1", port=port)
+    async_client = AsyncExternalRobotInferenceClient(host="127.0.0.1", port=port)
+
+    async def run_sync():
+        for _ in range(nb_requests):
+            sync_client.get_action(observations)
+
+    async def run_async():
+        for _ in range(nb_requests):
+            await async_client.get_action(observations)
+
+    results = {}
+    try:
+        for name, run in [
+            ("REQ + pickle", run_sync),
+            ("DEALER + multipart", run_async),
+        ]:
+            start = time.perf_counter()
+            task = asyncio.ensure_future(run())
+            lags = await measure_lag(task)
+            await task
+            rtt = (time.perf_counter() - start) / nb_requests
+            max_lag = max(lags, default=rtt)
+            results[name] = max_lag
+            print(
+                f"\n{name}: mean RTT {rtt * 1000:.1f} ms, "
+                f"max event loop lag {max_lag * 1000:.1f} ms"
+            )
+    finally:
+        async_client.close()
+        stop_server(server, port)
+
+    assert results["DEALER + multipart"] < results["REQ + pickle"]
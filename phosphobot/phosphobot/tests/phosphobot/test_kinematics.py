@@ -0,0 +1,245 @@
+"""
+Tests for the NumPy kinematics of the robot arms, compared with pybullet.
+
+```
+pytest tests/phosphobot/test_kinematics.py -s
+```
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.configs import config
+from phosphobot.hardware import KochHardware, SO100Hardware, get_sim
+from phosphobot.hardware.base import BaseManipulator
+from phosphobot.hardware.kinematics import KinematicChain
+from phosphobot.types import SimulationMode
+
+
+@pytest.fixture(params=[SO100Hardware, KochHardware])
+def robot(request) -> BaseManipulator:
+    config.SIM_MODE = SimulationMode.headless
+    get_sim()
+    return request.param()
+
+
+def random_joints(
+    robot: BaseManipulator, rng: np.random.Generator, size: int | None = None
+) -> np.ndarray:
+    """Random joint positions within the joint limits of the URDF"""
+    lower = np.maximum(np.array(robot.lower_joint_limits), -1.5)
+    upper = np.minimum(np.array(robot.upper_joint_limits), 1.5)
+    shape = (len(robot.actuated_joints),) if size is None else (size, len(lower))
+    return rng.uniform(lower, upper, shape)
+
+
+def set_sim_joints(robot: BaseManipulator, q: np.ndarray) -> None:
+    robot.set_simulation_positions(q)
+
+
+def test_forward_kinematics_matches_pybullet(robot: BaseManipulator):
+    chain = robot.kinematic_chain
+    assert isinstance(chain, KinematicChain)
+
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        q = random_joints(robot, rng)
+        set_sim_joints(robot, q)
+        link_state = robot.sim.get_link_state(
+            robot_id=robot.p_robot_id,
+            link_index=robot.END_EFFECTOR_LINK_INDEX,
+            compute_forward_kinematics=True,
+        )
+        position, quaternion = chain.forward_kinematics(q)
+        assert np.allclose(position, link_state[4], atol=1e-6)
+        # q and -q are the same rotation
+        assert np.isclose(abs(np.dot(quaternion, link_state[5])), 1, atol=1e-6)
+
+
+def test_inverse_kinematics_batch(robot: BaseManipulator):
+    chain = robot.kinematic_chain
+    assert chain is not None
+
+    rng = np.random.default_rng(0)
+    q_targets = random_joints(robot, rng, size=50)
+    positions, quaternions = chain.forward_kinematics(q_targets)
+
+    q_init = q_targets + rng.normal(0, 0.1, q_targets.shape)
+    q_solutions, errors = chain.inverse_kinematics(
+        positions, quaternions, q_init=q_init
+    )
+    assert q_solutions.shape == q_targets.shape
+    assert errors.shape == (50,)
+
+    solved_positions, _ = chain.forward_kinematics(q_solutions)
+    assert np.median(np.linalg.norm(solved_positions - positions, axis=1)) < 1e-4
+
+    # Each target of the batch gets the same solution as when solved alone
+    q_solution, error = chain.inverse_kinematics(
+        positions[0], quaternions[0], q_init=q_init[0]
+    )
+    assert isinstance(error, float)
+    assert np.allclose(q_solution, q_solutions[0])
+
+
+def test_inverse_kinematics_out_of_reach(robot: BaseManipulator):
+    chain = robot.kinematic_chain
+    assert chain is not None
+
+    q_init = np.zeros(chain.num_joints)
+    start_position, _ = chain.forward_kinematics(q_init)
+    target_position = start_position + np.array([2.0, 0, 0])
+    q_solution, error = chain.inverse_kinematics(target_position, q_init=q_init)
+
+    # The solver stops early and returns a valid joint vector closer to the target
+    assert np.all(q_solution >= np.array(robot.lower_joint_limits) - 1e-9)
+    assert np.all(q_solution <= np.array(robot.upper_joint_limits) + 1e-9)
+    assert error < np.linalg.norm(target_position - start_position)
+
+
+@pytest.mark.benchmark
+def test_inverse_kinematics_benchmark(robot: BaseManipulator):
+    """
+    Accuracy and time of the inverse kinematics with pybullet and with the kinematic
+    chain, for small moves from the current position (like in teleoperation).
+    """
+    chain = robot.kinematic_chain
+    assert chain is not None
+
+    rng = np.random.default_rng(0)
+    nb_targets = 100
+    q_targets = random_joints(robot, rng, size=nb_targets)
+    positions, quaternions = chain.forward_kinematics(q_targets)
+    q_currents = q_targets + rng.normal(0, 0.05, q_targets.shape)
+
+    def benchmark(use_kinematic_chain: bool) -> tuple[float, float]:
+        robot.kinematic_chain = chain if use_kinematic_chain else None
+        errors = []
+        elapsed = 0.0
+        for position, quaternion, q_current in zip(positions, quaternions, q_currents):
+            set_sim_joints(robot, q_current)
+            start = time.perf_counter()
+            q_solution = robot.inverse_kinematics(position, quaternion)
+            elapsed += time.perf_counter() - start
+            solved_position, _ = chain.forward_kinematics(q_solution)
+            errors.append(np.linalg.norm(solved_position - position))
+        return float(np.median(errors)), elapsed / nb_targets
+
+    results = {}
+    for use_kinematic_chain in (False, True):
+        median_error, duration = benchmark(use_kinematic_chain)
+        results[use_kinematic_chain] = median_error
+        print(
+            f"\n[{robot.name}] Kinematic chain: {use_kinematic_chain}. "
+            f"Median position error: {median_error * 1e3:.3f} mm, "
+            f"time per target: {duration * 1e6:.0f} us"
+        )
+
+    start = time.perf_counter()
+    chain.inverse_kinematics(positions, quaternions, q_init=q_currents)
+    duration = (time.perf_counter() - start) / nb_targets
+    print(f"[{robot.name}] Batch of {nb_targets}: {duration * 1e6:.0f} us per target")
+
+    assert results[True] < results[False]
+
+
+def test_forward_kinematics_cache(robot: BaseManipulator, monkeypatch):
+    chain = robot.kinematic_chain
+    assert chain is not None
+    nb_computations = 0
+    forward_kinematics_matrix = chain.forward_kinematics_matrix
+
+    def counting_forward_kinematics_matrix(q):
+        nonlocal nb_computations
+        nb_computations += 1
+        return forward_kinematics_matrix(q)
+
+    monkeypatch.setattr(
+        chain, "forward_kinematics_matrix", counting_forward_kinematics_matrix
+    )
+
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        set_sim_joints(robot, random_joints(robot, rng))
+        position, orientation = robot.forward_kinematics()
+        # Same pose as pybullet
+        robot.kinematic_chain = None
+        expected_position, expected_orientation = robot.forward_kinematics()
+        robot.kinematic_chain = chain
+        assert np.allclose(position, expected_position, atol=1e-6)
+        assert np.allclose(orientation, expected_orientation, atol=1e-6)
+
+    # The joints didn't move: the pose is read from the cache, without reading the
+    # joints in the simulation
+    nb_computations = 0
+
+    def fail_read(*args, **kwargs):
+        raise AssertionError("The joints were read in the simulation")
+
+    monkeypatch.setattr(robot.sim, "get_joints_states", fail_read)
+    for _ in range(3):
+        assert np.allclose(robot.forward_kinematics()[0], position)
+    assert nb_computations == 0
+
+
+def test_forward_kinematics_batch(robot: BaseManipulator):
+    rng = np.random.default_rng(0)
+    joints_positions = random_joints(robot, rng, size=20)
+
+    positions, orientations = robot.forward_kinematics_batch(joints_positions)
+    assert positions.shape == orientations.shape == (20, 3)
+    for joints_position, position, orientation in zip(
+        joints_positions, positions, orientations
+    ):
+        set_sim_joints(robot, joints_position)
+        assert np.allclose(robot.forward_kinematics()[0], position)
+        assert np.allclose(robot.forward_kinematics()[1], orientation)
+
+
+@pytest.mark.benchmark
+def test_forward_kinematics_benchmark(robot: BaseManipulator):
+    """
+    Time of an end effector state read with pybullet and with the kinematic chain,
+    when the joints move at every read and when they don't.
+    """
+    chain = robot.kinematic_chain
+    assert chain is not None
+
+    rng = np.random.default_rng(0)
+    nb_reads = 300
+    joints_positions = random_joints(robot, rng, size=nb_reads)
+
+    def benchmark(use_kinematic_chain: bool, moving: bool) -> float:
+        robot.kinematic_chain = chain if use_kinematic_chain else None
+        set_sim_joints(robot, joints_positions[0])
+        elapsed = 0.0
+        for joints_position in joints_positions:
+            if moving:
+                set_sim_joints(robot, joints_position)
+            start = time.perf_counter()
+            robot.forward_kinematics()
+            elapsed += time.perf_counter() - start
+        return elapsed / nb_reads
+
+    durations = {}
+    for use_kinematic_chain in (False, True):
+        for moving in (True, False):
+            duration = benchmark(use_kinematic_chain, moving)
+            durations[use_kinematic_chain, moving] = duration
+            print(
+                f"\n[{robot.name}] Kinematic chain: {use_kinematic_chain}. "
+                f"Moving joints: {moving}. Time per read: {duration * 1e6:.1f} us"
+            )
+
+    start = time.perf_counter()
+    robot.forward_kinematics_batch(joints_positions)
+    duration = (time.perf_counter() - start) / nb_reads
+    print(f"[{robot.name}] Batch of {nb_reads}: {duration * 1e6:.1f} us per read")
+
+    assert durations[True, False] < durations[False, False]
@@ -0,0 +1,110 @@
+"""
+Tests for the latency histograms and the counters exposed on /metrics.
+
+```
+pytest tests/phosphobot/test_metrics.py -s
+```
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.camera import DummyCamera, RGB_CONVERSION_SECONDS
+from phosphobot.metrics import MetricsRegistry
+
+
+def test_histogram_quantiles():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(1, 2, 3, 4))
+    for value in np.linspace(0.01, 4, 1000):
+        histogram.observe(float(value))
+
+    snapshot = histogram.snapshot()
+    assert snapshot.count == 1000
+    assert snapshot.mean == pytest.approx(2.005, abs=1e-3)
+    assert snapshot.p50 == pytest.approx(2, abs=0.05)
+    assert snapshot.p90 == pytest.approx(3.6, abs=0.05)
+    assert snapshot.cumulative_counts[-1] == 1000
+
+    # Values above the largest bound are counted, but not in a finite bucket
+    histogram.observe(10)
+    snapshot = histogram.snapshot()
+    assert snapshot.count == 1001
+    assert snapshot.cumulative_counts[-1] == 1000
+
+    empty = registry.histogram("empty_seconds", "Nothing observed")
+    assert empty.snapshot().p50 is None
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("overruns_total", "Loop overruns").inc(3)
+    histogram = registry.histogram(
+        "transfer_seconds", "Bus transfers", buckets=(0.001, 0.01), bus="feetech"
+    )
+    histogram.observe(0.0005)
+    histogram.observe(0.005)
+    histogram.observe(0.5)
+
+    # Same name and labels: same metric
+    assert registry.counter("overruns_total", "Loop overruns").value == 3
+    with pytest.raises(ValueError):
+        registry.counter("transfer_seconds", "Not a counter")
+
+    text = registry.render_prometheus()
+    assert "# TYPE overruns_total counter" in text
+    assert "overruns_total 3.0" in text
+    assert "# TYPE transfer_seconds histogram" in text
+    assert 'transfer_seconds_bucket{bus="feetech",le="0.001"} 1' in text
+    assert 'transfer_seconds_bucket{bus="feetech",le="0.01"} 2' in text
+    assert 'transfer_seconds_bucket{bus="feetech",le="+Inf"} 3' in text
+    assert 'transfer_seconds_count{bus="feetech"} 3' in text
+    assert text.endswith("\n")
+
+
+def test_frame_conversions_are_timed():
+    camera = DummyCamera(camera_type="dummy", width=32, height=24)
+    camera._publish_frame(np.zeros((24, 32, 3), dtype=np.uint8))
+    camera_frame = camera.get_latest_frame()
+    assert camera_frame is not None
+
+    count = RGB_CONVERSION_SECONDS.snapshot().count
+    camera.get_rgb_from_camera_frame(camera_frame)
+    # The converted frame is cached
+    camera.get_rgb_from_camera_frame(camera_frame)
+    assert RGB_CONVERSION_SECONDS.snapshot().count == count + 1
+    camera.stop()
+
+
+@pytest.mark.benchmark
+def test_observe_overhead_benchmark():
+    """
+    Cost of recording a value, compared to a 1 kHz loop period.
+    """
+    registry = MetricsRegistry()
+    histogram = registry.histogram("benchmark_seconds", "Benchmark")
+    nb_observations = 100_000
+
+    start = time.perf_counter()
+    for i in range(nb_observations):
+        histogram.observe(i * 1e-6)
+    observe_time = (time.perf_counter() - start) / nb_observations
+
+    start = time.perf_counter()
+    for _ in range(nb_observations):
+        with histogram.time():
+            pass
+    timer_time = (time.perf_counter() - start) / nb_observations
+
+    print(
+        f"\nobserve: {observe_time * 1e6:.2f} us, "
+        f"time() context manager: {timer_time * 1e6:.2f} us"
+    )
+    # Less than 1% of a 1 ms period
+    assert observe_time < 10e-6
@@ -0,0 +1,120 @@
+"""
+Tests for the sampling profiler of the threads and loops of the server.
+
+```
+pytest tests/phosphobot/test_profiler.py -s
+```
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.profiler import SamplingProfiler, register_loop
+
+
+def busy_work(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+@register_loop("registered_loop")
+async def registered_loop(duration: float) -> None:
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        # Longer than the switch interval of the GIL, so that the sampler thread
+        # interrupts the computation
+        sum(i * i for i in range(300_000))
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_samples_are_attributed_to_loops(tmp_path):
+    profiler = SamplingProfiler(output_dir=tmp_path)
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_work, args=(stop,), name="busy_thread")
+    thread.start()
+
+    status = profiler.start(interval=0.005)
+    assert status.running
+    with pytest.raises(RuntimeError):
+        profiler.start()
+
+    await registered_loop(duration=0.3)
+    status = profiler.stop()
+    stop.set()
+    thread.join()
+
+    assert not status.running
+    assert status.nb_samples > 10
+    assert status.samples_per_loop["busy_thread"] > 10
+    assert status.samples_per_loop["registered_loop"] > 10
+    assert status.speedscope_path is not None and status.flamegraph_path is not None
+
+    with open(status.speedscope_path) as f:
+        speedscope = json.load(f)
+    frames = speedscope["shared"]["frames"]
+    profiles = {profile["name"]: profile for profile in speedscope["profiles"]}
+    busy_profile = profiles["busy_thread"]
+    assert busy_profile["type"] == "sampled"
+    assert len(busy_profile["samples"]) == len(busy_profile["weights"])
+    assert busy_profile["endValue"] == pytest.approx(sum(busy_profile["weights"]))
+    assert any(
+        frames[i]["name"] == "busy_work"
+        for sample in busy_profile["samples"]
+        for i in sample
+    )
+
+    with open(status.flamegraph_path) as f:
+        lines = f.read().splitlines()
+    assert any(
+        line.startswith("registered_loop;") and "registered_loop (" in line
+        for line in lines
+    )
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_session_stops_after_its_duration(tmp_path):
+    profiler = SamplingProfiler(output_dir=tmp_path)
+    profiler.start(interval=0.005, duration=0.1)
+    time.sleep(0.5)
+    status = profiler.status()
+    assert not status.running
+    assert status.elapsed_s == pytest.approx(0.1, abs=0.05)
+    assert status.speedscope_path is not None
+
+
+@pytest.mark.benchmark
+def test_profiler_overhead_benchmark(tmp_path):
+    """
+    Time spent sampling the threads, at the default interval of 10 ms.
+    """
+    profiler = SamplingProfiler(output_dir=tmp_path)
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=busy_work, args=(stop,), name=f"busy_{i}")
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+
+    profiler.start(interval=0.01)
+    time.sleep(1)
+    status = profiler.stop()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert status.overhead_percent is not None
+    print(
+        f"\n{status.nb_samples} samples of {len(status.samples_per_loop)} threads "
+        f"in {status.elapsed_s:.1f}s, overhead {status.overhead_percent:.2f}%"
+    )
+    assert status.overhead_percent < 5
@@ -0,0 +1,699 @@
+"""
+Tests for the episode recording and saving in the LeRobot format.
+
+```
+pytest tests/phosphobot/test_recording.py
+```
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+
+import av
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.configs import config
+from phosphobot.episode_queue import EpisodeSaveQueue
+from phosphobot.hardware import SO100Hardware, get_sim
+from phosphobot.models import (
+    JsonEpisode,
+    LeRobotDataset,
+    LeRobotEpisode,
+    Observation,
+    Step,
+)
+from phosphobot.models.dataset import StepBuffer
+from phosphobot.models.lerobot_dataset import LeRobotEpisodeModel, Stats
+from phosphobot.types import SimulationMode
+from phosphobot.utils import ImageStatsAccumulator
+
+CAMERA_KEYS = ["observation.images.main", "observation.images.secondary_0"]
+TARGET_SIZE = (64, 48)
+
+
+def count_video_frames(video_path: str) -> int:
+    with av.open(video_path) as container:
+        return sum(1 for _ in container.decode(video=0))
+
+
+@pytest.fixture
+def robot() -> SO100Hardware:
+    config.SIM_MODE = SimulationMode.headless
+    get_sim()
+    return SO100Hardware()
+
+
+async def record_episode(
+    dataset_path: str,
+    robot: SO100Hardware,
+    nb_steps: int,
+    dataset_manager: LeRobotDataset | None = None,
+) -> LeRobotEpisode:
+    episode = await LeRobotEpisode.start_new(
+        dataset_manager=dataset_manager or LeRobotDataset(path=dataset_path),
+        robots=[robot],
+        codec="avc1",
+        freq=30,
+        target_size=TARGET_SIZE,
+        instruction="test",
+        all_camera_key_names=CAMERA_KEYS,
+    )
+    rng = np.random.default_rng(0)
+    for i in range(nb_steps):
+        frame_shape = (TARGET_SIZE[1], TARGET_SIZE[0], 3)
+        step = Step(
+            observation=Observation(
+                main_image=rng.integers(0, 255, frame_shape, dtype=np.uint8),
+                secondary_images=[rng.integers(0, 255, frame_shape, dtype=np.uint8)],
+                state=np.zeros(7),
+                joints_position=np.full(6, i, dtype=np.float32),
+                timestamp=i / 30,
+            )
+        )
+        if episode.steps:
+            episode.update_previous_step(step)
+        await episode.append_step(step)
+    return episode
+
+
+@pytest.mark.asyncio
+async def test_streaming_video_encoding(robot: SO100Hardware, tmp_path):
+    """
+    Frames are encoded while recording: the steps don't keep the images in RAM
+    and every camera video has one frame per step after save.
+    """
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    nb_steps = 12
+
+    episode = await record_episode(dataset_path, robot, nb_steps)
+    assert all(step.observation.main_image.size == 0 for step in episode.steps)
+    assert all(not step.observation.secondary_images for step in episode.steps)
+
+    await episode.save()
+
+    for camera_key in CAMERA_KEYS:
+        video_path = os.path.join(
+            dataset_path, "videos", "chunk-000", camera_key, "episode_000000.mp4"
+        )
+        assert count_video_frames(video_path) == nb_steps
+
+    # Image stats are computed by the encoders, on all the pixels
+    episodes_stats = episode.dataset_manager.episodes_stats_model
+    assert episodes_stats is not None
+    main_stats = episodes_stats.episodes_stats[0].stats.observation_images[
+        "observation.images.main"
+    ]
+    assert main_stats.count == nb_steps * TARGET_SIZE[0] * TARGET_SIZE[1]
+
+
+def make_frames(nb_frames: int, height: int, width: int) -> list[np.ndarray]:
+    """
+    Moving gradients with noise, closer to camera frames than uniform noise.
+    """
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    frames = []
+    for i in range(nb_frames):
+        frame = np.stack(
+            [
+                (x + 3 * i) % width * 200 / width,
+                (y + 2 * i) % height * 150 / height + 50,
+                np.full((height, width), 40 + i % 30),
+            ],
+            axis=-1,
+        )
+        frame += rng.normal(0, 10, frame.shape)
+        frames.append(np.clip(frame, 0, 255).astype(np.uint8))
+    return frames
+
+
+def assert_image_stats_close(
+    stats: Stats, exact: Stats, atol: float, min_max_atol: float
+) -> None:
+    stats.compute_from_rolling_images()
+    exact.compute_from_rolling_images()
+    assert stats.count == exact.count
+    for field in ["mean", "std"]:
+        np.testing.assert_allclose(
+            getattr(stats, field), getattr(exact, field), atol=atol, err_msg=field
+        )
+    # Subsampling misses the extreme pixels
+    for field in ["min", "max"]:
+        np.testing.assert_allclose(
+            getattr(stats, field),
+            getattr(exact, field),
+            atol=min_max_atol,
+            err_msg=field,
+        )
+
+
+def test_image_stats_accumulator():
+    """
+    The image stats of the video encoders match the exact stats: exactly with all
+    the pixels, within tolerance when subsampled.
+    """
+    frames = make_frames(nb_frames=60, height=120, width=160)
+    exact = Stats()
+    for frame in frames:
+        exact.update_image(frame)
+
+    for spatial_stride, temporal_stride, atol, min_max_atol in [
+        (1, 1, 1e-5, 1e-6),
+        (2, 1, 5e-3, 0.05),
+        (4, 3, 1e-2, 0.1),
+    ]:
+        accumulator = ImageStatsAccumulator(spatial_stride, temporal_stride)
+        for frame in frames:
+            accumulator.update(frame)
+        image_stats = accumulator.stats()
+        assert image_stats is not None
+        stats = Stats()
+        stats.update_image_stats(*image_stats)
+        assert_image_stats_close(
+            stats, deepcopy(exact), atol=atol, min_max_atol=min_max_atol
+        )
+
+    assert ImageStatsAccumulator().stats() is None
+
+
+@pytest.mark.asyncio
+async def test_image_stats_are_computed_by_the_encoders(robot: SO100Hardware, tmp_path):
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    nb_steps = 20
+
+    episode = await record_episode(dataset_path, robot, nb_steps)
+    await episode.save()
+
+    # Same frames as record_episode
+    rng = np.random.default_rng(0)
+    exact_stats = {key: Stats() for key in CAMERA_KEYS}
+    for _ in range(nb_steps):
+        for key in CAMERA_KEYS:
+            frame_shape = (TARGET_SIZE[1], TARGET_SIZE[0], 3)
+            exact_stats[key].update_image(
+                rng.integers(0, 255, frame_shape, dtype=np.uint8)
+            )
+
+    episodes_stats = read_jsonl(
+        os.path.join(dataset_path, "meta", "episodes_stats.jsonl")
+    )
+    assert len(episodes_stats) == 1
+    for key in CAMERA_KEYS:
+        saved = Stats.model_validate(episodes_stats[0]["stats"][key])
+        exact = exact_stats[key]
+        exact.compute_from_rolling_images()
+        assert saved.count == exact.count
+        for field in ["mean", "std", "min", "max"]:
+            np.testing.assert_allclose(
+                np.array(getattr(saved, field)).reshape(3),
+                np.array(getattr(exact, field)).reshape(3),
+                atol=1e-2,
+                err_msg=f"{key} {field}",
+            )
+
+
+@pytest.mark.benchmark
+def test_image_stats_benchmark():
+    """
+    Time per 640x480 frame of the exact stats, formerly computed in the recording
+    loop, and of the stats computed by the video encoders with the configured strides.
+    """
+    frames = make_frames(nb_frames=30, height=480, width=640)
+
+    start = time.perf_counter()
+    exact = Stats()
+    for frame in frames:
+        exact.update_image(frame)
+    exact_time = (time.perf_counter() - start) / len(frames)
+
+    start = time.perf_counter()
+    accumulator = ImageStatsAccumulator(
+        config.IMAGE_STATS_SPATIAL_STRIDE, config.IMAGE_STATS_TEMPORAL_STRIDE
+    )
+    for frame in frames:
+        accumulator.update(frame)
+    image_stats = accumulator.stats()
+    accumulator_time = (time.perf_counter() - start) / len(frames)
+
+    print(
+        f"\nImage stats per frame: exact {exact_time * 1000:.2f} ms, "
+        f"accumulator {accumulator_time * 1000:.2f} ms "
+        f"(strides {config.IMAGE_STATS_SPATIAL_STRIDE}, "
+        f"{config.IMAGE_STATS_TEMPORAL_STRIDE})"
+    )
+    assert image_stats is not None
+    stats = Stats()
+    stats.update_image_stats(*image_stats)
+    assert_image_stats_close(stats, exact, atol=5e-3, min_max_atol=0.05)
+    assert accumulator_time < exact_time / 5
+
+
+@pytest.mark.asyncio
+async def test_discard_removes_partial_videos(robot: SO100Hardware, tmp_path):
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+
+    episode = await record_episode(dataset_path, robot, nb_steps=3)
+    episode.discard()
+
+    for camera_key in CAMERA_KEYS:
+        video_path = os.path.join(
+            dataset_path, "videos", "chunk-000", camera_key, "episode_000000.mp4"
+        )
+        assert not os.path.exists(video_path)
+
+
+def read_jsonl(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.asyncio
+async def test_meta_files_are_appended(robot: SO100Hardware, tmp_path):
+    """
+    Saving an episode appends its lines to the meta files without rewriting the
+    lines of the previous episodes, and the models stay loaded between episodes.
+    """
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    dataset = LeRobotDataset(path=dataset_path)
+    meta_path = dataset.meta_folder_full_path
+
+    previous_content = {"episodes.jsonl": "", "episodes_stats.jsonl": ""}
+    for episode_index in range(3):
+        episode = await record_episode(
+            dataset_path, robot, nb_steps=5 + episode_index, dataset_manager=dataset
+        )
+        episodes_model = dataset.episodes_model
+        await episode.save()
+        # Not reloaded from the files
+        assert dataset.episodes_model is episodes_model
+
+        for file_name, content in previous_content.items():
+            with open(os.path.join(meta_path, file_name)) as f:
+                new_content = f.read()
+            assert new_content.startswith(content)
+            assert len(new_content.splitlines()) == episode_index + 1
+            previous_content[file_name] = new_content
+
+    episodes = read_jsonl(os.path.join(meta_path, "episodes.jsonl"))
+    assert [e["length"] for e in episodes] == [5, 6, 7]
+    assert len(read_jsonl(os.path.join(meta_path, "tasks.jsonl"))) == 1
+    with open(os.path.join(meta_path, "info.json")) as f:
+        info = json.load(f)
+    assert info["total_episodes"] == 3
+    assert info["total_frames"] == 18
+
+    # The files are the same as the ones written from scratch
+    reloaded = LeRobotDataset(path=dataset_path)
+    reloaded.load_meta_models()
+    assert reloaded.episodes_stats_model is not None
+    assert [s.episode_index for s in reloaded.episodes_stats_model.episodes_stats] == [
+        0,
+        1,
+        2,
+    ]
+    reloaded.save_all_meta_models()
+    assert read_jsonl(os.path.join(meta_path, "episodes.jsonl")) == episodes
+    assert not [f for f in os.listdir(meta_path) if f.endswith(".tmp")]
+
+
+@pytest.mark.asyncio
+async def test_partial_line_is_repaired(robot: SO100Hardware, tmp_path):
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    dataset = LeRobotDataset(path=dataset_path)
+    episode = await record_episode(dataset_path, robot, 4, dataset_manager=dataset)
+    await episode.save()
+
+    # Crash in the middle of an append
+    episodes_path = os.path.join(dataset.meta_folder_full_path, "episodes.jsonl")
+    with open(episodes_path, "a") as f:
+        f.write('{"episode_index": 1, "tas')
+
+    # The models are reloaded since the file changed
+    episode = await record_episode(dataset_path, robot, 4, dataset_manager=dataset)
+    await episode.save()
+    episodes = read_jsonl(episodes_path)
+    assert [e["episode_index"] for e in episodes] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_discarded_episode_is_not_saved(robot: SO100Hardware, tmp_path):
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    dataset = LeRobotDataset(path=dataset_path)
+    episode = await record_episode(dataset_path, robot, 4, dataset_manager=dataset)
+    await episode.save()
+    episode = await record_episode(dataset_path, robot, 3, dataset_manager=dataset)
+    episode.discard()
+
+    episode = await record_episode(dataset_path, robot, 6, dataset_manager=dataset)
+    assert episode.episode_index == 1
+    await episode.save()
+    episodes = read_jsonl(os.path.join(dataset.meta_folder_full_path, "episodes.jsonl"))
+    assert [e["length"] for e in episodes] == [4, 6]
+
+
+@pytest.mark.asyncio
+async def test_next_episode_records_while_saving(robot: SO100Hardware, tmp_path):
+    """
+    The next episode is recorded while the previous one is saved in the background,
+    with the next index reserved.
+    """
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    dataset = LeRobotDataset(path=dataset_path)
+    queue = EpisodeSaveQueue(max_pending=2)
+
+    for episode_index in range(3):
+        episode = await record_episode(
+            dataset_path, robot, nb_steps=4 + episode_index, dataset_manager=dataset
+        )
+        assert episode.episode_index == episode_index
+        await queue.submit(episode, dataset_path=dataset_path)
+    assert queue.nb_pending > 0
+    await queue.join()
+
+    status = queue.status()
+    assert status.nb_pending == 0
+    assert status.nb_saved == 3
+    assert [job.state for job in status.jobs] == ["saved"] * 3
+    assert [job.episode_index for job in status.jobs] == [0, 1, 2]
+
+    episodes = read_jsonl(os.path.join(dataset.meta_folder_full_path, "episodes.jsonl"))
+    assert [e["length"] for e in episodes] == [4, 5, 6]
+    for episode_index, nb_steps in enumerate([4, 5, 6]):
+        video_path = os.path.join(
+            dataset.videos_folder_full_path,
+            CAMERA_KEYS[0],
+            f"episode_{episode_index:06d}.mp4",
+        )
+        assert count_video_frames(video_path) == nb_steps
+
+
+@pytest.mark.asyncio
+async def test_failed_save_index_is_reused(robot: SO100Hardware, tmp_path):
+    """
+    If an episode fails to save, the next episode takes its index.
+    """
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    dataset = LeRobotDataset(path=dataset_path)
+    queue = EpisodeSaveQueue(max_pending=2)
+
+    failing_episode = await record_episode(
+        dataset_path, robot, 4, dataset_manager=dataset
+    )
+    # Can't be repaired
+    failing_episode.steps[1].action = None
+    failing_episode.steps[1].observation.joints_position = np.full(6, np.nan)
+    episode = await record_episode(dataset_path, robot, 5, dataset_manager=dataset)
+    assert episode.episode_index == 1
+
+    await queue.submit(failing_episode, dataset_path=dataset_path)
+    await queue.submit(episode, dataset_path=dataset_path)
+    await queue.join()
+
+    status = queue.status()
+    assert (status.nb_failed, status.nb_saved) == (1, 1)
+    assert status.jobs[0].error is not None
+    assert status.jobs[1].episode_index == 0
+
+    assert dataset.info_model is not None
+    assert dataset.info_model.total_episodes == 1
+    episodes = read_jsonl(os.path.join(dataset.meta_folder_full_path, "episodes.jsonl"))
+    assert [(e["episode_index"], e["length"]) for e in episodes] == [(0, 5)]
+    episodes_stats = read_jsonl(
+        os.path.join(dataset.meta_folder_full_path, "episodes_stats.jsonl")
+    )
+    assert [s["episode_index"] for s in episodes_stats] == [0]
+    assert episodes_stats[0]["stats"]["episode_index"]["max"] == [0]
+    assert os.path.exists(
+        os.path.join(dataset.data_folder_full_path, "episode_000000.parquet")
+    )
+    for camera_key in CAMERA_KEYS:
+        camera_folder = os.path.join(dataset.videos_folder_full_path, camera_key)
+        assert os.listdir(camera_folder) == ["episode_000000.mp4"]
+        assert (
+            count_video_frames(os.path.join(camera_folder, "episode_000000.mp4")) == 5
+        )
+
+    # The indices continue after the saved episodes
+    episode = await record_episode(dataset_path, robot, 3, dataset_manager=dataset)
+    assert episode.episode_index == 1
+    episode.discard()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_waits_for_a_slot(robot: SO100Hardware, tmp_path):
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    dataset = LeRobotDataset(path=dataset_path)
+    queue = EpisodeSaveQueue(max_pending=1)
+
+    first_episode = await record_episode(
+        dataset_path, robot, 3, dataset_manager=dataset
+    )
+    first_job = await queue.submit(first_episode, dataset_path=dataset_path)
+    assert queue.is_full
+
+    episode = await record_episode(dataset_path, robot, 3, dataset_manager=dataset)
+    await queue.submit(episode, dataset_path=dataset_path)
+    # Queued once the first episode left the queue
+    assert first_job.state != "queued"
+    await queue.close()
+    assert queue.status().nb_saved == 2
+
+
+@pytest.mark.asyncio
+async def test_v2_stats_only_contain_saved_episodes(robot: SO100Hardware, tmp_path):
+    """
+    In lerobot_v2, the stats of the whole dataset are updated when an episode is
+    saved, not while it's recorded: the episode recorded while the previous one is
+    saved isn't written to stats.json.
+    """
+    dataset_path = str(tmp_path / "lerobot_v2" / "test_dataset")
+    dataset = LeRobotDataset(path=dataset_path)
+    stats_path = os.path.join(dataset.meta_folder_full_path, "stats.json")
+
+    first_episode = await record_episode(
+        dataset_path, robot, 5, dataset_manager=dataset
+    )
+    # Recorded while the first episode is waiting to be saved
+    discarded_episode = await record_episode(
+        dataset_path, robot, 7, dataset_manager=dataset
+    )
+    await first_episode.save()
+    with open(stats_path) as f:
+        stats = json.load(f)
+    assert stats["timestamp"]["count"] == 5
+    assert stats["observation.images.main"]["count"] == 5 * 64 * 48
+
+    discarded_episode.discard()
+    episode = await record_episode(dataset_path, robot, 3, dataset_manager=dataset)
+    assert episode.episode_index == 1
+    await episode.save()
+    with open(stats_path) as f:
+        stats = json.load(f)
+    assert stats["timestamp"]["count"] == 8
+    assert stats["episode_index"]["max"] == [1]
+    # The frame indices of the dataset follow each other
+    assert stats["index"]["min"] == [0]
+    assert stats["index"]["max"] == [7]
+    assert stats["index"]["mean"] == [pytest.approx(3.5)]
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_meta_save_benchmark(robot: SO100Hardware, tmp_path):
+    """
+    Time to save the meta files after an episode, in a dataset of 1000 episodes,
+    when all the files are rewritten and when the new lines are appended.
+    """
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    dataset = LeRobotDataset(path=dataset_path)
+    episode = await record_episode(dataset_path, robot, 5, dataset_manager=dataset)
+    await episode.save()
+
+    # Grow the dataset to 1000 episodes in the meta models only
+    assert dataset.episodes_model is not None
+    assert dataset.episodes_stats_model is not None
+    for episode_index in range(1, 1000):
+        episode_features = deepcopy(dataset.episodes_model.episodes[0])
+        episode_features.episode_index = episode_index
+        dataset.episodes_model.episodes.append(episode_features)
+        episode_stats = deepcopy(dataset.episodes_stats_model.episodes_stats[0])
+        episode_stats.episode_index = episode_index
+        dataset.episodes_stats_model.episodes_stats.append(episode_stats)
+    dataset.episodes_model._episodes_features = None
+    dataset.save_all_meta_models()
+
+    start = time.perf_counter()
+    dataset.save_all_meta_models()
+    rewrite_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dataset.save_episode_meta_models(episode_index=999)
+    append_time = time.perf_counter() - start
+
+    print(
+        f"\nMeta files of 1000 episodes: {rewrite_time * 1000:.1f} ms to rewrite, "
+        f"{append_time * 1000:.1f} ms to append"
+    )
+    assert append_time * 10 < rewrite_time
+
+
+def make_step(i: int, nb_joints: int = 6) -> Step:
+    return Step(
+        observation=Observation(
+            state=np.zeros(7),
+            joints_position=np.full(nb_joints, i / 7, dtype=np.float32),
+            timestamp=i / 30,
+            language_instruction="test",
+        ),
+        metadata={"created_at": float(i)},
+    )
+
+
+def test_step_buffer_views():
+    buffer = StepBuffer(capacity=2)
+    for i in range(5):
+        if buffer:
+            buffer.set_action(len(buffer) - 1, make_step(i).observation.joints_position)
+        buffer.append(make_step(i))
+
+    assert len(buffer) == 5
+    assert [step.is_first for step in buffer] == [True] + [False] * 4
+    assert [step.is_last for step in buffer] == [False] * 4 + [True]
+    step = buffer[-1]
+    assert step.action is None
+    assert step.observation.timestamp == pytest.approx(4 / 30)
+    assert step.observation.language_instruction == "test"
+    assert step.metadata == {"created_at": 4.0}
+    np.testing.assert_allclose(buffer[1].action, np.full(6, 2 / 7), rtol=1e-6)
+
+    # The views write to the buffer
+    step.action = np.ones(6)
+    buffer[0].observation.joints_position = np.full(6, -1.0)
+    assert buffer.action_is_set.all()
+    np.testing.assert_array_equal(buffer.actions[-1], np.ones(6))
+    np.testing.assert_array_equal(buffer.joints_positions[0], np.full(6, -1.0))
+    assert len(buffer[1:3]) == 2
+
+    with pytest.raises(ValueError):
+        buffer.append(make_step(5, nb_joints=5))
+
+
+def write_parquet_from_step_objects(
+    steps: list[Step], path: str, freq: int, global_frame_offset: int
+) -> None:
+    """
+    The steps written with LeRobotEpisodeModel, as before the StepBuffer.
+    """
+    data: dict[str, list] = {
+        "action": [],
+        "observation.state": [],
+        "timestamp": (np.arange(len(steps)) / freq).tolist(),
+        "task_index": [],
+        "episode_index": [],
+        "frame_index": [],
+        "index": [],
+    }
+    for frame_index, step in enumerate(steps):
+        assert step.action is not None
+        data["action"].append(step.action.astype(np.float32).tolist())
+        data["observation.state"].append(
+            step.observation.joints_position.astype(np.float32)
+        )
+        data["task_index"].append(0)
+        data["episode_index"].append(0)
+        data["frame_index"].append(frame_index)
+        data["index"].append(frame_index + global_frame_offset)
+    LeRobotEpisodeModel(**data).to_parquet(path)
+
+
+@pytest.mark.asyncio
+async def test_parquet_matches_step_model(robot: SO100Hardware, tmp_path):
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    episode = await record_episode(dataset_path, robot, nb_steps=12)
+    assert isinstance(episode.steps, StepBuffer)
+    # Nothing left to repair but the action of the last step
+    assert episode.steps.action_is_set.sum() == 11
+    await episode.save()
+
+    expected_path = str(tmp_path / "expected.parquet")
+    write_parquet_from_step_objects(
+        list(episode.steps), expected_path, freq=30, global_frame_offset=0
+    )
+    table = pq.read_table(episode._parquet_path)
+    expected = pq.read_table(expected_path)
+    assert table.schema.remove_metadata() == expected.schema.remove_metadata()
+    pd.testing.assert_frame_equal(table.to_pandas(), expected.to_pandas())
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_step_buffer_benchmark(robot: SO100Hardware, tmp_path):
+    """
+    Time to create and append 18000 steps (10 minutes at 30 Hz) and to write them
+    to parquet, and memory kept by the steps, with a list of Step objects and a
+    StepBuffer.
+    """
+    nb_steps = 18000
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    list_episode = JsonEpisode()
+    for i in range(nb_steps):
+        step = make_step(i)
+        list_episode.update_previous_step(step)
+        list_episode.add_step(step)
+    list_append_time = time.perf_counter() - start
+    list_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert isinstance(list_episode.steps, list)
+    list_episode.steps[-1].action = list_episode.steps[-1].observation.joints_position
+    start = time.perf_counter()
+    write_parquet_from_step_objects(
+        list_episode.steps,
+        str(tmp_path / "list.parquet"),
+        freq=30,
+        global_frame_offset=0,
+    )
+    list_write_time = time.perf_counter() - start
+    del list_episode
+
+    dataset_path = str(tmp_path / "lerobot_v2.1" / "test_dataset")
+    episode = await record_episode(dataset_path, robot, nb_steps=0)
+    buffer = episode.steps
+    assert isinstance(buffer, StepBuffer)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(nb_steps):
+        step = make_step(i)
+        episode.update_previous_step(step)
+        episode.add_step(step)
+    buffer_append_time = time.perf_counter() - start
+    buffer_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    episode._repair_steps()
+    episode._write_parquet()
+    buffer_write_time = time.perf_counter() - start
+    episode.discard()
+
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(episode._parquet_path),
+        pd.read_parquet(tmp_path / "list.parquet"),
+    )
+    print(
+        f"\n{nb_steps} steps. Step objects: append {list_append_time * 1000:.0f} ms, "
+        f"write {list_write_time * 1000:.0f} ms, {list_memory / 1e6:.1f} MB. "
+        f"StepBuffer: append {buffer_append_time * 1000:.0f} ms, "
+        f"write {buffer_write_time * 1000:.0f} ms, {buffer_memory / 1e6:.1f} MB"
+    )
+    assert buffer_write_time * 5 < list_write_time
+    assert buffer_memory * 2 < list_memory
@@ -0,0 +1,127 @@
+"""
+Tests for the dynamic batching of the inference requests.
+
+```
+pytest tests/phosphobot/test_request_batching.py -s
+```
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.request_batching import RequestBatcher
+
+# A forward pass has a fixed cost, and a small cost per item of the batch
+FORWARD_TIME = 0.02
+ITEM_TIME = 0.002
+
+
+def fake_forward(items: list[np.ndarray]) -> list[np.ndarray]:
+    time.sleep(FORWARD_TIME + ITEM_TIME * len(items))
+    batch = np.stack(items)
+    return list(batch * 2)
+
+
+@pytest.mark.asyncio
+async def test_results_are_scattered():
+    batch_sizes = []
+
+    def forward(items):
+        batch_sizes.append(len(items))
+        return fake_forward(items)
+
+    batcher = RequestBatcher(forward, max_batch_size=4, max_wait_ms=20)
+    results = await asyncio.gather(
+        *[batcher.submit(np.full(3, i, dtype=float)) for i in range(10)]
+    )
+    await batcher.close()
+
+    for i, result in enumerate(results):
+        np.testing.assert_array_equal(result, np.full(3, 2 * i))
+    assert max(batch_sizes) == 4
+    assert sum(batch_sizes) == 10
+    assert batcher.nb_batches == len(batch_sizes)
+
+
+@pytest.mark.asyncio
+async def test_errors_only_fail_their_request():
+    batch_sizes = []
+
+    def forward(items):
+        batch_sizes.append(len(items))
+        if any(item is None for item in items):
+            raise ValueError("Invalid input")
+        return items
+
+    batcher = RequestBatcher(forward, max_batch_size=2, max_wait_ms=50)
+    results = await asyncio.gather(
+        batcher.submit(1), batcher.submit(None), return_exceptions=True
+    )
+    assert results[0] == 1
+    assert isinstance(results[1], ValueError)
+    # The failed batch, then its requests one by one
+    assert batch_sizes == [2, 1, 1]
+
+    # The batcher keeps working after an error
+    assert await batcher.submit(3) == 3
+    await batcher.close()
+
+
+@pytest.mark.asyncio
+async def test_single_request_waits_at_most_the_window():
+    batcher = RequestBatcher(lambda items: items, max_batch_size=8, max_wait_ms=10)
+    start = time.perf_counter()
+    assert await batcher.submit("a") == "a"
+    assert time.perf_counter() - start < 0.1
+    await batcher.close()
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_batching_benchmark():
+    """
+    Throughput and latency of 8 clients sending 10 requests each, one after the
+    other, without batching and with batches of up to 8 requests.
+    """
+    nb_clients = 8
+    nb_requests = 10
+    throughputs = {}
+
+    for max_batch_size in (1, 8):
+        batcher = RequestBatcher(
+            fake_forward, max_batch_size=max_batch_size, max_wait_ms=5
+        )
+        latencies: list[float] = []
+
+        async def client(
+            i: int,
+            batcher: RequestBatcher = batcher,
+            latencies: list[float] = latencies,
+        ):
+            for _ in range(nb_requests):
+                start = time.perf_counter()
+                await batcher.submit(np.full(6, i, dtype=np.float32))
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[client(i) for i in range(nb_clients)])
+        elapsed = time.perf_counter() - start
+        await batcher.close()
+
+        throughputs[max_batch_size] = nb_clients * nb_requests / elapsed
+        print(
+            f"\nmax batch size {max_batch_size}: "
+            f"{throughputs[max_batch_size]:.0f} requests/s, "
+            f"mean batch size {batcher.mean_batch_size:.1f}, "
+            f"latency p50 {np.percentile(latencies, 50) * 1000:.0f} ms, "
+            f"p99 {np.percentile(latencies, 99) * 1000:.0f} ms"
+        )
+
+    assert throughputs[8] > 2 * throughputs[1]
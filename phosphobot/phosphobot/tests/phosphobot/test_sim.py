@@ -0,0 +1,196 @@
+"""
+Tests for the PyBullet simulation.
+
+```
+pytest tests/phosphobot/test_sim.py -s
+```
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+from serial.tools.list_ports_common import ListPortInfo
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.configs import config
+from phosphobot.hardware import KochHardware, SO100Hardware, WX250SHardware, get_sim
+from phosphobot.robot import RobotConnectionManager
+from phosphobot.types import SimulationMode
+
+
+@pytest.fixture
+def robot() -> SO100Hardware:
+    config.SIM_MODE = SimulationMode.headless
+    get_sim()
+    return SO100Hardware()
+
+
+def test_motor_commands_are_mirrored(robot: SO100Hardware):
+    q_target_rad = np.array([0.1, -0.2, 0.3, -0.4, 0.5, 0.2])
+    robot.set_motors_positions(q_target_rad, enable_gripper=True)
+
+    # The joints are at the target positions without stepping the physics
+    q_sim_rad = robot.read_joints_position(unit="rad", source="sim")
+    assert np.allclose(q_sim_rad, q_target_rad)
+
+
+def test_physics_thread(robot: SO100Hardware):
+    sim = robot.sim
+    # Only the motor targets are set: the physics moves the joints
+    sim.set_joints_states(
+        robot.p_robot_id, robot.actuated_joints, [0.3] * 6, mirror=False
+    )
+    sim.start_physics()
+    try:
+        deadline = time.perf_counter() + 5
+        while time.perf_counter() < deadline:
+            q_sim_rad = robot.read_joints_position(unit="rad", source="sim")
+            if np.allclose(q_sim_rad, 0.3, atol=0.05):
+                break
+            time.sleep(0.05)
+        assert np.allclose(q_sim_rad, 0.3, atol=0.05)
+    finally:
+        sim.stop_physics()
+
+
+@pytest.mark.benchmark
+def test_motor_commands_benchmark(robot: SO100Hardware):
+    """
+    Motor commands per second in the simulation, with the kinematics-only mirror
+    and with the previous behaviour (960 physics steps per command).
+    """
+    rng = np.random.default_rng(0)
+    q_targets_rad = rng.uniform(-0.5, 0.5, size=(50, 6))
+
+    def mirror_command(q_target_rad: np.ndarray):
+        robot.set_motors_positions(q_target_rad, enable_gripper=True)
+
+    def physics_command(q_target_rad: np.ndarray):
+        robot.sim.set_joints_states(
+            robot.p_robot_id,
+            robot.actuated_joints,
+            q_target_rad.tolist(),
+            mirror=False,
+        )
+        robot.sim.step(steps=960)
+
+    rates = {}
+    for name, command in [("physics", physics_command), ("mirror", mirror_command)]:
+        start = time.perf_counter()
+        for q_target_rad in q_targets_rad:
+            command(q_target_rad)
+        rates[name] = len(q_targets_rad) / (time.perf_counter() - start)
+        print(f"\n{name}: {rates[name]:.0f} commands/s")
+
+    assert rates["mirror"] > 10 * rates["physics"]
+
+
+def test_robots_have_isolated_simulations():
+    config.SIM_MODE = SimulationMode.headless
+    first_robot = SO100Hardware()
+    second_robot = SO100Hardware()
+    assert first_robot.sim is not second_robot.sim
+    assert first_robot.sim.client_id != second_robot.sim.client_id
+
+    q_target_rad = np.array([0.1, -0.2, 0.3, -0.4, 0.5, 0.2])
+    first_robot.set_motors_positions(q_target_rad, enable_gripper=True)
+    second_robot.set_motors_positions(-q_target_rad, enable_gripper=True)
+    assert np.allclose(
+        first_robot.read_joints_position(unit="rad", source="sim"), q_target_rad
+    )
+
+    # Resetting the world of a robot doesn't remove the other robot
+    second_robot.sim.reset()
+    assert np.allclose(
+        first_robot.read_joints_position(unit="rad", source="sim"), q_target_rad
+    )
+
+
+@pytest.mark.asyncio
+async def test_port_rescan_keeps_other_robots(monkeypatch):
+    class FakeRobot:
+        name = "fake"
+
+        def __init__(self, port: ListPortInfo):
+            self.port = port.device
+            self.connected = False
+
+        async def connect(self):
+            self.connected = True
+
+        def disconnect(self):
+            self.connected = False
+
+    monkeypatch.setattr(config, "ONLY_SIMULATION", False)
+    monkeypatch.setattr(config, "ENABLE_CAN", False)
+    monkeypatch.setattr(
+        WX250SHardware, "from_port", classmethod(lambda cls, port: None)
+    )
+    monkeypatch.setattr(KochHardware, "from_port", classmethod(lambda cls, port: None))
+    monkeypatch.setattr(
+        SO100Hardware, "from_port", classmethod(lambda cls, port: FakeRobot(port))
+    )
+
+    rcm = RobotConnectionManager()
+    first_port, second_port = ListPortInfo("/dev/ttyACM0"), ListPortInfo("/dev/ttyACM1")
+
+    rcm.available_ports = [first_port]
+    await rcm._find_robots()
+    (first_robot,) = rcm._all_robots
+
+    # Plugging a second robot doesn't reconnect the first one
+    rcm.available_ports = [first_port, second_port]
+    await rcm._find_robots()
+    assert rcm._all_robots[0] is first_robot
+    second_robot = rcm._all_robots[1]
+    assert second_robot.port == second_port.device
+
+    # Unplugging the first robot only disconnects it
+    rcm.available_ports = [second_port]
+    await rcm._find_robots()
+    assert rcm._all_robots == [second_robot]
+    assert not first_robot.connected
+    assert second_robot.connected
+
+
+@pytest.mark.asyncio
+async def test_dropped_robots_release_their_simulation(monkeypatch):
+    config.SIM_MODE = SimulationMode.headless
+    monkeypatch.setattr(config, "ONLY_SIMULATION", False)
+    monkeypatch.setattr(config, "ENABLE_CAN", False)
+    monkeypatch.setattr(
+        WX250SHardware, "from_port", classmethod(lambda cls, port: None)
+    )
+    monkeypatch.setattr(KochHardware, "from_port", classmethod(lambda cls, port: None))
+    robots: list[SO100Hardware] = []
+
+    def from_port(cls, port: ListPortInfo):
+        robot = cls(device_name=port.device, only_simulation=True)
+        robots.append(robot)
+        return robot
+
+    async def connect(self):
+        if self.device_name == "/dev/ttyUSB0":
+            raise OSError("Not a SO-100")
+        self.is_connected = True
+
+    monkeypatch.setattr(SO100Hardware, "from_port", classmethod(from_port))
+    monkeypatch.setattr(SO100Hardware, "connect", connect)
+
+    rcm = RobotConnectionManager()
+    rcm.available_ports = [ListPortInfo("/dev/ttyACM0"), ListPortInfo("/dev/ttyUSB0")]
+    await rcm._find_robots()
+    connected_robot, probed_robot = robots
+    assert rcm._all_robots == [connected_robot]
+    # The robot created to probe the other port doesn't keep its physics client
+    assert not probed_robot.sim.connected
+    assert connected_robot.sim.connected
+
+    rcm.available_ports = []
+    await rcm._find_robots()
+    assert rcm._all_robots == []
+    assert not connected_robot.sim.connected
@@ -0,0 +1,225 @@
+"""
+Tests for the synchronized snapshots of the robots and the cameras.
+
+```
+pytest tests/phosphobot/test_snapshot.py -s
+```
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.camera import DummyCamera
+from phosphobot.control_loop import get_control_loop_runtime
+from phosphobot.hardware import SO100Hardware
+from phosphobot.snapshot import SnapshotService
+
+READ_TIME = 0.002
+
+
+class FakeRobot:
+    """A robot whose reads on the motors bus are counted"""
+
+    name = "fake"
+
+    def __init__(self, read_time: float = READ_TIME):
+        self.read_time = read_time
+        self.nb_reads = 0
+        self._lock = threading.Lock()
+
+    def get_observation(self) -> tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            time.sleep(self.read_time)
+            self.nb_reads += 1
+            return np.zeros(6), np.full(6, float(self.nb_reads))
+
+
+@pytest.fixture
+def camera():
+    """A camera publishing a frame every 10 ms"""
+    camera = DummyCamera(camera_type="dummy", width=32, height=24)
+    camera.camera_id = 0
+    stop = threading.Event()
+
+    def publish():
+        value = 0
+        while not stop.is_set():
+            camera._publish_frame(np.full((24, 32, 3), value % 256, dtype=np.uint8))
+            value += 1
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=publish, daemon=True)
+    thread.start()
+    yield camera
+    stop.set()
+    thread.join()
+    camera.stop()
+
+
+def wait_for_sampler_to_stop():
+    runtime = get_control_loop_runtime()
+    runtime.join("snapshots", timeout=2)
+    assert not runtime.is_running("snapshots")
+
+
+@pytest.mark.asyncio
+async def test_snapshots_are_synchronized(camera: DummyCamera):
+    service = SnapshotService()
+    robot = FakeRobot()
+    with service.subscribe(robots=[robot], cameras=[camera], freq=50) as snapshots:
+        received = []
+        for _ in range(10):
+            snapshot = await snapshots.next(timeout=1)
+            assert snapshot is not None
+            received.append(snapshot)
+
+    wait_for_sampler_to_stop()
+    assert [s.seq for s in received] == sorted(set(s.seq for s in received))
+    for snapshot in received:
+        robot_sample = snapshot.robot_sample(robot)  # type: ignore
+        assert robot_sample is not None
+        assert 0 in snapshot.cameras
+        # The robot is read right after the frames are captured
+        assert snapshot.skew < 0.05
+        assert min(snapshot.capture_timestamps) <= snapshot.timestamp
+
+    # Query by time
+    target = received[4]
+    assert service.at(target.timestamp) == target
+    assert service.at(target.timestamp + 0.001) == target
+
+
+def test_old_snapshots_keep_their_frames(camera: DummyCamera):
+    service = SnapshotService()
+    robot = FakeRobot()
+    assert camera.wait_for_frame(timeout=1) is not None
+    snapshot = service.sample([robot], [camera], frame_timeout=0.1)
+    camera_sample = snapshot.cameras[0]
+    value = camera_sample.frame.frame[0, 0, 0]
+
+    # The ring buffer slot of the frame is reused by the next frames
+    time.sleep(0.02 * (camera.frame_ring.size + 1))
+    latest = camera.get_latest_frame()
+    assert latest is not None and latest.seq > snapshot.cameras[0].frame.seq + 4
+
+    assert service.at(snapshot.timestamp) is snapshot
+    assert np.all(camera_sample.rgb() == value)
+    assert np.all(camera_sample.bgr(resize=(16, 12)) == value)
+
+
+@pytest.mark.asyncio
+async def test_sampler_runs_at_the_highest_rate():
+    service = SnapshotService()
+    robot = FakeRobot()
+    slow = service.subscribe(robots=[robot], freq=10)
+    fast = service.subscribe(robots=[robot], freq=50)
+    assert service.status().rate_hz == pytest.approx(50)
+    fast.close()
+    assert service.status().rate_hz == pytest.approx(10)
+    slow.close()
+    wait_for_sampler_to_stop()
+    assert not service.status().running
+
+
+def test_on_demand_reads_are_shared():
+    service = SnapshotService()
+    robot = FakeRobot(read_time=0.05)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        samples = list(pool.map(lambda _: service.read_robot(robot), range(8)))
+
+    assert robot.nb_reads == 1
+    assert all(sample is samples[0] for sample in samples)
+
+    # Too old: read again
+    time.sleep(0.06)
+    service.read_robot(robot, max_age=0.05)
+    assert robot.nb_reads == 2
+
+
+def test_manipulators_are_read_in_the_simulation_during_control_loops(monkeypatch):
+    service = SnapshotService()
+    robot = SO100Hardware()
+    sources = []
+    read_joints_position = robot.read_joints_position
+
+    def record_source(*args, **kwargs):
+        sources.append(kwargs.get("source"))
+        return read_joints_position(*args, **kwargs)
+
+    monkeypatch.setattr(robot, "read_joints_position", record_source)
+    # A control loop uses the motors bus: the simulation mirrors the motors
+    monkeypatch.setattr(robot, "joints_position_source", lambda: "sim")
+
+    snapshot = service.sample([robot], [])
+
+    assert sources == ["sim"]
+    robot_sample = snapshot.robot_sample(robot)
+    assert robot_sample is not None
+    assert robot_sample.joints_position.shape == (6,)
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_bus_load_benchmark(camera: DummyCamera):
+    """
+    Robot reads per second when 1 to 8 consumers at 50 Hz read the robot and the
+    camera themselves, and when they subscribe to the snapshots.
+    """
+    duration = 0.5
+    freq = 50
+    results = {}
+
+    for nb_consumers in (1, 4, 8):
+        # Each consumer reads the robot and the camera itself
+        robot = FakeRobot()
+
+        async def consumer(robot: FakeRobot = robot):
+            start = time.perf_counter()
+            while time.perf_counter() - start < duration:
+                await asyncio.to_thread(robot.get_observation)
+                camera.get_latest_frame()
+                await asyncio.sleep(1 / freq)
+
+        await asyncio.gather(*[consumer() for _ in range(nb_consumers)])
+        direct_rate = robot.nb_reads / duration
+
+        # The consumers share the snapshots
+        robot = FakeRobot()
+        service = SnapshotService()
+        subscriptions = [
+            service.subscribe(robots=[robot], cameras=[camera], freq=freq)
+            for _ in range(nb_consumers)
+        ]
+
+        async def subscriber(subscription, robot: FakeRobot = robot):
+            start = time.perf_counter()
+            while time.perf_counter() - start < duration:
+                snapshot = await subscription.next(timeout=1)
+                assert snapshot is not None and snapshot.robot_sample(robot)
+
+        await asyncio.gather(*[subscriber(s) for s in subscriptions])
+        for subscription in subscriptions:
+            subscription.close()
+        wait_for_sampler_to_stop()
+        shared_rate = robot.nb_reads / duration
+
+        results[nb_consumers] = shared_rate
+        status = service.status()
+        print(
+            f"\n{nb_consumers} consumers: {direct_rate:.0f} reads/s without snapshots, "
+            f"{shared_rate:.0f} reads/s with snapshots, "
+            f"mean skew {status.mean_skew_ms:.1f} ms"
+        )
+
+    # The bus load doesn't depend on the number of consumers
+    assert results[8] < 1.5 * results[1]
+    assert results[8] <= freq * 1.2
@@ -0,0 +1,221 @@
+"""
+Tests for the binary encoding of the teleoperation messages.
+
+```
+pytest tests/phosphobot/test_teleop_encoding.py -s
+```
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.configs import config
+from phosphobot.hardware import SO100Hardware
+from phosphobot.models import AppControlData, RobotStatus
+from phosphobot.teleop_encoding import (
+    CONTROL_STRUCT,
+    BinaryDecodeError,
+    decode_control,
+    decode_status,
+    encode_control,
+    encode_status,
+    is_newer_sequence,
+)
+from phosphobot.teleoperation import TeleopManager, _TeleopProtocol
+from phosphobot.types import SimulationMode
+
+ADDR = ("127.0.0.1", 5555)
+
+
+class FakeRobotConnectionManager:
+    def __init__(self, robots):
+        self._robots = robots
+
+    @property
+    async def robots(self):
+        return self._robots
+
+
+class FakeTransport:
+    def __init__(self):
+        self.sent: list[bytes] = []
+
+    def sendto(self, data: bytes, addr):
+        self.sent.append(data)
+
+    def get_extra_info(self, name):
+        return ADDR
+
+
+@pytest.fixture
+def teleop_manager(monkeypatch) -> TeleopManager:
+    config.SIM_MODE = SimulationMode.headless
+    robot = SO100Hardware()
+    robot.initial_position = np.zeros(3)
+    robot.initial_orientation_rad = np.zeros(3)
+
+    async def move_robot_absolute(target_position, target_orientation_rad, **kwargs):
+        pass
+
+    monkeypatch.setattr(robot, "move_robot_absolute", move_robot_absolute)
+    teleop_manager = TeleopManager(FakeRobotConnectionManager([robot]))
+    teleop_manager.MAX_INSTRUCTIONS_PER_SEC = 1_000_000
+    return teleop_manager
+
+
+def make_control_data(i: int, source="right") -> AppControlData:
+    return AppControlData(
+        x=0.01 * i,
+        y=0.02,
+        z=-0.03,
+        rx=10.5,
+        ry=-20.25,
+        rz=30,
+        open=0.5,
+        source=source,
+        timestamp=1_700_000_000.125 + i,
+    )
+
+
+def test_control_round_trip():
+    control_data = make_control_data(3, source="left")
+    data = encode_control(control_data, sequence=42)
+    assert len(data) == CONTROL_STRUCT.size
+
+    decoded, sequence = decode_control(data)
+    assert sequence == 42
+    assert decoded.source == "left"
+    assert decoded.timestamp == control_data.timestamp
+    for field in ("x", "y", "z", "rx", "ry", "rz", "open"):
+        assert getattr(decoded, field) == pytest.approx(getattr(control_data, field))
+
+    no_timestamp = AppControlData(x=0, y=0, z=0, rx=0, ry=0, rz=0, open=1)
+    assert decode_control(encode_control(no_timestamp))[0].timestamp is None
+
+
+def test_malformed_control_messages():
+    data = encode_control(make_control_data(0))
+    with pytest.raises(BinaryDecodeError):
+        decode_control(data[:-1])
+
+    wrong_version = bytearray(data)
+    wrong_version[2] = 99
+    with pytest.raises(BinaryDecodeError):
+        decode_control(bytes(wrong_version))
+
+    control_data = make_control_data(0)
+    control_data.direction_x = 2
+    with pytest.raises(BinaryDecodeError):
+        decode_control(encode_control(control_data))
+
+
+@pytest.mark.parametrize(
+    "status",
+    [
+        RobotStatus(nb_actions_received=12),
+        RobotStatus(
+            is_object_gripped=True,
+            is_object_gripped_source="right",
+            nb_actions_received=3,
+        ),
+        RobotStatus(
+            is_object_gripped=False,
+            is_object_gripped_source="left",
+            nb_actions_received=0,
+        ),
+    ],
+)
+def test_status_round_trip(status: RobotStatus):
+    assert decode_status(encode_status(status)) == status
+
+
+def test_sequence_wrap_around():
+    assert is_newer_sequence(0, None)
+    assert is_newer_sequence(5, 4)
+    assert not is_newer_sequence(4, 4)
+    assert not is_newer_sequence(3, 4)
+    assert is_newer_sequence(1, 2**32 - 1)
+
+
+@pytest.mark.asyncio
+async def test_udp_binary_packets(teleop_manager: TeleopManager):
+    protocol = _TeleopProtocol(teleop_manager)
+    protocol.transport = FakeTransport()  # type: ignore
+
+    protocol.datagram_received(encode_control(make_control_data(1), sequence=10), ADDR)
+    # Late packet: older than the last one received
+    protocol.datagram_received(encode_control(make_control_data(0), sequence=9), ADDR)
+    assert teleop_manager.counters.dropped == 1
+
+    packet = protocol.pending_packets["right"]
+    assert packet.binary
+    assert packet.control_data.x == pytest.approx(0.01)
+
+    # JSON packets are still accepted
+    json_packet = make_control_data(2, source="left").model_dump_json().encode()
+    protocol.datagram_received(json_packet, ADDR)
+    assert not protocol.pending_packets["left"].binary
+
+    # Invalid binary packets get an error response
+    protocol.datagram_received(b"PT" + bytes(10), ADDR)
+    assert json.loads(protocol.transport.sent[-1])["error"] == "invalid_binary"
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_encoding_benchmark(teleop_manager: TeleopManager):
+    """
+    Packets per second and p99 latency of the server side processing of a
+    teleoperation packet (decode, validate, dispatch to the robot, encode the
+    status), with the JSON and the binary encodings.
+    """
+    nb_packets = 3000
+    protocol = _TeleopProtocol(teleop_manager)
+    protocol.transport = FakeTransport()  # type: ignore
+    controls = [make_control_data(i) for i in range(nb_packets)]
+    for control in controls:
+        control.timestamp = None
+    status = RobotStatus(nb_actions_received=100)
+
+    async def process_json(i: int):
+        control = protocol._parse_packet(json_packets[i], ADDR)
+        assert control is not None
+        await teleop_manager.process_control_data(control)
+        status.model_dump_json().encode()
+
+    async def process_binary(i: int):
+        control = protocol._parse_binary_packet(binary_packets[i], ADDR)
+        assert control is not None
+        await teleop_manager.process_control_data(control)
+        encode_status(status)
+
+    json_packets = [control.model_dump_json().encode() for control in controls]
+    binary_packets = [
+        encode_control(control, sequence=i) for i, control in enumerate(controls)
+    ]
+
+    rates = {}
+    for name, process in [("json", process_json), ("binary", process_binary)]:
+        protocol.last_sequences.clear()
+        latencies = np.zeros(nb_packets)
+        start = time.perf_counter()
+        for i in range(nb_packets):
+            packet_start = time.perf_counter()
+            await process(i)
+            latencies[i] = time.perf_counter() - packet_start
+        rates[name] = nb_packets / (time.perf_counter() - start)
+        packet_size = len(json_packets[0] if name == "json" else binary_packets[0])
+        print(
+            f"\n{name}: {rates[name]:.0f} packets/s, "
+            f"p99 latency {np.percentile(latencies, 99) * 1e6:.1f} us, "
+            f"packet size {packet_size} bytes"
+        )
+
+    assert rates["binary"] > rates["json"]
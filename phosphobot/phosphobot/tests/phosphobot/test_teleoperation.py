@@ -0,0 +1,172 @@
+"""
+Tests for the teleoperation command mailboxes.
+
+```
+pytest tests/phosphobot/test_teleoperation.py -s
+```
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.configs import config
+from phosphobot.hardware import SO100Hardware
+from phosphobot.models import AppControlData
+from phosphobot.teleoperation import TeleopManager
+from phosphobot.types import SimulationMode
+
+# Duration of a move of the robot: the robot can execute 50 commands per second
+MOVE_DURATION = 0.02
+
+
+class FakeRobotConnectionManager:
+    def __init__(self, robots):
+        self._robots = robots
+
+    @property
+    async def robots(self):
+        return self._robots
+
+
+@pytest.fixture
+def robot(monkeypatch) -> SO100Hardware:
+    config.SIM_MODE = SimulationMode.headless
+    robot = SO100Hardware()
+    robot.initial_position = np.zeros(3)
+    robot.initial_orientation_rad = np.zeros(3)
+    robot.targets = []
+
+    async def move_robot_absolute(target_position, target_orientation_rad, **kwargs):
+        await asyncio.sleep(MOVE_DURATION)
+        robot.targets.append(target_position.copy())
+
+    monkeypatch.setattr(robot, "move_robot_absolute", move_robot_absolute)
+    return robot
+
+
+def control_data(x: float) -> AppControlData:
+    return AppControlData(x=x, y=0, z=0, rx=0, ry=0, rz=0, open=1)
+
+
+async def wait_for_commands(teleop_manager: TeleopManager, timeout: float = 2):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        mailboxes = teleop_manager._mailboxes.values()
+        if all(not mailbox.has_command() for mailbox in mailboxes):
+            await teleop_manager.wait_robots_ready(timeout=timeout)
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_latest_command_wins(robot: SO100Hardware):
+    teleop_manager = TeleopManager(FakeRobotConnectionManager([robot]))
+
+    for i in range(20):
+        assert await teleop_manager.process_control_data(control_data(x=i))
+    await wait_for_commands(teleop_manager)
+
+    stats = teleop_manager.stats()
+    # The commands were posted before the servo task ran: only the last one is executed
+    assert stats.nb_commands_executed == 1
+    assert stats.nb_commands_superseded == 19
+    assert stats.nb_commands_dropped == 0
+    assert stats.mean_command_age_ms is not None
+    assert robot.targets[-1][0] == 19
+
+
+@pytest.mark.asyncio
+async def test_sources_have_their_own_mailbox(robot: SO100Hardware):
+    teleop_manager = TeleopManager(FakeRobotConnectionManager([robot]), robot_id=0)
+
+    left = control_data(x=1)
+    left.source = "left"
+    await teleop_manager.process_control_data(left)
+    await teleop_manager.process_control_data(control_data(x=2))
+    await wait_for_commands(teleop_manager)
+
+    assert len(teleop_manager._mailboxes) == 2
+    assert teleop_manager.stats().nb_commands_superseded == 0
+    assert sorted(target[0] for target in robot.targets) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_stop_servos_cancels_the_tasks(robot: SO100Hardware):
+    teleop_manager = TeleopManager(FakeRobotConnectionManager([robot]))
+
+    await teleop_manager.process_control_data(control_data(x=1))
+    await wait_for_commands(teleop_manager)
+    servo_tasks = [mailbox.servo_task for mailbox in teleop_manager._mailboxes.values()]
+    assert servo_tasks
+
+    teleop_manager.stop_servos(robot)
+    await asyncio.sleep(0)
+
+    assert teleop_manager._mailboxes == {}
+    assert all(task is not None and task.done() for task in servo_tasks)
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_command_age_benchmark(robot: SO100Hardware):
+    """
+    Age of the executed commands when a VR headset sends 200 commands per second to
+    a robot that executes 50 moves per second, with a FIFO queue and with the
+    latest-wins mailbox.
+    """
+    nb_commands = 60
+    period = 1 / 200
+
+    async def send_commands(send):
+        for i in range(nb_commands):
+            await send(control_data(x=i), time.perf_counter())
+            await asyncio.sleep(period)
+
+    # FIFO queue: every command is executed in order
+    queue: asyncio.Queue = asyncio.Queue()
+    fifo_ages = []
+
+    async def fifo_worker():
+        while True:
+            command, received_at = await queue.get()
+            await robot.move_robot_absolute(np.array([command.x, 0, 0]), np.zeros(3))
+            fifo_ages.append(time.perf_counter() - received_at)
+            queue.task_done()
+
+    async def fifo_send(command, received_at):
+        queue.put_nowait((command, received_at))
+
+    worker = asyncio.create_task(fifo_worker())
+    await send_commands(fifo_send)
+    await queue.join()
+    worker.cancel()
+
+    # Latest-wins mailbox
+    teleop_manager = TeleopManager(FakeRobotConnectionManager([robot]))
+
+    async def mailbox_send(command, received_at):
+        await teleop_manager.process_control_data(command, received_at=received_at)
+
+    await send_commands(mailbox_send)
+    await wait_for_commands(teleop_manager)
+    stats = teleop_manager.stats()
+
+    fifo_max_age_ms = max(fifo_ages) * 1000
+    print(
+        f"\nFIFO queue: {len(fifo_ages)} commands executed, "
+        f"max age {fifo_max_age_ms:.0f} ms"
+        f"\nMailbox: {stats.nb_commands_executed} commands executed, "
+        f"{stats.nb_commands_superseded} superseded, "
+        f"max age {stats.max_command_age_ms:.0f} ms"
+    )
+
+    assert stats.max_command_age_ms is not None
+    assert stats.max_command_age_ms < fifo_max_age_ms
+    assert robot.targets[-1][0] == nb_commands - 1
@@ -0,0 +1,238 @@
+"""
+Tests for the binary tensor encoding of the ACT inference requests.
+
+```
+pytest tests/phosphobot/test_tensor_encoding.py -s
+```
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import json_numpy  # type: ignore
+import numpy as np
+import pytest
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.am.act import ACT
+from phosphobot.tensor_encoding import (
+    TensorDecodeError,
+    decode_tensors,
+    encode_tensors,
+    inference_response,
+    read_inference_request,
+)
+
+CHUNK_SIZE = 100
+
+
+def make_inputs(nb_cameras: int = 3, height: int = 480, width: int = 640) -> dict:
+    # Smooth images, like camera frames, so that the JPEG compression is realistic
+    y, x = np.mgrid[0:height, 0:width]
+    inputs: dict = {"observation.state": np.linspace(-1, 1, 6, dtype=np.float32)}
+    for i in range(nb_cameras):
+        image = np.stack([x * 255 // width, y * 255 // height, (x + y + 40 * i) % 256])
+        inputs[f"observation.images.{i}"] = image.transpose(1, 2, 0).astype(np.uint8)
+    return inputs
+
+
+def fake_policy(payload: dict) -> np.ndarray:
+    """Actions of shape (chunk, batch, joints), like the ACT policy"""
+    state = np.asarray(payload["observation.state"], dtype=np.float32)
+    return np.tile(state, (CHUNK_SIZE, 1, 1)) + np.arange(CHUNK_SIZE).reshape(-1, 1, 1)
+
+
+def make_server_app(fail: bool = False) -> FastAPI:
+    """If fail is True, the inference fails with a 500 error"""
+    app = FastAPI()
+
+    @app.post("/act")
+    async def inference(request: Request):
+        payload, binary = await read_inference_request(request)
+        if fail:
+            raise HTTPException(status_code=500, detail="CUDA out of memory")
+        return inference_response(fake_policy(payload), binary=binary)
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy", "transports": ["binary", "json"]}
+
+    return app
+
+
+def make_legacy_server_app(parse_error_status_code: int = 422) -> FastAPI:
+    """
+    A server that only supports the JSON transport. It answers the binary requests
+    with a 422 validation error, or with parse_error_status_code.
+    """
+    app = FastAPI()
+
+    class InferenceRequest(BaseModel):
+        encoded: str
+
+    if parse_error_status_code == 422:
+
+        @app.post("/act")
+        async def inference(request: InferenceRequest):
+            return json_numpy.dumps(fake_policy(json_numpy.loads(request.encoded)))
+
+    else:
+
+        @app.post("/act")
+        async def inference_from_body(request: Request):
+            try:
+                encoded = (await request.json())["encoded"]
+            except Exception as e:
+                raise HTTPException(status_code=parse_error_status_code, detail=str(e))
+            return json_numpy.dumps(fake_policy(json_numpy.loads(encoded)))
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy"}
+
+    return app
+
+
+@contextmanager
+def serve(app: FastAPI):
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield server.servers[0].sockets[0].getsockname()[1]
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def test_round_trip():
+    inputs = make_inputs(nb_cameras=2, height=48, width=64)
+    inputs["detect_instruction"] = "red lego brick"
+    inputs["scalar"] = np.float64(3.5) * np.ones(())
+
+    decoded = decode_tensors(encode_tensors(inputs))
+    assert decoded.keys() == inputs.keys()
+    assert decoded["detect_instruction"] == "red lego brick"
+    for key, value in inputs.items():
+        if isinstance(value, np.ndarray):
+            assert decoded[key].dtype == value.dtype
+            np.testing.assert_array_equal(decoded[key], value)
+
+    # Views on the message: writable only if the message is
+    assert not decoded["observation.state"].flags.writeable
+    writable = decode_tensors(bytearray(encode_tensors(inputs)))
+    assert writable["observation.state"].flags.writeable
+
+
+def test_jpeg_compression():
+    inputs = make_inputs(nb_cameras=1)
+    data = encode_tensors(inputs, jpeg_quality=90)
+    assert len(data) < len(encode_tensors(inputs)) / 10
+
+    decoded = decode_tensors(data)
+    image = inputs["observation.images.0"]
+    assert decoded["observation.images.0"].shape == image.shape
+    error = np.abs(decoded["observation.images.0"].astype(int) - image.astype(int))
+    assert error.mean() < 2
+    # The state is not an image: sent raw
+    np.testing.assert_array_equal(
+        decoded["observation.state"], inputs["observation.state"]
+    )
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"PTT1",
+        b"{}" + bytes(20),
+        encode_tensors({"a": np.zeros(10)})[:-8],
+        b"PTT1" + (1000).to_bytes(4, "little") + b"{}",
+        b"PTT1" + (2).to_bytes(4, "little") + b"[]",
+    ],
+)
+def test_malformed_messages(data: bytes):
+    with pytest.raises(TensorDecodeError):
+        decode_tensors(data)
+
+
+@pytest.mark.parametrize("parse_error_status_code", [422, 500])
+def test_fallback_to_json_transport(parse_error_status_code: int):
+    inputs = make_inputs(nb_cameras=1, height=48, width=64)
+    with serve(make_legacy_server_app(parse_error_status_code)) as port:
+        model = ACT(server_url="http://127.0.0.1", server_port=port)
+        model.BINARY_RETRY_INTERVAL = 2
+        actions = model.sample_actions(inputs)
+        assert not model.uses_binary_transport
+        np.testing.assert_allclose(actions, fake_policy(inputs))
+
+        # The binary transport is tried again after BINARY_RETRY_INTERVAL requests
+        model.sample_actions(inputs)
+        assert model.uses_binary_transport
+        model.sample_actions(inputs)
+        assert not model.uses_binary_transport
+
+
+def test_no_fallback_on_inference_errors():
+    """A server which supports the binary transport keeps it when inference fails"""
+    inputs = make_inputs(nb_cameras=1, height=48, width=64)
+    with serve(make_server_app(fail=True)) as port:
+        model = ACT(server_url="http://127.0.0.1", server_port=port)
+        with pytest.raises(HTTPException, match="CUDA out of memory"):
+            model.sample_actions(inputs)
+        assert model.uses_binary_transport
+
+
+@pytest.mark.benchmark
+def test_transport_benchmark():
+    """
+    Request size and round trip time of an inference request with 3 camera frames
+    of 480x640, to a local server, with the JSON and the binary transports.
+    """
+    inputs = make_inputs()
+    nb_requests = 10
+    mean_rtts = {}
+
+    with serve(make_server_app()) as port:
+        for transport, jpeg_quality in [
+            ("json", None),
+            ("binary", None),
+            ("binary", 90),
+        ]:
+            model = ACT(
+                server_url="http://127.0.0.1",
+                server_port=port,
+                transport=transport,  # type: ignore
+                jpeg_quality=jpeg_quality,
+            )
+            if transport == "json":
+                size = len(json.dumps({"encoded": json_numpy.dumps(inputs)}))
+            else:
+                size = len(encode_tensors(inputs, jpeg_quality=jpeg_quality))
+
+            actions = model.sample_actions(inputs)
+            np.testing.assert_allclose(actions, fake_policy(inputs))
+            rtts = []
+            for _ in range(nb_requests):
+                start = time.perf_counter()
+                model.sample_actions(inputs)
+                rtts.append(time.perf_counter() - start)
+            assert model.uses_binary_transport == (transport == "binary")
+
+            name = transport if jpeg_quality is None else f"{transport}+jpeg"
+            mean_rtts[name] = np.mean(rtts)
+            print(
+                f"\n{name}: request of {size / 1e6:.2f} MB, "
+                f"mean RTT {mean_rtts[name] * 1000:.1f} ms"
+            )
+
+    assert mean_rtts["binary"] < mean_rtts["json"]
@@ -0,0 +1,228 @@
+"""
+Tests for the encoding of the camera videos, concurrent across the cameras and the
+eyes of the stereo cameras.
+
+```
+pytest tests/phosphobot/test_video_encoding.py -s
+```
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import av
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from phosphobot.utils import (
+    StreamingVideoEncoder,
+    create_video_file,
+    encode_videos,
+    get_video_encoding_jobs,
+)
+
+SIZE = (160, 120)
+
+
+def read_video_frames(video_path: str) -> list[np.ndarray]:
+    with av.open(video_path) as container:
+        return [frame.to_ndarray(format="rgb24") for frame in container.decode(video=0)]
+
+
+def moving_frames(nb_frames: int, width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    A gradient moving across the image, with some noise.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(width)[None, :, None]
+    y = np.arange(height)[:, None, None]
+    channels = np.arange(3)[None, None, :]
+    frames = np.stack(
+        [(x + 2 * y + 40 * channels + 4 * i) % 256 for i in range(nb_frames)]
+    ).astype(np.int16)
+    frames += rng.integers(-8, 8, frames.shape, dtype=np.int16)
+    return np.clip(frames, 0, 255).astype(np.uint8)
+
+
+def stereo_frames(nb_frames: int) -> np.ndarray:
+    # Dark left eye, bright right eye
+    frames = np.zeros((nb_frames, SIZE[1], SIZE[0] * 2, 3), dtype=np.uint8)
+    frames[:, :, SIZE[0] :, :] = 200
+    return frames
+
+
+def test_stereo_video_file(tmp_path):
+    output_path = str(tmp_path / "observation.images.main" / "episode_000000.mp4")
+    saved_paths = create_video_file(
+        frames=stereo_frames(10),
+        target_size=(SIZE[0] * 2, SIZE[1]),
+        output_path=output_path,
+        fps=30,
+        codec="avc1",
+    )
+    assert isinstance(saved_paths, tuple)
+    left_path, right_path = saved_paths
+    assert left_path.endswith("observation.images.main.left/episode_000000.mp4")
+
+    left_frames = read_video_frames(left_path)
+    right_frames = read_video_frames(right_path)
+    assert len(left_frames) == len(right_frames) == 10
+    assert left_frames[0].shape == (SIZE[1], SIZE[0], 3)
+    assert left_frames[0].mean() < 20 and right_frames[0].mean() > 180
+
+
+def test_streaming_stereo_encoder(tmp_path):
+    output_path = str(tmp_path / "observation.images.main" / "episode_000000.mp4")
+    encoder = StreamingVideoEncoder(
+        output_path=output_path,
+        target_size=(SIZE[0] * 2, SIZE[1]),
+        fps=30,
+        codec="avc1",
+    )
+    for frame in stereo_frames(10):
+        encoder.write(frame)
+    encoder.finish()
+    with pytest.raises(RuntimeError):
+        encoder.write(stereo_frames(1)[0])
+    saved_paths = encoder.close()
+
+    assert isinstance(saved_paths, tuple)
+    left_frames = read_video_frames(saved_paths[0])
+    right_frames = read_video_frames(saved_paths[1])
+    assert len(left_frames) == len(right_frames) == 10
+    assert left_frames[-1].mean() < 20 and right_frames[-1].mean() > 180
+
+
+class SlowImageStats:
+    """Stand-in for ImageStatsAccumulator that makes the encoder late"""
+
+    def update(self, frame: np.ndarray) -> None:
+        time.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_late_encoder_does_not_block_the_event_loop(tmp_path):
+    output_path = str(tmp_path / "observation.images.main" / "episode_000000.mp4")
+    encoder = StreamingVideoEncoder(
+        output_path=output_path,
+        target_size=SIZE,
+        fps=30,
+        codec="avc1",
+        max_queue_size=1,
+        image_stats=SlowImageStats(),  # type: ignore
+    )
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    for frame in moving_frames(10, *SIZE):
+        await encoder.write_async(frame)
+    elapsed = time.perf_counter() - start
+    ticker_task.cancel()
+    saved_path = encoder.close()
+
+    assert encoder.nb_late_writes > 0
+    # The event loop kept running while the writes waited for the encoder
+    assert elapsed > 0.1
+    assert ticks >= elapsed / 0.005 / 2
+    # No frame is dropped
+    assert isinstance(saved_path, str)
+    assert len(read_video_frames(saved_path)) == 10
+
+
+class ConcurrencyStats:
+    """Stand-in for ImageStatsAccumulator that counts the encoders running at once"""
+
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def update(self, frame: np.ndarray) -> None:
+        cls = type(self)
+        with cls.lock:
+            cls.running += 1
+            cls.max_running = max(cls.max_running, cls.running)
+        time.sleep(0.005)
+        with cls.lock:
+            cls.running -= 1
+
+
+def test_encoding_slots_cap_the_encoders(tmp_path):
+    encoding_slots = threading.Semaphore(2)
+    encoders = [
+        StreamingVideoEncoder(
+            output_path=str(tmp_path / f"camera_{i}" / "episode_000000.mp4"),
+            target_size=SIZE,
+            fps=30,
+            codec="avc1",
+            image_stats=ConcurrencyStats(),  # type: ignore
+            encoding_slots=encoding_slots,
+        )
+        for i in range(4)
+    ]
+    for frame in moving_frames(10, *SIZE):
+        for encoder in encoders:
+            encoder.write(frame)
+    saved_paths = [encoder.close() for encoder in encoders]
+
+    assert ConcurrencyStats.max_running <= 2
+    for saved_path in saved_paths:
+        assert isinstance(saved_path, str)
+        assert len(read_video_frames(saved_path)) == 10
+
+
+@pytest.mark.benchmark
+def test_encoding_benchmark(tmp_path):
+    """
+    Time to encode the videos of an episode against its length and its number of
+    cameras, one video after another and concurrently.
+    """
+    nb_cpus = os.cpu_count() or 1
+    print(f"\n{nb_cpus} CPUs")
+    for nb_frames in (30, 90):
+        for nb_cameras in (1, 3):
+            frames = [
+                moving_frames(nb_frames, *SIZE, seed=camera)
+                for camera in range(nb_cameras)
+            ]
+            times = {}
+            for mode, max_workers in (("sequential", 1), ("concurrent", nb_cameras)):
+                jobs = [
+                    job
+                    for camera, camera_frames in enumerate(frames)
+                    for job in get_video_encoding_jobs(
+                        frames=camera_frames,
+                        target_size=SIZE,
+                        output_path=str(
+                            tmp_path / mode / f"camera_{camera}" / "episode_000000.mp4"
+                        ),
+                        fps=30,
+                        codec="avc1",
+                    )
+                ]
+                start = time.perf_counter()
+                paths = encode_videos(jobs, max_workers=max_workers)
+                times[mode] = time.perf_counter() - start
+                assert [len(read_video_frames(path)) for path in paths] == [
+                    nb_frames
+                ] * nb_cameras
+
+            print(
+                f"{nb_frames} frames x {nb_cameras} cameras: "
+                f"sequential {times['sequential'] * 1000:.0f} ms, "
+                f"concurrent {times['concurrent'] * 1000:.0f} ms"
+            )
+            # The encoders release the GIL: with several CPUs the cameras are
+            # encoded in parallel, with one CPU the threads cost little
+            assert times["concurrent"] < times["sequential"] * 1.5 + 0.05